@@ -48,6 +48,15 @@ TELEGRAM_PREPROCESSING = {
     'skip_bot_messages': False,     # 不跳过 bot 消息（可能是公告）
 }
 
+# Telegram 启动与频道实体解析
+TELEGRAM_STARTUP = {
+    'resolve_concurrency': 4,       # 后台解析并发请求数
+    'resolve_batch_size': 50,       # 每个 GetChannels 请求的频道数
+    'entity_cache_path': 'data/telegram/entity_cache.json',  # 相对项目根目录
+    'entity_cache_ttl_hours': 24,   # 缓存超过该时间的频道重新解析
+    'refresh_interval_hours': 6,    # 后台元数据刷新周期
+}
+
 # ==================== REST API 优化配置 ====================
 
 REST_API_POLL_INTERVALS = {
@@ -74,6 +83,91 @@ REST_API_POLL_INTERVALS = {
     'default': 15,
 }
 
+# ==================== HTTP 限流配置（core.http_client 使用）====================
+# 每个主机一个令牌桶: rate = 每秒补充权重, burst = 桶容量
+# 取各交易所公开文档限额的约 80%，留出余量给同 IP 的其他进程
+
+HTTP_RATE_LIMITS = {
+    # 交易所
+    'api.binance.com': {'rate': 16, 'burst': 200},       # 1200 权重/分钟
+    'www.binance.com': {'rate': 2, 'burst': 5},          # 公告 bapi
+    'www.okx.com': {'rate': 8, 'burst': 20},             # 20次/2秒
+    'api.bybit.com': {'rate': 40, 'burst': 100},         # 600次/5秒
+    'api.upbit.com': {'rate': 8, 'burst': 10},           # 10次/秒
+    'api-manager.upbit.com': {'rate': 2, 'burst': 5},
+    'api.exchange.coinbase.com': {'rate': 8, 'burst': 15},
+    'www.coinbase.com': {'rate': 2, 'burst': 5},
+    'api.kucoin.com': {'rate': 8, 'burst': 20},
+    'www.kucoin.com': {'rate': 2, 'burst': 5},
+    'api.gateio.ws': {'rate': 16, 'burst': 50},          # 200次/10秒
+    'www.gate.io': {'rate': 2, 'burst': 5},
+    'api.bitget.com': {'rate': 8, 'burst': 20},
+    'api.huobi.pro': {'rate': 8, 'burst': 20},
+    'api.mexc.com': {'rate': 8, 'burst': 20},
+    'api.kraken.com': {'rate': 1, 'burst': 15},
+    'api.bithumb.com': {'rate': 10, 'burst': 20},
+    'api.coinone.co.kr': {'rate': 5, 'burst': 10},
+    'api.korbit.co.kr': {'rate': 5, 'burst': 10},
+    'api.gopax.co.kr': {'rate': 5, 'burst': 10},
+
+    # 数据服务
+    'api.etherscan.io': {'rate': 4, 'burst': 5},         # 免费档 5次/秒
+    'api.dexscreener.com': {'rate': 4, 'burst': 10},     # 300次/分钟
+    'api.geckoterminal.com': {'rate': 0.4, 'burst': 5},  # 30次/分钟
+    'api.coingecko.com': {'rate': 0.4, 'burst': 5},      # 免费档 30次/分钟
+    'api.llama.fi': {'rate': 5, 'burst': 10},
+    'stablecoins.llama.fi': {'rate': 5, 'burst': 10},
+    'api.gopluslabs.io': {'rate': 0.5, 'burst': 5},
+    'api.honeypot.is': {'rate': 1, 'burst': 5},
+
+    # 未列出的主机
+    'default': {'rate': 10, 'burst': 20},
+}
+
+# 接口权重（主机+路径前缀 -> 权重，默认 1）
+HTTP_ENDPOINT_WEIGHTS = {
+    'api.binance.com/api/v3/exchangeInfo': 20,
+    'api.binance.com/api/v3/ticker/24hr': 40,
+    'api.binance.com/api/v3/depth': 5,
+    'api.binance.com/api/v3/klines': 2,
+    'api.mexc.com/api/v3/exchangeInfo': 10,
+}
+
+# 等价 API 主机池（主主机 -> 备用主机）
+# 同一交易所的多个入口共用一个限流桶（交易所按 IP 计权重），
+# hedged_fetch_json 选最快主机，超过 p90 未返回时向次快主机补发一次
+HTTP_ENDPOINT_POOLS = {
+    'api.binance.com': ['api1.binance.com', 'api2.binance.com', 'api3.binance.com', 'api4.binance.com', 'api-gcp.binance.com'],
+    'www.okx.com': ['aws.okx.com'],
+    'api.bybit.com': ['api.bytick.com'],
+}
+
+# 对冲参数
+HTTP_HEDGE_CONFIG = {
+    'default_delay': 1.0,       # 样本不足时的对冲等待（秒）
+    'min_delay': 0.05,          # 对冲等待下限
+    'min_samples': 5,           # 计算 p90 所需的最少样本
+    'sample_window': 64,        # 每个主机保留的延迟样本数
+    'stale_after': 300,         # 样本超过该秒数视为过期，重新探测该主机
+}
+
+# ==================== REST 轮询调度配置（core.poll_scheduler 使用）====================
+# 所有 REST 监控共用一个时间轮；公告出现上币信号时加速该交易所，
+# 长时间无变化的交易所逐步退避，整体受全局预算约束
+
+POLL_SCHEDULER_CONFIG = {
+    'global_rps': 20,           # 全局轮询预算（次/秒）
+    'burst': 40,
+    'tick': 0.25,               # 时间轮刻度（秒）
+    'wheel_slots': 512,
+    'idle_after': 7200,         # 2 小时无变化开始退避
+    'max_backoff': 8,           # 最多退避到基础间隔的 8 倍
+    'boost_factor': 3,          # 加速时间隔缩短为 1/3
+    'min_interval': 1.0,
+    'boost_duration': 1800,     # 上币公告后加速 30 分钟
+    'redis_sync_interval': 5,
+}
+
 # ==================== 公告 API 配置（核心监控目标）====================
 # 公告 API 是除了 Telegram/Twitter 外最有价值的信息源
 # 比 exchangeInfo/WebSocket 有真正的提前量
@@ -237,3 +331,86 @@ MONITORING_CONFIG = {
     'health_check_interval': 60,
 }
 
+
+# ==================== 链路延迟追踪 ====================
+
+TRACE_CONFIG = {
+    'enabled': True,
+    'flush_interval': 5,        # 直方图写入 Redis 的间隔（秒）
+    'retention_hours': 48,      # 小时直方图保留时长
+}
+
+
+# ==================== Prometheus 指标 ====================
+
+METRICS_CONFIG = {
+    'enabled': True,
+    'host': '0.0.0.0',
+    # 各服务独立运行时的 /metrics 端口（unified_runner 单进程只启动一个）
+    # 仪表盘直接在 Flask 端口提供 /metrics
+    'ports': {
+        'unified_runner': 9210,
+        'fusion_turbo': 9211,
+        'fusion_v3': 9217,
+        'optimized_collector': 9212,
+        'exchange_intl': 9213,
+        'exchange_kr': 9214,
+        'telegram': 9215,
+        'turbo_pusher': 9216,
+    },
+    'default_port': None,
+}
+
+
+# ==================== Stream 编码 ====================
+
+STREAM_CODEC = {
+    # 生产者写入格式: 'legacy'（每个字段一个字符串）/ 'msgpack'（单字段二进制信封）
+    # 消费者按消息里的标记字段自动识别两种格式，上线顺序: 先升级消费者，再切换生产者
+    # 环境变量 STREAM_CODEC 可覆盖
+    'format': 'legacy',
+    'streams': ['events:raw', 'events:fused', 'events:route:*'],
+}
+
+
+# ==================== 近似重复检测 ====================
+
+NEAR_DUP_CONFIG = {
+    'enabled': True,
+    'window_seconds': 600,      # 簇保留时长（按首条出现时间）
+    'max_distance': 14,         # SimHash 汉明距离阈值（需小于 bands）
+    'bands': 16,                # LSH 分段数（64 位 / 16 段 = 每段 4 位）
+    'min_tokens': 5,            # 过短的文本不参与检测
+}
+
+
+# ==================== 事件去重 ====================
+
+DEDUP_CONFIG = {
+    # 顶层为默认值，filters 按使用方覆盖
+    'fp_rate': 0.001,           # Bloom 误判率（把新事件当成重复的概率）
+    'buckets': 4,               # 时间分桶数，键在窗口的 3/4 ~ 1 之间过期
+    'redis_prefix': 'dedup:',
+    'filters': {
+        # shared=True 时多个进程通过 Redis 位图共享去重状态
+        'collector_events': {'window_seconds': 3600, 'capacity': 10000, 'shared': True},
+        'fusion_turbo': {'window_seconds': 1800, 'capacity': 50000, 'shared': True},
+        'scorer_events': {'window_seconds': 1800, 'capacity': 50000, 'shared': False},
+        'alpha_events': {'window_seconds': 1800, 'capacity': 50000, 'shared': False},
+        'whale_txs': {'window_seconds': 86400, 'capacity': 50000, 'shared': True},
+    },
+}
+
+
+# ==================== 合约地址同步 ====================
+
+CONTRACT_SYNC_CONFIG = {
+    'incremental_interval': 300,    # 增量同步间隔（秒）：只处理游标之后新增的交易对
+    'full_interval': 86400,         # 全量同步间隔（秒）：补查所有仍缺合约的符号
+    'concurrency': 8,               # DexScreener 并发上限（实际速率由 HTTP_RATE_LIMITS 限制）
+    'geckoterminal_fallback': True, # DexScreener 未找到时回退 GeckoTerminal
+    'geckoterminal_concurrency': 2,
+    'min_liquidity': 1000,          # 最低流动性（USD），低于此值不写入
+    'write_batch': 100,             # 找到的合约攒够该数量后一次 pipeline 写入
+    'log_retention_days': 7,        # known_pairs:added 新增记录保留天数
+}
@@ -0,0 +1,31 @@
+-- ============================================================
+-- Crypto Monitor - Redis Stream 归档表结构
+-- ============================================================
+-- services/stream_archiver.py 使用，依赖 init_postgres.sql 中的表
+-- 执行方法:
+--   docker exec -i crypto-postgres psql -U crypto -d crypto < scripts/init_archive_tables.sql
+
+-- ============================================================
+-- 1. 原始 Stream 归档（所有归档流的完整字段）
+-- ============================================================
+CREATE TABLE IF NOT EXISTS stream_archive (
+    stream VARCHAR(50) NOT NULL,                -- events:raw / events:fused / whales:dynamics / trades:executed
+    stream_id VARCHAR(40) NOT NULL,             -- Redis Stream ID（幂等键）
+    ts TIMESTAMP WITH TIME ZONE NOT NULL,       -- Stream ID 中的毫秒时间戳
+    data JSONB NOT NULL,
+    archived_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (stream, stream_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_archive_ts ON stream_archive(ts DESC);
+CREATE INDEX IF NOT EXISTS idx_archive_stream_ts ON stream_archive(stream, ts DESC);
+
+-- ============================================================
+-- 2. 业务表的幂等键
+-- ============================================================
+-- listing_events.event_id = 'fused:<stream_id>'，trades.trade_id 已唯一
+-- whale_activities 没有唯一键，按 Stream ID 去重
+ALTER TABLE whale_activities ADD COLUMN IF NOT EXISTS stream_id VARCHAR(40);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_whale_stream_id ON whale_activities(stream_id);
+
+SELECT '归档表初始化完成!' as status;
@@ -23,6 +23,10 @@ logger = logging.getLogger(__name__)
 
 try:
     import aiohttp
+    try:
+        from core.http_client import create_session
+    except ImportError:
+        from src.core.http_client import create_session
     HAS_AIOHTTP = True
 except ImportError:
     HAS_AIOHTTP = False
@@ -162,7 +166,7 @@ class HoneypotDetector:
             url = f"https://api.gopluslabs.io/api/v1/token_security/{chain_id}"
             params = {'contract_addresses': token_address}
             
-            async with aiohttp.ClientSession() as session:
+            async with create_session() as session:
                 async with session.get(url, params=params, timeout=10) as resp:
                     if resp.status != 200:
                         return {'safe': None, 'reason': f'API 错误: {resp.status}'}
@@ -241,7 +245,7 @@ class HoneypotDetector:
                 'chainId': {'eth': 1, 'bsc': 56, 'base': 8453}.get(chain_code, 1)
             }
             
-            async with aiohttp.ClientSession() as session:
+            async with create_session() as session:
                 async with session.get(url, params=params, timeout=15) as resp:
                     if resp.status != 200:
                         return {'safe': None, 'reason': f'API 错误: {resp.status}'}
@@ -30,6 +30,7 @@ from datetime import datetime
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from core.logging import get_logger
+from core.http_client import create_session
 
 logger = get_logger('multi_analyzer')
 
@@ -49,7 +50,7 @@ class DataFetcher:
     async def ensure_session(self):
         if not self.session or self.session.closed:
             timeout = aiohttp.ClientTimeout(total=10)
-            self.session = aiohttp.ClientSession(timeout=timeout)
+            self.session = create_session(timeout=timeout)
     
     async def fetch(self, url: str, params: dict = None) -> Optional[dict]:
         """获取 JSON 数据"""
@@ -21,6 +21,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from core.logging import get_logger
 from core.redis_client import RedisClient
+from core.http_client import create_session
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -290,7 +291,7 @@ class TokenClassifier:
         network = chain_map.get(chain.lower(), 'ethereum')
         url = f"https://api.dexscreener.com/latest/dex/search?q={symbol}"
         
-        async with aiohttp.ClientSession() as session:
+        async with create_session() as session:
             async with session.get(url, timeout=10) as resp:
                 if resp.status == 200:
                     data = await resp.json()
@@ -319,7 +320,7 @@ class TokenClassifier:
         network = chain_map.get(chain.lower(), 'eth')
         url = f"https://api.geckoterminal.com/api/v2/search/pools?query={symbol}&network={network}"
         
-        async with aiohttp.ClientSession() as session:
+        async with create_session() as session:
             async with session.get(url, timeout=10) as resp:
                 if resp.status == 200:
                     data = await resp.json()
@@ -413,7 +414,7 @@ class TokenClassifier:
             
             url = f"https://api.dexscreener.com/latest/dex/tokens/{contract_address}"
             
-            async with aiohttp.ClientSession() as session:
+            async with create_session() as session:
                 async with session.get(url, timeout=10) as resp:
                     if resp.status == 200:
                         data = await resp.json()
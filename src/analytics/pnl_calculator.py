@@ -6,17 +6,24 @@ PnL Calculator Engine
 功能：
 1. 分析钱包的完整交易历史
 2. 计算胜率和 PnL
-3. 获取实时价格
+3. 获取实时价格，按交易时间的历史价格估值
 4. 生成分析报告
 """
 
 import asyncio
 import aiohttp
+import json
 import logging
 import os
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional, Any
 
+try:
+    from src.core.http_client import create_session
+except ImportError:
+    from core.http_client import create_session
+
 logger = logging.getLogger('pnl_calculator')
 
 # 尝试导入模型
@@ -28,6 +35,8 @@ except ImportError:
     sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
     from src.models.whale_analytics import TokenPosition, WalletAnalytics, TradeResult
 
+from src.analytics.price_history import HistoricalPriceStore
+
 # CoinGecko ID 映射
 TOKEN_COINGECKO_IDS = {
     'ETH': 'ethereum',
@@ -103,7 +112,7 @@ class PriceService:
         """获取或创建 session"""
         if self._session is None or self._session.closed:
             timeout = aiohttp.ClientTimeout(total=10)
-            self._session = aiohttp.ClientSession(timeout=timeout)
+            self._session = create_session(timeout=timeout)
         return self._session
         
     async def close(self):
@@ -165,9 +174,8 @@ class PriceService:
                     data = await resp.json()
                     return data.get(coingecko_id, {}).get('usd')
                 elif resp.status == 429:
-                    # Rate limited
+                    # 主机级退避由 core.http_client 按 Retry-After 处理
                     logger.warning("CoinGecko API 限速")
-                    await asyncio.sleep(60)
         except asyncio.TimeoutError:
             logger.debug(f"获取 {coingecko_id} 价格超时")
         except Exception as e:
@@ -238,11 +246,22 @@ class PriceService:
         return result
 
 
+# 钱包分析快照（Redis）
+SNAPSHOT_KEY_PREFIX = 'whale:pnl:'            # String: WalletAnalytics.to_state() JSON
+SNAPSHOT_SUMMARY_KEY = 'whale:pnl:summary'    # Hash: address -> to_summary_dict() JSON
+
+# 增量拉取时的分页上限（Etherscan 要求 page * offset <= 10000）
+INCREMENTAL_PAGE_SIZE = 1000
+INCREMENTAL_MAX_PAGES = 10
+
+
 class PnLCalculator:
     """PnL 计算器"""
     
-    def __init__(self):
+    def __init__(self, price_history: Optional[HistoricalPriceStore] = None, redis_client=None):
         self.price_service = PriceService()
+        self.price_history = price_history or HistoricalPriceStore(coingecko_ids=TOKEN_COINGECKO_IDS)
+        self.redis = redis_client
         self._fetcher = None
         
     @property
@@ -260,8 +279,40 @@ class PnLCalculator:
     async def close(self):
         """关闭资源"""
         await self.price_service.close()
+        await self.price_history.close()
         if self._fetcher:
             await self._fetcher.close()
+    
+    # ==================== 快照 ====================
+    
+    def load_snapshot(self, address: str) -> Optional[WalletAnalytics]:
+        """读取钱包的上次分析快照"""
+        if not self.redis:
+            return None
+        try:
+            raw = self.redis.get(SNAPSHOT_KEY_PREFIX + address.lower())
+            return WalletAnalytics.from_state(json.loads(raw)) if raw else None
+        except Exception as e:
+            logger.warning(f"读取钱包快照失败 {address[:10]}...: {e}")
+            return None
+    
+    def save_snapshot(self, analytics: WalletAnalytics):
+        """写回分析快照（累计状态 + Dashboard 摘要）"""
+        if not self.redis:
+            return
+        address = analytics.address.lower()
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.set(SNAPSHOT_KEY_PREFIX + address, json.dumps(analytics.to_state()))
+            pipe.hset(SNAPSHOT_SUMMARY_KEY, address, json.dumps({
+                **analytics.to_summary_dict(),
+                'analysis_time': analytics.analysis_time.isoformat() if analytics.analysis_time else None,
+            }))
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"保存钱包快照失败 {address[:10]}...: {e}")
+    
+    # ==================== 分析 ====================
         
     async def analyze_wallet(
         self, 
@@ -294,31 +345,7 @@ class PnLCalculator:
         logger.info(f"分析钱包: {label or address[:10]}...")
         
         try:
-            # 获取 ETH 余额
-            eth_balance = await self.fetcher.get_eth_balance(address)
-            analytics.eth_balance = eth_balance
-            
-            # 获取 ETH 交易记录
-            eth_txs = await self.fetcher.get_address_transactions(address, offset=500)
-            
-            # 获取代币转账记录
-            token_txs = await self.fetcher.get_token_transfers(address, offset=1000)
-            
-            # 处理交易
-            cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-            
-            # 处理 ETH 交易
-            await self._process_eth_transactions(analytics, eth_txs, address, cutoff)
-            
-            # 处理代币交易
-            await self._process_token_transactions(analytics, token_txs, address, cutoff)
-            
-            # 更新当前价格并计算 PnL
-            await self._update_prices_and_pnl(analytics)
-            
-            # 计算统计数据
-            analytics.calculate_stats()
-            
+            await self._collect(analytics, datetime.now(timezone.utc) - timedelta(days=days))
         except Exception as e:
             logger.error(f"分析钱包失败 {address[:10]}...: {e}")
             import traceback
@@ -326,6 +353,145 @@ class PnLCalculator:
         
         return analytics
     
+    async def refresh_wallet(
+        self,
+        address: str,
+        label: str = '',
+        category: str = '',
+        days: int = 90,
+        eth_balance: Optional[float] = None,
+        full: bool = False,
+    ) -> Optional[WalletAnalytics]:
+        """
+        增量刷新钱包分析
+        
+        有快照时只拉取游标区块之后的交易，累加到已有持仓；ETH 余额未变时跳过 txlist
+        （收发 ETH 和支付 gas 都会改变余额）。成功后写回快照，失败时保留旧快照。
+        
+        Args:
+            eth_balance: 调用方批量查询到的当前 ETH 余额（None 表示单独查询）
+            full: 忽略快照，按 days 重新分析
+        """
+        previous = None if full else self.load_snapshot(address)
+        if previous:
+            analytics = previous
+            analytics.label = label or analytics.label
+            analytics.category = category or analytics.category
+            analytics.analysis_time = datetime.now(timezone.utc)
+            cutoff = datetime.fromtimestamp(0, tz=timezone.utc)
+        else:
+            analytics = WalletAnalytics(
+                address=address,
+                label=label or address[:10] + '...',
+                category=category or 'unknown',
+                analysis_time=datetime.now(timezone.utc)
+            )
+            cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        
+        if not self.fetcher:
+            logger.warning("Etherscan fetcher 不可用")
+            return previous
+        
+        skip_eth = previous is not None and eth_balance is not None and eth_balance == previous.eth_balance
+        try:
+            await self._collect(analytics, cutoff, eth_balance=eth_balance, skip_eth=skip_eth)
+        except Exception as e:
+            logger.error(f"刷新钱包失败 {address[:10]}...: {e}")
+            return None
+        
+        self.save_snapshot(analytics)
+        return analytics
+    
+    async def _fetch_since(self, fetch, address: str, last_block: int, first_offset: int) -> List[Dict]:
+        """
+        拉取游标之后的交易（游标为 0 时只取最新 first_offset 条）
+        
+        游标区块在上次拉取时已完整处理，从下一个区块开始按区块升序分页，拿到的总是连续前缀。
+        最后一页是满页时（达到页数上限，或下一页请求失败——fetcher 失败也返回空列表），
+        末尾区块可能只拿到一部分，丢弃这个区块，游标停在它之前，下一轮从它开始继续。
+        """
+        if not last_block:
+            return await fetch(address, offset=first_offset)
+        
+        txs: List[Dict] = []
+        complete = False
+        for page in range(1, INCREMENTAL_MAX_PAGES + 1):
+            batch = await fetch(
+                address, start_block=last_block + 1, page=page, offset=INCREMENTAL_PAGE_SIZE, sort='asc'
+            )
+            txs.extend(batch)
+            if len(batch) < INCREMENTAL_PAGE_SIZE:
+                # 空页无法区分“没有更多”与请求失败，只有不满的非空页才确认到达末尾
+                complete = bool(batch) or not txs
+                break
+        
+        if not complete:
+            tail = int(txs[-1].get('blockNumber', 0) or 0)
+            trimmed = [tx for tx in txs if int(tx.get('blockNumber', 0) or 0) < tail]
+            if trimmed:
+                logger.info(f"{address[:10]}... 交易超过单次拉取范围，区块 {tail} 起下一轮继续")
+                txs = trimmed
+        return txs
+    
+    async def _collect(
+        self,
+        analytics: WalletAnalytics,
+        cutoff: datetime,
+        eth_balance: Optional[float] = None,
+        skip_eth: bool = False,
+    ):
+        """拉取 analytics 游标之后的交易并累加到持仓"""
+        address = analytics.address
+        
+        # 获取 ETH 余额
+        if eth_balance is None:
+            eth_balance = await self.fetcher.get_eth_balance(address)
+        analytics.eth_balance = eth_balance
+        
+        # 获取 ETH 交易记录 / 代币转账记录
+        eth_txs, token_txs = await asyncio.gather(
+            self._fetch_since(self.fetcher.get_address_transactions, address, analytics.last_eth_block, 500)
+            if not skip_eth else asyncio.sleep(0, result=[]),
+            self._fetch_since(self.fetcher.get_token_transfers, address, analytics.last_token_block, 1000),
+        )
+        
+        # 按时间正序累加，首笔/最近交易时间才正确
+        def block_of(tx):
+            return int(tx.get('blockNumber', 0) or 0)
+        eth_txs = sorted(eth_txs or [], key=block_of)
+        token_txs = sorted(token_txs or [], key=block_of)
+        
+        # 批量回补新交易时间范围内的历史 K 线（已缓存的区间不会重复请求）
+        symbols = {'ETH'} if eth_txs else set()
+        symbols.update(
+            tx.get('tokenSymbol', '').upper() for tx in token_txs
+            if tx.get('tokenSymbol')
+        )
+        if symbols:
+            since = min(int(tx.get('timeStamp', 0) or 0) for tx in eth_txs + token_txs)
+            try:
+                await self.price_history.ensure_range(symbols, max(since, cutoff.timestamp()))
+            except Exception as e:
+                logger.warning(f"回补历史价格失败，使用当前价格估值: {e}")
+        
+        # 处理 ETH 交易
+        await self._process_eth_transactions(analytics, eth_txs, address, cutoff)
+        
+        # 处理代币交易
+        await self._process_token_transactions(analytics, token_txs, address, cutoff)
+        
+        # 推进游标
+        if eth_txs:
+            analytics.last_eth_block = max(analytics.last_eth_block, block_of(eth_txs[-1]))
+        if token_txs:
+            analytics.last_token_block = max(analytics.last_token_block, block_of(token_txs[-1]))
+        
+        # 更新当前价格并计算 PnL
+        await self._update_prices_and_pnl(analytics)
+        
+        # 计算统计数据
+        analytics.calculate_stats()
+    
     async def _process_eth_transactions(
         self, 
         analytics: WalletAnalytics, 
@@ -349,8 +515,8 @@ class PnLCalculator:
         
         position = analytics.positions['ETH']
         
-        # 获取当前 ETH 价格
-        eth_price = await self.price_service.get_current_price('ETH')
+        # 当前 ETH 价格（历史价格缺失时的后备）
+        current_eth_price = await self.price_service.get_current_price('ETH')
         
         for tx in txs:
             try:
@@ -362,6 +528,8 @@ class PnLCalculator:
                 if value < 0.01:  # 过滤小额
                     continue
                 
+                eth_price = self.price_history.lookup('ETH', tx_time.timestamp()) or current_eth_price
+                
                 is_incoming = tx.get('to', '').lower() == address_lower
                 
                 if is_incoming:
@@ -448,8 +616,11 @@ class PnLCalculator:
                 
                 position = analytics.positions[token_symbol]
                 
-                # 获取代币价格
-                token_price = prices.get(token_symbol, 0)
+                # 按交易时间的历史价格，缺失时用当前价格
+                token_price = (
+                    self.price_history.lookup(token_symbol, tx_time.timestamp())
+                    or prices.get(token_symbol, 0)
+                )
                 
                 is_incoming = tx.get('to', '').lower() == address_lower
                 
@@ -503,44 +674,68 @@ class PnLCalculator:
 async def analyze_all_whales(
     addresses: List[Dict],
     days: int = 90,
-    max_concurrent: int = 3
+    max_concurrent: int = 8,
+    redis_client=None,
+    full: bool = False,
 ) -> List[WalletAnalytics]:
     """
     分析所有巨鲸地址
     
+    传入 redis_client 时按快照增量刷新：每个钱包只拉取上次游标之后的交易，
+    ETH 余额（balancemulti 批量查询）未变的钱包跳过 txlist，结果写回快照。
+    并发受 max_concurrent 和 EtherscanFetcher 的 Key 档位令牌桶共同约束。
+    
     Args:
         addresses: 地址列表 [{'address': '0x...', 'name': '...', 'label': '...'}]
-        days: 分析多少天的数据
-        max_concurrent: 最大并发数
+        days: 首次分析（无快照）时回溯的天数
+        max_concurrent: 最大并发钱包数
+        redis_client: 快照存储，None 时每次完整分析且不持久化
+        full: 忽略已有快照，重新完整分析
         
     Returns:
         分析结果列表（按评分排序）
     """
     
-    calculator = PnLCalculator()
-    results = []
+    calculator = PnLCalculator(redis_client=redis_client)
+    semaphore = asyncio.Semaphore(max_concurrent)
+    started = time.monotonic()
     
-    # 分批处理以避免 API 限速
-    for i, addr_info in enumerate(addresses):
+    # 批量查询 ETH 余额（每 20 个地址一次请求）
+    balances: Dict[str, float] = {}
+    if calculator.fetcher:
         try:
-            logger.info(f"[{i+1}/{len(addresses)}] 分析 {addr_info.get('name', addr_info.get('address', '')[:10])}")
-            
-            analytics = await calculator.analyze_wallet(
-                address=addr_info.get('address', ''),
-                label=addr_info.get('name', addr_info.get('label', '')),
-                category=addr_info.get('label', addr_info.get('category', '')),
-                days=days
+            balances = await calculator.fetcher.get_multi_eth_balance(
+                [a.get('address', '') for a in addresses if a.get('address')]
             )
-            results.append(analytics)
-            
-            # 限速：每3个地址等待1秒
-            if (i + 1) % 3 == 0:
-                await asyncio.sleep(1)
-                
         except Exception as e:
-            logger.error(f"分析失败 {addr_info.get('name')}: {e}")
+            logger.warning(f"批量查询余额失败: {e}")
+    
+    async def analyze_one(i: int, addr_info: Dict) -> Optional[WalletAnalytics]:
+        address = addr_info.get('address', '')
+        async with semaphore:
+            try:
+                logger.info(f"[{i+1}/{len(addresses)}] 分析 {addr_info.get('name', address[:10])}")
+                return await calculator.refresh_wallet(
+                    address=address,
+                    label=addr_info.get('name', addr_info.get('label', '')),
+                    category=addr_info.get('label', addr_info.get('category', '')),
+                    days=days,
+                    eth_balance=balances.get(address.lower()),
+                    full=full,
+                )
+            except Exception as e:
+                logger.error(f"分析失败 {addr_info.get('name')}: {e}")
+                return None
+    
+    try:
+        analyzed = await asyncio.gather(*(
+            analyze_one(i, addr_info) for i, addr_info in enumerate(addresses)
+        ))
+    finally:
+        await calculator.close()
     
-    await calculator.close()
+    results = [a for a in analyzed if a is not None]
+    logger.info(f"✅ 分析完成 {len(results)}/{len(addresses)} 个钱包，耗时 {time.monotonic() - started:.1f}s")
     
     # 按评分排序
     results.sort(key=lambda x: x.smart_score, reverse=True)
@@ -0,0 +1,404 @@
+# -*- coding: utf-8 -*-
+"""
+历史价格存储
+Historical Price Store
+
+按交易对、按小时/日 K 线保存历史价格（SQLite 持久化），供 PnL 计算按交易时间估值：
+- 按时间范围批量回补：Binance klines（每次 1000 根），失败时回退 CoinGecko market_chart/range
+- 按已存 K 线的实际 open_time 计算缺失区间（含中间空洞），重复分析不会重复请求；
+  确实没有 K 线的历史区间（停牌、维护）本进程内只查一次
+- 只有数据源明确回答"交易对不存在"时才停用该代币；限流 / 5xx / 超时只中断本次回补，
+  已拿到的部分照常写入，未完整拉取的区间下次重试
+- 查询 (symbol, interval, open_time) 主键上的 B-tree，按时间戳 O(log n) 定位
+- 批量估值时整段加载为有序数组，用 bisect 查找
+"""
+
+import asyncio
+import bisect
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+try:
+    from src.core.http_client import create_session, fetch_json
+except ImportError:
+    from core.http_client import create_session, fetch_json
+
+logger = logging.getLogger('price_history')
+
+DEFAULT_DB_PATH = os.getenv(
+    'PRICE_HISTORY_DB',
+    str(Path(__file__).parent.parent.parent / 'data' / 'price_history.db'),
+)
+
+# K 线周期（秒）
+INTERVALS = {
+    '1h': 3600,
+    '1d': 86400,
+}
+
+# 小时线覆盖的最长回溯；更早的交易用日线
+HOURLY_MAX_AGE = 90 * 86400
+
+BINANCE_KLINES_URL = 'https://api.binance.com/api/v3/klines'
+BINANCE_KLINES_LIMIT = 1000
+BINANCE_INVALID_SYMBOL = -1121
+COINGECKO_RANGE_URL = 'https://api.coingecko.com/api/v3/coins/{id}/market_chart/range'
+
+STABLECOINS = {'USDT', 'USDC', 'DAI', 'BUSD', 'TUSD', 'FDUSD'}
+
+# 包装资产按底层资产计价
+SYMBOL_ALIASES = {
+    'WETH': 'ETH',
+    'WBTC': 'BTC',
+    'STETH': 'ETH',
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS candles (
+    symbol    TEXT    NOT NULL,
+    interval  TEXT    NOT NULL,
+    open_time INTEGER NOT NULL,
+    open      REAL    NOT NULL,
+    high      REAL    NOT NULL,
+    low       REAL    NOT NULL,
+    close     REAL    NOT NULL,
+    PRIMARY KEY (symbol, interval, open_time)
+) WITHOUT ROWID
+"""
+
+Candle = Tuple[int, float, float, float, float]  # (open_time, open, high, low, close)
+
+
+def interval_for(ts: float, now: Optional[float] = None) -> str:
+    """按交易时间选择 K 线周期"""
+    now = now or time.time()
+    return '1h' if now - ts <= HOURLY_MAX_AGE else '1d'
+
+
+def normalize_symbol(symbol: str) -> str:
+    symbol = (symbol or '').upper()
+    return SYMBOL_ALIASES.get(symbol, symbol)
+
+
+class PriceSourceError(Exception):
+    """数据源暂时不可用（限流 / 5xx / 超时 / 异常响应），可重试；candles 为出错前已拉到的部分"""
+
+    def __init__(self, message: str, candles: Optional[List[Candle]] = None):
+        super().__init__(message)
+        self.candles = candles or []
+
+
+class HistoricalPriceStore:
+    """历史 K 线存储"""
+
+    def __init__(self, db_path: Optional[str] = None, coingecko_ids: Optional[Dict[str, str]] = None):
+        self.db_path = db_path or DEFAULT_DB_PATH
+        if self.db_path != ':memory:':
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(_SCHEMA)
+        self._db.commit()
+
+        self.coingecko_ids = coingecko_ids or {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        # 无数据源的交易对（本进程内不再重复请求）
+        self._unavailable: set = set()
+        # 批量估值用的有序数组缓存 {(symbol, interval): (open_times, closes)}
+        self._series: Dict[Tuple[str, str], Tuple[List[int], List[float]]] = {}
+        # 已向数据源查询过的已收盘区间 {(symbol, interval): [(start, end)]}，其中的空洞不再重复请求
+        self._checked: Dict[Tuple[str, str], List[Tuple[int, int]]] = {}
+
+        self.stats = {
+            'lookups': 0,
+            'hits': 0,
+            'requests': 0,
+            'candles_written': 0,
+            'source_errors': 0,
+        }
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = create_session(timeout=aiohttp.ClientTimeout(total=20))
+        return self._session
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._db.close()
+
+    # ==================== 存取 ====================
+
+    def upsert_candles(self, symbol: str, interval: str, candles: Iterable[Candle]) -> int:
+        """写入 K 线（同一根 K 线重复写入时覆盖，未收盘的 K 线会被更新）"""
+        rows = [(symbol, interval, int(c[0]), c[1], c[2], c[3], c[4]) for c in candles]
+        if not rows:
+            return 0
+        self._db.executemany(
+            'INSERT OR REPLACE INTO candles VALUES (?, ?, ?, ?, ?, ?, ?)', rows
+        )
+        self._db.commit()
+        self._series.pop((symbol, interval), None)
+        self.stats['candles_written'] += len(rows)
+        return len(rows)
+
+    def coverage(self, symbol: str, interval: str) -> Optional[Tuple[int, int]]:
+        """已存储的 K 线时间范围 (最早 open_time, 最晚 open_time)"""
+        row = self._db.execute(
+            'SELECT MIN(open_time), MAX(open_time) FROM candles WHERE symbol = ? AND interval = ?',
+            (symbol, interval),
+        ).fetchone()
+        if not row or row[0] is None:
+            return None
+        return row[0], row[1]
+
+    def missing_spans(self, symbol: str, interval: str, start: int, end: int) -> List[Tuple[int, int]]:
+        """[start, end] 内缺少 K 线的区间（按实际 open_time 计算，包括已有数据中间的空洞）"""
+        step = INTERVALS[interval]
+        open_times = [r[0] for r in self._db.execute(
+            'SELECT open_time FROM candles WHERE symbol = ? AND interval = ? '
+            'AND open_time BETWEEN ? AND ? ORDER BY open_time',
+            (symbol, interval, start, end),
+        )]
+        if not open_times:
+            gaps = [(start, end)]
+        else:
+            gaps = []
+            expected = start
+            for t in open_times:
+                if t > expected:
+                    gaps.append((expected, t - step))
+                expected = t + step
+            # 最后一根可能未收盘，从它开始重新拉取
+            if end >= open_times[-1] + step:
+                gaps.append((open_times[-1], end))
+
+        checked = self._checked.get((symbol, interval), ())
+        return [g for g in gaps if not any(s <= g[0] and g[1] <= e for s, e in checked)]
+
+    def lookup(self, symbol: str, ts: float, interval: Optional[str] = None) -> Optional[float]:
+        """
+        查询某一时刻的价格（所在 K 线的收盘价）
+
+        Args:
+            symbol: 代币符号
+            ts: Unix 时间戳（秒）
+            interval: K 线周期，默认按时间距今远近选择
+        """
+        symbol = normalize_symbol(symbol)
+        if symbol in STABLECOINS:
+            return 1.0
+        interval = interval or interval_for(ts)
+        self.stats['lookups'] += 1
+
+        series = self._series.get((symbol, interval))
+        if series is not None:
+            open_times, closes = series
+            idx = bisect.bisect_right(open_times, int(ts)) - 1
+            price = closes[idx] if idx >= 0 and int(ts) - open_times[idx] < INTERVALS[interval] else None
+        else:
+            row = self._db.execute(
+                'SELECT open_time, close FROM candles '
+                'WHERE symbol = ? AND interval = ? AND open_time <= ? '
+                'ORDER BY open_time DESC LIMIT 1',
+                (symbol, interval, int(ts)),
+            ).fetchone()
+            price = row[1] if row and int(ts) - row[0] < INTERVALS[interval] else None
+
+        if price is not None:
+            self.stats['hits'] += 1
+        return price
+
+    def load_series(self, symbol: str, interval: str) -> int:
+        """将整段 K 线加载为有序数组，之后的 lookup 走 bisect"""
+        symbol = normalize_symbol(symbol)
+        rows = self._db.execute(
+            'SELECT open_time, close FROM candles WHERE symbol = ? AND interval = ? ORDER BY open_time',
+            (symbol, interval),
+        ).fetchall()
+        self._series[(symbol, interval)] = ([r[0] for r in rows], [r[1] for r in rows])
+        return len(rows)
+
+    # ==================== 回补 ====================
+
+    async def ensure_range(self, symbols: Iterable[str], start_ts: float, end_ts: Optional[float] = None):
+        """
+        确保若干代币在时间范围内有 K 线（只回补缺失部分），并加载为有序数组
+
+        范围跨越小时线回溯上限时，较早的部分用日线
+        """
+        now = time.time()
+        end_ts = min(end_ts or now, now)
+        boundary = now - HOURLY_MAX_AGE
+
+        spans = []
+        if start_ts < boundary:
+            spans.append(('1d', start_ts, min(end_ts, boundary + INTERVALS['1d'])))
+        if end_ts > boundary:
+            spans.append(('1h', max(start_ts, boundary), end_ts))
+
+        targets = {normalize_symbol(s) for s in symbols} - STABLECOINS
+        await asyncio.gather(*[
+            self.backfill(symbol, interval, s, e)
+            for symbol in targets
+            for interval, s, e in spans
+        ])
+        for symbol in targets:
+            for interval, _, _ in spans:
+                if (symbol, interval) not in self._series:
+                    self.load_series(symbol, interval)
+
+    async def backfill(self, symbol: str, interval: str, start_ts: float, end_ts: float) -> int:
+        """回补 [start_ts, end_ts] 中尚未覆盖的 K 线，返回写入数量"""
+        symbol = normalize_symbol(symbol)
+        if symbol in STABLECOINS or symbol in self._unavailable:
+            return 0
+        step = INTERVALS[interval]
+        start = int(start_ts) // step * step
+        end = int(end_ts)
+
+        lock = self._locks.setdefault((symbol, interval), asyncio.Lock())
+        async with lock:
+            gaps = self.missing_spans(symbol, interval, start, end)
+            # 早于当前 K 线的区间已收盘，查询过之后仍缺的部分就是数据源本身没有
+            closed_before = int(time.time()) // step * step
+
+            written = 0
+            for gap_start, gap_end in gaps:
+                candles, complete = await self._fetch_span(symbol, interval, gap_start, gap_end)
+                if candles is None:
+                    self._unavailable.add(symbol)
+                    logger.debug(f"{symbol} 无历史价格数据源")
+                    break
+                written += self.upsert_candles(symbol, interval, candles)
+                if not complete:
+                    # 暂时性失败（多半是限流）：后面的缺口也先不请求，下次重试
+                    break
+                if gap_end < closed_before:
+                    self._checked.setdefault((symbol, interval), []).append((gap_start, gap_end))
+
+            if written:
+                logger.info(f"📈 回补 {symbol} {interval} K 线 {written} 根")
+            return written
+
+    async def _fetch_span(self, symbol: str, interval: str, start: int, end: int) -> Tuple[Optional[List[Candle]], bool]:
+        """
+        依次尝试 Binance、CoinGecko 拉取一个区间
+
+        Returns:
+            (K 线, 是否完整)；K 线为 None 表示两个数据源都明确没有该代币
+        """
+        partial: List[Candle] = []
+        failed = False
+        try:
+            candles = await self._fetch_binance(symbol, interval, start, end)
+            if candles is not None:
+                return candles, True
+        except PriceSourceError as e:
+            self.stats['source_errors'] += 1
+            logger.debug(f"Binance K 线暂时不可用 {symbol}: {e}")
+            partial, failed = e.candles, True
+
+        try:
+            candles = await self._fetch_coingecko(symbol, interval, start, end)
+            if candles is not None:
+                return candles, True
+        except PriceSourceError as e:
+            self.stats['source_errors'] += 1
+            logger.debug(f"CoinGecko 历史价格暂时不可用 {symbol}: {e}")
+            failed = True
+
+        return (partial, False) if failed else (None, False)
+
+    async def _fetch_binance(self, symbol: str, interval: str, start: int, end: int) -> Optional[List[Candle]]:
+        """
+        分页拉取 Binance K 线
+
+        Returns:
+            K 线；交易对不存在（400 Invalid symbol）时返回 None
+
+        Raises:
+            PriceSourceError: 请求失败或中途失败（附带已拉到的部分）
+        """
+        session = await self._get_session()
+        step = INTERVALS[interval]
+        candles: List[Candle] = []
+        cursor = start
+        while cursor <= end:
+            params = {
+                'symbol': f'{symbol}USDT',
+                'interval': interval,
+                'startTime': cursor * 1000,
+                'endTime': end * 1000,
+                'limit': BINANCE_KLINES_LIMIT,
+            }
+            self.stats['requests'] += 1
+            try:
+                status, data = await fetch_json(session, BINANCE_KLINES_URL, params=params)
+            except Exception as e:
+                raise PriceSourceError(f"请求失败: {e}", candles) from e
+            if status == 400 and isinstance(data, dict) and data.get('code') == BINANCE_INVALID_SYMBOL:
+                return None
+            if status != 200 or not isinstance(data, list):
+                raise PriceSourceError(f"HTTP {status}", candles)
+            if not data:
+                break
+            for k in data:
+                candles.append((int(k[0]) // 1000, float(k[1]), float(k[2]), float(k[3]), float(k[4])))
+            if len(data) < BINANCE_KLINES_LIMIT:
+                break
+            cursor = candles[-1][0] + step
+        return candles
+
+    async def _fetch_coingecko(self, symbol: str, interval: str, start: int, end: int) -> Optional[List[Candle]]:
+        """
+        CoinGecko 只有价格点，按周期聚合为 K 线
+
+        Returns:
+            K 线；没有 CoinGecko ID 或 ID 不存在（404）时返回 None
+
+        Raises:
+            PriceSourceError: 限流 / 5xx / 超时等暂时性失败
+        """
+        coingecko_id = self.coingecko_ids.get(symbol)
+        if not coingecko_id or not isinstance(coingecko_id, str):
+            return None
+        session = await self._get_session()
+        params = {'vs_currency': 'usd', 'from': start, 'to': end + INTERVALS[interval]}
+        self.stats['requests'] += 1
+        try:
+            status, data = await fetch_json(
+                session, COINGECKO_RANGE_URL.format(id=coingecko_id), params=params
+            )
+        except Exception as e:
+            raise PriceSourceError(f"请求失败: {e}") from e
+        if status == 404:
+            return None
+        if status != 200 or not isinstance(data, dict):
+            raise PriceSourceError(f"HTTP {status}")
+        if not data.get('prices'):
+            return []
+
+        step = INTERVALS[interval]
+        buckets: Dict[int, List[float]] = {}
+        for ts_ms, price in data['prices']:
+            buckets.setdefault(int(ts_ms) // 1000 // step * step, []).append(float(price))
+        return [
+            (t, p[0], max(p), min(p), p[-1])
+            for t, p in sorted(buckets.items())
+        ]
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            'db_path': self.db_path,
+            'loaded_series': len(self._series),
+            'unavailable': sorted(self._unavailable),
+        }
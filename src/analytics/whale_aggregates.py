@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+巨鲸增量聚合
+Whale Incremental Aggregates
+
+WhaleMonitor 每推送一条 whales:dynamics 事件，就在 Redis 中增量更新该地址的统计：
+- whale:agg:{address}          Hash  交易次数 / 买卖 USD / 最近活动 / 派生指标
+- whale:agg:tokens:{address}   Set   交易过的代币
+- whale:rank:smart_score       ZSet  聪明钱评分排行
+- whale:rank:total_pnl         ZSet  PnL 排行
+- whale:rank:win_rate          ZSet  胜率排行（仅 total_trades >= 3）
+- whale:agg:seen:{YYYYMMDD}    Set   已计入的 tx_hash，按交易日期分桶，保留 SEEN_RETENTION_DAYS 天后过期
+
+Dashboard 的 /api/whale/analytics 与 /api/whale/leaderboard 直接读取排行和 Hash，
+不再扫描 Stream 重新计算，覆盖全部历史且实时更新。
+
+去重标记与计数在同一个 MULTI 中提交（WATCH 当天的去重桶），不会出现
+"已标记但未计入"或并发重复计入；超过保留期的事件无法去重，直接跳过。
+"""
+
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from redis.exceptions import WatchError
+
+logger = logging.getLogger(__name__)
+
+AGG_KEY_PREFIX = 'whale:agg:'
+TOKENS_KEY_PREFIX = 'whale:agg:tokens:'
+SEEN_KEY_PREFIX = 'whale:agg:seen:'
+RANK_SCORE_KEY = 'whale:rank:smart_score'
+RANK_PNL_KEY = 'whale:rank:total_pnl'
+RANK_WIN_RATE_KEY = 'whale:rank:win_rate'
+
+# 胜率排行的最少交易数
+MIN_TRADES_FOR_WIN_RATE = 3
+
+# 去重桶保留天数（需覆盖 whales:dynamics 回灌能读到的时间范围）
+SEEN_RETENTION_DAYS = 30
+
+BUY_ACTIONS = ('receive', 'buy', 'withdraw_from_exchange')
+SELL_ACTIONS = ('send', 'sell', 'deposit_to_exchange')
+
+
+def parse_usd(value: Any) -> float:
+    """解析 USD 金额（支持 "$1,234" 格式）"""
+    if value is None or value == '':
+        return 0.0
+    try:
+        if isinstance(value, str):
+            return float(value.replace('$', '').replace(',', ''))
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def event_usd(event: Dict[str, Any]) -> float:
+    """取事件的 USD 金额，优先使用原始数值字段"""
+    raw = event.get('value_usd_raw')
+    if raw not in (None, ''):
+        value = parse_usd(raw)
+        if value:
+            return value
+    return parse_usd(event.get('value_usd', '') or event.get('amount_usd', '0'))
+
+
+def compute_metrics(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    由累计统计计算胜率 / PnL / 评分
+
+    Args:
+        stats: total_trades, sell_trades, total_buy_usd, total_sell_usd, tokens_count
+    """
+    total_trades = int(stats.get('total_trades', 0))
+    sell_trades = int(stats.get('sell_trades', 0))
+    total_buy_usd = float(stats.get('total_buy_usd', 0))
+    total_sell_usd = float(stats.get('total_sell_usd', 0))
+    tokens_count = int(stats.get('tokens_count', 0))
+
+    # 估算胜率（简化：卖出收入 > 买入成本 视为盈利）
+    total_pnl = total_sell_usd - total_buy_usd * 0.8  # 假设持仓有20%浮盈
+    win_rate = 50  # 默认
+
+    if sell_trades > 0 and total_buy_usd > 0:
+        if total_sell_usd > total_buy_usd:
+            win_rate = min(70 + (total_sell_usd / total_buy_usd - 1) * 20, 90)
+        else:
+            win_rate = max(30 + (total_sell_usd / total_buy_usd) * 40, 20)
+
+    smart_score = 0
+
+    # 胜率贡献（最高40分）
+    smart_score += min(win_rate * 0.4, 40)
+
+    # PnL 贡献（最高30分）
+    if total_pnl > 1000000:
+        smart_score += 30
+    elif total_pnl > 100000:
+        smart_score += 20
+    elif total_pnl > 10000:
+        smart_score += 10
+    elif total_pnl > 0:
+        smart_score += 5
+
+    # 交易活跃度（最高20分）
+    if total_trades >= 100:
+        smart_score += 20
+    elif total_trades >= 50:
+        smart_score += 15
+    elif total_trades >= 20:
+        smart_score += 10
+    elif total_trades >= 5:
+        smart_score += 5
+
+    # 多样性（最高10分）
+    smart_score += min(tokens_count * 2, 10)
+
+    return {
+        'win_rate': round(win_rate, 1),
+        'total_pnl': round(total_pnl, 2),
+        'realized_pnl': round(total_sell_usd - total_buy_usd * 0.5, 2),
+        'unrealized_pnl': round(total_buy_usd * 0.3, 2),
+        'smart_score': min(int(smart_score), 100),
+    }
+
+
+def seen_key(ts_ms: int) -> str:
+    """交易时间所在日期的去重桶"""
+    return SEEN_KEY_PREFIX + datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).strftime('%Y%m%d')
+
+
+def _seen_expire_at(ts_ms: int) -> int:
+    day_start = ts_ms // 86_400_000 * 86_400
+    return day_start + (SEEN_RETENTION_DAYS + 1) * 86_400
+
+
+def record_event(redis_client, event: Dict[str, Any]) -> bool:
+    """
+    将一条巨鲸事件计入聚合
+
+    Returns:
+        是否计入（无地址或 tx_hash 已计入时返回 False）
+    """
+    address = (event.get('address') or '').lower()
+    if not redis_client or not address:
+        return False
+
+    tx_hash = event.get('tx_hash') or ''
+    agg_key = AGG_KEY_PREFIX + address
+    tokens_key = TOKENS_KEY_PREFIX + address
+    action = event.get('action', '')
+    token = event.get('token', 'ETH')
+    value_usd = event_usd(event)
+
+    try:
+        ts = int(event.get('timestamp') or 0)
+    except (TypeError, ValueError):
+        ts = 0
+    ts = ts or int(time.time() * 1000)
+
+    if tx_hash and ts < (time.time() - SEEN_RETENTION_DAYS * 86_400) * 1000:
+        logger.debug(f"跳过超过去重保留期的事件 {tx_hash}")
+        return False
+    bucket = seen_key(ts)
+    member = f"{address}:{tx_hash}"
+
+    with redis_client.pipeline(transaction=True) as pipe:
+        while True:
+            try:
+                if tx_hash:
+                    pipe.watch(bucket)
+                    if pipe.sismember(bucket, member):
+                        return False
+                pipe.multi()
+                if tx_hash:
+                    pipe.sadd(bucket, member)
+                    pipe.expireat(bucket, _seen_expire_at(ts))
+                pipe.hset(agg_key, mapping={
+                    'address': event.get('address', ''),
+                    'label': event.get('address_label', 'Unknown') or 'Unknown',
+                    'category': event.get('category', 'unknown') or 'unknown',
+                })
+                pipe.hincrby(agg_key, 'total_trades', 1)
+                if action in BUY_ACTIONS:
+                    pipe.hincrby(agg_key, 'buy_trades', 1)
+                    pipe.hincrbyfloat(agg_key, 'total_buy_usd', value_usd)
+                elif action in SELL_ACTIONS:
+                    pipe.hincrby(agg_key, 'sell_trades', 1)
+                    pipe.hincrbyfloat(agg_key, 'total_sell_usd', value_usd)
+                if token:
+                    pipe.sadd(tokens_key, token)
+                pipe.hgetall(agg_key)
+                pipe.scard(tokens_key)
+                results = pipe.execute()
+                break
+            except WatchError:
+                # 其他写入方在检查后改动了去重桶，重新检查
+                continue
+
+    stats = dict(results[-2])
+    stats['tokens_count'] = results[-1]
+
+    # 历史回灌的事件可能乱序，只保留最新活动时间
+    last_activity = max(ts, int(stats.get('last_activity', 0) or 0))
+
+    metrics = compute_metrics(stats)
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.hset(agg_key, mapping={
+        **metrics,
+        'tokens_count': stats['tokens_count'],
+        'last_activity': last_activity,
+    })
+    pipe.zadd(RANK_SCORE_KEY, {address: metrics['smart_score']})
+    pipe.zadd(RANK_PNL_KEY, {address: metrics['total_pnl']})
+    if int(stats.get('total_trades', 0)) >= MIN_TRADES_FOR_WIN_RATE:
+        pipe.zadd(RANK_WIN_RATE_KEY, {address: metrics['win_rate']})
+    pipe.execute()
+    return True
+
+
+def _to_analytics(data: Dict[str, str]) -> Dict[str, Any]:
+    """Hash 字段转换为 /api/whale/analytics 的条目格式"""
+    return {
+        'address': data.get('address', ''),
+        'label': data.get('label', 'Unknown'),
+        'category': data.get('category', 'unknown'),
+        'win_rate': float(data.get('win_rate', 50)),
+        'total_trades': int(data.get('total_trades', 0)),
+        'total_pnl': float(data.get('total_pnl', 0)),
+        'realized_pnl': float(data.get('realized_pnl', 0)),
+        'unrealized_pnl': float(data.get('unrealized_pnl', 0)),
+        'smart_score': int(data.get('smart_score', 0)),
+        'total_buy_usd': round(float(data.get('total_buy_usd', 0)), 2),
+        'total_sell_usd': round(float(data.get('total_sell_usd', 0)), 2),
+        'tokens_count': int(data.get('tokens_count', 0)),
+        'last_activity': int(data.get('last_activity', 0)),
+        'top_holdings': [],
+    }
+
+
+def get_ranked(redis_client, rank_key: str = RANK_SCORE_KEY,
+               limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """按排行读取前 limit 个地址的聚合数据（None 表示全部）"""
+    end = -1 if limit is None else max(limit, 1) - 1
+    addresses = redis_client.zrevrange(rank_key, 0, end)
+    if not addresses:
+        return []
+
+    pipe = redis_client.pipeline(transaction=False)
+    for address in addresses:
+        pipe.hgetall(AGG_KEY_PREFIX + address)
+    return [_to_analytics(data) for data in pipe.execute() if data]
+
+
+def get_wallet(redis_client, address: str) -> Optional[Dict[str, Any]]:
+    """读取单个地址的聚合数据"""
+    data = redis_client.hgetall(AGG_KEY_PREFIX + address.lower())
+    return _to_analytics(data) if data else None
+
+
+def has_aggregates(redis_client) -> bool:
+    """是否已有聚合数据"""
+    return bool(redis_client.exists(RANK_SCORE_KEY))
+
+
+def get_leaderboard(redis_client, limit: int = 10) -> Dict[str, List[Dict[str, Any]]]:
+    """三个维度的排行榜"""
+    def short(a):
+        return a['address'][:10] + '...'
+
+    return {
+        'by_score': [
+            {
+                'rank': i + 1,
+                'label': a['label'],
+                'address': short(a),
+                'full_address': a['address'],
+                'score': a['smart_score'],
+                'win_rate': a['win_rate'],
+                'total_pnl': a['total_pnl'],
+            }
+            for i, a in enumerate(get_ranked(redis_client, RANK_SCORE_KEY, limit))
+        ],
+        'by_win_rate': [
+            {
+                'rank': i + 1,
+                'label': a['label'],
+                'address': short(a),
+                'full_address': a['address'],
+                'win_rate': a['win_rate'],
+                'total_trades': a['total_trades'],
+            }
+            for i, a in enumerate(get_ranked(redis_client, RANK_WIN_RATE_KEY, limit))
+        ],
+        'by_pnl': [
+            {
+                'rank': i + 1,
+                'label': a['label'],
+                'address': short(a),
+                'full_address': a['address'],
+                'total_pnl': a['total_pnl'],
+                'realized': a['realized_pnl'],
+                'unrealized': a['unrealized_pnl'],
+            }
+            for i, a in enumerate(get_ranked(redis_client, RANK_PNL_KEY, limit))
+        ],
+    }
+
+
+def rebuild_from_stream(redis_client, stream_key: str = 'whales:dynamics',
+                        batch: int = 500) -> int:
+    """
+    从 Stream 回灌聚合（首次启用或聚合被清空时）
+
+    已计入的 tx_hash 会被跳过，可重复执行。
+    """
+    count = 0
+    last_id = '-'
+    while True:
+        entries = redis_client.xrange(stream_key, min=last_id, count=batch)
+        if last_id != '-' and entries and entries[0][0] == last_id:
+            entries = entries[1:]
+        if not entries:
+            break
+        for mid, data in entries:
+            if record_event(redis_client, data):
+                count += 1
+        last_id = entries[-1][0]
+    return count
@@ -38,6 +38,8 @@ from dataclasses import dataclass
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from core.logging import get_logger
 from core.redis_client import RedisClient
+from core.http_client import create_session, hedged_fetch_json
+from core.poll_scheduler import get_poll_scheduler
 from core.symbols import extract_symbols
 
 logger = get_logger('announcement_monitor')
@@ -288,7 +290,7 @@ class AnnouncementMonitor:
         
         # 创建 HTTP session
         timeout = aiohttp.ClientTimeout(total=10)
-        self.session = aiohttp.ClientSession(timeout=timeout)
+        self.session = create_session(timeout=timeout)
         
         # 从 Redis 加载已知公告 ID
         await self._load_known_ids()
@@ -399,21 +401,15 @@ class AnnouncementMonitor:
             }
             
             if method == 'GET':
-                params = config.get('params', {})
-                kwargs['params'] = params
-                async with self.session.get(url, **kwargs) as resp:
-                    if resp.status != 200:
-                        logger.warning(f"{exchange} 公告API返回 {resp.status}")
-                        return []
-                    data = await resp.json()
+                kwargs['params'] = config.get('params', {})
             else:  # POST
-                body = config.get('body', {})
-                kwargs['json'] = body
-                async with self.session.post(url, **kwargs) as resp:
-                    if resp.status != 200:
-                        logger.warning(f"{exchange} 公告API返回 {resp.status}")
-                        return []
-                    data = await resp.json()
+                kwargs['json'] = config.get('body', {})
+            
+            # 有等价主机池的交易所（OKX/Bybit）自动对冲到次快主机
+            status, data = await hedged_fetch_json(self.session, url, method, **kwargs)
+            if status != 200:
+                logger.warning(f"{exchange} 公告API返回 {status}")
+                return []
             
             # 解析响应
             parse_config = config.get('parse', {})
@@ -484,11 +480,12 @@ class AnnouncementMonitor:
         
         return announcements
     
-    async def check_exchange(self, exchange: str):
-        """检查单个交易所"""
+    async def check_exchange(self, exchange: str) -> bool:
+        """检查单个交易所，返回是否有新公告"""
         self.stats['total_checks'] += 1
         
         announcements = await self.fetch_announcements(exchange)
+        found = False
         
         for ann in announcements:
             # 检查是否是新公告
@@ -496,6 +493,7 @@ class AnnouncementMonitor:
                 continue
             
             # 新公告！
+            found = True
             self.known_announcements[exchange].add(ann.id)
             await self._save_known_id(exchange, ann.id)
             
@@ -510,6 +508,8 @@ class AnnouncementMonitor:
                 await self._emit_delisting_event(ann)
             
             logger.info(f"🆕 [{exchange}] {ann.event_type}: {ann.title[:80]}...")
+        
+        return found
     
     async def _emit_listing_event(self, ann: Announcement):
         """推送上币事件"""
@@ -533,6 +533,9 @@ class AnnouncementMonitor:
         
         self.redis.push_event('events:raw', event_data)
         
+        # 上币公告后该交易所的市场列表即将变化，加速其所有 REST 轮询
+        get_poll_scheduler(self.redis).boost(ann.exchange)
+        
         logger.info(f"📢 [LISTING] {ann.exchange}: {ann.symbols} - {ann.title[:60]}...")
     
     async def _emit_delisting_event(self, ann: Announcement):
@@ -563,14 +566,18 @@ class AnnouncementMonitor:
         
         logger.info(f"[START] {exchange} 公告监控 (间隔: {interval}s)")
         
+        job = get_poll_scheduler(self.redis).register(f'announcement:{exchange}', exchange, interval)
+        
         while self.running:
+            await job.wait()
+            found = False
             try:
-                await self.check_exchange(exchange)
+                found = await self.check_exchange(exchange)
             except Exception as e:
                 logger.error(f"{exchange} 监控错误: {e}")
                 self.stats['errors'] += 1
-            
-            await asyncio.sleep(interval)
+            finally:
+                job.done(found)
     
     async def heartbeat_loop(self):
         """心跳循环"""
@@ -584,6 +591,7 @@ class AnnouncementMonitor:
                     'listing_found': str(self.stats['listing_found']),
                     'errors': str(self.stats['errors']),
                     'exchanges': str(len(ANNOUNCEMENT_APIS)),
+                    'boosted': ','.join(get_poll_scheduler().get_status()['boosted']),
                     'timestamp': str(int(time.time())),
                 }
                 self.redis.heartbeat('announcement', heartbeat_data, ttl=120)
@@ -7,7 +7,11 @@ Blockchain Monitor
 
 功能：
 - 区块高度监控
-- 链上事件检测（预留）
+- 新池检测：按区块区间批量 eth_getLogs 扫描 DEX 工厂合约的
+  PairCreated / PoolCreated（Uniswap V2/V3、PancakeSwap、Aerodrome）
+  - 每条链一次请求覆盖所有工厂
+  - 区块游标持久化到 Redis，重启后补扫停机期间的区块
+  - RPC 限制返回条数/区间时自动缩小区间，空闲时放大
 """
 import asyncio
 import aiohttp
@@ -16,11 +20,15 @@ import sys
 import os
 import signal
 import time
+from collections import deque
+from datetime import datetime, timezone
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from core.logging import get_logger
 from core.redis_client import RedisClient
+from core.http_client import create_session
+from core.trace import start_trace
 
 try:
     import yaml
@@ -39,30 +47,45 @@ stats = {'scans': 0, 'events': 0, 'errors': 0, 'blocks_checked': 0}
 # 心跳键名
 HEARTBEAT_KEY = 'blockchain'
 
-# 默认区块链配置
+# 区块游标（hash: chain -> 已扫描到的区块）
+CURSOR_KEY = 'blockchain:pool_cursor'
+
+# 默认区块链配置（poll_interval 约等于出块时间，新池在一个区块内被发现）
 DEFAULT_CHAINS = {
     'ethereum': {
         'enabled': True,
         'rpc_url': os.getenv('ETH_RPC_URL', 'https://eth.llamarpc.com'),
-        'poll_interval': 15,
+        'poll_interval': 12,
+        'log_range': 100,           # 初始 eth_getLogs 区间
+        'max_log_range': 2000,
+        'max_catchup_blocks': 7200, # 停机补扫上限（约 1 天）
         'type': 'evm'
     },
     'bsc': {
         'enabled': True,
         'rpc_url': os.getenv('BSC_RPC_URL', 'https://bsc-dataseed.binance.org'),
-        'poll_interval': 5,
+        'poll_interval': 3,
+        'log_range': 200,
+        'max_log_range': 2000,
+        'max_catchup_blocks': 28800,
         'type': 'evm'
     },
     'base': {
         'enabled': True,
         'rpc_url': os.getenv('BASE_RPC_URL', 'https://mainnet.base.org'),
-        'poll_interval': 5,
+        'poll_interval': 2,
+        'log_range': 200,
+        'max_log_range': 2000,
+        'max_catchup_blocks': 43200,
         'type': 'evm'
     },
     'arbitrum': {
         'enabled': True,
         'rpc_url': os.getenv('ARBITRUM_RPC_URL', 'https://arb1.arbitrum.io/rpc'),
-        'poll_interval': 5,
+        'poll_interval': 2,
+        'log_range': 1000,
+        'max_log_range': 10000,
+        'max_catchup_blocks': 345600,
         'type': 'evm'
     },
     'solana': {
@@ -73,6 +96,130 @@ DEFAULT_CHAINS = {
     }
 }
 
+# ==================== DEX 工厂 ====================
+
+# 事件 topic0
+TOPIC_V2_PAIR_CREATED = '0x0d3648bd0f6ba80134a33ba9275ac585d9d315f0ad8355cddefde31afa28d0e9'   # PairCreated(address,address,address,uint256)
+TOPIC_V3_POOL_CREATED = '0x783cca1c0412dd0d695e784568c96da2e9c22ff989357a2e8b1d9b2b4e6b7118'   # PoolCreated(address,address,uint24,int24,address)
+TOPIC_SOLIDLY_POOL_CREATED = '0x2128d88d14c80cb081c1252a5acff7a264671bf199ce226b53788fb26065005e'  # PoolCreated(address,address,bool,address,uint256)
+
+FACTORY_TOPICS = {
+    'v2': TOPIC_V2_PAIR_CREATED,
+    'v3': TOPIC_V3_POOL_CREATED,
+    'solidly': TOPIC_SOLIDLY_POOL_CREATED,
+}
+
+# 链 -> [(dex, 类型, 工厂地址)]
+DEX_FACTORIES = {
+    'ethereum': [
+        ('uniswap_v2', 'v2', '0x5C69bEe701ef814a2B6a3EDD4B1652CB9cc5aA6f'),
+        ('uniswap_v3', 'v3', '0x1F98431c8aD98523631AE4a59f267346ea31F984'),
+        ('pancakeswap_v3', 'v3', '0x0BFbCF9fa4f9C56B0F40a671Ad40E0805A091865'),
+    ],
+    'bsc': [
+        ('pancakeswap_v2', 'v2', '0xcA143Ce32Fe78f1f7019d7d551a6402fC5350c73'),
+        ('pancakeswap_v3', 'v3', '0x0BFbCF9fa4f9C56B0F40a671Ad40E0805A091865'),
+        ('uniswap_v3', 'v3', '0xdB1d10011AD0Ff90774D0C6Bb92e5C5c8b4461F7'),
+    ],
+    'base': [
+        ('uniswap_v2', 'v2', '0x8909Dc15e40173Ff4699343b6eB8132c65e18eC6'),
+        ('uniswap_v3', 'v3', '0x33128a8fC17869897dcE68Ed026d694621f6FDfD'),
+        ('aerodrome', 'solidly', '0x420DD381b31aEf6683db6B902084cB0FFECe40Da'),
+        ('pancakeswap_v3', 'v3', '0x0BFbCF9fa4f9C56B0F40a671Ad40E0805A091865'),
+    ],
+    'arbitrum': [
+        ('uniswap_v2', 'v2', '0xf1D7CC64Fb4452F05c498126312eBE29f30Fbcf9'),
+        ('uniswap_v3', 'v3', '0x1F98431c8aD98523631AE4a59f267346ea31F984'),
+        ('pancakeswap_v3', 'v3', '0x0BFbCF9fa4f9C56B0F40a671Ad40E0805A091865'),
+    ],
+}
+
+# 基础代币（两边都是基础代币的池不是新币）
+BASE_TOKENS = {
+    'ethereum': {
+        '0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2',  # WETH
+        '0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48',  # USDC
+        '0xdac17f958d2ee523a2206206994597c13d831ec7',  # USDT
+        '0x6b175474e89094c44da98b954eedeac495271d0f',  # DAI
+        '0x2260fac5e5542a773aa44fbcfedf7c193bc2c599',  # WBTC
+    },
+    'bsc': {
+        '0xbb4cdb9cbd36b01bd1cbaebf2de08d9173bc095c',  # WBNB
+        '0x55d398326f99059ff775485246999027b3197955',  # USDT
+        '0x8ac76a51cc950d9822d68b83fe1ad97b32cd580d',  # USDC
+        '0xe9e7cea3dedca5984780bafc599bd69add087d56',  # BUSD
+    },
+    'base': {
+        '0x4200000000000000000000000000000000000006',  # WETH
+        '0x833589fcd6edb6e08f4c7c32d4f71b54bda02913',  # USDC
+    },
+    'arbitrum': {
+        '0x82af49447d8a07e3bd95bd0d56f35241523fbab1',  # WETH
+        '0xaf88d065e77c8cc2239327c5edb3a432268e5831',  # USDC
+        '0xfd086bc7cd5c481dcc9c85ebe478a1c0b69fcbb9',  # USDT
+    },
+}
+
+# RPC 因结果过多/区间过大拒绝时的错误特征
+RANGE_LIMIT_HINTS = (
+    'more than', 'too many', 'limit exceeded', 'range', 'too large',
+    'response size', 'query timeout', '-32005',
+)
+
+
+def _topic_to_address(topic: str) -> str:
+    return '0x' + topic[-40:].lower()
+
+
+def _word(data: str, index: int) -> str:
+    """取 ABI data 的第 index 个 32 字节字"""
+    body = data[2:] if data.startswith('0x') else data
+    return body[index * 64:(index + 1) * 64]
+
+
+def _signed_int(word: str, bits: int = 256) -> int:
+    value = int(word, 16)
+    if value >= 1 << (bits - 1):
+        value -= 1 << bits
+    return value
+
+
+def decode_pool_log(chain: str, log: dict, factory_index: dict) -> dict:
+    """
+    解码工厂事件为 NewPoolEvent 形状的字典
+    （字段与 monitors.dex.uniswap_v3.NewPoolEvent.to_dict 一致，另加 dex/tx_hash）
+    """
+    topics = log.get('topics') or []
+    dex, kind = factory_index[log.get('address', '').lower()]
+    data = log.get('data', '0x')
+
+    fee = 0
+    tick_spacing = 0
+    extra = {}
+    if kind == 'v2':
+        pool = _topic_to_address(_word(data, 0))
+    elif kind == 'v3':
+        fee = int(topics[3], 16)
+        tick_spacing = _signed_int(_word(data, 0))
+        pool = _topic_to_address(_word(data, 1))
+    else:  # solidly: topics[3] = stable
+        extra['stable'] = bool(int(topics[3], 16))
+        pool = _topic_to_address(_word(data, 0))
+
+    return {
+        'pool_address': pool,
+        'token0': _topic_to_address(topics[1]),
+        'token1': _topic_to_address(topics[2]),
+        'fee': fee,
+        'tick_spacing': tick_spacing,
+        'block_number': int(log.get('blockNumber', '0x0'), 16),
+        'chain': chain,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'dex': dex,
+        'tx_hash': log.get('transactionHash', ''),
+        **extra,
+    }
+
 
 def load_config():
     """加载配置"""
@@ -91,8 +238,146 @@ def load_config():
     logger.info(f"配置加载成功：{len(config.get('chains', {}))} 个区块链")
 
 
+async def rpc_call(session, rpc_url, method, params):
+    """JSON-RPC 调用，返回 (result, error)"""
+    payload = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+    async with session.post(rpc_url, json=payload, timeout=aiohttp.ClientTimeout(total=15)) as resp:
+        if resp.status != 200:
+            return None, f"HTTP {resp.status}"
+        data = await resp.json(content_type=None)
+    if 'error' in data:
+        return None, data['error']
+    return data.get('result'), None
+
+
+def _is_range_error(error) -> bool:
+    text = json.dumps(error).lower() if not isinstance(error, str) else error.lower()
+    return any(hint in text for hint in RANGE_LIMIT_HINTS)
+
+
+def _load_cursor(chain_name):
+    try:
+        value = redis_client.hget(CURSOR_KEY, chain_name)
+        return int(value) if value else None
+    except Exception as e:
+        logger.warning(f"{chain_name} 读取区块游标失败: {e}")
+        return None
+
+
+def _save_cursor(chain_name, block):
+    try:
+        redis_client.hset(CURSOR_KEY, chain_name, block)
+    except Exception as e:
+        logger.warning(f"{chain_name} 保存区块游标失败: {e}")
+
+
+def _push_pool_event(pool):
+    """推送新池事件到 events:raw"""
+    base_tokens = BASE_TOKENS.get(pool['chain'], set())
+    token0, token1 = pool['token0'], pool['token1']
+    if token0 in base_tokens and token1 in base_tokens:
+        return False
+    
+    # 新代币一侧作为合约地址
+    new_token = token1 if token0 in base_tokens else token0
+    
+    now_ms = str(int(datetime.now(timezone.utc).timestamp() * 1000))
+    event = {
+        # timestamp 统一为毫秒整数字符串（与其他 events:raw 生产者一致），不用池字典里的 ISO 时间
+        **{k: str(v) for k, v in pool.items() if k != 'timestamp'},
+        'source': 'chain_liquidity_added',
+        'source_type': 'onchain',
+        'event_type': 'new_pool',
+        'exchange': pool['dex'],
+        'chain': pool['chain'],
+        'contract_address': new_token,
+        'raw_text': f"New pool on {pool['dex']} ({pool['chain']}): {token0}/{token1} pool={pool['pool_address']}",
+        'timestamp': now_ms,
+        'detected_at': now_ms,
+    }
+    start_trace(event)
+    redis_client.push_event('events:raw', event)
+    return True
+
+
+async def scan_pool_logs(session, chain_name, chain_config, state):
+    """
+    扫描 [cursor+1, head] 区间的工厂事件
+    
+    每个区间一次 eth_getLogs（address 为该链全部工厂，topic0 为三种事件的并集）。
+    RPC 拒绝（结果过多/区间过大）时区间减半重试，结果稀疏时区间翻倍。
+    """
+    rpc_url = chain_config['rpc_url']
+    
+    head_hex, error = await rpc_call(session, rpc_url, 'eth_blockNumber', [])
+    if error:
+        logger.warning(f"{chain_name} eth_blockNumber 失败: {error}")
+        stats['errors'] += 1
+        return
+    head = int(head_hex, 16)
+    stats['scans'] += 1
+    
+    cursor = state['cursor']
+    if cursor is None:
+        cursor = head - 1
+    
+    # 停机太久只补扫最近 max_catchup_blocks 个区块
+    max_catchup = chain_config.get('max_catchup_blocks', 7200)
+    if head - cursor > max_catchup:
+        logger.warning(f"{chain_name} 落后 {head - cursor} 个区块，只补扫最近 {max_catchup} 个")
+        cursor = head - max_catchup
+    
+    if head - cursor > state['log_range']:
+        logger.info(f"{chain_name} 补扫区块 {cursor + 1} -> {head}")
+    
+    # RPC 拒绝过的区间作为上限，避免反复放大-被拒
+    max_range = state.get('range_cap') or chain_config.get('max_log_range', 2000)
+    
+    while running and cursor < head:
+        end = min(cursor + state['log_range'], head)
+        logs, error = await rpc_call(session, rpc_url, 'eth_getLogs', [{
+            'fromBlock': hex(cursor + 1),
+            'toBlock': hex(end),
+            'address': state['factories'],
+            'topics': [state['topics']],
+        }])
+        
+        if error:
+            if _is_range_error(error) and state['log_range'] > 1:
+                state['log_range'] = max(state['log_range'] // 2, 1)
+                state['range_cap'] = max_range = state['log_range']
+                logger.info(f"{chain_name} getLogs 区间缩小到 {state['log_range']}")
+                continue
+            logger.warning(f"{chain_name} eth_getLogs 失败: {error}")
+            stats['errors'] += 1
+            break
+        
+        for log in logs or []:
+            key = (log.get('transactionHash'), log.get('logIndex'))
+            if key in state['seen']:
+                continue
+            state['seen'].append(key)
+            try:
+                pool = decode_pool_log(chain_name, log, state['factory_index'])
+            except (KeyError, IndexError, ValueError) as e:
+                logger.debug(f"{chain_name} 解码工厂事件失败: {e}")
+                continue
+            if _push_pool_event(pool):
+                stats['events'] += 1
+                logger.info(f"[POOL] {chain_name} {pool['dex']}: {pool['token0'][:10]}.../{pool['token1'][:10]}... @ {pool['block_number']}")
+        
+        stats['blocks_checked'] += end - cursor
+        cursor = end
+        state['cursor'] = cursor
+        _save_cursor(chain_name, cursor)
+        
+        # 结果稀疏时扩大区间（补扫更快）
+        if len(logs or []) < 100 and state['log_range'] < max_range:
+            state['log_range'] = min(state['log_range'] * 2, max_range)
+
+
 async def monitor_evm_chain(chain_name, chain_config):
-    """监控 EVM 兼容链"""
+    """监控 EVM 兼容链（新池检测）"""
     if not chain_config.get('enabled', True):
         return
     
@@ -103,41 +388,41 @@ async def monitor_evm_chain(chain_name, chain_config):
         logger.warning(f"{chain_name} RPC URL 未配置")
         return
     
-    logger.info(f"启动 {chain_name} 监控")
+    factories = DEX_FACTORIES.get(chain_name, [])
+    state = {
+        'cursor': _load_cursor(chain_name),
+        'log_range': chain_config.get('log_range', 100),
+        'factories': [address for _, _, address in factories],
+        'topics': sorted({FACTORY_TOPICS[kind] for _, kind, _ in factories}),
+        'factory_index': {address.lower(): (dex, kind) for dex, kind, address in factories},
+        # 重叠区间/重组时去重
+        'seen': deque(maxlen=2000),
+    }
     
-    last_block = 0
+    logger.info(f"启动 {chain_name} 监控 ({len(factories)} 个 DEX 工厂)")
     
-    async with aiohttp.ClientSession() as session:
+    async with create_session() as session:
         # 连接测试
         try:
-            payload = {"jsonrpc": "2.0", "id": 1, "method": "eth_blockNumber", "params": []}
-            async with session.post(rpc_url, json=payload, timeout=10) as resp:
-                if resp.status == 200:
-                    logger.info(f"[OK] {chain_name} 连接成功")
+            _, error = await rpc_call(session, rpc_url, 'eth_blockNumber', [])
+            if error is None:
+                logger.info(f"[OK] {chain_name} 连接成功")
         except Exception as e:
             logger.error(f"{chain_name} 连接失败: {e}")
             return
         
+        if not factories:
+            logger.info(f"{chain_name} 未配置 DEX 工厂，仅监控区块高度")
+        
         while running:
+            started = time.monotonic()
             try:
-                payload = {"jsonrpc": "2.0", "id": 1, "method": "eth_blockNumber", "params": []}
-                async with session.post(rpc_url, json=payload, timeout=10) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        block_hex = data.get('result', '0x0')
-                        block_num = int(block_hex, 16)
-                        
-                        if block_num > last_block:
-                            if last_block > 0:
-                                new_blocks = block_num - last_block
-                                if new_blocks > 0:
-                                    stats['blocks_checked'] += new_blocks
-                            last_block = block_num
-                        
+                if factories:
+                    await scan_pool_logs(session, chain_name, chain_config, state)
+                else:
+                    head_hex, error = await rpc_call(session, rpc_url, 'eth_blockNumber', [])
+                    if error is None:
                         stats['scans'] += 1
-                    else:
-                        logger.warning(f"{chain_name} RPC HTTP {resp.status}")
-                        stats['errors'] += 1
             
             except asyncio.TimeoutError:
                 logger.warning(f"{chain_name} 超时")
@@ -146,7 +431,8 @@ async def monitor_evm_chain(chain_name, chain_config):
                 logger.error(f"{chain_name} 错误: {e}")
                 stats['errors'] += 1
             
-            await asyncio.sleep(poll_interval)
+            # 扣除本轮耗时，保持按出块节奏轮询
+            await asyncio.sleep(max(poll_interval - (time.monotonic() - started), 0.5))
 
 
 async def monitor_solana(chain_config):
@@ -163,7 +449,7 @@ async def monitor_solana(chain_config):
     
     logger.info("启动 Solana 监控")
     
-    async with aiohttp.ClientSession() as session:
+    async with create_session() as session:
         while running:
             try:
                 payload = {"jsonrpc": "2.0", "id": 1, "method": "getSlot"}
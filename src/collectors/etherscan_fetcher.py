@@ -2,6 +2,10 @@
 """
 Etherscan API 数据获取器
 用于获取巨鲸地址的历史交易数据
+
+限速: 按 API Key 档位的令牌桶 + 并发上限（不再每次请求前固定 sleep）
+批量: balancemulti 每次 20 个地址，余额未变化的地址跳过 txlist
+增量: 每个地址记录 startblock 游标，只拉取新区块的交易
 """
 
 import os
@@ -9,7 +13,12 @@ import asyncio
 import aiohttp
 import logging
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Set
+
+try:
+    from src.core.http_client import create_session, TokenBucket
+except ImportError:
+    from core.http_client import create_session, TokenBucket
 
 logger = logging.getLogger('etherscan_fetcher')
 
@@ -17,6 +26,25 @@ logger = logging.getLogger('etherscan_fetcher')
 ETHERSCAN_API_KEY = os.getenv('ETHERSCAN_API_KEY', '')
 ETHERSCAN_BASE_URL = 'https://api.etherscan.io/v2/api'  # V2 API
 
+# API Key 档位 -> (每秒请求数, 并发上限)
+ETHERSCAN_API_TIERS = {
+    'free': (5, 5),
+    'standard': (10, 8),
+    'advanced': (20, 10),
+    'professional': (30, 15),
+}
+ETHERSCAN_API_TIER = os.getenv('ETHERSCAN_API_TIER', 'free')
+
+# balancemulti 单次最多地址数
+BALANCEMULTI_MAX = 20
+
+# 限速后的最大重试次数
+RATE_LIMIT_RETRIES = 3
+
+# 增量拉取：每页条数、单次调用最多页数（超出的部分下一轮从游标继续）
+INCREMENTAL_PAGE_SIZE = 100
+INCREMENTAL_MAX_PAGES = 10
+
 # 链 ID 配置
 CHAIN_IDS = {
     'ethereum': 1,
@@ -31,20 +59,30 @@ CHAIN_IDS = {
 class EtherscanFetcher:
     """Etherscan API 数据获取器 (V2)"""
     
-    def __init__(self, api_key: str = None, chain: str = 'ethereum'):
+    def __init__(self, api_key: str = None, chain: str = 'ethereum', tier: str = None, redis_client=None):
         self.api_key = api_key or ETHERSCAN_API_KEY
         self.base_url = ETHERSCAN_BASE_URL
+        self.chain = chain
         self.chain_id = CHAIN_IDS.get(chain, 1)
-        self.rate_limit_delay = 0.21  # 5次/秒限制，加点余量
         self.session = None
         self._request_count = 0
-        self._last_request_time = 0
+        
+        # 按档位限速，留 10% 余量
+        rate, concurrency = ETHERSCAN_API_TIERS.get(tier or ETHERSCAN_API_TIER, ETHERSCAN_API_TIERS['free'])
+        self.bucket = TokenBucket(rate * 0.9, rate)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        
+        # 增量游标: action -> address -> 已见过的最大区块
+        self.redis = redis_client
+        self.cursors: Dict[str, Dict[str, int]] = {}
+        # 上一轮 balancemulti 的余额（wei）
+        self.balances: Dict[str, int] = {}
         
     async def _get_session(self) -> aiohttp.ClientSession:
         """获取或创建 session"""
         if self.session is None or self.session.closed:
             timeout = aiohttp.ClientTimeout(total=30)
-            self.session = aiohttp.ClientSession(timeout=timeout)
+            self.session = create_session(timeout=timeout)
         return self.session
         
     async def close(self):
@@ -53,10 +91,7 @@ class EtherscanFetcher:
             await self.session.close()
             
     async def _make_request(self, params: dict) -> Any:
-        """发送请求（带限速）"""
-        # 限速
-        await asyncio.sleep(self.rate_limit_delay)
-        
+        """发送请求（令牌桶限速 + 并发上限，限速时有限次重试）"""
         if not self.api_key:
             logger.warning("未配置 ETHERSCAN_API_KEY，跳过请求")
             return None
@@ -67,34 +102,177 @@ class EtherscanFetcher:
         
         session = await self._get_session()
         
-        try:
-            async with session.get(self.base_url, params=params) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    if data.get('status') == '1':
-                        self._request_count += 1
-                        return data.get('result', [])
-                    else:
-                        msg = data.get('message', 'Unknown error')
-                        result = data.get('result', '')
-                        if 'Max rate limit reached' in msg:
-                            logger.warning("Etherscan API 限速，等待5秒")
-                            await asyncio.sleep(5)
-                            return await self._make_request(params)  # 重试
-                        if 'Invalid API Key' in str(result) or 'Invalid API' in msg:
-                            logger.error(f"Etherscan API Key 无效! 请检查配置。result={result}")
-                        else:
-                            logger.warning(f"Etherscan API error: {msg}, result={result}")
-                        return None
-                else:
-                    logger.error(f"HTTP error: {resp.status}")
-                    return None
-        except asyncio.TimeoutError:
-            logger.error("请求超时")
-            return None
-        except Exception as e:
-            logger.error(f"请求错误: {e}")
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            await self.bucket.acquire()
+            try:
+                async with self.semaphore:
+                    # 限速由 Key 档位令牌桶负责，跳过主机级令牌（weight=0）
+                    async with session.get(self.base_url, params=params, trace_request_ctx={'weight': 0}) as resp:
+                        if resp.status != 200:
+                            logger.error(f"HTTP error: {resp.status}")
+                            return None
+                        data = await resp.json()
+            except asyncio.TimeoutError:
+                logger.error("请求超时")
+                return None
+            except Exception as e:
+                logger.error(f"请求错误: {e}")
+                return None
+            
+            if data.get('status') == '1':
+                self._request_count += 1
+                return data.get('result', [])
+            
+            msg = data.get('message', 'Unknown error')
+            result = data.get('result', '')
+            if 'rate limit' in str(result).lower() or 'rate limit' in msg.lower():
+                # 整个桶暂停，排队中的请求一起让出
+                self.bucket.block(1.0 * (attempt + 1))
+                logger.warning(f"Etherscan API 限速，第 {attempt + 1} 次重试")
+                continue
+            if 'No transactions found' in msg or 'No records found' in msg:
+                self._request_count += 1
+                return []
+            if 'Invalid API Key' in str(result) or 'Invalid API' in msg:
+                logger.error(f"Etherscan API Key 无效! 请检查配置。result={result}")
+            else:
+                logger.warning(f"Etherscan API error: {msg}, result={result}")
             return None
+        
+        logger.warning("Etherscan API 限速重试次数用尽")
+        return None
+    
+    # ==================== 增量游标 ====================
+    
+    def _cursor_key(self, action: str) -> str:
+        return f'whale:cursor:{self.chain}:{action}'
+    
+    def _get_cursor(self, action: str, address: str) -> Optional[int]:
+        cursors = self.cursors.get(action)
+        if cursors is None:
+            cursors = self.cursors[action] = {}
+            if self.redis:
+                try:
+                    stored = self.redis.hgetall(self._cursor_key(action)) or {}
+                    cursors.update({
+                        (k.decode() if isinstance(k, bytes) else k): int(v)
+                        for k, v in stored.items()
+                    })
+                except Exception as e:
+                    logger.debug(f"加载游标失败: {e}")
+        return cursors.get(address.lower())
+    
+    def _advance_cursor(self, action: str, address: str, txs: List[Dict]) -> None:
+        blocks = [int(tx.get('blockNumber', 0) or 0) for tx in txs]
+        if not blocks:
+            return
+        address = address.lower()
+        newest = max(blocks)
+        cursors = self.cursors.setdefault(action, {})
+        if newest <= cursors.get(address, 0):
+            return
+        cursors[address] = newest
+        if self.redis:
+            try:
+                self.redis.hset(self._cursor_key(action), address, newest)
+            except Exception as e:
+                logger.debug(f"保存游标失败: {e}")
+    
+    async def _fetch_incremental(self, action: str, address: str, offset: int) -> List[Dict]:
+        """
+        按游标增量拉取（txlist / tokentx）
+        
+        首次没有游标时只取最新 offset 条用于建立游标；之后从游标区块开始按区块升序分页，
+        直到某页不满。升序保证已拉到的交易是连续的：请求失败或达到页数上限时，
+        游标只推进到已拉到的最大区块，剩下的下一轮继续，不会跳过较早的交易。
+        游标区块本身会重复返回，由调用方按 tx hash 去重。
+        """
+        cursor = self._get_cursor(action, address)
+        if cursor is None:
+            result = await self._make_request({
+                'module': 'account',
+                'action': action,
+                'address': address,
+                'page': 1,
+                'offset': offset,
+                'sort': 'desc',
+            })
+            txs = result if isinstance(result, list) else []
+            self._advance_cursor(action, address, txs)
+            return txs
+        
+        txs: List[Dict] = []
+        for page in range(1, INCREMENTAL_MAX_PAGES + 1):
+            result = await self._make_request({
+                'module': 'account',
+                'action': action,
+                'address': address,
+                'startblock': cursor,
+                'endblock': 99999999,
+                'page': page,
+                'offset': INCREMENTAL_PAGE_SIZE,
+                'sort': 'asc',
+            })
+            if not isinstance(result, list):
+                break
+            txs.extend(result)
+            if len(result) < INCREMENTAL_PAGE_SIZE:
+                break
+        else:
+            logger.info(f"{address[:10]}... {action} 超过 {INCREMENTAL_MAX_PAGES} 页，剩余交易下一轮继续")
+        
+        self._advance_cursor(action, address, txs)
+        return txs
+    
+    async def get_new_transactions(self, address: str, offset: int = 20) -> List[Dict]:
+        """增量获取普通交易（从上次游标区块开始）"""
+        return await self._fetch_incremental('txlist', address, offset)
+    
+    async def get_new_token_transfers(self, address: str, offset: int = 20) -> List[Dict]:
+        """增量获取 ERC20 转账（从上次游标区块开始）"""
+        return await self._fetch_incremental('tokentx', address, offset)
+    
+    async def get_balance_changes(self, addresses: List[str]) -> Set[str]:
+        """
+        批量查询余额，返回余额相对上一轮有变化的地址（小写）
+        
+        ETH 转入/转出（含 gas）都会改变余额，余额未变的地址可以跳过 txlist。
+        首次查询的地址视为有变化。查询失败的批次也视为有变化，保证不漏。
+        """
+        chunks = [addresses[i:i + BALANCEMULTI_MAX] for i in range(0, len(addresses), BALANCEMULTI_MAX)]
+        results = await asyncio.gather(*(self._get_multi_balance_wei(c) for c in chunks))
+        
+        changed: Set[str] = set()
+        for chunk, balances in zip(chunks, results):
+            if not balances:
+                changed.update(a.lower() for a in chunk)
+                continue
+            for address in chunk:
+                address = address.lower()
+                balance = balances.get(address)
+                if balance is None or self.balances.get(address) != balance:
+                    changed.add(address)
+                if balance is not None:
+                    self.balances[address] = balance
+        return changed
+    
+    async def _get_multi_balance_wei(self, addresses: List[str]) -> Dict[str, int]:
+        params = {
+            'module': 'account',
+            'action': 'balancemulti',
+            'address': ','.join(addresses),
+            'tag': 'latest',
+        }
+        result = await self._make_request(params)
+        if not isinstance(result, list):
+            return {}
+        balances = {}
+        for item in result:
+            try:
+                balances[item.get('account', '').lower()] = int(item.get('balance', 0))
+            except (ValueError, TypeError):
+                continue
+        return balances
     
     async def get_address_transactions(
         self, 
@@ -102,7 +280,8 @@ class EtherscanFetcher:
         start_block: int = 0,
         end_block: int = 99999999,
         page: int = 1,
-        offset: int = 100
+        offset: int = 100,
+        sort: str = 'desc'
     ) -> List[Dict]:
         """获取地址的普通交易记录"""
         
@@ -114,7 +293,7 @@ class EtherscanFetcher:
             'endblock': end_block,
             'page': page,
             'offset': offset,
-            'sort': 'desc',
+            'sort': sort,
         }
         
         result = await self._make_request(params)
@@ -145,7 +324,10 @@ class EtherscanFetcher:
         address: str,
         contract_address: Optional[str] = None,
         page: int = 1,
-        offset: int = 100
+        offset: int = 100,
+        start_block: int = 0,
+        end_block: int = 99999999,
+        sort: str = 'desc'
     ) -> List[Dict]:
         """获取地址的 ERC20 代币转账记录"""
         
@@ -153,9 +335,11 @@ class EtherscanFetcher:
             'module': 'account',
             'action': 'tokentx',
             'address': address,
+            'startblock': start_block,
+            'endblock': end_block,
             'page': page,
             'offset': offset,
-            'sort': 'desc',
+            'sort': sort,
         }
         
         if contract_address:
@@ -183,25 +367,15 @@ class EtherscanFetcher:
         return 0
     
     async def get_multi_eth_balance(self, addresses: List[str]) -> Dict[str, float]:
-        """批量获取 ETH 余额（最多20个地址）"""
+        """批量获取 ETH 余额（每 20 个地址一次请求，并发执行）"""
         
-        if len(addresses) > 20:
-            addresses = addresses[:20]
-            
-        params = {
-            'module': 'account',
-            'action': 'balancemulti',
-            'address': ','.join(addresses),
-            'tag': 'latest',
+        chunks = [addresses[i:i + BALANCEMULTI_MAX] for i in range(0, len(addresses), BALANCEMULTI_MAX)]
+        results = await asyncio.gather(*(self._get_multi_balance_wei(c) for c in chunks))
+        return {
+            address: wei / 1e18
+            for balances in results
+            for address, wei in balances.items()
         }
-        
-        result = await self._make_request(params)
-        if result and isinstance(result, list):
-            return {
-                item.get('account', ''): int(item.get('balance', 0)) / 1e18
-                for item in result
-            }
-        return {}
     
     async def get_token_balance(self, address: str, contract_address: str) -> float:
         """获取代币余额"""
@@ -277,163 +451,166 @@ async def fetch_whale_history(
     logger.info(f"当前 ETH 价格: ${eth_price}")
     
     total_addresses = len(addresses)
-    processed = 0
     
-    for addr_info in addresses:
+    async def fetch_one(index: int, addr_info: Dict) -> List[Dict]:
         address = addr_info.get('address', '')
         if not address:
-            continue
-            
+            return []
+        
         label = addr_info.get('name', addr_info.get('label', 'Unknown'))
         category = addr_info.get('label', 'unknown')
+        transactions = []
         
-        processed += 1
-        logger.info(f"[{processed}/{total_addresses}] 获取 {label} ({address[:10]}...) 的历史数据")
+        logger.info(f"[{index}/{total_addresses}] 获取 {label} ({address[:10]}...) 的历史数据")
         
-        try:
-            # 获取 ETH 交易
-            eth_txs = await fetcher.get_address_transactions(address, offset=50)
-            
-            for tx in eth_txs or []:
-                try:
-                    # 过滤时间
-                    tx_timestamp = int(tx.get('timeStamp', 0))
-                    tx_time = datetime.fromtimestamp(tx_timestamp, tz=timezone.utc)
-                    if tx_time < cutoff_time:
-                        continue
-                        
-                    value_eth = int(tx.get('value', 0)) / 1e18
-                    if value_eth < min_eth_value:
-                        continue
-                    
-                    value_usd = value_eth * eth_price
-                    if value_usd < min_usd_value:
-                        continue
-                    
-                    # 判断方向和动作
-                    is_incoming = tx.get('to', '').lower() == address.lower()
-                    from_addr = tx.get('from', '')
-                    to_addr = tx.get('to', '')
-                    
-                    # 判断是否涉及交易所
-                    from_is_exchange = is_exchange_address(from_addr)
-                    to_is_exchange = is_exchange_address(to_addr)
-                    
-                    if is_incoming:
-                        if from_is_exchange:
-                            action = 'withdraw_from_exchange'
-                        else:
-                            action = 'receive'
-                    else:
-                        if to_is_exchange:
-                            action = 'deposit_to_exchange'
-                        else:
-                            action = 'send'
-                    
-                    # 获取对方地址信息
-                    counter_addr = from_addr if is_incoming else to_addr
-                    counter_info = get_address_info(counter_addr)
-                    
-                    all_transactions.append({
-                        'address': address,
-                        'address_label': label,
-                        'category': category,
-                        'tx_hash': tx.get('hash', ''),
-                        'action': action,
-                        'token': 'ETH',
-                        'token_address': '',
-                        'amount': str(round(value_eth, 4)),
-                        'value_usd': f"${value_usd:,.0f}",
-                        'value_usd_raw': value_usd,
-                        'from_address': from_addr,
-                        'to_address': to_addr,
-                        'counter_label': counter_info.get('name', '') if counter_info else '',
-                        'timestamp': str(tx_timestamp * 1000),
-                        'tx_time': tx_time.isoformat(),
-                        'block_number': tx.get('blockNumber', ''),
-                        'chain': 'ethereum',
-                    })
-                except Exception as e:
-                    logger.debug(f"处理 ETH 交易出错: {e}")
+        # ETH 交易和代币转账并发获取（限速由 fetcher 令牌桶负责）
+        eth_txs, token_txs = await asyncio.gather(
+            fetcher.get_address_transactions(address, offset=50),
+            fetcher.get_token_transfers(address, offset=50),
+        )
+        
+        for tx in eth_txs or []:
+            try:
+                # 过滤时间
+                tx_timestamp = int(tx.get('timeStamp', 0))
+                tx_time = datetime.fromtimestamp(tx_timestamp, tz=timezone.utc)
+                if tx_time < cutoff_time:
                     continue
-            
-            # 获取代币转账
-            token_txs = await fetcher.get_token_transfers(address, offset=50)
-            
-            for tx in token_txs or []:
-                try:
-                    tx_timestamp = int(tx.get('timeStamp', 0))
-                    tx_time = datetime.fromtimestamp(tx_timestamp, tz=timezone.utc)
-                    if tx_time < cutoff_time:
-                        continue
-                    
-                    decimals = int(tx.get('tokenDecimal', 18))
-                    value = int(tx.get('value', 0)) / (10 ** decimals)
-                    
-                    token_symbol = tx.get('tokenSymbol', 'UNKNOWN')
-                    
-                    # 估算 USD 价值
-                    value_usd = estimate_usd_value(token_symbol, value)
-                    
-                    # 对于稳定币，价值等于数量
-                    if token_symbol in ['USDT', 'USDC', 'DAI', 'BUSD']:
-                        value_usd = value
-                    
-                    # 过滤小额
-                    if value_usd < min_usd_value:
-                        continue
-                    
-                    is_incoming = tx.get('to', '').lower() == address.lower()
-                    from_addr = tx.get('from', '')
-                    to_addr = tx.get('to', '')
-                    
-                    from_is_exchange = is_exchange_address(from_addr)
-                    to_is_exchange = is_exchange_address(to_addr)
-                    
-                    if is_incoming:
-                        if from_is_exchange:
-                            action = 'withdraw_from_exchange'
-                        else:
-                            action = 'receive'
+                
+                value_eth = int(tx.get('value', 0)) / 1e18
+                if value_eth < min_eth_value:
+                    continue
+                
+                value_usd = value_eth * eth_price
+                if value_usd < min_usd_value:
+                    continue
+                
+                # 判断方向和动作
+                is_incoming = tx.get('to', '').lower() == address.lower()
+                from_addr = tx.get('from', '')
+                to_addr = tx.get('to', '')
+                
+                # 判断是否涉及交易所
+                from_is_exchange = is_exchange_address(from_addr)
+                to_is_exchange = is_exchange_address(to_addr)
+                
+                if is_incoming:
+                    if from_is_exchange:
+                        action = 'withdraw_from_exchange'
                     else:
-                        if to_is_exchange:
-                            action = 'deposit_to_exchange'
-                        else:
-                            action = 'send'
-                    
-                    counter_addr = from_addr if is_incoming else to_addr
-                    counter_info = get_address_info(counter_addr)
-                    
-                    all_transactions.append({
-                        'address': address,
-                        'address_label': label,
-                        'category': category,
-                        'tx_hash': tx.get('hash', ''),
-                        'action': action,
-                        'token': token_symbol,
-                        'token_address': tx.get('contractAddress', ''),
-                        'amount': str(round(value, 4) if value < 1000000 else f"{value/1e6:.2f}M"),
-                        'value_usd': f"${value_usd:,.0f}",
-                        'value_usd_raw': value_usd,
-                        'from_address': from_addr,
-                        'to_address': to_addr,
-                        'counter_label': counter_info.get('name', '') if counter_info else '',
-                        'timestamp': str(tx_timestamp * 1000),
-                        'tx_time': tx_time.isoformat(),
-                        'block_number': tx.get('blockNumber', ''),
-                        'chain': 'ethereum',
-                    })
-                except Exception as e:
-                    logger.debug(f"处理代币交易出错: {e}")
+                        action = 'receive'
+                else:
+                    if to_is_exchange:
+                        action = 'deposit_to_exchange'
+                    else:
+                        action = 'send'
+                
+                # 获取对方地址信息
+                counter_addr = from_addr if is_incoming else to_addr
+                counter_info = get_address_info(counter_addr)
+                
+                transactions.append({
+                    'address': address,
+                    'address_label': label,
+                    'category': category,
+                    'tx_hash': tx.get('hash', ''),
+                    'action': action,
+                    'token': 'ETH',
+                    'token_address': '',
+                    'amount': str(round(value_eth, 4)),
+                    'value_usd': f"${value_usd:,.0f}",
+                    'value_usd_raw': value_usd,
+                    'from_address': from_addr,
+                    'to_address': to_addr,
+                    'counter_label': counter_info.get('name', '') if counter_info else '',
+                    'timestamp': str(tx_timestamp * 1000),
+                    'tx_time': tx_time.isoformat(),
+                    'block_number': tx.get('blockNumber', ''),
+                    'chain': 'ethereum',
+                })
+            except Exception as e:
+                logger.debug(f"处理 ETH 交易出错: {e}")
+                continue
+        
+        for tx in token_txs or []:
+            try:
+                tx_timestamp = int(tx.get('timeStamp', 0))
+                tx_time = datetime.fromtimestamp(tx_timestamp, tz=timezone.utc)
+                if tx_time < cutoff_time:
                     continue
-                    
-        except Exception as e:
-            logger.error(f"获取地址 {address[:10]}... 数据失败: {e}")
-            continue
+                
+                decimals = int(tx.get('tokenDecimal', 18))
+                value = int(tx.get('value', 0)) / (10 ** decimals)
+                
+                token_symbol = tx.get('tokenSymbol', 'UNKNOWN')
+                
+                # 估算 USD 价值
+                value_usd = estimate_usd_value(token_symbol, value)
+                
+                # 对于稳定币，价值等于数量
+                if token_symbol in ['USDT', 'USDC', 'DAI', 'BUSD']:
+                    value_usd = value
+                
+                # 过滤小额
+                if value_usd < min_usd_value:
+                    continue
+                
+                is_incoming = tx.get('to', '').lower() == address.lower()
+                from_addr = tx.get('from', '')
+                to_addr = tx.get('to', '')
+                
+                from_is_exchange = is_exchange_address(from_addr)
+                to_is_exchange = is_exchange_address(to_addr)
+                
+                if is_incoming:
+                    if from_is_exchange:
+                        action = 'withdraw_from_exchange'
+                    else:
+                        action = 'receive'
+                else:
+                    if to_is_exchange:
+                        action = 'deposit_to_exchange'
+                    else:
+                        action = 'send'
+                
+                counter_addr = from_addr if is_incoming else to_addr
+                counter_info = get_address_info(counter_addr)
+                
+                transactions.append({
+                    'address': address,
+                    'address_label': label,
+                    'category': category,
+                    'tx_hash': tx.get('hash', ''),
+                    'action': action,
+                    'token': token_symbol,
+                    'token_address': tx.get('contractAddress', ''),
+                    'amount': str(round(value, 4) if value < 1000000 else f"{value/1e6:.2f}M"),
+                    'value_usd': f"${value_usd:,.0f}",
+                    'value_usd_raw': value_usd,
+                    'from_address': from_addr,
+                    'to_address': to_addr,
+                    'counter_label': counter_info.get('name', '') if counter_info else '',
+                    'timestamp': str(tx_timestamp * 1000),
+                    'tx_time': tx_time.isoformat(),
+                    'block_number': tx.get('blockNumber', ''),
+                    'chain': 'ethereum',
+                })
+            except Exception as e:
+                logger.debug(f"处理代币交易出错: {e}")
+                continue
         
-        # 每处理5个地址，等待一下避免限速
-        if processed % 5 == 0:
-            await asyncio.sleep(1)
+        return transactions
+    
+    # 所有地址并发，实际速率由 API Key 档位令牌桶控制
+    results = await asyncio.gather(
+        *(fetch_one(i, info) for i, info in enumerate(addresses, 1)),
+        return_exceptions=True,
+    )
+    for addr_info, result in zip(addresses, results):
+        if isinstance(result, Exception):
+            logger.error(f"获取地址 {addr_info.get('address', '')[:10]}... 数据失败: {result}")
+            continue
+        all_transactions.extend(result)
     
     await fetcher.close()
     
@@ -28,6 +28,10 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from core.logging import get_logger
 from core.redis_client import RedisClient
+from core.http_client import create_session, hedged_fetch_json
+from core.poll_scheduler import get_poll_scheduler
+from core.metrics import EVENTS, register_stats, start_metrics_server
+from core.trace import start_trace
 
 try:
     import yaml
@@ -223,9 +227,11 @@ async def monitor_binance_ws(exchange_config):
                                     'detected_at': str(int(datetime.now(timezone.utc).timestamp() * 1000))
                                 }
                                 
+                                start_trace(event)
                                 redis_client.push_event('events:raw', event)
                                 redis_client.add_known_pair(exchange_name, symbol)
                                 stats['events'] += 1
+                                EVENTS.inc(service='exchange_intl', source=event['source'])
                         
                         stats['scans'] += 1
                     
@@ -270,45 +276,49 @@ async def monitor_exchange_rest(exchange_config):
     
     timeout = aiohttp.ClientTimeout(total=15)
     
-    async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
+    job = get_poll_scheduler(redis_client).register(f'intl:{exchange_name}', exchange_name, poll_interval)
+    
+    async with create_session(timeout=timeout, headers=headers) as session:
         while running:
+            await job.wait()
+            new_count = 0
             try:
-                async with session.get(rest_url) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        symbols = parse_symbols(exchange_name, data)
-                        
-                        new_count = 0
-                        for symbol in symbols:
-                            if symbol and not redis_client.check_known_pair(exchange_name, symbol):
-                                logger.info(f"[NEW] {symbol} @ {exchange_name}")
-                                
-                                event = {
-                                    'source': 'rest_api',
-                                    'source_type': 'market',
-                                    'exchange': exchange_name,
-                                    'symbol': symbol,
-                                    'raw_text': f"New trading pair: {symbol}",
-                                    'detected_at': str(int(datetime.now(timezone.utc).timestamp() * 1000))
-                                }
-                                
-                                redis_client.push_event('events:raw', event)
-                                redis_client.add_known_pair(exchange_name, symbol)
-                                stats['events'] += 1
-                                new_count += 1
-                        
-                        if new_count > 0:
-                            logger.info(f"[STAT] {exchange_name}: {new_count} 新币")
-                        
-                        stats['scans'] += 1
+                status, data = await hedged_fetch_json(session, rest_url)
+                if status == 200:
+                    symbols = parse_symbols(exchange_name, data)
                     
-                    elif resp.status == 429:
-                        logger.warning(f"{exchange_name} 限流，等待60s")
-                        await asyncio.sleep(60)
-                        stats['errors'] += 1
-                    else:
-                        logger.warning(f"{exchange_name} HTTP {resp.status}")
-                        stats['errors'] += 1
+                    for symbol in symbols:
+                        if symbol and not redis_client.check_known_pair(exchange_name, symbol):
+                            logger.info(f"[NEW] {symbol} @ {exchange_name}")
+                            
+                            event = {
+                                'source': 'rest_api',
+                                'source_type': 'market',
+                                'exchange': exchange_name,
+                                'symbol': symbol,
+                                'raw_text': f"New trading pair: {symbol}",
+                                'detected_at': str(int(datetime.now(timezone.utc).timestamp() * 1000))
+                            }
+                            
+                            start_trace(event)
+                            redis_client.push_event('events:raw', event)
+                            redis_client.add_known_pair(exchange_name, symbol)
+                            stats['events'] += 1
+                            EVENTS.inc(service='exchange_intl', source=event['source'])
+                            new_count += 1
+                    
+                    if new_count > 0:
+                        logger.info(f"[STAT] {exchange_name}: {new_count} 新币")
+                    
+                    stats['scans'] += 1
+                    
+                elif status in (429, 418):
+                    # 主机级退避已由 core.http_client 按 Retry-After 处理
+                    logger.warning(f"{exchange_name} 限流 ({status})")
+                    stats['errors'] += 1
+                else:
+                    logger.warning(f"{exchange_name} HTTP {status}")
+                    stats['errors'] += 1
             
             except asyncio.TimeoutError:
                 logger.warning(f"{exchange_name} 超时")
@@ -316,8 +326,8 @@ async def monitor_exchange_rest(exchange_config):
             except Exception as e:
                 logger.error(f"{exchange_name} 错误: {e}")
                 stats['errors'] += 1
-            
-            await asyncio.sleep(poll_interval)
+            finally:
+                job.done(new_count > 0)
 
 
 async def heartbeat_loop():
@@ -349,6 +359,9 @@ async def main():
     redis_client = RedisClient.from_env()
     logger.info("[OK] Redis 已连接")
     
+    register_stats('crypto_exchange_monitor', stats, service='exchange_intl')
+    start_metrics_server('exchange_intl')
+    
     tasks = [asyncio.create_task(heartbeat_loop())]
     
     for ex in config['exchanges']:
@@ -23,6 +23,9 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from core.logging import get_logger
 from core.redis_client import RedisClient
+from core.http_client import create_session
+from core.poll_scheduler import get_poll_scheduler
+from core.metrics import EVENTS, register_stats, start_metrics_server
 from core.symbols import extract_symbols
 from core.utils import extract_contract_address
 
@@ -153,15 +156,18 @@ async def monitor_exchange(exchange_name, exchange_config):
     
     headers = {'User-Agent': 'Mozilla/5.0'}
     
-    async with aiohttp.ClientSession() as session:
+    job = get_poll_scheduler(redis_client).register(f'kr:{exchange_name}', exchange_name, poll_interval)
+    
+    async with create_session() as session:
         while running:
+            await job.wait()
+            new_count = 0
             try:
                 async with session.get(markets_url, timeout=timeout, headers=headers) as resp:
                     if resp.status == 200:
                         data = await resp.json()
                         markets = parse_markets(exchange_name, data)
                         
-                        new_count = 0
                         for market_id in markets:
                             if not redis_client.check_known_pair(exchange_name, market_id):
                                 logger.info(f"[NEW] {exchange_name}: {market_id}")
@@ -178,6 +184,7 @@ async def monitor_exchange(exchange_name, exchange_config):
                                 redis_client.push_event('events:raw', event)
                                 redis_client.add_known_pair(exchange_name, market_id)
                                 stats['events'] += 1
+                                EVENTS.inc(service='exchange_kr', source=event['source'])
                                 new_count += 1
                         
                         if new_count > 0:
@@ -194,8 +201,8 @@ async def monitor_exchange(exchange_name, exchange_config):
             except Exception as e:
                 logger.error(f"{exchange_name} 错误: {e}")
                 stats['errors'] += 1
-            
-            await asyncio.sleep(poll_interval)
+            finally:
+                job.done(new_count > 0)
 
 
 async def monitor_upbit_announcements():
@@ -214,7 +221,7 @@ async def monitor_upbit_announcements():
     
     logger.info("启动 Upbit 公告监控")
     
-    async with aiohttp.ClientSession() as session:
+    async with create_session() as session:
         while running:
             try:
                 async with session.get(announcement_url, timeout=timeout) as resp:
@@ -253,6 +260,7 @@ async def monitor_upbit_announcements():
                                     redis_client.push_event('events:raw', event)
                                     redis_client.add_known_pair('upbit', f"notice_{notice_id}")
                                     stats['events'] += 1
+                                    EVENTS.inc(service='exchange_kr', source=event['source'])
             
             except asyncio.TimeoutError:
                 pass
@@ -293,6 +301,9 @@ async def main():
     redis_client = RedisClient.from_env()
     logger.info("[OK] Redis 已连接")
     
+    register_stats('crypto_exchange_monitor', stats, service='exchange_kr')
+    start_metrics_server('exchange_kr')
+    
     tasks = [asyncio.create_task(heartbeat_loop())]
     
     for ex_name, ex_config in config['exchanges'].items():
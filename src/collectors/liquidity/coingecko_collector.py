@@ -10,6 +10,11 @@ import asyncio
 import aiohttp
 import logging
 from typing import Dict, List, Optional, Any
+
+try:
+    from src.core.http_client import create_session
+except ImportError:
+    from core.http_client import create_session
 from datetime import datetime
 from dataclasses import dataclass, field
 
@@ -56,7 +61,7 @@ class CoinGeckoCollector:
     async def _get_session(self) -> aiohttp.ClientSession:
         if self.session is None or self.session.closed:
             timeout = aiohttp.ClientTimeout(total=30)
-            self.session = aiohttp.ClientSession(timeout=timeout)
+            self.session = create_session(timeout=timeout)
         return self.session
     
     async def close(self):
@@ -88,8 +93,8 @@ class CoinGeckoCollector:
                     self._cache_time[url] = datetime.now()
                     return data
                 elif resp.status == 429:
-                    logger.warning("CoinGecko API 限速，等待重试...")
-                    await asyncio.sleep(60)
+                    # 主机级退避由 core.http_client 按 Retry-After 处理
+                    logger.warning("CoinGecko API 限速")
                     return None
                 else:
                     logger.warning(f"CoinGecko API 返回 {resp.status}: {url}")
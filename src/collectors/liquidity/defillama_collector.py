@@ -8,6 +8,11 @@ import asyncio
 import aiohttp
 import logging
 from typing import Dict, List, Optional, Any
+
+try:
+    from src.core.http_client import create_session
+except ImportError:
+    from core.http_client import create_session
 from datetime import datetime, timedelta
 from dataclasses import dataclass, field
 
@@ -71,7 +76,7 @@ class DefiLlamaCollector:
     async def _get_session(self) -> aiohttp.ClientSession:
         if self.session is None or self.session.closed:
             timeout = aiohttp.ClientTimeout(total=30)
-            self.session = aiohttp.ClientSession(timeout=timeout)
+            self.session = create_session(timeout=timeout)
         return self.session
     
     async def close(self):
@@ -8,6 +8,11 @@ import asyncio
 import aiohttp
 import logging
 from typing import Dict, List, Optional, Tuple
+
+try:
+    from src.core.http_client import create_session
+except ImportError:
+    from core.http_client import create_session
 from datetime import datetime
 from dataclasses import dataclass, field
 
@@ -68,7 +73,7 @@ class ExchangeDepthCollector:
     async def _get_session(self) -> aiohttp.ClientSession:
         if self.session is None or self.session.closed:
             timeout = aiohttp.ClientTimeout(total=15)
-            self.session = aiohttp.ClientSession(timeout=timeout)
+            self.session = create_session(timeout=timeout)
         return self.session
     
     async def close(self):
@@ -21,8 +21,12 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from core.logging import get_logger
 from core.redis_client import RedisClient
+from core.http_client import create_session
 from core.symbols import extract_symbols
 from core.utils import extract_contract_address
+from core.trace import start_trace
+from core.near_dup import NEAR_DUP_CONFIG, NearDuplicateDetector, make_anchor
+from fusion.scoring_engine import InstitutionalScorer
 
 try:
     import yaml
@@ -36,7 +40,11 @@ logger = get_logger('news')
 redis_client = None
 config = None
 running = True
-stats = {'scans': 0, 'events': 0, 'errors': 0}
+stats = {'scans': 0, 'events': 0, 'errors': 0, 'near_dup_suppressed': 0}
+
+# 各新闻源互相转载的近似重复检测；来源按融合层评分器的分类计
+near_dup = NearDuplicateDetector() if NEAR_DUP_CONFIG.get('enabled', True) else None
+source_classifier = InstitutionalScorer()
 
 # 心跳键名
 HEARTBEAT_KEY = 'news'
@@ -88,7 +96,7 @@ async def monitor_rss():
     
     seen_urls = set()
     
-    async with aiohttp.ClientSession() as session:
+    async with create_session() as session:
         while running:
             try:
                 for source in sources:
@@ -133,6 +141,21 @@ async def monitor_rss():
                                             'chain': contract_info.get('chain', ''),
                                         }
                                         
+                                        # 近似重复：同一来源分类的转载丢弃
+                                        match = near_dup and near_dup.check(
+                                            full_text,
+                                            source=source_classifier.classify_source(event),
+                                            anchor=make_anchor(symbols, event['contract_address'], full_text),
+                                        )
+                                        if match:
+                                            if not match.new_source:
+                                                stats['near_dup_suppressed'] += 1
+                                                logger.debug(f"[DUP] [{source_name}] {title[:60]}")
+                                                continue
+                                            event['near_dup_of'] = match.fingerprint
+                                            event['repost_count'] = str(match.count)
+                                        
+                                        start_trace(event)
                                         redis_client.push_event('events:raw', event)
                                         stats['events'] += 1
                                         new_count += 1
@@ -5,8 +5,8 @@
 
 优化点：
 1. 多交易所 WebSocket 并发 (Binance, OKX, Bybit, KuCoin, Gate)
-2. REST API 差异化调度（从配置文件读取）
-3. 连接池复用，减少连接开销
+2. REST API 差异化调度（core.poll_scheduler 时间轮：公告加速、空闲退避、全局预算）
+3. 连接池复用，减少连接开销（core.http_client 共享连接池 + 按主机限流 + 多主机对冲）
 4. 事件去重，避免重复推送
 5. 异步并发，最大化吞吐量
 6. 新增：公告 API 监控
@@ -21,17 +21,20 @@ import json
 import sys
 import os
 import time
-import hashlib
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, Set, List, Optional
-from collections import deque
 
 # 添加 core 层路径
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from core.logging import get_logger
 from core.redis_client import RedisClient
+from core.http_client import create_session, hedged_fetch_json, close_connector
+from core.poll_scheduler import get_poll_scheduler
+from core.trace import start_trace
+from core.dedup import Deduplicator
+from core.metrics import EVENTS, register_stats, start_metrics_server
 
 # 导入优化配置
 try:
@@ -166,8 +169,8 @@ class OptimizedCollector:
         # 已知交易对缓存 (内存 + Redis)
         self.known_pairs: Dict[str, Set[str]] = {}
         
-        # 事件去重（最近1000条）
-        self.recent_events: deque = deque(maxlen=1000)
+        # 事件去重（init 后换成多进程共享的 Redis Bloom）
+        self.event_dedup = Deduplicator('collector_events')
         
         # 统计
         self.stats = {
@@ -192,19 +195,13 @@ class OptimizedCollector:
         # 连接 Redis
         self.redis = RedisClient.from_env()
         logger.info("✅ Redis 连接成功")
+        self.event_dedup = Deduplicator('collector_events', redis_client=self.redis)
         
         # 预加载已知交易对
         await self.preload_known_pairs()
         
-        # 创建 HTTP 连接池
-        connector = aiohttp.TCPConnector(
-            limit=50,  # 最大连接数
-            limit_per_host=10,
-            ssl=self.ssl_context,
-            ttl_dns_cache=300,
-        )
-        self.http_session = aiohttp.ClientSession(
-            connector=connector,
+        # HTTP 会话（挂在进程共享连接池上，按主机令牌桶限流）
+        self.http_session = create_session(
             timeout=aiohttp.ClientTimeout(total=10),
             headers={'User-Agent': 'Mozilla/5.0 (compatible; CryptoMonitor/2.0)'},
         )
@@ -230,21 +227,16 @@ class OptimizedCollector:
         # 添加到缓存
         self.known_pairs[exchange].add(symbol)
         
-        # 异步写入 Redis（不阻塞）
-        key = f"known_pairs:{exchange}"
-        self.redis.client.sadd(key, symbol)
+        # 写入 Redis（同时记入新增记录，供合约同步增量处理）
+        self.redis.add_known_pair(exchange, symbol)
         
         return True
     
     def is_duplicate_event(self, exchange: str, symbol: str) -> bool:
         """检查是否重复事件（短时间内）"""
-        event_hash = hashlib.md5(f"{exchange}:{symbol}".encode()).hexdigest()[:16]
-        
-        if event_hash in self.recent_events:
+        if self.event_dedup.seen(f"{exchange}:{symbol}"):
             self.stats['duplicates'] += 1
             return True
-        
-        self.recent_events.append(event_hash)
         return False
     
     async def push_event(self, exchange: str, symbol: str, source_type: str):
@@ -264,7 +256,9 @@ class OptimizedCollector:
             'ts': str(int(time.time() * 1000)),
         }
         
+        start_trace(event)
         self.redis.push_event('events:raw', event)
+        EVENTS.inc(service='optimized_collector', source=event['source'])
         
         tier = REST_FEEDS.get(exchange, {}).get('tier', 3)
         if tier == 1:
@@ -336,30 +330,33 @@ class OptimizedCollector:
         
         logger.info(f"📡 启动 {exchange} REST 监控 (间隔 {interval}s)")
         
+        job = get_poll_scheduler(self.redis).register(f'optimized:{exchange}', exchange, interval)
+        
         while self.running:
+            await job.wait()
+            new_count = 0
             try:
-                async with self.http_session.get(url) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        symbols = parser(data)
-                        
-                        new_count = 0
-                        for symbol in symbols:
-                            if symbol and self.is_new_pair(exchange, symbol):
-                                await self.push_event(exchange, symbol, 'rest_api')
-                                self.stats['rest_events'] += 1
-                                new_count += 1
-                        
-                        if new_count > 0:
-                            logger.info(f"📊 {exchange}: 发现 {new_count} 个新币")
+                status, data = await hedged_fetch_json(self.http_session, url, ssl=self.ssl_context)
+                if status == 200:
+                    symbols = parser(data)
                     
-                    elif resp.status == 429:
-                        logger.warning(f"{exchange} 限流，等待 60 秒")
-                        await asyncio.sleep(60)
+                    for symbol in symbols:
+                        if symbol and self.is_new_pair(exchange, symbol):
+                            await self.push_event(exchange, symbol, 'rest_api')
+                            self.stats['rest_events'] += 1
+                            new_count += 1
                     
-                    elif resp.status in (403, 451):
-                        logger.warning(f"{exchange} 访问受限 ({resp.status})")
-                        self.stats['errors'] += 1
+                    if new_count > 0:
+                        logger.info(f"📊 {exchange}: 发现 {new_count} 个新币")
+                
+                elif status in (429, 418):
+                    # 主机级退避已由 core.http_client 按 Retry-After 处理
+                    logger.warning(f"{exchange} 限流 ({status})")
+                    self.stats['errors'] += 1
+                
+                elif status in (403, 451):
+                    logger.warning(f"{exchange} 访问受限 ({status})")
+                    self.stats['errors'] += 1
                 
             except asyncio.TimeoutError:
                 logger.warning(f"{exchange} 请求超时")
@@ -367,8 +364,8 @@ class OptimizedCollector:
             except Exception as e:
                 logger.error(f"{exchange} REST 错误: {e}")
                 self.stats['errors'] += 1
-            
-            await asyncio.sleep(interval)
+            finally:
+                job.done(new_count > 0)
     
     # ==================== 心跳 ====================
     
@@ -403,6 +400,8 @@ class OptimizedCollector:
     async def run(self):
         """运行采集器"""
         await self.init()
+        register_stats('crypto_collector', self.stats, service='optimized_collector')
+        start_metrics_server('optimized_collector')
         
         tasks = []
         
@@ -427,6 +426,7 @@ class OptimizedCollector:
             self.running = False
             if self.http_session:
                 await self.http_session.close()
+            await close_connector()
             if self.redis:
                 self.redis.close()
     
@@ -41,7 +41,9 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from core.logging import get_logger
 from core.redis_client import RedisClient
+from core.http_client import create_session
 from core.utils import extract_contract_address
+from core.trace import start_trace
 
 logger = get_logger('realtime_listing')
 
@@ -343,12 +345,7 @@ class RealtimeListingMonitor:
         self.redis = RedisClient.from_env()
         logger.info("✅ Redis 连接成功")
         
-        connector = aiohttp.TCPConnector(
-            limit=30,
-            ssl=self.ssl_context,
-        )
-        self.session = aiohttp.ClientSession(
-            connector=connector,
+        self.session = create_session(
             timeout=aiohttp.ClientTimeout(total=15),
             headers={'User-Agent': 'Mozilla/5.0 (compatible; CryptoMonitor/2.0)'},
         )
@@ -416,7 +413,7 @@ class RealtimeListingMonitor:
                 # 构建请求
                 if method == 'GET':
                     params = config.get('params', {})
-                    async with self.session.get(url, params=params) as resp:
+                    async with self.session.get(url, params=params, ssl=self.ssl_context) as resp:
                         if resp.status == 200:
                             data = await resp.json()
                         else:
@@ -426,7 +423,7 @@ class RealtimeListingMonitor:
                             continue
                 else:  # POST
                     payload = config.get('payload', {})
-                    async with self.session.post(url, json=payload) as resp:
+                    async with self.session.post(url, json=payload, ssl=self.ssl_context) as resp:
                         if resp.status == 200:
                             data = await resp.json()
                         else:
@@ -478,6 +475,7 @@ class RealtimeListingMonitor:
                         }
                         
                         # 推送事件
+                        start_trace(event, source_ts=ann.get('time') or None)
                         self.redis.push_event('events:raw', event)
                         self.stats['new_listings_found'] += 1
                         
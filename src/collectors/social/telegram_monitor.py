@@ -6,6 +6,7 @@ Telegram 频道实时监控
 - 频道分级处理（Tier 1/2/3）
 - 快速预过滤（毫秒级判断）
 - 详细延迟追踪
+- 快速启动（按 chat_id 集合立即监听，频道实体后台解析 + 磁盘缓存）
 """
 
 import asyncio
@@ -26,6 +27,10 @@ from core.logging import get_logger
 from core.redis_client import RedisClient
 from core.symbols import extract_symbols
 from core.utils import extract_contract_address
+from core.trace import start_trace
+from core.metrics import EVENTS, register_stats, start_metrics_server
+from core.near_dup import NearDuplicateDetector, make_anchor
+from fusion.scoring_engine import InstitutionalScorer
 
 # 导入优化配置
 try:
@@ -34,12 +39,16 @@ try:
         TELEGRAM_CHANNEL_PRIORITY,
         QUICK_FILTER_KEYWORDS,
         TELEGRAM_PREPROCESSING,
+        TELEGRAM_STARTUP,
+        NEAR_DUP_CONFIG,
     )
 except ImportError:
     # 降级默认值
     TELEGRAM_CHANNEL_PRIORITY = {'tier_1': [], 'tier_2': [], 'tier_3': []}
     QUICK_FILTER_KEYWORDS = {'list', 'listing', '上线', '上币', 'new'}
     TELEGRAM_PREPROCESSING = {'skip_media_only': True, 'min_text_length': 10}
+    TELEGRAM_STARTUP = {}
+    NEAR_DUP_CONFIG = {}
 
 try:
     import yaml
@@ -47,8 +56,8 @@ try:
 except ImportError:
     HAS_YAML = False
 
-from telethon import TelegramClient, events
-from telethon.tl.types import InputPeerChannel
+from telethon import TelegramClient, events, utils
+from telethon.tl.types import InputPeerChannel, PeerChannel
 
 logger = get_logger('telegram')
 
@@ -135,6 +144,60 @@ for ch in channel_entries:
         'category': ch.get('category', '')
     }
 
+# 监听的 chat_id 集合（Telethon 的带标记 ID，频道为 -100<id>）
+# 直接由 channels_resolved.json 计算，注册事件处理器时不需要先解析实体
+WATCHED_CHAT_IDS = {
+    utils.get_peer_id(PeerChannel(ch['id'])) for ch in channel_entries if ch.get('id')
+}
+
+# ============================================================
+# 频道实体缓存
+# ============================================================
+
+ENTITY_CACHE_PATH = project_root / TELEGRAM_STARTUP.get('entity_cache_path', 'data/telegram/entity_cache.json')
+
+# 已解析的频道 {频道 ID: {title, username, access_hash, resolved_at}}
+entity_cache = {}
+
+
+def load_entity_cache() -> dict:
+    """读取磁盘上的频道实体缓存"""
+    try:
+        with open(ENTITY_CACHE_PATH, encoding='utf-8') as f:
+            data = json.load(f)
+        return {int(k): v for k, v in data.get('channels', {}).items()}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning(f"读取频道实体缓存失败: {e}")
+        return {}
+
+
+def save_entity_cache():
+    """写入频道实体缓存（先写临时文件再替换，避免中途退出留下半个文件）"""
+    try:
+        ENTITY_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = ENTITY_CACHE_PATH.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'updated_at': int(time.time()), 'channels': entity_cache}, f, ensure_ascii=False)
+        os.replace(tmp_path, ENTITY_CACHE_PATH)
+    except Exception as e:
+        logger.warning(f"写入频道实体缓存失败: {e}")
+
+
+def apply_cached_metadata():
+    """用缓存中的最新标题/用户名覆盖 channels_resolved.json 里的旧值"""
+    for channel_id, meta in entity_cache.items():
+        if channel_id in channel_info:
+            if meta.get('title'):
+                channel_info[channel_id]['title'] = meta['title']
+            if meta.get('username'):
+                channel_info[channel_id]['username'] = meta['username']
+
+
+entity_cache.update(load_entity_cache())
+apply_cached_metadata()
+
 # ============================================================
 # 关键词系统 - 分级匹配
 # ============================================================
@@ -178,8 +241,12 @@ keywords = all_keywords_high + all_keywords_medium
 
 client = TelegramClient(session_name, api_id, api_hash)
 
-stats = {'messages': 0, 'events': 0, 'errors': 0, 'filtered': 0, 'tier1': 0, 'tier2': 0, 'tier3': 0}
-channels = []
+stats = {'messages': 0, 'events': 0, 'errors': 0, 'filtered': 0, 'tier1': 0, 'tier2': 0, 'tier3': 0,
+         'near_dup_suppressed': 0}
+
+# 跨频道转发的近似重复检测；来源按融合层评分器的分类计，保证多源加分的来源数不变
+near_dup = NearDuplicateDetector() if NEAR_DUP_CONFIG.get('enabled', True) else None
+source_classifier = InstitutionalScorer()
 
 # ============================================================
 # 优化函数
@@ -272,7 +339,12 @@ async def message_handler(event):
         text = event.message.raw_text or ""
         
         # 优化：使用消息的 peer_id 获取 chat_id（避免额外 API 调用）
-        chat_id = event.chat_id or (event.message.peer_id.channel_id if hasattr(event.message.peer_id, 'channel_id') else None)
+        # event.chat_id 是带标记 ID（-100<id>），channel_info 以频道原始 ID 为键
+        chat_id = event.chat_id
+        if chat_id is not None:
+            chat_id = utils.resolve_id(chat_id)[0]
+        elif hasattr(event.message.peer_id, 'channel_id'):
+            chat_id = event.message.peer_id.channel_id
         
         # 从缓存获取频道信息
         if chat_id and chat_id in channel_info:
@@ -385,8 +457,25 @@ async def message_handler(event):
                 # Tier 1 频道：5秒就告警
                 logger.warning(f"[TIER1] {chat_name} 延迟={total_delay:.1f}s")
             
+            # 近似重复：同一来源分类的转发丢弃，新来源的转发带上簇指纹继续推送
+            if near_dup:
+                match = near_dup.check(
+                    text,
+                    source=source_classifier.classify_source(event_data),
+                    anchor=make_anchor(symbols, contract_address, text),
+                )
+                if match:
+                    if not match.new_source:
+                        stats['near_dup_suppressed'] += 1
+                        logger.debug(f"[DUP] [{chat_name}] 近似转发 (距离 {match.distance}, 第 {match.count} 次)")
+                        return
+                    event_data['near_dup_of'] = match.fingerprint
+                    event_data['repost_count'] = str(match.count)
+            
+            start_trace(event_data, source_ts=msg_time, receive_ts=receive_time)
             redis_client.push_event('events:raw', event_data)
             stats['events'] += 1
+            EVENTS.inc(service='telegram', source=f'telegram_tier{channel_tier}')
             
             # 日志输出
             log_msg = f"[EVENT] type={event_type} symbols={symbols}"
@@ -471,6 +560,97 @@ def determine_event_type(text: str, category: str, keywords: list) -> str:
     return 'signal'
 
 
+def _remember_entity(entity):
+    """记录解析到的频道实体（写缓存并刷新 channel_info）"""
+    meta = {
+        'title': getattr(entity, 'title', '') or '',
+        'username': getattr(entity, 'username', '') or '',
+        'access_hash': getattr(entity, 'access_hash', None),
+        'resolved_at': int(time.time()),
+    }
+    entity_cache[entity.id] = meta
+    info = channel_info.setdefault(entity.id, {'category': ''})
+    if meta['title']:
+        info['title'] = meta['title']
+    if meta['username']:
+        info['username'] = meta['username']
+
+
+async def resolve_channel_entities(force: bool = False) -> tuple:
+    """
+    后台解析频道实体（有界并发）
+
+    按批调用 get_entity（一批一个 GetChannels 请求），批量失败时逐个重试，
+    缓存未过期的频道跳过。解析结果写入 Telethon session 和磁盘缓存。
+
+    Returns:
+        (成功数, 失败的频道名列表)
+    """
+    ttl = TELEGRAM_STARTUP.get('entity_cache_ttl_hours', 24) * 3600
+    batch_size = max(1, TELEGRAM_STARTUP.get('resolve_batch_size', 50))
+    semaphore = asyncio.Semaphore(max(1, TELEGRAM_STARTUP.get('resolve_concurrency', 4)))
+    now = time.time()
+
+    pending = []
+    for ch in channel_entries:
+        cached = entity_cache.get(ch.get('id'), {})
+        if not force and now - cached.get('resolved_at', 0) < ttl:
+            continue
+        access_hash = ch.get('access_hash') or cached.get('access_hash')
+        if not ch.get('id') or access_hash is None:
+            logger.warning(f"跳过无效频道 {ch.get('username', ch.get('id'))}: 缺少 access_hash")
+            continue
+        pending.append((ch, InputPeerChannel(ch['id'], access_hash)))
+
+    if not pending:
+        return 0, []
+
+    resolved = 0
+    failed = []
+
+    async def resolve_batch(batch):
+        nonlocal resolved
+        async with semaphore:
+            try:
+                entities = await client.get_entity([peer for _, peer in batch])
+            except Exception as e:
+                logger.debug(f"批量解析失败，逐个重试: {e}")
+                entities = []
+                for ch, peer in batch:
+                    try:
+                        entities.append(await client.get_entity(peer))
+                    except Exception as e:
+                        failed.append(ch.get('username') or str(ch['id']))
+                        logger.debug(f"频道解析失败 {ch.get('username')}: {e}")
+        for entity in entities:
+            _remember_entity(entity)
+        resolved += len(entities)
+
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    await asyncio.gather(*(resolve_batch(b) for b in batches))
+    save_entity_cache()
+    return resolved, failed
+
+
+async def entity_refresh_loop():
+    """启动后解析过期的频道实体，之后定期刷新元数据"""
+    interval = TELEGRAM_STARTUP.get('refresh_interval_hours', 6) * 3600
+    force = False
+    while True:
+        started = time.time()
+        try:
+            resolved, failed = await resolve_channel_entities(force=force)
+            if resolved or failed:
+                logger.info(f"[OK] 频道实体解析完成: 成功 {resolved}, 失败 {len(failed)}, "
+                            f"耗时 {time.time() - started:.1f}s")
+            if failed:
+                logger.warning(f"失败的频道 ({len(failed)}): {', '.join(failed[:10])}")
+        except Exception as e:
+            logger.warning(f"频道实体解析错误: {e}")
+        await asyncio.sleep(interval)
+        force = True
+
+
 async def heartbeat_loop():
     """心跳循环 - 包含延迟统计"""
     while True:
@@ -482,7 +662,8 @@ async def heartbeat_loop():
                 'events': str(stats['events']),
                 'errors': str(stats['errors']),
                 'filtered': str(stats.get('filtered', 0)),
-                'channels': str(len(channels)),
+                'channels': str(len(WATCHED_CHAT_IDS)),
+                'channels_resolved': str(sum(1 for ch in channel_entries if ch.get('id') in entity_cache)),
                 'tier1_events': str(stats.get('tier1', 0)),
                 'tier2_events': str(stats.get('tier2', 0)),
                 'tier3_events': str(stats.get('tier3', 0)),
@@ -503,72 +684,36 @@ async def heartbeat_loop():
 
 
 async def main():
-    global channels
-    
     logger.info("=" * 50)
     logger.info("Telegram Monitor 启动")
     logger.info("=" * 50)
     
-    if CHANNELS_FILE_MISSING or not channel_entries:
+    if CHANNELS_FILE_MISSING or not WATCHED_CHAT_IDS:
         logger.warning("没有频道配置，Telegram 监控将不启动")
         return
     
     await client.start()
     logger.info("[OK] Telethon 已连接")
     
-    logger.info(f"批量解析频道实体... (共 {len(channel_entries)} 个)")
-    
-    input_peers = []
-    for ch in channel_entries:
-        try:
-            peer = InputPeerChannel(ch['id'], ch['access_hash'])
-            input_peers.append(peer)
-        except Exception as e:
-            logger.warning(f"跳过无效频道 {ch.get('username', ch['id'])}: {e}")
-    
-    logger.info(f"[OK] 创建了 {len(input_peers)} 个 InputPeerChannel")
-    
-    # 逐个解析频道实体（get_entities 在某些版本不可用）
-    channels = []
-    failed_channels = []
-    
-    for i, (peer, ch_info) in enumerate(zip(input_peers, channel_entries)):
-        try:
-            entity = await client.get_entity(peer)
-            channels.append(entity)
-        except Exception as e:
-            failed_channels.append(ch_info.get('username', str(ch_info['id'])))
-            logger.debug(f"频道解析失败 {ch_info.get('username')}: {e}")
-        
-        # 每 20 个输出进度
-        if (i + 1) % 20 == 0:
-            logger.info(f"解析进度: {i+1}/{len(input_peers)}, 成功: {len(channels)}")
-            await asyncio.sleep(0.5)
-    
-    logger.info(f"[OK] 频道解析完成: {len(channels)}/{len(input_peers)} 成功")
+    register_stats('crypto_telegram', stats, service='telegram')
+    register_stats('crypto_telegram_latency', latency_stats, service='telegram')
+    start_metrics_server('telegram')
     
-    if failed_channels:
-        logger.warning(f"失败的频道 ({len(failed_channels)}): {', '.join(failed_channels[:10])}")
-    
-    if not channels:
-        logger.error("没有可监控的频道！")
-        return
-    
-    client.add_event_handler(message_handler, events.NewMessage(chats=channels))
-    logger.info(f"[OK] 事件处理器已注册，监控 {len(channels)} 个频道")
-    
-    logger.info("监控的频道（前10个）:")
-    for ch in channels[:10]:
-        title = getattr(ch, 'title', 'N/A')
-        username = getattr(ch, 'username', 'N/A')
-        logger.info(f"  - @{username}: {title}")
+    # 立即开始监听：按预先计算的 chat_id 集合过滤，不等待实体解析
+    client.add_event_handler(
+        message_handler,
+        events.NewMessage(func=lambda e: e.chat_id in WATCHED_CHAT_IDS),
+    )
+    logger.info(f"[OK] 事件处理器已注册，监控 {len(WATCHED_CHAT_IDS)} 个频道 "
+                f"(实体缓存 {len(entity_cache)} 个)")
     
+    # 实体解析与元数据刷新放到后台
+    asyncio.create_task(entity_refresh_loop())
     asyncio.create_task(heartbeat_loop())
     
     logger.info("开始实时监听消息...")
     await client.run_until_disconnected()
 
-
 if __name__ == "__main__":
     try:
         client.loop.run_until_complete(main())
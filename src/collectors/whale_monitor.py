@@ -19,6 +19,13 @@ import time
 from datetime import datetime, timezone, timedelta
 from typing import Optional, Dict, List, Any
 
+try:
+    from src.core.http_client import create_session
+    from src.core.dedup import Deduplicator
+except ImportError:
+    from core.http_client import create_session
+    from core.dedup import Deduplicator
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('whale_monitor')
@@ -52,6 +59,11 @@ except ImportError:
     EtherscanFetcher = None
     fetch_whale_history = None
 
+try:
+    from src.analytics import whale_aggregates
+except ImportError:
+    from analytics import whale_aggregates
+
 
 class WhaleMonitor:
     """巨鲸监控器"""
@@ -61,10 +73,10 @@ class WhaleMonitor:
         self.etherscan_key = os.getenv('ETHERSCAN_API_KEY', '')
         self.session = None
         self.running = False
-        self.fetcher = EtherscanFetcher() if EtherscanFetcher else None
+        self.fetcher = EtherscanFetcher(redis_client=redis_client) if EtherscanFetcher else None
         
         # 缓存已处理的交易哈希
-        self.processed_txs = set()
+        self.processed_txs = Deduplicator('whale_txs', redis_client=redis_client)
         
         # 配置
         self.thresholds = WHALE_MONITOR_CONFIG.get('thresholds', {})
@@ -80,7 +92,7 @@ class WhaleMonitor:
     async def start(self):
         """启动监控"""
         self.running = True
-        self.session = aiohttp.ClientSession()
+        self.session = create_session()
         
         logger.info("=" * 50)
         logger.info("🐋 Whale Monitor 启动")
@@ -89,6 +101,15 @@ class WhaleMonitor:
         logger.info(f"大额转账阈值: ${self.thresholds.get('large_transfer', 50000):,}")
         logger.info(f"Etherscan API Key: {'已配置' if self.etherscan_key else '未配置'}")
         
+        # 首次启用增量聚合时从现有 Stream 回灌
+        if self.redis:
+            try:
+                if not whale_aggregates.has_aggregates(self.redis):
+                    count = whale_aggregates.rebuild_from_stream(self.redis, self.stream_key)
+                    logger.info(f"📊 回灌巨鲸聚合 {count} 条")
+            except Exception as e:
+                logger.warning(f"回灌巨鲸聚合失败: {e}")
+        
         # 首次启动时加载历史数据
         await self.load_historical_data()
         
@@ -210,45 +231,69 @@ class WhaleMonitor:
             if priority >= 3:
                 priority_groups.get(priority, priority_groups[3]).append(addr_info)
         
+        # 优先级3只检查部分
+        priority_groups[3] = priority_groups[3][:10]
+        
+        # 轮询间隔: 优先级 5/4/3 对应配置 priority_1/2/3
+        poll_intervals = WHALE_MONITOR_CONFIG.get('poll_intervals', {})
+        intervals = {
+            5: poll_intervals.get('priority_1', 30),
+            4: poll_intervals.get('priority_2', 60),
+            3: poll_intervals.get('priority_3', 120),
+        }
+        
         logger.info(f"📡 开始实时监控:")
         for p, addrs in priority_groups.items():
-            logger.info(f"  - 优先级 {p}: {len(addrs)} 个地址")
-            
+            logger.info(f"  - 优先级 {p}: {len(addrs)} 个地址 (每 {intervals[p]}s)")
+        
+        next_due = {p: 0.0 for p, addrs in priority_groups.items() if addrs}
+        if not next_due:
+            return
+        
         while self.running:
+            now = time.monotonic()
+            due = [p for p in next_due if next_due[p] <= now]
+            for p in due:
+                next_due[p] = now + intervals[p]
+            
             try:
-                # 轮询优先级5的地址（每30秒）
-                for addr_info in priority_groups.get(5, []):
-                    await self._check_address_activity(addr_info)
-                    await asyncio.sleep(0.5)
-                
-                await asyncio.sleep(30)
-                
-                # 轮询优先级4的地址（每60秒）
-                for addr_info in priority_groups.get(4, []):
-                    await self._check_address_activity(addr_info)
-                    await asyncio.sleep(0.5)
-                
-                await asyncio.sleep(30)
-                
-                # 轮询优先级3的地址（每120秒，只检查部分）
-                for addr_info in priority_groups.get(3, [])[:10]:
-                    await self._check_address_activity(addr_info)
-                    await asyncio.sleep(0.5)
-                    
+                await asyncio.gather(*(self._sweep_addresses(priority_groups[p]) for p in due))
             except Exception as e:
                 logger.error(f"轮询地址失败: {e}")
-                
-            await asyncio.sleep(60)
             
-    async def _check_address_activity(self, addr_info: dict):
-        """检查地址活动"""
+            await asyncio.sleep(max(min(next_due.values()) - time.monotonic(), 1.0))
+    
+    async def _sweep_addresses(self, group: List[dict]):
+        """
+        扫描一组地址
+        
+        先用 balancemulti 批量查余额（20 个地址一次请求），只对余额变化的地址拉 txlist；
+        代币转账不影响 ETH 余额，仍逐地址按游标增量拉取。所有请求并发，由 fetcher 令牌桶限速。
+        """
+        changed = await self.fetcher.get_balance_changes([a['address'] for a in group])
+        await asyncio.gather(*(
+            self._check_address_activity(addr_info, check_eth=addr_info['address'].lower() in changed)
+            for addr_info in group
+        ))
+            
+    async def _check_address_activity(self, addr_info: dict, check_eth: bool = True):
+        """检查地址活动（增量：只返回游标区块之后的交易）"""
         address = addr_info.get('address', '')
         if not address:
             return
             
         try:
-            # 获取最新交易
-            txs = await self.fetcher.get_address_transactions(address, offset=5)
+            recent = datetime.now(timezone.utc) - timedelta(minutes=5)
+            
+            # 获取最新交易（余额未变化时跳过）
+            if check_eth:
+                txs, token_txs = await asyncio.gather(
+                    self.fetcher.get_new_transactions(address, offset=5),
+                    self.fetcher.get_new_token_transfers(address, offset=5),
+                )
+            else:
+                txs = []
+                token_txs = await self.fetcher.get_new_token_transfers(address, offset=5)
             
             for tx in txs or []:
                 tx_hash = tx.get('hash', '')
@@ -258,14 +303,11 @@ class WhaleMonitor:
                 # 检查是否是最近5分钟的交易
                 tx_timestamp = int(tx.get('timeStamp', 0))
                 tx_time = datetime.fromtimestamp(tx_timestamp, tz=timezone.utc)
-                if tx_time < datetime.now(timezone.utc) - timedelta(minutes=5):
+                if tx_time < recent:
                     continue
                 
                 await self._process_new_transaction(tx, addr_info)
             
-            # 获取最新代币转账
-            token_txs = await self.fetcher.get_token_transfers(address, offset=5)
-            
             for tx in token_txs or []:
                 tx_hash = tx.get('hash', '')
                 if tx_hash in self.processed_txs:
@@ -273,7 +315,7 @@ class WhaleMonitor:
                     
                 tx_timestamp = int(tx.get('timeStamp', 0))
                 tx_time = datetime.fromtimestamp(tx_timestamp, tz=timezone.utc)
-                if tx_time < datetime.now(timezone.utc) - timedelta(minutes=5):
+                if tx_time < recent:
                     continue
                     
                 await self._process_new_token_transfer(tx, addr_info)
@@ -286,10 +328,6 @@ class WhaleMonitor:
         tx_hash = tx.get('hash', '')
         self.processed_txs.add(tx_hash)
         
-        # 限制缓存大小
-        if len(self.processed_txs) > 10000:
-            self.processed_txs = set(list(self.processed_txs)[-5000:])
-        
         value_eth = int(tx.get('value', 0)) / 1e18
         min_eth = self.thresholds.get('eth_min', 10)
         if value_eth < min_eth:
@@ -437,6 +475,13 @@ class WhaleMonitor:
             )
         except Exception as e:
             logger.error(f"推送事件失败: {e}")
+            return
+        
+        # Stream 有长度上限，累计统计单独维护
+        try:
+            whale_aggregates.record_event(self.redis, event)
+        except Exception as e:
+            logger.error(f"更新巨鲸聚合失败: {e}")
             
     async def _push_event(self, event: dict):
         """推送事件到 Redis (旧格式，保持兼容)"""
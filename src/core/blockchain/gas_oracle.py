@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Gas 预言机 - 基于新区块订阅的 EIP-1559 Gas 建议
+================================================
+功能:
+- 通过 WebSocketPool 订阅 newHeads
+- 每个新区块拉取一次 eth_feeHistory，环形缓冲保存最近 N 个区块
+- 内存中直接返回 slow/standard/fast 三档建议（无 RPC 调用）
+- 可选：将最新建议写入 Redis (gas:oracle:{chain}) 供 Dashboard 读取
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, List, Optional, Any, Deque, Tuple
+from dataclasses import dataclass
+
+from .websocket_client import WebSocketPool, WebSocketClient, WebSocketConfig
+
+logger = logging.getLogger(__name__)
+
+
+# 各链 WebSocket 环境变量（与 UniswapV3Monitor 保持一致）
+GAS_WS_ENV = {
+    'ethereum': ('ETHEREUM_WS_URL', 'ETH_WS_URL'),
+    'bsc': ('BSC_WS_URL',),
+    'base': ('BASE_WS_URL',),
+    'arbitrum': ('ARBITRUM_WS_URL',),
+}
+
+# feeHistory 奖励百分位 -> 速度档位
+REWARD_PERCENTILES = [10, 50, 90]
+SPEED_INDEX = {'slow': 0, 'standard': 1, 'fast': 2}
+
+# maxFeePerGas = next_base_fee * 倍数 + priority（可承受连续 6 个满块）
+BASE_FEE_MULTIPLIER = 2
+
+# EIP-1559 参数
+ELASTICITY_MULTIPLIER = 2
+BASE_FEE_CHANGE_DENOMINATOR = 8
+
+GWEI = 10 ** 9
+
+
+@dataclass
+class GasSuggestion:
+    """EIP-1559 Gas 建议"""
+    chain: str
+    speed: str
+    block_number: int
+    base_fee: int               # wei，下一个区块的 baseFee
+    max_priority_fee: int       # wei
+    max_fee: int                # wei
+    updated_at: float           # unix 秒
+
+    @property
+    def gas_price(self) -> int:
+        """Legacy gasPrice（baseFee + priority）"""
+        return self.base_fee + self.max_priority_fee
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.updated_at
+
+    def tx_fields(self) -> Dict[str, int]:
+        """交易构建用的 EIP-1559 字段"""
+        return {
+            'maxFeePerGas': self.max_fee,
+            'maxPriorityFeePerGas': self.max_priority_fee,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'chain': self.chain,
+            'speed': self.speed,
+            'block_number': self.block_number,
+            'base_fee_gwei': round(self.base_fee / GWEI, 4),
+            'max_priority_fee_gwei': round(self.max_priority_fee / GWEI, 4),
+            'max_fee_gwei': round(self.max_fee / GWEI, 4),
+            'updated_at': self.updated_at,
+        }
+
+
+def next_base_fee(base_fee: int, gas_used: int, gas_limit: int) -> int:
+    """按 EIP-1559 公式计算下一区块 baseFee"""
+    if gas_limit <= 0:
+        return base_fee
+
+    target = gas_limit // ELASTICITY_MULTIPLIER
+    if target == 0 or gas_used == target:
+        return base_fee
+
+    if gas_used > target:
+        delta = max(base_fee * (gas_used - target) // target // BASE_FEE_CHANGE_DENOMINATOR, 1)
+        return base_fee + delta
+
+    delta = base_fee * (target - gas_used) // target // BASE_FEE_CHANGE_DENOMINATOR
+    return max(base_fee - delta, 0)
+
+
+def _hex_to_int(value: Any) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, int):
+        return value
+    return int(value, 16)
+
+
+class GasOracle:
+    """单链 Gas 预言机"""
+
+    def __init__(
+        self,
+        chain: str,
+        ws_url: Optional[str] = None,
+        block_window: int = 20,
+        redis_client=None,
+    ):
+        """
+        Args:
+            chain: 链名称
+            ws_url: WebSocket 节点地址（默认从环境变量读取）
+            block_window: 环形缓冲保存的区块数
+            redis_client: 可选，用于发布最新建议给 Dashboard
+        """
+        self.chain = chain
+        self.ws_url = ws_url or self._get_ws_url(chain)
+        self.block_window = block_window
+        self.redis = redis_client
+
+        self.client: Optional[WebSocketClient] = None
+
+        # 环形缓冲: (block_number, base_fee, (p10, p50, p90))
+        self._samples: Deque[Tuple[int, int, Tuple[int, ...]]] = deque(maxlen=block_window)
+        self._next_base_fee = 0
+        self._head_number = 0
+        self._suggestions: Dict[str, GasSuggestion] = {}
+
+        # JSON-RPC 请求
+        self._request_id = 0
+        self._pending: Dict[int, str] = {}
+
+        self.stats = {
+            'heads': 0,
+            'fee_history': 0,
+            'errors': 0,
+        }
+
+    @staticmethod
+    def _get_ws_url(chain: str) -> str:
+        for env in GAS_WS_ENV.get(chain, ()):
+            url = os.getenv(env)
+            if url:
+                return url
+        return ''
+
+    @property
+    def is_configured(self) -> bool:
+        return bool(self.ws_url) and '{API_KEY}' not in self.ws_url
+
+    # ==================== 连接 ====================
+
+    def attach(self, pool: WebSocketPool) -> WebSocketClient:
+        """注册到连接池"""
+        config = WebSocketConfig(
+            url=self.ws_url,
+            chain=self.chain,
+            name=f'gas_{self.chain}',
+            # 只关心最新区块头，积压时合并
+            overflow='coalesce',
+        )
+        self.client = pool.add_client(config)
+        self.client.register_handler('eth_subscription', self._handle_head)
+        self.client.register_handler('rpc_response', self._handle_response)
+        # 重连后订阅由客户端重放，断线期间的区块需要重新回填
+        self.client.on_reconnect(self._backfill)
+        return self.client
+
+    async def subscribe(self) -> bool:
+        """
+        订阅 newHeads 并回填最近区块
+
+        未连接时订阅仍会被客户端记录，连接建立后重放并通过重连回调回填
+        """
+        if not self.client:
+            return False
+
+        ok = await self.client.subscribe({
+            'jsonrpc': '2.0',
+            'id': self._next_id('subscribe'),
+            'method': 'eth_subscribe',
+            'params': ['newHeads'],
+        })
+        if ok:
+            await self._backfill()
+        return ok
+
+    async def _backfill(self):
+        """回填最近 block_window 个区块的 feeHistory"""
+        await self._request_fee_history(self.block_window, 'latest')
+
+    def _next_id(self, kind: str) -> int:
+        # 断线期间丢失的响应不会回来，防止无限增长
+        if len(self._pending) > 256:
+            self._pending.clear()
+        self._request_id += 1
+        self._pending[self._request_id] = kind
+        return self._request_id
+
+    async def _request_fee_history(self, block_count: int, newest_block: str):
+        await self.client.send({
+            'jsonrpc': '2.0',
+            'id': self._next_id('fee_history'),
+            'method': 'eth_feeHistory',
+            'params': [hex(block_count), newest_block, REWARD_PERCENTILES],
+        })
+
+    # ==================== 消息处理 ====================
+
+    async def _handle_head(self, data: dict):
+        """newHeads 推送"""
+        header = data.get('params', {}).get('result') or {}
+        if 'number' not in header:
+            return
+
+        number = _hex_to_int(header['number'])
+        if number <= self._head_number:
+            return
+        self._head_number = number
+        self.stats['heads'] += 1
+
+        # 先用区块头推算 baseFee，feeHistory 返回后再校正
+        base_fee = _hex_to_int(header.get('baseFeePerGas'))
+        self._next_base_fee = next_base_fee(
+            base_fee,
+            _hex_to_int(header.get('gasUsed')),
+            _hex_to_int(header.get('gasLimit')),
+        )
+        self._rebuild()
+
+        await self._request_fee_history(1, header['number'])
+
+    async def _handle_response(self, data: dict):
+        """JSON-RPC 响应"""
+        kind = self._pending.pop(data.get('id'), None)
+        if kind is None:
+            return
+
+        if 'error' in data:
+            self.stats['errors'] += 1
+            logger.warning(f"[Gas] {self.chain} {kind} 失败: {data['error']}")
+            return
+
+        if kind == 'fee_history':
+            self._apply_fee_history(data.get('result') or {})
+
+    def _apply_fee_history(self, result: dict):
+        """写入环形缓冲"""
+        oldest = _hex_to_int(result.get('oldestBlock'))
+        base_fees = [_hex_to_int(v) for v in result.get('baseFeePerGas', [])]
+        rewards = result.get('reward') or []
+
+        for i, reward in enumerate(rewards):
+            number = oldest + i
+            if self._samples and number <= self._samples[-1][0]:
+                continue
+            self._samples.append((
+                number,
+                base_fees[i] if i < len(base_fees) else 0,
+                tuple(_hex_to_int(r) for r in reward),
+            ))
+
+        # baseFeePerGas 比 reward 多一项：下一个区块的 baseFee
+        if base_fees and len(base_fees) > len(rewards):
+            newest = oldest + len(rewards) - 1
+            if newest >= self._head_number:
+                self._head_number = newest
+                self._next_base_fee = base_fees[-1]
+
+        self.stats['fee_history'] += 1
+        self._rebuild()
+
+    def _rebuild(self):
+        """重算三档建议（每个区块一次）"""
+        if not self._samples and not self._next_base_fee:
+            return
+
+        now = time.time()
+        for speed, idx in SPEED_INDEX.items():
+            values = sorted(s[2][idx] for s in self._samples if len(s[2]) > idx)
+            priority = values[len(values) // 2] if values else 0
+            self._suggestions[speed] = GasSuggestion(
+                chain=self.chain,
+                speed=speed,
+                block_number=self._head_number,
+                base_fee=self._next_base_fee,
+                max_priority_fee=priority,
+                max_fee=self._next_base_fee * BASE_FEE_MULTIPLIER + priority,
+                updated_at=now,
+            )
+
+        self._publish()
+
+    def _publish(self):
+        """发布到 Redis（Dashboard 读取）"""
+        if not self.redis:
+            return
+
+        try:
+            mapping = {'block_number': str(self._head_number), 'updated_at': str(int(time.time()))}
+            for speed, s in self._suggestions.items():
+                mapping[f'{speed}_priority_gwei'] = str(round(s.max_priority_fee / GWEI, 4))
+                mapping[f'{speed}_max_fee_gwei'] = str(round(s.max_fee / GWEI, 4))
+            mapping['base_fee_gwei'] = str(round(self._next_base_fee / GWEI, 4))
+
+            key = f'gas:oracle:{self.chain}'
+            self.redis.hset(key, mapping=mapping)
+            self.redis.expire(key, 120)
+        except Exception as e:
+            logger.debug(f"[Gas] 发布失败: {e}")
+
+    # ==================== 查询 ====================
+
+    def suggest(self, speed: str = 'standard', max_age: float = 60.0) -> Optional[GasSuggestion]:
+        """
+        获取 Gas 建议（纯内存读取）
+
+        Args:
+            speed: slow / standard / fast
+            max_age: 超过该秒数视为过期，返回 None（调用方回退到 RPC）
+        """
+        suggestion = self._suggestions.get(speed)
+        if suggestion is None or time.time() - suggestion.updated_at > max_age:
+            return None
+        return suggestion
+
+    @property
+    def status(self) -> dict:
+        return {
+            'chain': self.chain,
+            'head': self._head_number,
+            'samples': len(self._samples),
+            'next_base_fee_gwei': round(self._next_base_fee / GWEI, 4),
+            'suggestions': {k: v.to_dict() for k, v in self._suggestions.items()},
+            'stats': self.stats,
+        }
+
+
+# ==================== 全局实例 ====================
+
+_oracles: Dict[str, GasOracle] = {}
+_pool: Optional[WebSocketPool] = None
+
+
+def get_gas_oracle(chain: str) -> Optional[GasOracle]:
+    """获取已启动的 Gas 预言机（未启动返回 None）"""
+    return _oracles.get(chain)
+
+
+async def start_gas_oracles(
+    chains: List[str],
+    pool: Optional[WebSocketPool] = None,
+    redis_client=None,
+    block_window: int = 20,
+) -> Dict[str, GasOracle]:
+    """
+    启动多链 Gas 预言机（幂等）
+
+    Args:
+        chains: 链列表
+        pool: 复用已有连接池；为空则创建进程内共享池
+        redis_client: 可选，发布建议到 Redis
+        block_window: 环形缓冲区块数
+
+    Returns:
+        已启动的预言机
+    """
+    global _pool
+
+    pool = pool or _pool or WebSocketPool()
+    started = []
+
+    for chain in chains:
+        if chain in _oracles:
+            continue
+        oracle = GasOracle(chain, block_window=block_window, redis_client=redis_client)
+        if not oracle.is_configured:
+            logger.info(f"[Gas] {chain} 未配置 WebSocket，跳过")
+            continue
+        oracle.attach(pool)
+        _oracles[chain] = oracle
+        started.append(oracle)
+
+    if not started:
+        return dict(_oracles)
+
+    for oracle in started:
+        # 连接失败也要订阅：记录下来，listen() 重连成功后重放并回填
+        await oracle.client.connect()
+        await oracle.subscribe()
+
+    # 新客户端单独监听，不影响池内已有任务
+    for oracle in started:
+        pool.listen_client(oracle.client.config.name)
+
+    _pool = pool
+    logger.info(f"[Gas] 预言机已启动: {[o.chain for o in started]}")
+    return dict(_oracles)
@@ -3,15 +3,17 @@
 WebSocket 连接池 - 管理多链 WebSocket 连接
 ============================================
 功能:
-- 自动重连机制
+- 自动重连机制（重连后自动重放 subscribe() 记录的订阅，再调用 on_reconnect 回调）
 - 多链并发管理
-- 事件分发处理
+- 事件分发处理：读取循环只负责解码入队，handler 在 worker 任务中执行，
+  慢 handler 不会阻塞 socket 读取；队列满时按策略丢弃或合并
 """
 
+import time
 import asyncio
 import json
 import logging
-from typing import Dict, Callable, Optional, Any
+from typing import Dict, Callable, Optional, Any, List, Hashable
 from dataclasses import dataclass, field
 from datetime import datetime
 
@@ -37,6 +39,12 @@ class WebSocketConfig:
     ping_interval: int = 20
     ping_timeout: int = 10
     name: str = ""
+    # 分发队列
+    queue_size: int = 5000
+    workers: int = 1                    # >1 时不同消息的处理顺序不再保证
+    overflow: str = 'drop_oldest'       # drop_oldest / drop_newest / coalesce / block
+    # coalesce 策略的合并键（返回 None 表示不可合并），默认按订阅 ID 合并
+    coalesce_key: Optional[Callable[[dict], Optional[Hashable]]] = None
     
     def __post_init__(self):
         if not self.name:
@@ -58,6 +66,26 @@ class WebSocketClient:
         self.is_running = False
         self._last_message_time: Optional[datetime] = None
         
+        # 订阅记录（重连后重放）
+        self._subscriptions: List[dict] = []
+        # 重连并重放订阅后的回调（如补拉断线期间的数据）
+        self._reconnect_callbacks: List[Callable] = []
+        
+        # 分发队列: 元素为 [合并键, 数据, 接收时间]，合并时原地替换数据
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: Dict[Hashable, list] = {}
+        self._workers: List[asyncio.Task] = []
+        
+        self.dispatch_stats = {
+            'received': 0,
+            'handled': 0,
+            'dropped': 0,
+            'coalesced': 0,
+            'lag_ms_last': 0.0,
+            'lag_ms_avg': 0.0,
+            'lag_ms_max': 0.0,
+        }
+        
     async def connect(self) -> bool:
         """建立连接"""
         try:
@@ -88,12 +116,27 @@ class WebSocketClient:
         logger.info(f"[WS] {self.config.name} 将在 {wait_time}s 后重连 (第 {self.reconnect_count} 次)")
         
         await asyncio.sleep(wait_time)
-        return await self.connect()
+        if not await self.connect():
+            return False
+        await self._replay_subscriptions()
+        for callback in self._reconnect_callbacks:
+            try:
+                await callback()
+            except Exception as e:
+                logger.error(f"[WS] 重连回调错误: {self.config.name} - {e}")
+        return True
+    
+    def on_reconnect(self, callback: Callable):
+        """注册重连回调（async，无参数），每次重连并重放订阅后调用"""
+        self._reconnect_callbacks.append(callback)
     
     async def subscribe(self, subscription: dict) -> bool:
-        """订阅事件"""
+        """订阅事件（记录下来，重连后自动重放）"""
+        if subscription not in self._subscriptions:
+            self._subscriptions.append(subscription)
+        
         if not self.is_connected or not self.ws:
-            logger.warning(f"[WS] {self.config.name} 未连接，无法订阅")
+            logger.warning(f"[WS] {self.config.name} 未连接，重连后订阅")
             return False
         
         try:
@@ -104,50 +147,163 @@ class WebSocketClient:
             logger.error(f"[WS] 订阅失败: {e}")
             return False
     
+    async def _replay_subscriptions(self):
+        """重放订阅（服务端订阅 ID 会变化，handler 不应依赖旧 ID）"""
+        for subscription in self._subscriptions:
+            try:
+                await self.ws.send(json.dumps(subscription))
+            except Exception as e:
+                logger.error(f"[WS] 重放订阅失败: {self.config.name} - {e}")
+                return
+        if self._subscriptions:
+            logger.info(f"[WS] {self.config.name} 已重放 {len(self._subscriptions)} 个订阅")
+    
+    async def send(self, payload: dict) -> bool:
+        """发送 JSON-RPC 请求（不记录为订阅）"""
+        if not self.is_connected or not self.ws:
+            return False
+        
+        try:
+            await self.ws.send(json.dumps(payload))
+            return True
+        except Exception as e:
+            logger.debug(f"[WS] 发送失败: {self.config.name} - {e}")
+            return False
+    
     async def listen(self):
-        """监听消息"""
+        """监听消息（读取循环只解码入队，handler 由 worker 执行）"""
         self.is_running = True
+        self._start_workers()
         
-        while self.is_running:
-            try:
-                if not self.is_connected:
-                    if not await self.reconnect():
-                        break
-                    continue
-                
-                async for message in self.ws:
-                    self._last_message_time = datetime.utcnow()
-                    
-                    try:
-                        data = json.loads(message)
-                    except json.JSONDecodeError:
-                        logger.warning(f"[WS] 无法解析消息: {message[:100]}")
+        try:
+            while self.is_running:
+                try:
+                    if not self.is_connected:
+                        if not await self.reconnect():
+                            break
                         continue
                     
-                    # 分发到对应的 handler
-                    event_type = self._get_event_type(data)
-                    
-                    if event_type in self.handlers:
+                    async for message in self.ws:
+                        self._last_message_time = datetime.utcnow()
+                        received_at = time.monotonic()
+                        
                         try:
-                            await self.handlers[event_type](data)
-                        except Exception as e:
-                            logger.error(f"[WS] Handler 错误: {event_type} - {e}")
+                            data = json.loads(message)
+                        except json.JSONDecodeError:
+                            logger.warning(f"[WS] 无法解析消息: {message[:100]}")
+                            continue
+                        
+                        await self._enqueue(data, received_at)
+                        
+                except ConnectionClosed as e:
+                    logger.warning(f"[WS] 连接关闭: {self.config.name} - {e}")
+                    self.is_connected = False
                     
-                    # 通用 handler
-                    if '*' in self.handlers:
-                        try:
-                            await self.handlers['*'](data)
-                        except Exception as e:
-                            logger.error(f"[WS] 通用 Handler 错误: {e}")
-                    
-            except ConnectionClosed as e:
-                logger.warning(f"[WS] 连接关闭: {self.config.name} - {e}")
-                self.is_connected = False
-                
+                except Exception as e:
+                    logger.error(f"[WS] 监听错误: {self.config.name} - {e}")
+                    self.is_connected = False
+                    await asyncio.sleep(1)
+        finally:
+            self._stop_workers()
+    
+    # ==================== 分发队列 ====================
+    
+    def _start_workers(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.config.queue_size)
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < max(self.config.workers, 1):
+            self._workers.append(asyncio.create_task(self._worker()))
+    
+    def _stop_workers(self):
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+    
+    def _coalesce_key(self, data: dict) -> Optional[Hashable]:
+        if self.config.coalesce_key:
+            return self.config.coalesce_key(data)
+        # 默认：同一订阅的推送只保留最新一条（如 newHeads）
+        if data.get('method') == 'eth_subscription':
+            return data.get('params', {}).get('subscription')
+        return None
+    
+    async def _enqueue(self, data: dict, received_at: float):
+        """按溢出策略入队"""
+        self.dispatch_stats['received'] += 1
+        policy = self.config.overflow
+        
+        key = self._coalesce_key(data) if policy == 'coalesce' else None
+        if key is not None:
+            item = self._pending.get(key)
+            if item is not None:
+                # 队列中还有同键的未处理消息，直接替换为最新数据
+                item[1] = data
+                item[2] = received_at
+                self.dispatch_stats['coalesced'] += 1
+                return
+        
+        item = [key, data, received_at]
+        
+        if self._queue.full():
+            if policy == 'block':
+                await self._queue.put(item)
+                self._track(item)
+                return
+            if policy == 'drop_newest':
+                self.dispatch_stats['dropped'] += 1
+                return
+            # drop_oldest / coalesce（不可合并时）
+            oldest = self._queue.get_nowait()
+            self._queue.task_done()
+            self._untrack(oldest)
+            self.dispatch_stats['dropped'] += 1
+            if self.dispatch_stats['dropped'] % 1000 == 1:
+                logger.warning(f"[WS] {self.config.name} 分发队列已满，累计丢弃 {self.dispatch_stats['dropped']} 条")
+        
+        self._queue.put_nowait(item)
+        self._track(item)
+    
+    def _track(self, item: list):
+        if item[0] is not None:
+            self._pending[item[0]] = item
+    
+    def _untrack(self, item: list):
+        if item[0] is not None and self._pending.get(item[0]) is item:
+            del self._pending[item[0]]
+    
+    async def _worker(self):
+        stats = self.dispatch_stats
+        while True:
+            item = await self._queue.get()
+            self._untrack(item)
+            try:
+                await self._dispatch(item[1])
+            finally:
+                self._queue.task_done()
+            
+            lag = (time.monotonic() - item[2]) * 1000
+            stats['handled'] += 1
+            stats['lag_ms_last'] = lag
+            stats['lag_ms_avg'] = stats['lag_ms_avg'] * 0.95 + lag * 0.05
+            stats['lag_ms_max'] = max(stats['lag_ms_max'], lag)
+    
+    async def _dispatch(self, data: dict):
+        """分发到对应的 handler"""
+        event_type = self._get_event_type(data)
+        
+        if event_type in self.handlers:
+            try:
+                await self.handlers[event_type](data)
+            except Exception as e:
+                logger.error(f"[WS] Handler 错误: {event_type} - {e}")
+        
+        # 通用 handler
+        if '*' in self.handlers:
+            try:
+                await self.handlers['*'](data)
             except Exception as e:
-                logger.error(f"[WS] 监听错误: {self.config.name} - {e}")
-                self.is_connected = False
-                await asyncio.sleep(1)
+                logger.error(f"[WS] 通用 Handler 错误: {e}")
     
     def register_handler(self, event_type: str, handler: Callable):
         """注册事件处理器"""
@@ -165,11 +321,14 @@ class WebSocketClient:
             return data['type']
         elif 'e' in data:  # Binance 格式
             return data['e']
+        elif 'id' in data and ('result' in data or 'error' in data):  # JSON-RPC 响应
+            return 'rpc_response'
         return 'unknown'
     
     async def close(self):
         """关闭连接"""
         self.is_running = False
+        self._stop_workers()
         if self.ws:
             await self.ws.close()
         self.is_connected = False
@@ -183,7 +342,11 @@ class WebSocketClient:
             'chain': self.config.chain,
             'connected': self.is_connected,
             'reconnect_count': self.reconnect_count,
-            'last_message': self._last_message_time.isoformat() if self._last_message_time else None
+            'last_message': self._last_message_time.isoformat() if self._last_message_time else None,
+            'subscriptions': len(self._subscriptions),
+            'queue_depth': self._queue.qsize() if self._queue else 0,
+            'overflow': self.config.overflow,
+            **{k: round(v, 2) if isinstance(v, float) else v for k, v in self.dispatch_stats.items()},
         }
 
 
@@ -217,6 +380,16 @@ class WebSocketPool:
         
         await asyncio.gather(*self._tasks.values(), return_exceptions=True)
     
+    def listen_client(self, name: str) -> Optional[asyncio.Task]:
+        """单独启动某个客户端的监听（用于 listen_all 之后追加的客户端）"""
+        client = self.clients.get(name)
+        if not client:
+            return None
+        
+        task = asyncio.create_task(client.listen())
+        self._tasks[name] = task
+        return task
+    
     def get_client(self, name: str) -> Optional[WebSocketClient]:
         """获取客户端"""
         return self.clients.get(name)
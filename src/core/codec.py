@@ -0,0 +1,221 @@
+"""
+Stream 消息编解码
+
+两种格式共存，消费者按消息里的标记字段识别，不需要和生产者约定:
+- legacy: 每个字段一个字符串，dict/list 字段是 JSON 字符串（push_event 旧行为）
+- mp1:    两个字段 {_enc: 'mp1', _body: <msgpack>}，嵌套字段为原生 map/array，
+          不再有 JSON 字符串套 JSON；顶层标量仍为字符串，字段语义与 legacy 一致
+
+生产者按 STREAM_CODEC 配置选择格式（未安装 msgspec/msgpack 时固定 legacy）。
+二进制信封无法用 decode_responses=True 的连接读取，读取统一走 binary_client()
+再用 decode_event / decode_response 解码。
+
+用法:
+    >>> fields = encode_event('events:fused', event)           # XADD 的字段
+    >>> client = binary_client(redis)                           # decode_responses=False
+    >>> for stream, entries in decode_response(client.xread({'events:fused': '0'})):
+    ...     for msg_id, event in entries:
+    ...         detail = field_json(event.get('score_detail'), {})
+"""
+
+import json
+import os
+import sys
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+# msgspec 优先（更快），其次 msgpack，两者输出同一种 msgpack 格式
+try:
+    import msgspec
+    _encoder = msgspec.msgpack.Encoder(enc_hook=str)
+    _decoder = msgspec.msgpack.Decoder()
+    _pack = _encoder.encode
+    _unpack = _decoder.decode
+    HAS_MSGPACK = True
+except ImportError:
+    try:
+        import msgpack
+
+        def _pack(obj: Any) -> bytes:
+            return msgpack.packb(obj, use_bin_type=True, default=str)
+
+        def _unpack(data: bytes) -> Any:
+            return msgpack.unpackb(data, raw=False)
+
+        HAS_MSGPACK = True
+    except ImportError:
+        HAS_MSGPACK = False
+
+# 读取编码配置
+try:
+    sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'config'))
+    from optimization_config import STREAM_CODEC
+except ImportError:
+    STREAM_CODEC = {}
+
+CODEC_FIELD = '_enc'
+BODY_FIELD = '_body'
+CODEC_MSGPACK_V1 = 'mp1'
+
+FORMAT_LEGACY = 'legacy'
+FORMAT_MSGPACK = 'msgpack'
+
+_CODEC_FIELD_B = CODEC_FIELD.encode()
+_BODY_FIELD_B = BODY_FIELD.encode()
+
+Fields = Dict[str, Any]
+
+
+def _configured_format() -> str:
+    fmt = os.environ.get('STREAM_CODEC') or STREAM_CODEC.get('format', FORMAT_LEGACY)
+    if fmt == FORMAT_MSGPACK and not HAS_MSGPACK:
+        logger.warning("STREAM_CODEC=msgpack 但未安装 msgspec/msgpack，使用 legacy 格式")
+        return FORMAT_LEGACY
+    return fmt
+
+
+_format = _configured_format()
+_stream_patterns = tuple(STREAM_CODEC.get('streams', ('events:raw', 'events:fused', 'events:route:*')))
+_envelope_streams: Dict[str, bool] = {}
+
+
+def set_format(fmt: str):
+    """切换生产者写入格式（测试/基准用）"""
+    global _format
+    if fmt == FORMAT_MSGPACK and not HAS_MSGPACK:
+        raise RuntimeError("未安装 msgspec/msgpack")
+    _format = fmt
+    _envelope_streams.clear()
+
+
+def envelope_enabled(stream_key: str) -> bool:
+    """该 Stream 是否写入二进制信封"""
+    enabled = _envelope_streams.get(stream_key)
+    if enabled is None:
+        enabled = _envelope_streams[stream_key] = _format == FORMAT_MSGPACK and any(
+            fnmatchcase(stream_key, pattern) for pattern in _stream_patterns
+        )
+    return enabled
+
+
+# ==================== 编码 ====================
+
+def legacy_fields(event: Fields) -> Dict[str, str]:
+    """legacy 格式：全部字段转字符串，dict/list 转 JSON"""
+    fields = {}
+    for key, value in event.items():
+        if isinstance(value, str):
+            fields[key] = value
+        elif isinstance(value, (dict, list)):
+            fields[key] = json.dumps(value, ensure_ascii=False)
+        elif value is None:
+            fields[key] = ''
+        else:
+            fields[key] = str(value)
+    return fields
+
+
+def envelope_body(event: Fields) -> Fields:
+    """信封内容：顶层标量转字符串（与 legacy 一致），dict/list 保持原生"""
+    body = {}
+    for key, value in event.items():
+        if isinstance(value, (str, dict, list)):
+            body[key] = value
+        elif value is None:
+            body[key] = ''
+        else:
+            body[key] = str(value)
+    return body
+
+
+def pack_envelope(body: Fields) -> Dict[str, Any]:
+    return {CODEC_FIELD: CODEC_MSGPACK_V1, BODY_FIELD: _pack(body)}
+
+
+def encode_event(stream_key: str, event: Fields) -> Dict[str, Any]:
+    """按 Stream 的配置编码为 XADD 字段"""
+    if envelope_enabled(stream_key):
+        return pack_envelope(envelope_body(event))
+    return legacy_fields(event)
+
+
+# ==================== 解码 ====================
+
+def _text(value) -> str:
+    return value.decode('utf-8', 'replace') if isinstance(value, bytes) else value
+
+
+def decode_event(fields: Optional[Dict], legacy: bool = False) -> Fields:
+    """
+    解码一条消息的字段（bytes 或 str 均可）
+
+    Args:
+        legacy: True 时把信封里的 dict/list 转回 JSON 字符串，
+                供只认识 legacy 字段的下游（归档、仪表盘）使用
+    """
+    if not fields:
+        return {}
+    codec = fields.get(_CODEC_FIELD_B) or fields.get(CODEC_FIELD)
+    if codec is None:
+        return {_text(k): _text(v) for k, v in fields.items()}
+
+    codec = _text(codec)
+    body = fields.get(_BODY_FIELD_B) or fields.get(BODY_FIELD)
+    if codec != CODEC_MSGPACK_V1 or not HAS_MSGPACK or not isinstance(body, bytes):
+        logger.warning(f"无法解码消息: codec={codec}, msgpack={HAS_MSGPACK}")
+        return {}
+    try:
+        event = _unpack(body)
+    except Exception as e:
+        logger.warning(f"信封解码失败: {e}")
+        return {}
+    return legacy_fields(event) if legacy else event
+
+
+def decode_entries(entries, legacy: bool = False) -> List[Tuple[str, Fields]]:
+    """解码 XRANGE / XREVRANGE 结果"""
+    return [(_text(msg_id), decode_event(fields, legacy)) for msg_id, fields in entries or []]
+
+
+def decode_response(response, legacy: bool = False) -> List[Tuple[str, List[Tuple[str, Fields]]]]:
+    """解码 XREAD / XREADGROUP 结果"""
+    return [(_text(stream), decode_entries(entries, legacy)) for stream, entries in response or []]
+
+
+def field_json(value, default=None):
+    """读取嵌套字段：信封里是原生 dict/list，legacy 里是 JSON 字符串"""
+    if isinstance(value, (dict, list)):
+        return value
+    if not value:
+        return default
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return default
+
+
+# ==================== 连接 ====================
+
+def binary_client(client):
+    """
+    返回与 client 同一 Redis 的 decode_responses=False 连接
+
+    RedisClient 直接返回其缓存的 binary；redis.Redis / fakeredis 按连接池参数新建
+    （调用方应缓存结果）
+    """
+    binary = getattr(type(client), 'binary', None)
+    if binary is not None:
+        return client.binary
+    import redis
+
+    pool = client.connection_pool
+    if not pool.connection_kwargs.get('decode_responses'):
+        return client
+    kwargs = dict(pool.connection_kwargs, decode_responses=False)
+    kwargs.pop('maint_notifications_pool_handler', None)
+    return redis.Redis(connection_pool=pool.__class__(connection_class=pool.connection_class, **kwargs))
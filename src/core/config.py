@@ -385,3 +385,24 @@ def get_redis_config() -> Dict[str, Any]:
         'password': cfg.REDIS_PASSWORD,
         'db': cfg.REDIS_DB,
     }
+
+
+def get_postgres_dsn() -> str:
+    """
+    获取 PostgreSQL 连接串
+    
+    优先使用 DATABASE_URL，否则由 POSTGRES_* 拼接
+    
+    Returns:
+        postgresql:// 连接串
+    """
+    from urllib.parse import quote
+    
+    dsn = os.getenv('DATABASE_URL')
+    if dsn:
+        return dsn
+    cfg = get_config()
+    auth = quote(cfg.POSTGRES_USER, safe='')
+    if cfg.POSTGRES_PASSWORD:
+        auth += ':' + quote(cfg.POSTGRES_PASSWORD, safe='')
+    return f'postgresql://{auth}@{cfg.POSTGRES_HOST}:{cfg.POSTGRES_PORT}/{cfg.POSTGRES_DB}'
@@ -0,0 +1,286 @@
+"""
+事件去重（Bloom 过滤器）
+
+- 本地: 按时间分桶的 Bloom 过滤器环，窗口内见过的键视为重复，过期桶整体清空
+- 共享（可选）: Redis 位图上的轮转 Bloom 过滤器，多个进程共用同一份去重状态；
+  SETBIT / GETBIT 在一个 MULTI 管道里完成，SETBIT 返回旧值，"检查并加入"是原子的
+
+Bloom 过滤器只会误判"已见过"（概率 fp_rate），不会漏判。窗口按桶轮转，键在
+window_seconds × (buckets - 1) / buckets 到 window_seconds 之间过期。
+
+每个使用方一个名字，参数见 DEDUP_CONFIG['filters'][name]:
+    >>> dedup = Deduplicator('fusion_turbo', redis_client=redis, clock=clock)
+    >>> if dedup.seen(event_hash):      # 检查并加入
+    ...     return
+    >>> tx_hash in dedup                # 只检查
+    >>> dedup.add(tx_hash)              # 只加入
+"""
+
+import hashlib
+import math
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+# 读取去重配置
+try:
+    sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'config'))
+    from optimization_config import DEDUP_CONFIG
+except ImportError:
+    DEDUP_CONFIG = {}
+
+DEFAULT_WINDOW = 3600
+DEFAULT_CAPACITY = 10000
+DEFAULT_FP_RATE = 0.001
+DEFAULT_BUCKETS = 4
+REDIS_KEY_PREFIX = 'dedup:'
+
+
+def bloom_size(capacity: int, fp_rate: float) -> Tuple[int, int]:
+    """按容量和误判率计算 (位数 m, 哈希数 k)"""
+    capacity = max(int(capacity), 1)
+    fp_rate = min(max(fp_rate, 1e-9), 0.5)
+    m = math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)
+    k = max(1, round(m / capacity * math.log(2)))
+    return m, k
+
+
+def bloom_positions(key: str, m: int, k: int) -> List[int]:
+    """双重哈希得到 k 个位位置（跨进程稳定）"""
+    digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], 'little')
+    h2 = int.from_bytes(digest[8:], 'little') | 1
+    return [(h1 + i * h2) % m for i in range(k)]
+
+
+class BloomFilter:
+    """定长位数组 Bloom 过滤器"""
+
+    __slots__ = ('m', 'k', 'bits', 'count')
+
+    def __init__(self, m: int, k: int):
+        self.m = m
+        self.k = k
+        self.bits = bytearray((m + 7) // 8)
+        self.count = 0
+
+    def contains_positions(self, positions: List[int]) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def add_positions(self, positions: List[int]):
+        bits = self.bits
+        for p in positions:
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def clear(self):
+        self.bits = bytearray(len(self.bits))
+        self.count = 0
+
+
+class TimeBucketedBloom:
+    """本地按时间分桶的 Bloom 过滤器环"""
+
+    def __init__(self, window_seconds: float, capacity: int, fp_rate: float,
+                 buckets: int = DEFAULT_BUCKETS, clock: Optional[Callable[[], float]] = None):
+        """
+        Args:
+            window_seconds: 去重窗口
+            capacity: 一个窗口内预计的键数量（每个桶按此容量分配）
+            fp_rate: 整个环的误判率（每桶按 fp_rate / buckets 分配）
+            buckets: 桶数，越多过期越平滑
+        """
+        self.buckets = max(int(buckets), 2)
+        self.bucket_seconds = window_seconds / self.buckets
+        self.clock = clock or time.time
+        self.m, self.k = bloom_size(capacity, fp_rate / self.buckets)
+        self._filters = [BloomFilter(self.m, self.k) for _ in range(self.buckets)]
+        self._epoch = None
+
+    def positions(self, key: str) -> List[int]:
+        return bloom_positions(key, self.m, self.k)
+
+    def _rotate(self) -> int:
+        """按当前时间清空过期桶，返回当前桶编号"""
+        epoch = int(self.clock() // self.bucket_seconds)
+        if self._epoch is None:
+            self._epoch = epoch
+        elif epoch > self._epoch:
+            for e in range(max(self._epoch + 1, epoch - self.buckets + 1), epoch + 1):
+                self._filters[e % self.buckets].clear()
+            self._epoch = epoch
+        return self._epoch
+
+    def contains(self, key: str, positions: Optional[List[int]] = None) -> bool:
+        self._rotate()
+        positions = positions or self.positions(key)
+        return any(f.contains_positions(positions) for f in self._filters)
+
+    def add(self, key: str, positions: Optional[List[int]] = None):
+        epoch = self._rotate()
+        self._filters[epoch % self.buckets].add_positions(positions or self.positions(key))
+
+    def seen(self, key: str) -> bool:
+        """检查并加入"""
+        positions = self.positions(key)
+        if self.contains(key, positions):
+            return True
+        self.add(key, positions)
+        return False
+
+
+class RedisBloom:
+    """
+    Redis 位图上的轮转 Bloom 过滤器（多进程共享）
+
+    Redis:
+        dedup:<名字>:<桶编号>  String 位图，过期时间为窗口 + 一个桶
+    """
+
+    def __init__(self, redis_client, name: str, window_seconds: float, capacity: int,
+                 fp_rate: float, buckets: int = DEFAULT_BUCKETS,
+                 clock: Optional[Callable[[], float]] = None):
+        self.redis = redis_client
+        self.prefix = f"{DEDUP_CONFIG.get('redis_prefix', REDIS_KEY_PREFIX)}{name}:"
+        self.buckets = max(int(buckets), 2)
+        self.bucket_seconds = window_seconds / self.buckets
+        self.ttl = int(math.ceil(window_seconds + self.bucket_seconds))
+        self.clock = clock or time.time
+        self.m, self.k = bloom_size(capacity, fp_rate / self.buckets)
+
+    def positions(self, key: str) -> List[int]:
+        return bloom_positions(key, self.m, self.k)
+
+    def _keys(self) -> List[str]:
+        """当前桶在前，之后依次为更早的桶"""
+        epoch = int(self.clock() // self.bucket_seconds)
+        return [f'{self.prefix}{epoch - i}' for i in range(self.buckets)]
+
+    def _getbits(self, pipe, keys: List[str], positions: List[int]):
+        for key in keys:
+            for p in positions:
+                pipe.getbit(key, p)
+
+    @staticmethod
+    def _any_full(bits: List[int], k: int) -> bool:
+        return any(all(bits[i:i + k]) for i in range(0, len(bits), k))
+
+    def contains(self, key: str, positions: Optional[List[int]] = None) -> bool:
+        positions = positions or self.positions(key)
+        pipe = self.redis.pipeline(transaction=False)
+        self._getbits(pipe, self._keys(), positions)
+        return self._any_full(pipe.execute(), self.k)
+
+    def add(self, key: str, positions: Optional[List[int]] = None):
+        positions = positions or self.positions(key)
+        current = self._keys()[0]
+        pipe = self.redis.pipeline(transaction=False)
+        for p in positions:
+            pipe.setbit(current, p, 1)
+        pipe.expire(current, self.ttl)
+        pipe.execute()
+
+    def seen(self, key: str, positions: Optional[List[int]] = None) -> bool:
+        """原子地检查并加入（SETBIT 返回旧值）"""
+        positions = positions or self.positions(key)
+        current, *older = self._keys()
+        pipe = self.redis.pipeline(transaction=True)
+        for p in positions:
+            pipe.setbit(current, p, 1)
+        self._getbits(pipe, older, positions)
+        pipe.expire(current, self.ttl)
+        results = pipe.execute()[:-1]
+        return self._any_full(results, self.k)
+
+
+class Deduplicator:
+    """
+    去重器：本地分桶 Bloom + 可选 Redis 共享 Bloom
+
+    共享模式下本地命中直接返回（本进程见过），未命中再查 Redis 并写入；
+    Redis 出错时退化为本地结果。本地与共享过滤器参数相同，位位置只算一次。
+    不支持 pipeline 的客户端（如回放的输出捕获器）只使用本地过滤器
+    """
+
+    def __init__(
+        self,
+        name: str,
+        redis_client=None,
+        clock: Optional[Callable[[], float]] = None,
+        window_seconds: Optional[float] = None,
+        capacity: Optional[int] = None,
+        fp_rate: Optional[float] = None,
+        shared: Optional[bool] = None,
+    ):
+        """
+        Args:
+            name: 使用方名字（配置键、Redis 键名的一部分）
+            redis_client: 共享模式使用的 Redis 客户端，None 时只用本地过滤器
+            clock: 返回 Unix 秒的时钟，回放时注入事件时间
+            其余参数默认取 DEDUP_CONFIG['filters'][name]，再取 DEDUP_CONFIG 顶层默认值
+        """
+        cfg = {**DEDUP_CONFIG, **DEDUP_CONFIG.get('filters', {}).get(name, {})}
+        self.name = name
+        window = window_seconds if window_seconds is not None else cfg.get('window_seconds', DEFAULT_WINDOW)
+        capacity = capacity or cfg.get('capacity', DEFAULT_CAPACITY)
+        fp_rate = fp_rate or cfg.get('fp_rate', DEFAULT_FP_RATE)
+        buckets = cfg.get('buckets', DEFAULT_BUCKETS)
+        shared = cfg.get('shared', False) if shared is None else shared
+
+        self.local = TimeBucketedBloom(window, capacity, fp_rate, buckets, clock)
+        self.shared = None
+        if shared and hasattr(redis_client, 'pipeline'):
+            self.shared = RedisBloom(redis_client, name, window, capacity, fp_rate, buckets, clock)
+        self.stats = {'checked': 0, 'duplicates': 0, 'shared_hits': 0, 'shared_errors': 0}
+
+    def __contains__(self, key: str) -> bool:
+        positions = self.local.positions(key)
+        if self.local.contains(key, positions):
+            return True
+        if self.shared is None:
+            return False
+        try:
+            found = self.shared.contains(key, positions)
+        except Exception as e:
+            self.stats['shared_errors'] += 1
+            logger.debug(f"共享去重查询失败 {self.name}: {e}")
+            return False
+        if found:
+            self.stats['shared_hits'] += 1
+            self.local.add(key, positions)
+        return found
+
+    def add(self, key: str):
+        positions = self.local.positions(key)
+        self.local.add(key, positions)
+        if self.shared is None:
+            return
+        try:
+            self.shared.add(key, positions)
+        except Exception as e:
+            self.stats['shared_errors'] += 1
+            logger.debug(f"共享去重写入失败 {self.name}: {e}")
+
+    def seen(self, key: str) -> bool:
+        """检查并加入，返回是否重复"""
+        self.stats['checked'] += 1
+        positions = self.local.positions(key)
+        duplicate = self.local.contains(key, positions)
+        if not duplicate and self.shared is not None:
+            try:
+                duplicate = self.shared.seen(key, positions)
+                if duplicate:
+                    self.stats['shared_hits'] += 1
+            except Exception as e:
+                self.stats['shared_errors'] += 1
+                logger.debug(f"共享去重失败 {self.name}: {e}")
+        if duplicate:
+            self.stats['duplicates'] += 1
+        self.local.add(key, positions)
+        return duplicate
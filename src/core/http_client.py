@@ -0,0 +1,502 @@
+"""
+统一 HTTP 客户端注册表
+
+特性:
+- 每个进程（事件循环）共享一个调优过的 TCPConnector（DNS 缓存、keep-alive）
+- 按主机的令牌桶限流，额度来自 config/optimization_config.py 的 HTTP_RATE_LIMITS
+- 通过 aiohttp TraceConfig 挂钩，调用方保留原有 `async with session.get(...)` 写法
+- 识别 429/418 与 Retry-After，整个主机退避，而不是调用方盲等 60 秒
+- 等价主机池（api1-4.binance.com 等）：按延迟选主机，超过 p90 未返回时对冲补发
+
+用法:
+    >>> session = create_session(timeout=aiohttp.ClientTimeout(total=10))
+    >>> async with session.get(url) as resp:
+    ...     data = await resp.json()
+    >>> await session.close()   # 只关闭会话，共享连接池保留
+"""
+
+import sys
+import time
+import random
+import asyncio
+import weakref
+from collections import deque
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from .logging import get_logger
+from .metrics import HTTP_SECONDS
+
+logger = get_logger(__name__)
+
+# 读取限流配置
+try:
+    sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'config'))
+    from optimization_config import HTTP_RATE_LIMITS, HTTP_ENDPOINT_WEIGHTS
+except ImportError:
+    HTTP_RATE_LIMITS = {'default': {'rate': 10, 'burst': 20}}
+    HTTP_ENDPOINT_WEIGHTS = {}
+
+try:
+    from optimization_config import HTTP_ENDPOINT_POOLS, HTTP_HEDGE_CONFIG
+except ImportError:
+    HTTP_ENDPOINT_POOLS = {}
+    HTTP_HEDGE_CONFIG = {}
+
+# 备用主机 -> 主主机（共用限流桶和接口权重）
+HOST_ALIASES = {
+    alias: primary
+    for primary, aliases in HTTP_ENDPOINT_POOLS.items()
+    for alias in aliases
+}
+
+# 限流状态码
+THROTTLE_STATUSES = (429, 418)
+
+# 无 Retry-After 时的指数退避
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 120.0
+
+
+class TokenBucket:
+    """
+    令牌桶（无锁）
+
+    asyncio 单线程下，检查与扣减之间没有 await，
+    令牌允许为负数（欠账），并发请求按到达顺序排队。
+    """
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', 'blocked_until')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = max(rate, 0.001)
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, weight: float = 1.0) -> float:
+        """预留令牌，返回需要等待的秒数"""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= weight
+
+        wait = 0.0
+        if self.tokens < 0:
+            wait = -self.tokens / self.rate
+        if self.blocked_until > now:
+            wait = max(wait, self.blocked_until - now)
+        return wait
+
+    async def acquire(self, weight: float = 1.0) -> float:
+        """获取令牌（必要时等待），返回实际等待秒数"""
+        wait = self.reserve(weight)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def block(self, seconds: float) -> None:
+        """暂停整个桶（收到 429 时）"""
+        now = time.monotonic()
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class HostRateLimiter:
+    """按主机的限流器"""
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Dict[str, float]]] = None,
+        weights: Optional[Dict[str, int]] = None,
+    ):
+        self.limits = limits if limits is not None else HTTP_RATE_LIMITS
+        self.weights = weights if weights is not None else HTTP_ENDPOINT_WEIGHTS
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._failures: Dict[str, int] = {}
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def bucket(self, host: str) -> TokenBucket:
+        host = HOST_ALIASES.get(host, host)
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            cfg = self.limits.get(host) or self.limits.get('default', {'rate': 10, 'burst': 20})
+            bucket = TokenBucket(cfg['rate'], cfg['burst'])
+            self._buckets[host] = bucket
+            self.stats[host] = {'requests': 0, 'throttled': 0, 'waited_ms': 0.0}
+        return bucket
+
+    def weight_for(self, host: str, path: str) -> float:
+        """按主机+路径前缀匹配接口权重"""
+        key = f"{HOST_ALIASES.get(host, host)}{path}"
+        for prefix, weight in self.weights.items():
+            if key.startswith(prefix):
+                return weight
+        return 1.0
+
+    async def acquire(self, host: str, path: str = '', weight: Optional[float] = None) -> float:
+        host = HOST_ALIASES.get(host, host)
+        bucket = self.bucket(host)
+        waited = await bucket.acquire(weight if weight is not None else self.weight_for(host, path))
+        stats = self.stats[host]
+        stats['requests'] += 1
+        if waited:
+            stats['waited_ms'] += waited * 1000
+        return waited
+
+    def on_response(self, host: str, status: int, headers) -> Optional[float]:
+        """
+        处理响应状态
+
+        Returns:
+            触发限流时的退避秒数，否则 None
+        """
+        host = HOST_ALIASES.get(host, host)
+        if status not in THROTTLE_STATUSES:
+            if host in self._failures:
+                del self._failures[host]
+            return None
+
+        failures = self._failures.get(host, 0) + 1
+        self._failures[host] = failures
+
+        delay = parse_retry_after(headers.get('Retry-After')) if headers else None
+        if delay is None:
+            delay = min(BACKOFF_BASE ** failures, BACKOFF_MAX) * (0.8 + random.random() * 0.4)
+
+        self.bucket(host).block(delay)
+        self.stats[host]['throttled'] += 1
+        logger.warning(f"[HTTP] {host} 限流 ({status})，暂停 {delay:.1f}s")
+        return delay
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        return {host: dict(s) for host, s in self.stats.items()}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After（秒数或 HTTP 日期）"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+# ==================== 全局实例 ====================
+
+_limiter = HostRateLimiter()
+_connectors: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.TCPConnector]' = weakref.WeakKeyDictionary()
+
+
+def get_rate_limiter() -> HostRateLimiter:
+    """获取进程级限流器"""
+    return _limiter
+
+
+async def _on_request_start(session, ctx, params) -> None:
+    request_ctx = ctx.trace_request_ctx or {}
+    url = params.url
+    await _limiter.acquire(url.host or '', url.path, request_ctx.get('weight'))
+    # 限流等待之后再计时，指标只反映网络与对端耗时
+    ctx.started = time.perf_counter()
+
+
+async def _on_request_end(session, ctx, params) -> None:
+    status = params.response.status
+    _limiter.on_response(params.url.host or '', status, params.response.headers)
+    started = getattr(ctx, 'started', None)
+    if started is not None:
+        HTTP_SECONDS.observe(time.perf_counter() - started, host=params.url.host or '', status=f'{status // 100}xx')
+
+
+async def _on_request_exception(session, ctx, params) -> None:
+    started = getattr(ctx, 'started', None)
+    if started is not None:
+        HTTP_SECONDS.observe(time.perf_counter() - started, host=params.url.host or '', status='error')
+
+
+def _build_trace_config() -> aiohttp.TraceConfig:
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(_on_request_start)
+    trace.on_request_end.append(_on_request_end)
+    trace.on_request_exception.append(_on_request_exception)
+    return trace
+
+
+def get_connector() -> aiohttp.TCPConnector:
+    """获取当前事件循环共享的 TCPConnector（需在协程内调用）"""
+    loop = asyncio.get_running_loop()
+    connector = _connectors.get(loop)
+    if connector is None or connector.closed:
+        connector = aiohttp.TCPConnector(
+            limit=100,
+            limit_per_host=20,
+            ttl_dns_cache=300,
+            use_dns_cache=True,
+            keepalive_timeout=60,
+            enable_cleanup_closed=True,
+        )
+        _connectors[loop] = connector
+    return connector
+
+
+def create_session(**kwargs: Any) -> aiohttp.ClientSession:
+    """
+    创建挂在共享连接池上的 ClientSession
+
+    参数同 aiohttp.ClientSession（connector 除外）。
+    会话很轻，可以按模块/按任务创建；关闭会话不会关闭共享连接池。
+    """
+    kwargs.pop('connector', None)
+    trace_configs = list(kwargs.pop('trace_configs', None) or [])
+    trace_configs.append(_build_trace_config())
+    return aiohttp.ClientSession(
+        connector=get_connector(),
+        connector_owner=False,
+        trace_configs=trace_configs,
+        **kwargs,
+    )
+
+
+async def fetch_json(
+    session: aiohttp.ClientSession,
+    url: str,
+    method: str = 'GET',
+    max_retries: int = 2,
+    max_wait: float = 30.0,
+    **kwargs: Any,
+) -> Tuple[int, Any]:
+    """
+    请求 JSON（限流时按 Retry-After 自动重试）
+
+    Args:
+        session: create_session() 创建的会话
+        url: 请求地址
+        method: HTTP 方法
+        max_retries: 限流后的最大重试次数
+        max_wait: 单次退避超过该秒数时不再重试，直接返回状态码
+        **kwargs: 透传给 session.request
+
+    Returns:
+        (状态码, JSON 数据或 None)
+    """
+    host = urlsplit(url).hostname or ''
+    status = 0
+    for attempt in range(max_retries + 1):
+        async with session.request(method, url, **kwargs) as resp:
+            status = resp.status
+            if status == 200:
+                return status, await resp.json(content_type=None)
+            if status not in THROTTLE_STATUSES:
+                return status, None
+
+        # 退避时长已由 trace 钩子写入主机令牌桶，下一次 acquire 自动等待
+        remaining = _limiter.bucket(host).blocked_until - time.monotonic()
+        if attempt >= max_retries or remaining > max_wait:
+            break
+    return status, None
+
+
+# ==================== 多端点对冲 ====================
+
+class EndpointPool:
+    """
+    等价主机池
+
+    记录每个主机最近的请求延迟，按 p50 排序选主机；
+    主请求超过主机 p90 仍未返回时，向次快主机补发一次（对冲请求）。
+    """
+
+    def __init__(self, hosts: List[str], config: Optional[Dict[str, float]] = None):
+        self.hosts = list(hosts)
+        cfg = {**HTTP_HEDGE_CONFIG, **(config or {})}
+        self.default_delay = cfg.get('default_delay', 1.0)
+        self.min_delay = cfg.get('min_delay', 0.05)
+        self.min_samples = int(cfg.get('min_samples', 5))
+        self.stale_after = cfg.get('stale_after', 300)
+        window = int(cfg.get('sample_window', 64))
+
+        self._latency: Dict[str, Deque[float]] = {h: deque(maxlen=window) for h in self.hosts}
+        self._last_sample: Dict[str, float] = {h: 0.0 for h in self.hosts}
+        self._failures: Dict[str, int] = {h: 0 for h in self.hosts}
+        self.stats = {'requests': 0, 'hedged': 0, 'hedge_wins': 0, 'failovers': 0}
+
+    def _percentile(self, host: str, pct: float, min_samples: Optional[int] = None) -> Optional[float]:
+        samples = self._latency[host]
+        if not samples or len(samples) < (self.min_samples if min_samples is None else min_samples):
+            return None
+        ordered = sorted(samples)
+        return ordered[min(int(len(ordered) * pct), len(ordered) - 1)]
+
+    def _rank(self, host: str, now: float) -> Tuple[int, float]:
+        # 过期或样本不足的主机排在已知慢主机之前，保证定期重新探测
+        p50 = self._percentile(host, 0.5, min_samples=1)
+        if p50 is None or now - self._last_sample[host] > self.stale_after:
+            p50 = 0.0
+        return self._failures[host], p50
+
+    def ordered_hosts(self) -> List[str]:
+        """按（连续失败数, p50 延迟）排序的主机列表"""
+        now = time.monotonic()
+        return sorted(self.hosts, key=lambda h: self._rank(h, now))
+
+    def hedge_delay(self, host: str) -> float:
+        """主请求等待多久后补发对冲请求"""
+        p90 = self._percentile(host, 0.9)
+        if p90 is None:
+            return self.default_delay
+        return max(p90, self.min_delay)
+
+    def record(self, host: str, latency: float, ok: bool) -> None:
+        if ok:
+            self._latency[host].append(latency)
+            self._last_sample[host] = time.monotonic()
+            self._failures[host] = 0
+        else:
+            self._failures[host] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'hosts': {
+                h: {
+                    'p50_ms': round((self._percentile(h, 0.5) or 0) * 1000, 1),
+                    'p90_ms': round((self._percentile(h, 0.9) or 0) * 1000, 1),
+                    'samples': len(self._latency[h]),
+                    'failures': self._failures[h],
+                }
+                for h in self.hosts
+            },
+        }
+
+
+_endpoint_pools: Dict[str, EndpointPool] = {}
+
+
+def get_endpoint_pool(host: str) -> Optional[EndpointPool]:
+    """按主机（主主机或备用主机）获取主机池，未配置返回 None"""
+    primary = HOST_ALIASES.get(host, host)
+    pool = _endpoint_pools.get(primary)
+    if pool is None and primary in HTTP_ENDPOINT_POOLS:
+        pool = EndpointPool([primary] + list(HTTP_ENDPOINT_POOLS[primary]))
+        _endpoint_pools[primary] = pool
+    return pool
+
+
+def get_endpoint_stats() -> Dict[str, Dict[str, Any]]:
+    return {primary: pool.get_stats() for primary, pool in _endpoint_pools.items()}
+
+
+async def _timed_fetch(
+    pool: EndpointPool,
+    session: aiohttp.ClientSession,
+    url: str,
+    host: str,
+    method: str,
+    kwargs: Dict[str, Any],
+) -> Tuple[int, Any]:
+    start = time.monotonic()
+    try:
+        status, data = await fetch_json(session, url, method, max_retries=0, **kwargs)
+    except asyncio.CancelledError:
+        # 被对冲请求抢先：已耗时是该主机延迟的下界，记为样本，避免慢主机一直排在前面
+        pool.record(host, time.monotonic() - start, True)
+        raise
+    except Exception:
+        pool.record(host, 0.0, False)
+        raise
+    pool.record(host, time.monotonic() - start, status == 200)
+    return status, data
+
+
+async def hedged_fetch_json(
+    session: aiohttp.ClientSession,
+    url: str,
+    method: str = 'GET',
+    **kwargs: Any,
+) -> Tuple[int, Any]:
+    """
+    在等价主机池上请求 JSON（对冲请求）
+
+    主机未配置主机池时等同于 fetch_json。否则先发往最快主机，
+    超过该主机 p90 延迟仍未返回（或已失败）时向次快主机补发一次，取先成功的结果。
+
+    Returns:
+        (状态码, JSON 数据或 None)；两个请求都异常时抛出最后一个异常
+    """
+    parts = urlsplit(url)
+    pool = get_endpoint_pool(parts.hostname or '')
+    if pool is None:
+        return await fetch_json(session, url, method, **kwargs)
+
+    pool.stats['requests'] += 1
+    hosts = pool.ordered_hosts()[:2]
+
+    def launch(host: str) -> asyncio.Task:
+        netloc = host if parts.port is None else f"{host}:{parts.port}"
+        target = parts._replace(netloc=netloc).geturl()
+        return asyncio.create_task(_timed_fetch(pool, session, target, host, method, kwargs))
+
+    primary = launch(hosts[0])
+    tasks = {primary}
+    done, _ = await asyncio.wait(tasks, timeout=pool.hedge_delay(hosts[0]))
+    if done:
+        first = None if primary.exception() else primary.result()
+        if (first is not None and first[0] == 200) or len(hosts) < 2:
+            return primary.result()
+        pool.stats['failovers'] += 1
+        tasks = set()
+    else:
+        pool.stats['hedged'] += 1
+
+    if len(hosts) > 1:
+        tasks.add(launch(hosts[1]))
+
+    result: Optional[Tuple[int, Any]] = None
+    error: Optional[BaseException] = None
+    try:
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    result = task.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if result[0] == 200:
+                    if task is not primary:
+                        pool.stats['hedge_wins'] += 1
+                    return result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if result is not None:
+        return result
+    raise error
+
+
+async def close_connector() -> None:
+    """关闭当前事件循环的共享连接池（进程退出时调用）"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    connector = _connectors.pop(loop, None)
+    if connector is not None and not connector.closed:
+        await connector.close()
@@ -6,12 +6,31 @@
 - 支持环境变量控制日志级别
 - 避免重复初始化
 - 兼容现有日志文件路径
+- 非阻塞输出：调用方只入队，格式化和写 stdout/文件在后台线程（QueueListener）
+- 按调用位置限流：同一行代码在窗口内超过配额的日志被丢弃，下一条放行时附带抑制条数；
+  默认只限 INFO 及以下，WARNING 需显式开启（LOG_RATE_MAX_LEVEL=WARNING）
+- 丢弃计数（队列满 / 限流）通过 discard_counts() 读取，core.metrics 导出为 crypto_log_discarded
+- 可选 JSON 结构化输出
+
+环境变量:
+    LOG_LEVEL           日志级别（默认 INFO）
+    LOG_ASYNC           1/0，是否启用队列输出（默认 1）
+    LOG_FORMAT          text / json（默认 text）
+    LOG_RATE_LIMIT      每个调用位置每个窗口最多输出条数，0 表示不限流（默认 20）
+    LOG_RATE_INTERVAL   限流窗口秒数（默认 10）
+    LOG_RATE_MAX_LEVEL  参与限流的最高级别（默认 INFO；ERROR 及以上始终不限流）
+    LOG_QUEUE_SIZE      队列容量，满时直接丢弃并计数（默认 10000）
 """
 
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
 import sys
 import os
-from typing import Optional
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
 
 
 # 默认配置
@@ -23,6 +42,166 @@ DEFAULT_LEVEL = 'INFO'
 _initialized_loggers: set = set()
 _root_configured = False
 
+# 后台输出线程（进程退出时停止并排空队列）
+_listeners: List[logging.handlers.QueueListener] = []
+
+# 已创建的队列 Handler / 限流器，汇总丢弃计数用
+_queue_handlers: List['NonBlockingQueueHandler'] = []
+_rate_limiters: List['CallSiteRateLimiter'] = []
+
+# LogRecord 自带属性，JSON 输出时其余属性视为 extra 字段
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+class JsonFormatter(logging.Formatter):
+    """一行一个 JSON 对象，extra 传入的字段原样输出"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class CallSiteRateLimiter(logging.Filter):
+    """
+    按调用位置（文件 + 行号）的固定窗口限流
+
+    只限 max_level（默认 INFO）及以下，告警和错误不抽样。被抑制的条数附加在该位置
+    下一个窗口的第一条日志上；该位置之后再无日志时，只计入 suppressed 总数。
+    """
+
+    def __init__(self, rate: int, interval: float, max_level: int = logging.INFO):
+        super().__init__()
+        self.rate = rate
+        self.interval = interval
+        self.max_level = min(max_level, logging.WARNING)
+        self.suppressed = 0
+        # (文件, 行号) -> [窗口开始时间, 窗口内已输出, 窗口内已抑制]
+        self._sites: Dict[Tuple[str, int], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        key = (record.pathname, record.lineno)
+        site = self._sites.get(key)
+        if site is None or record.created - site[0] >= self.interval:
+            suppressed = site[2] if site else 0
+            self._sites[key] = [record.created, 1, 0]
+            if suppressed:
+                record.msg = f"{record.getMessage()} [此处 {self.interval:g}s 内抑制了 {suppressed} 条]"
+                record.args = None
+            return True
+        if site[1] < self.rate:
+            site[1] += 1
+            return True
+        site[2] += 1
+        self.suppressed += 1
+        return False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    只做入队的 Handler
+
+    与标准 QueueHandler 不同，prepare 只合并 msg % args，不在调用线程里格式化；
+    队列满时直接丢弃并计数，不阻塞、不打印异常。
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # args 可能是之后会被修改的可变对象，入队前合并
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def discard_counts() -> Dict[str, int]:
+    """进程内被丢弃的日志条数：queue_full（队列满）/ rate_limited（限流抑制）"""
+    return {
+        'queue_full': sum(h.dropped for h in _queue_handlers),
+        'rate_limited': sum(f.suppressed for f in _rate_limiters),
+    }
+
+
+def _make_rate_limiter(rate: int) -> CallSiteRateLimiter:
+    max_level = os.environ.get('LOG_RATE_MAX_LEVEL', 'INFO').upper()
+    limiter = CallSiteRateLimiter(
+        rate, _env_int('LOG_RATE_INTERVAL', 10), getattr(logging, max_level, logging.INFO)
+    )
+    _rate_limiters.append(limiter)
+    return limiter
+
+
+def _make_formatter() -> logging.Formatter:
+    if os.environ.get('LOG_FORMAT', 'text').lower() == 'json':
+        return JsonFormatter()
+    return logging.Formatter(fmt=DEFAULT_FORMAT, datefmt=DEFAULT_DATEFMT)
+
+
+def _wrap_handler(target: logging.Handler) -> logging.Handler:
+    """
+    包装最终输出的 Handler：挂格式化器和限流器，异步模式下改为队列 + 后台线程
+
+    返回应挂到 logger 上的 Handler
+    """
+    target.setFormatter(_make_formatter())
+    rate = _env_int('LOG_RATE_LIMIT', 20)
+    if os.environ.get('LOG_ASYNC', '1') == '0':
+        if rate > 0:
+            target.addFilter(_make_rate_limiter(rate))
+        return target
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=_env_int('LOG_QUEUE_SIZE', 10000)))
+    handler.setLevel(target.level)
+    _queue_handlers.append(handler)
+    if rate > 0:
+        # 在入队前限流，被丢弃的日志连入队开销都没有
+        handler.addFilter(_make_rate_limiter(rate))
+    listener = logging.handlers.QueueListener(handler.queue, target, respect_handler_level=True)
+    listener.start()
+    if not _listeners:
+        atexit.register(shutdown_logging)
+    _listeners.append(listener)
+    return handler
+
+
+def shutdown_logging() -> None:
+    """停止后台输出线程（会先写完队列中的日志）"""
+    while _listeners:
+        listener = _listeners.pop()
+        try:
+            listener.stop()
+        except Exception:
+            pass
+
 
 def _configure_root_logger() -> None:
     """配置根 logger（只执行一次）"""
@@ -42,9 +221,7 @@ def _configure_root_logger() -> None:
     if not root_logger.handlers:
         handler = logging.StreamHandler(sys.stdout)
         handler.setLevel(logging.DEBUG)
-        formatter = logging.Formatter(fmt=DEFAULT_FORMAT, datefmt=DEFAULT_DATEFMT)
-        handler.setFormatter(formatter)
-        root_logger.addHandler(handler)
+        root_logger.addHandler(_wrap_handler(handler))
     
     _root_configured = True
 
@@ -92,13 +269,12 @@ def get_logger(
         logger.setLevel(getattr(logging, env_level, logging.INFO))
     
     # 如果需要写入文件
-    if log_file and not any(isinstance(h, logging.FileHandler) for h in logger.handlers):
+    if log_file and not getattr(logger, '_core_log_file', None):
         try:
             file_handler = logging.FileHandler(log_file, encoding='utf-8')
             file_handler.setLevel(logging.DEBUG)
-            formatter = logging.Formatter(fmt=DEFAULT_FORMAT, datefmt=DEFAULT_DATEFMT)
-            file_handler.setFormatter(formatter)
-            logger.addHandler(file_handler)
+            logger.addHandler(_wrap_handler(file_handler))
+            logger._core_log_file = log_file
         except Exception as e:
             # 文件写入失败不影响主流程
             logger.warning(f"无法创建日志文件 {log_file}: {e}")
@@ -0,0 +1,369 @@
+"""
+进程内 Prometheus 指标
+
+特性:
+- Counter / Gauge / Histogram（固定桶），按标签值元组存储，热路径只做字典加法
+- 不加锁：事件循环单线程写入，抓取线程读取时先复制快照（GIL 保证单次复制原子）
+- Gauge.set_function：抓取时再计算（队列深度等），热路径零开销
+- register_stats：把已有的 stats 字典原样导出，不用改每个计数点
+- 独立的守护线程 HTTP 服务 /metrics，同步/异步进程都能用；同一进程只启动一次
+
+用法:
+    >>> from core.metrics import EVENTS, start_metrics_server
+    >>> start_metrics_server('fusion_turbo')
+    >>> EVENTS.inc(service='fusion_turbo', source='binance_announcement')
+    >>> with SCORING_SECONDS.time(engine='turbo'):
+    ...     scorer.calculate_score(event)
+"""
+
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .logging import discard_counts, get_logger
+
+logger = get_logger(__name__)
+
+# 读取指标配置
+try:
+    sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'config'))
+    from optimization_config import METRICS_CONFIG
+except ImportError:
+    METRICS_CONFIG = {}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 默认延迟桶（秒）：覆盖 0.5ms 评分到 10s HTTP 超时
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+LabelKey = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}，收到 {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """只增计数器"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        return [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+            for key, value in list(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值，或在抓取时调用函数取值"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+        self._functions: Dict[LabelKey, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn: Callable[[], float], **labels: str) -> None:
+        """抓取时调用 fn 取值（fn 在抓取线程中执行，应只做只读操作）"""
+        self._functions[self._key(labels)] = fn
+
+    def get(self, **labels: str) -> float:
+        key = self._key(labels)
+        fn = self._functions.get(key)
+        return fn() if fn else self._values.get(key, 0)
+
+    def samples(self) -> List[str]:
+        values = dict(self._values)
+        for key, fn in list(self._functions.items()):
+            try:
+                values[key] = float(fn())
+            except Exception as e:
+                logger.debug(f"指标 {self.name} 取值失败: {e}")
+        return [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+            for key, value in values.items()
+        ]
+
+
+class _Timer:
+    __slots__ = ('_histogram', '_labels', '_start')
+
+    def __init__(self, histogram: 'Histogram', labels: Dict[str, str]):
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start, **self._labels)
+
+
+class Histogram(_Metric):
+    """固定桶直方图（桶计数不累加，输出时再求前缀和）"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签 -> [各桶次数..., +Inf 桶次数, sum]
+        self._values: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        counts = self._values.get(key)
+        if counts is None:
+            counts = self._values[key] = [0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def time(self, **labels: str) -> _Timer:
+        """计时上下文管理器"""
+        return _Timer(self, labels)
+
+    def count(self, **labels: str) -> int:
+        counts = self._values.get(self._key(labels))
+        return int(sum(counts[:-1])) if counts else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        bounds = [_format_value(float(b)) for b in self.buckets] + ['+Inf']
+        for key, counts in list(self._values.items()):
+            counts = list(counts)
+            cumulative = 0
+            for bound, n in zip(bounds, counts[:-1]):
+                cumulative += n
+                le = f'le="{bound}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {int(cumulative)}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(counts[-1])}')
+            lines.append(f'{self.name}_count{labels} {int(cumulative)}')
+        return lines
+
+
+class _StatsBridge:
+    """把现有 stats 字典的数值项导出为 untyped 指标"""
+
+    def __init__(self, prefix: str, stats: dict, labels: Dict[str, str]):
+        self.prefix = prefix
+        self.stats = stats
+        self.labels = labels
+
+    def samples(self) -> List[Tuple[str, str]]:
+        """(指标名, 样本行)；TYPE 行由注册表按指标名统一输出"""
+        label_str = _format_labels(self.labels.keys(), self.labels.values())
+        samples = []
+        for key, value in list(self.stats.items()):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f'{self.prefix}_{key}'
+            samples.append((name, f'{name}{label_str} {_format_value(value)}'))
+        return samples
+
+
+class MetricsRegistry:
+    """进程级指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._bridges: Dict[Tuple[str, tuple], _StatsBridge] = {}
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Iterable[str], **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+        elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+            raise ValueError(f"指标 {name} 已以不同类型或标签注册")
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def register_stats(self, prefix: str, stats: dict, **labels: str) -> None:
+        """导出 stats 字典（同一 prefix + 标签重复注册时替换为新的字典）"""
+        key = (prefix, tuple(sorted(labels.items())))
+        self._bridges[key] = _StatsBridge(prefix, stats, labels)
+
+    def render(self) -> str:
+        parts = [m.render() for m in list(self._metrics.values())]
+        # 多个服务可能用同一 prefix 注册（标签不同），同名指标只能有一个 TYPE 行且样本连续
+        families: Dict[str, List[str]] = {}
+        for bridge in list(self._bridges.values()):
+            for name, line in bridge.samples():
+                families.setdefault(name, []).append(line)
+        parts.extend(
+            '\n'.join([f'# TYPE {name} untyped', *lines]) for name, lines in families.items()
+        )
+        return '\n'.join(p for p in parts if p) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+register_stats = REGISTRY.register_stats
+render = REGISTRY.render
+
+
+# ==================== 公共热路径指标 ====================
+
+EVENTS = counter('crypto_events_total', '各服务处理的事件数（按来源）', ('service', 'source'))
+ERRORS = counter('crypto_errors_total', '各服务处理错误数', ('service',))
+SCORING_SECONDS = histogram('crypto_scoring_seconds', '事件评分耗时', ('engine',))
+QUEUE_DEPTH = gauge('crypto_queue_depth', '进程内队列深度', ('service', 'queue'))
+REDIS_RTT = histogram('crypto_redis_rtt_seconds', 'Redis 命令往返耗时', ('op',))
+HTTP_SECONDS = histogram('crypto_http_request_seconds', '出站 HTTP 请求耗时', ('host', 'status'))
+PUSH_SECONDS = histogram('crypto_push_seconds', '推送通道发送耗时', ('channel', 'result'))
+
+_START_TIME = gauge('crypto_process_start_time_seconds', '进程启动时间（Unix 秒）', ('service',))
+
+# 日志丢弃计数（单调递增，抓取时读取）
+LOG_DISCARDED = gauge('crypto_log_discarded', '被丢弃的日志条数（队列满 / 限流抑制）', ('reason',))
+for _reason in ('queue_full', 'rate_limited'):
+    LOG_DISCARDED.set_function(lambda reason=_reason: discard_counts()[reason], reason=_reason)
+
+
+# ==================== /metrics HTTP 服务 ====================
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def _resolve_port(service: str) -> Optional[int]:
+    env_port = os.environ.get('METRICS_PORT')
+    if env_port:
+        return int(env_port)
+    return METRICS_CONFIG.get('ports', {}).get(service, METRICS_CONFIG.get('default_port'))
+
+
+def start_metrics_server(service: str, port: Optional[int] = None,
+                         host: Optional[str] = None) -> Optional[ThreadingHTTPServer]:
+    """
+    启动 /metrics 守护线程（每个进程只启动一次，后续调用直接返回已有服务）
+
+    端口优先级: 参数 > 环境变量 METRICS_PORT > METRICS_CONFIG['ports'][service] > default_port
+    未启用或端口被占用时返回 None，不影响业务。
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        if not METRICS_CONFIG.get('enabled', True):
+            return None
+        port = port if port is not None else _resolve_port(service)
+        if port is None:
+            return None
+        host = host or METRICS_CONFIG.get('host', '0.0.0.0')
+        try:
+            server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+        except OSError as e:
+            logger.warning(f"指标服务启动失败 {host}:{port}: {e}")
+            return None
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+        _START_TIME.set(time.time(), service=service)
+        _server = server
+        logger.info(f"📈 指标服务: http://{host}:{server.server_address[1]}/metrics ({service})")
+        return server
+
+
+def stop_metrics_server() -> None:
+    global _server
+    with _server_lock:
+        if _server is not None:
+            _server.shutdown()
+            _server.server_close()
+            _server = None
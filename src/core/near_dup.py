@@ -0,0 +1,257 @@
+"""
+近似重复检测（SimHash + 分段 LSH）
+
+同一条上币消息会被几十个 Telegram 频道 / RSS 源改几个字转发，md5(raw_text[:100])
+认为每条都是新事件。这里对文本做 64 位 SimHash，在滑动时间窗口内按分段 LSH 查找
+汉明距离不超过 max_distance 的指纹：
+
+- 64 位分成 bands 段，每段一个桶索引；距离 < bands 的两个指纹至少有一段完全相同，
+  因此 max_distance < bands 时召回是精确的，只需比较同桶候选
+- 短消息改几个词的转发距离一般在 14 以内，不同内容的消息在 25 以上
+- anchor（如代币符号 + 合约地址）不同的文本永不匹配，避免 "list AAA" / "list BBB" 误判
+- anchor 还包含事件类别（下架 / 暂停 / 警示），"거래 지원 안내" 与 "거래 지원 종료 안내"
+  只差一两个词、距离在阈值内，但含义相反，不能当作转发丢弃
+- anchor 还包含文本中提到的交易所："Binance will list FOO" 与 "OKX will list FOO" 距离很小，
+  但第二家交易所上币是多所确认，不是转发
+- 每个簇记录已出现的来源；来自新来源的转发仍然放行（new_source=True），
+  下游多源加分的来源计数不受影响，同一来源的重复转发被丢弃
+
+用法:
+    >>> detector = NearDuplicateDetector()
+    >>> match = detector.check(text, source='tg_alpha_intel', anchor=make_anchor(['ABC'], text=text))
+    >>> if match and not match.new_source:
+    ...     return  # 同来源转发，丢弃
+"""
+
+import hashlib
+import re
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+# 读取配置
+try:
+    sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'config'))
+    from optimization_config import NEAR_DUP_CONFIG
+except ImportError:
+    NEAR_DUP_CONFIG = {}
+
+FINGERPRINT_BITS = 64
+
+# 英文/数字词，中日韩按单字切分（再组成二元组）
+_TOKEN_RE = re.compile(r'[a-z0-9$]+|[\u3040-\u30ff\u4e00-\u9fff\uac00-\ud7af]')
+_URL_RE = re.compile(r'https?://\S+')
+
+# 事件类别关键词（按顺序取第一个命中的类别；都不命中为上币/普通公告）
+EVENT_CLASSES = (
+    ('delist', re.compile(
+        r'delist|de-list|remov(?:e|al|ing)|terminat|end of (?:trading )?support|cease'
+        r'|종료|폐지|下架|下线|终止|上場廃止|取扱(?:い)?終了',
+        re.IGNORECASE,
+    )),
+    ('suspend', re.compile(r'suspen|halt|pause|중단|중지|暂停|停止', re.IGNORECASE)),
+    ('caution', re.compile(r'caution|유의|경고|警示|风险提示|注意喚起', re.IGNORECASE)),
+)
+
+# 交易所名称（含韩文 / 中文写法），归一为小写英文名；短名只排除相邻拉丁字母（\b 在中文旁不成立）
+EXCHANGE_NAMES = (
+    ('binance', re.compile(r'binance|币安|幣安', re.IGNORECASE)),
+    ('okx', re.compile(r'(?<![a-z])ok(?:e)?x(?![a-z])|欧易', re.IGNORECASE)),
+    ('bybit', re.compile(r'bybit', re.IGNORECASE)),
+    ('coinbase', re.compile(r'coinbase', re.IGNORECASE)),
+    ('kraken', re.compile(r'kraken', re.IGNORECASE)),
+    ('kucoin', re.compile(r'kucoin', re.IGNORECASE)),
+    ('gate', re.compile(r'gate\.io|gateio', re.IGNORECASE)),
+    ('bitget', re.compile(r'bitget', re.IGNORECASE)),
+    ('mexc', re.compile(r'mexc', re.IGNORECASE)),
+    ('htx', re.compile(r'(?<![a-z])htx(?![a-z])|huobi|火币', re.IGNORECASE)),
+    ('upbit', re.compile(r'upbit|업비트', re.IGNORECASE)),
+    ('bithumb', re.compile(r'bithumb|빗썸', re.IGNORECASE)),
+    ('coinone', re.compile(r'coinone|코인원', re.IGNORECASE)),
+    ('korbit', re.compile(r'korbit|코빗', re.IGNORECASE)),
+    ('gopax', re.compile(r'gopax|고팍스', re.IGNORECASE)),
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """小写、去掉链接后切词"""
+    return _TOKEN_RE.findall(_URL_RE.sub(' ', text.lower()))
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'big')
+
+
+def simhash64(tokens: List[str]) -> int:
+    """64 位 SimHash（特征: 去重后的单词 + 相邻二元组，权重相同）"""
+    features = set(tokens)
+    features.update(f'{a} {b}' for a, b in zip(tokens, tokens[1:]))
+    if not features:
+        return 0
+    # 每个特征哈希展开成 64 位字符串，按列统计 1 的个数（过半则该位为 1）
+    rows = [format(_feature_hash(feature), '064b') for feature in features]
+    half = len(rows) / 2
+    fingerprint = 0
+    for i, column in enumerate(zip(*rows)):
+        if column.count('1') > half:
+            fingerprint |= 1 << (FINGERPRINT_BITS - 1 - i)
+    return fingerprint
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+def event_class(text: str) -> str:
+    """公告的事件类别: delist / suspend / caution，上币和其他公告为空字符串"""
+    for name, pattern in EVENT_CLASSES:
+        if pattern.search(text or ''):
+            return name
+    return ''
+
+
+def exchange_names(text: str) -> List[str]:
+    """文本中提到的交易所（归一后的名称）"""
+    return [name for name, pattern in EXCHANGE_NAMES if pattern.search(text or '')]
+
+
+def make_anchor(symbols, contract_address: str = '', text: str = '') -> str:
+    """由代币符号、合约地址，以及 text 中的交易所和事件类别构造 anchor（顺序无关）"""
+    parts = sorted({str(s).upper() for s in symbols or [] if s})
+    if contract_address:
+        parts.append(contract_address.lower())
+    anchor = ','.join(parts)
+    exchanges = exchange_names(text)
+    if exchanges:
+        anchor = f"{anchor}@{'+'.join(exchanges)}"
+    kind = event_class(text)
+    return f'{anchor}#{kind}' if kind else anchor
+
+
+@dataclass(eq=False)
+class _Cluster:
+    fingerprint: int
+    anchor: str
+    first_seen: float
+    sources: Set[str] = field(default_factory=set)
+    count: int = 1
+
+
+@dataclass
+class NearDupMatch:
+    """命中的簇"""
+    fingerprint: str        # 簇首条文本的指纹（十六进制），转发事件可带上用于关联
+    distance: int
+    first_seen: float
+    count: int              # 含本条在内，簇内出现次数
+    new_source: bool        # 本条来源此前未在簇内出现
+
+
+class NearDuplicateDetector:
+    """滑动窗口内的近似重复检测器（单进程，非线程安全）"""
+
+    def __init__(
+        self,
+        window_seconds: Optional[float] = None,
+        max_distance: Optional[int] = None,
+        bands: Optional[int] = None,
+        min_tokens: Optional[int] = None,
+    ):
+        """
+        Args:
+            window_seconds: 簇保留时长（按首条出现时间）
+            max_distance: 判为重复的最大汉明距离，需小于 bands
+            bands: LSH 分段数，须整除 64
+            min_tokens: 少于该词数的短文本不参与检测（指纹不稳定）
+        """
+        self.window = window_seconds if window_seconds is not None else NEAR_DUP_CONFIG.get('window_seconds', 600)
+        self.max_distance = max_distance if max_distance is not None else NEAR_DUP_CONFIG.get('max_distance', 14)
+        self.bands = bands or NEAR_DUP_CONFIG.get('bands', 16)
+        self.min_tokens = min_tokens if min_tokens is not None else NEAR_DUP_CONFIG.get('min_tokens', 5)
+        if FINGERPRINT_BITS % self.bands:
+            raise ValueError(f"bands 须整除 {FINGERPRINT_BITS}: {self.bands}")
+        if self.max_distance >= self.bands:
+            raise ValueError(f"max_distance 须小于 bands: {self.max_distance} >= {self.bands}")
+        self._band_bits = FINGERPRINT_BITS // self.bands
+        self._band_mask = (1 << self._band_bits) - 1
+
+        self._clusters: Deque[_Cluster] = deque()
+        self._buckets: Dict[Tuple[str, int, int], List[_Cluster]] = {}
+        self.stats = {
+            'checked': 0,
+            'skipped_short': 0,
+            'near_duplicates': 0,
+            'new_source_reposts': 0,
+            'clusters': 0,
+        }
+
+    def _band_keys(self, anchor: str, fingerprint: int):
+        for band in range(self.bands):
+            yield anchor, band, fingerprint >> (band * self._band_bits) & self._band_mask
+
+    def _expire(self, now: float):
+        cutoff = now - self.window
+        while self._clusters and self._clusters[0].first_seen < cutoff:
+            cluster = self._clusters.popleft()
+            for key in self._band_keys(cluster.anchor, cluster.fingerprint):
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    continue
+                bucket.remove(cluster)
+                if not bucket:
+                    del self._buckets[key]
+        self.stats['clusters'] = len(self._clusters)
+
+    def check(self, text: str, source: str = '', anchor: str = '',
+              ts: Optional[float] = None) -> Optional[NearDupMatch]:
+        """
+        检查文本是否与窗口内的文本近似重复
+
+        Returns:
+            None 表示新文本（已加入索引）；否则返回命中的簇
+        """
+        now = ts if ts is not None else time.time()
+        self._expire(now)
+        self.stats['checked'] += 1
+
+        tokens = tokenize(text or '')
+        if len(tokens) < self.min_tokens:
+            self.stats['skipped_short'] += 1
+            return None
+        fingerprint = simhash64(tokens)
+
+        best, best_distance = None, self.max_distance + 1
+        seen = set()
+        for key in self._band_keys(anchor, fingerprint):
+            for cluster in self._buckets.get(key, ()):
+                if id(cluster) in seen:
+                    continue
+                seen.add(id(cluster))
+                distance = hamming(fingerprint, cluster.fingerprint)
+                if distance < best_distance:
+                    best, best_distance = cluster, distance
+
+        if best is None:
+            cluster = _Cluster(fingerprint, anchor, now, {source})
+            self._clusters.append(cluster)
+            for key in self._band_keys(anchor, fingerprint):
+                self._buckets.setdefault(key, []).append(cluster)
+            self.stats['clusters'] = len(self._clusters)
+            return None
+
+        best.count += 1
+        new_source = source not in best.sources
+        best.sources.add(source)
+        self.stats['near_duplicates'] += 1
+        if new_source:
+            self.stats['new_source_reposts'] += 1
+        return NearDupMatch(
+            fingerprint=f'{best.fingerprint:016x}',
+            distance=best_distance,
+            first_seen=best.first_seen,
+            count=best.count,
+            new_source=new_source,
+        )
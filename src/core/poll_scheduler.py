@@ -0,0 +1,382 @@
+"""
+REST 轮询调度器
+
+特性:
+- 哈希时间轮统一规划所有 REST 轮询，按绝对时间推进，不受请求耗时漂移影响
+- 固定节拍调度：下一次到期 = 上一次到期 + 间隔（请求耗时不再叠加到周期上）
+- 公告出现 "will list" 时加速对应交易所（boost），数小时无变化的交易所逐步退避
+- 全局令牌桶限制总请求速率，加速部分由退避部分让出，总量不增加
+- 可选 Redis 同步加速信号（poll:boost:{venue}），跨进程生效
+
+用法:
+    >>> scheduler = get_poll_scheduler()
+    >>> job = scheduler.register('rest:binance', venue='binance', interval=5)
+    >>> while running:
+    ...     await job.wait()
+    ...     changed = await poll_once()
+    ...     job.done(changed)
+"""
+
+import sys
+import math
+import time
+import random
+import asyncio
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .logging import get_logger
+from .http_client import TokenBucket
+
+logger = get_logger(__name__)
+
+# 读取调度配置
+try:
+    sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'config'))
+    from optimization_config import POLL_SCHEDULER_CONFIG
+except ImportError:
+    POLL_SCHEDULER_CONFIG = {}
+
+DEFAULT_CONFIG = {
+    'global_rps': 20,           # 全局轮询预算（次/秒）
+    'burst': 40,                # 预算桶容量
+    'tick': 0.25,               # 时间轮刻度（秒）
+    'wheel_slots': 512,         # 时间轮槽数（512 * 0.25s = 128s 一圈）
+    'idle_after': 7200,         # 无变化超过该秒数开始退避
+    'max_backoff': 8,           # 退避上限（基础间隔的倍数）
+    'boost_factor': 3,          # 加速倍数（基础间隔 / 倍数）
+    'min_interval': 1.0,        # 加速后的最小间隔
+    'boost_duration': 1800,     # 默认加速时长
+    'redis_sync_interval': 5,   # Redis 加速信号同步间隔
+}
+
+BOOST_KEY_PREFIX = 'poll:boost:'
+
+
+class PollJob:
+    """单个轮询任务"""
+
+    def __init__(
+        self,
+        scheduler: 'PollScheduler',
+        name: str,
+        venue: str,
+        interval: float,
+        min_interval: float,
+        max_interval: float,
+    ):
+        self.scheduler = scheduler
+        self.name = name
+        self.venue = venue
+        self.base_interval = interval
+        self.min_interval = min(min_interval, interval)
+        self.max_interval = max(max_interval, interval)
+
+        self.due = 0.0                  # 计划到期时间（调度器时钟）
+        self.released_at = 0.0
+        self.last_change = scheduler.clock()
+        self.boost_until = 0.0
+        self.in_flight = False
+
+        # 时间轮中的旧条目通过代数失效
+        self.generation = 0
+        self._waiter: Optional[asyncio.Future] = None
+        self._ready = False
+
+        self.stats = {'polls': 0, 'changes': 0, 'lag_ms': 0.0, 'budget_wait_ms': 0.0}
+
+    @property
+    def boosted(self) -> bool:
+        return self.boost_until > self.scheduler.clock()
+
+    @property
+    def interval(self) -> float:
+        """当前有效间隔"""
+        if self.boosted:
+            return self.min_interval
+
+        idle = self.scheduler.clock() - self.last_change
+        idle_after = self.scheduler.config['idle_after']
+        if idle < idle_after:
+            return self.base_interval
+
+        # 每多空闲一个 idle_after 周期，间隔翻倍
+        factor = 2 ** int(idle // idle_after)
+        return min(self.base_interval * factor, self.max_interval)
+
+    async def wait(self) -> None:
+        """等待下一次轮询时机（时间轮到期 + 全局预算）"""
+        if self.due <= 0:
+            self.scheduler._schedule_first(self)
+        if not self._ready:
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        self._ready = False
+        self.in_flight = True
+
+    def done(self, changed: bool = False) -> None:
+        """
+        报告本次轮询结果并规划下一次
+
+        Args:
+            changed: 本次是否发现新内容（新币对 / 新公告）
+        """
+        now = self.scheduler.clock()
+        self.in_flight = False
+        self.stats['polls'] += 1
+        if changed:
+            self.stats['changes'] += 1
+            self.last_change = now
+
+        # 固定节拍：从上一次到期时间推进；错过的周期直接跳过
+        interval = self.interval
+        due = self.due + interval
+        if due <= now:
+            due = now + interval - (now - self.due) % interval
+        self.scheduler._reschedule(self, due)
+
+    def _release(self, now: float) -> None:
+        # 到期时调用方可能还在处理上一轮结果，先记下，wait() 直接返回
+        self._ready = True
+        self.released_at = now
+        self.stats['lag_ms'] = (now - self.due) * 1000
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        now = self.scheduler.clock()
+        return {
+            'venue': self.venue,
+            'interval': round(self.interval, 2),
+            'base_interval': self.base_interval,
+            'boosted': self.boosted,
+            'idle_seconds': int(now - self.last_change),
+            'next_in': round(max(self.due - now, 0.0), 2),
+            **{k: round(v, 2) if isinstance(v, float) else v for k, v in self.stats.items()},
+        }
+
+
+class PollScheduler:
+    """哈希时间轮轮询调度器（进程内单例，见 get_poll_scheduler）"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None,
+                 clock: Optional[Callable[[], float]] = None):
+        self.config = {**DEFAULT_CONFIG, **POLL_SCHEDULER_CONFIG, **(config or {})}
+        self.clock = clock or time.monotonic
+        self.tick = self.config['tick']
+        self.slots: List[List[Tuple[int, PollJob, int, bool]]] = [
+            [] for _ in range(self.config['wheel_slots'])
+        ]
+        self.budget = TokenBucket(self.config['global_rps'], self.config['burst'])
+
+        self.jobs: Dict[str, PollJob] = {}
+        self.redis = None
+
+        self._tick_no = 0
+        self._task: Optional[asyncio.Task] = None
+        self._last_sync = 0.0
+
+        self.stats = {'released': 0, 'deferred': 0, 'boosts': 0}
+
+    # ==================== 注册 ====================
+
+    def register(
+        self,
+        name: str,
+        venue: str,
+        interval: float,
+        min_interval: Optional[float] = None,
+        max_interval: Optional[float] = None,
+    ) -> PollJob:
+        """
+        注册轮询任务（需在协程内调用）
+
+        Args:
+            name: 任务名（唯一，重复注册返回已有任务）
+            venue: 交易所名称，加速/退避按交易所生效
+            interval: 基础间隔（秒）
+            min_interval: 加速时的间隔，默认 interval / boost_factor
+            max_interval: 退避上限，默认 interval * max_backoff
+        """
+        job = self.jobs.get(name)
+        if job is not None:
+            return job
+
+        if min_interval is None:
+            min_interval = max(interval / self.config['boost_factor'], self.config['min_interval'])
+        if max_interval is None:
+            max_interval = interval * self.config['max_backoff']
+
+        job = PollJob(self, name, venue, interval, min_interval, max_interval)
+        self.jobs[name] = job
+        self._ensure_running()
+        return job
+
+    def bind_redis(self, redis_client) -> None:
+        """绑定 Redis，跨进程共享加速信号"""
+        if self.redis is None:
+            self.redis = redis_client
+
+    # ==================== 加速 ====================
+
+    def boost(self, venue: str, duration: Optional[float] = None, publish: bool = True) -> int:
+        """
+        加速某交易所的所有轮询任务
+
+        Args:
+            venue: 交易所名称
+            duration: 加速时长（秒）
+            publish: 是否写入 Redis 供其他进程读取
+
+        Returns:
+            受影响的任务数
+        """
+        duration = duration or self.config['boost_duration']
+        now = self.clock()
+        count = 0
+
+        for job in self.jobs.values():
+            if job.venue != venue:
+                continue
+            job.boost_until = max(job.boost_until, now + duration)
+            count += 1
+            # 已排期的下一次若晚于加速间隔，提前
+            if not job.in_flight and not job._ready and job.due > 0:
+                due = max(job.released_at + job.min_interval, now)
+                if due < job.due:
+                    self._reschedule(job, due)
+
+        if count:
+            self.stats['boosts'] += 1
+            logger.info(f"[POLL] 加速 {venue} ({count} 个任务, {int(duration)}s)")
+
+        if publish and self.redis is not None:
+            try:
+                self.redis.client.set(f'{BOOST_KEY_PREFIX}{venue}', '1', ex=int(duration))
+            except Exception as e:
+                logger.debug(f"[POLL] 发布加速信号失败: {e}")
+        return count
+
+    def _sync_boosts(self, now: float) -> None:
+        """从 Redis 读取其他进程发布的加速信号"""
+        if self.redis is None or now - self._last_sync < self.config['redis_sync_interval']:
+            return
+        self._last_sync = now
+
+        venues = sorted({job.venue for job in self.jobs.values()})
+        if not venues:
+            return
+        try:
+            pipe = self.redis.client.pipeline(transaction=False)
+            for venue in venues:
+                pipe.ttl(f'{BOOST_KEY_PREFIX}{venue}')
+            ttls = pipe.execute()
+        except Exception as e:
+            logger.debug(f"[POLL] 同步加速信号失败: {e}")
+            return
+
+        for venue, ttl in zip(venues, ttls):
+            if not ttl or ttl <= 0:
+                continue
+            remaining = min((job.boost_until for job in self.jobs.values() if job.venue == venue), default=0.0)
+            if remaining - now < ttl - self.config['redis_sync_interval']:
+                self.boost(venue, ttl, publish=False)
+
+    # ==================== 时间轮 ====================
+
+    def _schedule_first(self, job: PollJob) -> None:
+        # 启动时打散相位，避免所有交易所同一时刻请求
+        now = self.clock()
+        self._reschedule(job, now + random.uniform(0, min(job.interval, 2.0)))
+
+    def _reschedule(self, job: PollJob, due: float, prepaid: bool = False) -> None:
+        job.generation += 1
+        job.due = due
+        self._insert(job, due, prepaid)
+
+    def _insert(self, job: PollJob, due: float, prepaid: bool) -> None:
+        # 向上取整，保证不会早于到期时间释放
+        tick_no = max(math.ceil(due / self.tick), self._tick_no)
+        self.slots[tick_no % len(self.slots)].append((tick_no, job, job.generation, prepaid))
+
+    def _advance(self, now: float) -> None:
+        """推进到当前刻度，释放到期任务"""
+        target = int(now / self.tick)
+        while self._tick_no <= target:
+            idx = self._tick_no % len(self.slots)
+            # 先把到期条目整体摘出再触发：_fire 顺延时可能插回本槽（下一圈或仍是本刻度），
+            # 不能在遍历同一个列表时改写它；插回本刻度的条目在下一轮循环中处理
+            while self.slots[idx]:
+                slot = self.slots[idx]
+                due = [entry for entry in slot if entry[0] <= self._tick_no]
+                if not due:
+                    break
+                self.slots[idx] = [entry for entry in slot if entry[0] > self._tick_no]   # 下一圈
+                for entry in due:
+                    self._fire(entry, now)
+            self._tick_no += 1
+
+    def _fire(self, entry: Tuple[int, PollJob, int, bool], now: float) -> None:
+        _, job, generation, prepaid = entry
+        if generation != job.generation or job.in_flight or job._ready:
+            return
+
+        if not prepaid:
+            # 预算不足时顺延到令牌可用的刻度（已预留，不重复扣减）
+            wait = self.budget.reserve(1)
+            if wait > self.tick:
+                self.stats['deferred'] += 1
+                job.stats['budget_wait_ms'] += wait * 1000
+                job.generation += 1
+                self._insert(job, now + wait, prepaid=True)
+                return
+
+        self.stats['released'] += 1
+        job._release(now)
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._tick_no = int(self.clock() / self.tick)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        """按绝对刻度推进时间轮（sleep 误差不会累积）"""
+        while self.jobs:
+            now = self.clock()
+            try:
+                self._advance(now)
+                self._sync_boosts(now)
+            except Exception as e:
+                logger.error(f"[POLL] 调度错误: {e}")
+            await asyncio.sleep(max(self._tick_no * self.tick - self.clock(), 0.0))
+
+    # ==================== 状态 ====================
+
+    def get_status(self) -> Dict[str, Any]:
+        jobs = {name: job.to_dict() for name, job in self.jobs.items()}
+        return {
+            'jobs': len(jobs),
+            'planned_rps': round(sum(1 / j.interval for j in self.jobs.values()), 2),
+            'budget_rps': self.config['global_rps'],
+            'boosted': sorted({j.venue for j in self.jobs.values() if j.boosted}),
+            'stats': dict(self.stats),
+            'detail': jobs,
+        }
+
+
+# ==================== 全局实例 ====================
+
+_scheduler: Optional[PollScheduler] = None
+
+
+def get_poll_scheduler(redis_client=None) -> PollScheduler:
+    """获取进程级轮询调度器（可选绑定 Redis 共享加速信号）"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = PollScheduler()
+    if redis_client is not None:
+        _scheduler.bind_redis(redis_client)
+    return _scheduler
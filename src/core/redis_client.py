@@ -3,7 +3,7 @@
 
 特性:
 - 从配置文件或环境变量读取连接信息
-- 统一的 Stream 操作方法
+- 统一的 Stream 操作方法（编码见 core.codec，读取自动识别 legacy / 二进制信封）
 - 心跳和已知交易对管理
 - 连接池管理
 """
@@ -15,6 +15,12 @@ import os
 from pathlib import Path
 from typing import Optional, Dict, List, Any, Tuple
 from .logging import get_logger
+from .trace import TRACE_FIELD, append_hop
+from .codec import (
+    binary_client, decode_entries, decode_response, envelope_body, envelope_enabled,
+    legacy_fields, pack_envelope,
+)
+from .metrics import REDIS_RTT
 
 # 自动加载项目根目录的 .env 文件
 try:
@@ -35,6 +41,9 @@ except ImportError:
 
 logger = get_logger(__name__)
 
+# 新增交易对记录（ZSet，成员 "<交易所>:<交易对>"，分数为加入时的毫秒时间戳）
+KNOWN_PAIRS_ADDED_KEY = 'known_pairs:added'
+
 # 全局 Redis 实例缓存
 _redis_instances: Dict[str, 'RedisClient'] = {}
 
@@ -43,7 +52,7 @@ class RedisClient:
     """统一的 Redis 客户端封装"""
     
     # 使用 __slots__ 防止意外属性访问
-    __slots__ = ('_host', '_port', '_password', '_db', '_client')
+    __slots__ = ('_host', '_port', '_password', '_db', '_client', '_binary')
     
     def __init__(
         self,
@@ -84,6 +93,7 @@ class RedisClient:
             socket_timeout=socket_timeout,
         )
         object.__setattr__(self, '_client', _client)
+        object.__setattr__(self, '_binary', None)
         
         # 测试连接
         try:
@@ -115,6 +125,15 @@ class RedisClient:
         """获取底层 Redis 客户端"""
         return object.__getattribute__(self, '_client')
     
+    @property
+    def binary(self) -> redis.Redis:
+        """decode_responses=False 的连接（读取可能含二进制信封的 Stream）"""
+        _binary = object.__getattribute__(self, '_binary')
+        if _binary is None:
+            _binary = binary_client(object.__getattribute__(self, '_client'))
+            object.__setattr__(self, '_binary', _binary)
+        return _binary
+    
     def __getattr__(self, name: str):
         """代理未定义的属性到底层 Redis 客户端"""
         # 使用 object.__getattribute__ 避免递归
@@ -141,23 +160,25 @@ class RedisClient:
             事件 ID 或 None
         """
         try:
-            # 序列化复杂对象
-            serialized_data = {}
-            for key, value in event_data.items():
-                if isinstance(value, (dict, list)):
-                    serialized_data[key] = json.dumps(value, ensure_ascii=False)
-                elif value is None:
-                    serialized_data[key] = ''
-                else:
-                    serialized_data[key] = str(value)
+            # 序列化：legacy 每字段一个字符串，或单字段二进制信封（见 core.codec）
+            envelope = envelope_enabled(stream_key)
+            serialized_data = envelope_body(event_data) if envelope else legacy_fields(event_data)
+            
+            # 链路追踪：记录写入 Stream 的时间
+            if serialized_data.get(TRACE_FIELD):
+                serialized_data[TRACE_FIELD] = append_hop(serialized_data[TRACE_FIELD], 'xadd')
+            if envelope:
+                serialized_data = pack_envelope(serialized_data)
             
             # 添加到 Stream
+            started = time.perf_counter()
             event_id = self._client.xadd(
                 name=stream_key,
                 fields=serialized_data,
                 maxlen=maxlen,
                 approximate=True,
             )
+            REDIS_RTT.observe(time.perf_counter() - started, op='xadd')
             
             logger.debug(f"✅ 推送事件: {stream_key}, ID: {event_id}")
             return event_id
@@ -196,15 +217,7 @@ class RedisClient:
                     raise
             
             # 读取消息
-            messages = self._client.xreadgroup(
-                groupname=consumer_group,
-                consumername=consumer_name,
-                streams={stream_key: '>'},
-                count=count,
-                block=block,
-            )
-            
-            return messages or []
+            return self.read_group(consumer_group, consumer_name, {stream_key: '>'}, count, block)
             
         except Exception as e:
             logger.error(f"❌ 消费 Stream 失败: {e}")
@@ -230,16 +243,57 @@ class RedisClient:
             消息列表
         """
         try:
-            messages = self._client.xread(
+            messages = self.binary.xread(
                 streams={stream_key: last_id},
                 count=count,
                 block=block,
             )
-            return messages or []
+            return decode_response(messages)
         except Exception as e:
             logger.error(f"❌ 读取 Stream 失败: {e}")
             return []
     
+    def read_group(
+        self,
+        group_name: str,
+        consumer_name: str,
+        streams: Dict[str, str],
+        count: int = 10,
+        block: Optional[int] = None,
+        legacy: bool = False,
+    ) -> List[Tuple[str, List[Tuple[str, Dict[str, Any]]]]]:
+        """
+        XREADGROUP 并解码（异常由调用方处理）
+        
+        Args:
+            streams: {stream: 起始 ID}，'>' 读新消息，'0' 等读本消费者未确认的消息
+            legacy: 信封中的 dict/list 转回 JSON 字符串
+        """
+        messages = self.binary.xreadgroup(
+            groupname=group_name,
+            consumername=consumer_name,
+            streams=streams,
+            count=count,
+            block=block,
+        )
+        return decode_response(messages, legacy)
+    
+    def range_events(
+        self,
+        stream_key: str,
+        min: str = '-',
+        max: str = '+',
+        count: Optional[int] = None,
+        reverse: bool = False,
+        legacy: bool = False,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """XRANGE / XREVRANGE 并解码（reverse 时 min/max 含义不变）"""
+        if reverse:
+            entries = self.binary.xrevrange(stream_key, max=max, min=min, count=count)
+        else:
+            entries = self.binary.xrange(stream_key, min=min, max=max, count=count)
+        return decode_entries(entries, legacy)
+    
     def create_consumer_group(
         self,
         stream_key: str,
@@ -305,8 +359,10 @@ class RedisClient:
             serialized['timestamp'] = str(int(time.time()))
             
             # 设置 Hash
+            started = time.perf_counter()
             self._client.hset(key, mapping=serialized)
             self._client.expire(key, ttl)
+            REDIS_RTT.observe(time.perf_counter() - started, op='heartbeat')
             
             return True
             
@@ -347,10 +403,11 @@ class RedisClient:
             return False
     
     def add_known_pair(self, exchange: str, pair: str) -> bool:
-        """添加已知交易对"""
+        """添加已知交易对（新增的同时记入 known_pairs:added，供合约同步增量处理）"""
         try:
-            key = f"known_pairs:{exchange.lower()}"
-            self._client.sadd(key, pair)
+            exchange = exchange.lower()
+            if self._client.sadd(f"known_pairs:{exchange}", pair):
+                self._client.zadd(KNOWN_PAIRS_ADDED_KEY, {f"{exchange}:{pair}": int(time.time() * 1000)})
             return True
         except Exception as e:
             logger.error(f"添加已知交易对失败: {e}")
@@ -456,6 +513,27 @@ class RedisClient:
             db=db,
         )
 
+    @classmethod
+    def from_client(cls, client: redis.Redis) -> 'RedisClient':
+        """
+        包装已有的 Redis 兼容客户端（不新建连接、不 ping）
+
+        用于基准测试/本地测试注入 fakeredis，客户端需 decode_responses=True
+
+        Examples:
+            >>> import fakeredis
+            >>> redis = RedisClient.from_client(fakeredis.FakeRedis(decode_responses=True))
+        """
+        kwargs = getattr(getattr(client, 'connection_pool', None), 'connection_kwargs', {}) or {}
+        instance = cls.__new__(cls)
+        object.__setattr__(instance, '_host', kwargs.get('host', ''))
+        object.__setattr__(instance, '_port', kwargs.get('port', 0))
+        object.__setattr__(instance, '_password', None)
+        object.__setattr__(instance, '_db', kwargs.get('db', 0))
+        object.__setattr__(instance, '_client', client)
+        object.__setattr__(instance, '_binary', None)
+        return instance
+
 
 def get_redis(
     host: Optional[str] = None,
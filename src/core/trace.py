@@ -0,0 +1,295 @@
+"""
+链路延迟追踪
+
+特性:
+- 事件携带一个紧凑字段 _trace，沿 events:raw -> events:fused -> events:route:* 传递
+- 生产者打点 src（消息源时间）/ rcv（采集器收到）/ xadd（写入 Stream，push_event 自动追加）
+- 消费者追加自己的打点（fusion_in / fusion_score / fusion_emit / router_in / pusher_sent ...）
+- 每段耗时（上一打点 -> 本打点）在进程内累加为直方图，定期批量写入 Redis 小时桶
+
+字段格式（毫秒，偏移相对 t0）:
+    "<t0>;<已统计段数>;src:0,rcv:412,xadd:415,fusion_in:431"
+
+用法:
+    >>> start_trace(event, source_ts=msg_time, receive_ts=receive_time)
+    >>> redis.push_event('events:raw', event)            # 自动追加 xadd
+    ...
+    >>> stamp(event, 'fusion_in')
+    >>> tracer.observe(event)                             # 统计新增的段
+    >>> fused[TRACE_FIELD] = extend(event, 'fusion_emit') # 带到下游事件
+"""
+
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+# 读取追踪配置
+try:
+    sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'config'))
+    from optimization_config import TRACE_CONFIG
+except ImportError:
+    TRACE_CONFIG = {}
+
+TRACE_FIELD = '_trace'
+
+# 直方图桶上界（毫秒），最后一个桶为 +inf
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+BUCKET_LABELS = tuple(str(b) for b in BUCKETS_MS) + ('inf',)
+
+HIST_KEY_PREFIX = 'trace:hist:'
+SEGMENTS_KEY = 'trace:segments'
+
+# 端到端（首个打点 -> 最后打点）的段名
+TOTAL_SEGMENT = 'total'
+
+# 链路上的打点顺序（仅用于展示排序）
+HOP_ORDER = (
+    'src', 'rcv', 'xadd', 'fusion_in', 'fusion_score', 'fusion_emit',
+    'router_in', 'router_emit', 'pusher_in', 'pusher_sent',
+)
+
+Hops = List[Tuple[str, int]]
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _to_ms(ts: Optional[float]) -> Optional[int]:
+    """秒或毫秒时间戳统一为毫秒"""
+    try:
+        ts = float(ts)
+    except (TypeError, ValueError):
+        return None
+    return int(ts if ts > 1e12 else ts * 1000)
+
+
+# ==================== 编解码 ====================
+
+def encode(t0: int, recorded: int, hops: Hops) -> str:
+    return f"{t0};{recorded};" + ','.join(f'{name}:{ms - t0}' for name, ms in hops)
+
+
+def decode(value: str) -> Tuple[int, int, Hops]:
+    """解析 _trace 字段，返回 (t0, 已统计段数, [(打点, 绝对毫秒)])"""
+    t0_str, recorded_str, body = value.split(';', 2)
+    t0 = int(t0_str)
+    hops = []
+    for part in body.split(','):
+        if part:
+            name, offset = part.rsplit(':', 1)
+            hops.append((name, t0 + int(offset)))
+    return t0, int(recorded_str), hops
+
+
+def start_trace(event: dict, source_ts: Optional[float] = None,
+                receive_ts: Optional[float] = None) -> dict:
+    """
+    生产者创建追踪上下文
+
+    Args:
+        event: 待写入 events:raw 的事件（原地写入 _trace）
+        source_ts: 消息源时间（公告发布时间、TG 消息时间等，秒或毫秒），未知可省略
+        receive_ts: 采集器收到的时间，默认当前时间
+    """
+    if not TRACE_CONFIG.get('enabled', True):
+        return event
+    rcv = _to_ms(receive_ts) or _now_ms()
+    src = _to_ms(source_ts)
+    hops: Hops = []
+    if src and src <= rcv:
+        hops.append(('src', src))
+    hops.append(('rcv', rcv))
+    event[TRACE_FIELD] = encode(hops[0][1], 0, hops)
+    return event
+
+
+def append_hop(value: str, hop: str, ts: Optional[float] = None) -> str:
+    """在 _trace 字符串末尾追加打点（不解析已有打点）"""
+    if not value:
+        return value
+    try:
+        t0 = int(value.split(';', 1)[0])
+    except ValueError:
+        return value
+    ms = _to_ms(ts) or _now_ms()
+    sep = '' if value.endswith(';') else ','
+    return f'{value}{sep}{hop}:{ms - t0}'
+
+
+def stamp(event: dict, hop: str, ts: Optional[float] = None):
+    """事件带 _trace 时原地追加打点，否则不做任何事"""
+    value = event.get(TRACE_FIELD)
+    if value:
+        event[TRACE_FIELD] = append_hop(value, hop, ts)
+
+
+def extend(event: dict, hop: str, ts: Optional[float] = None) -> str:
+    """返回追加了打点的 _trace（不修改原事件），用于构造下游事件"""
+    value = event.get(TRACE_FIELD)
+    return append_hop(value, hop, ts) if value else ''
+
+
+# ==================== 直方图 ====================
+
+def _bucket_index(ms: int) -> int:
+    for i, bound in enumerate(BUCKETS_MS):
+        if ms <= bound:
+            return i
+    return len(BUCKETS_MS)
+
+
+class LatencyRecorder:
+    """
+    每段耗时直方图（进程内累加，按 flush_interval 批量写入 Redis 小时桶）
+
+    Redis:
+        trace:hist:<YYYYmmddHH>:<段名>  Hash {桶上界: 次数, count, sum_ms}
+        trace:segments                   Set  出现过的段名
+    """
+
+    def __init__(self, redis_client=None, flush_interval: Optional[float] = None):
+        self.redis = redis_client
+        self.flush_interval = flush_interval if flush_interval is not None else TRACE_CONFIG.get('flush_interval', 5)
+        self.retention = int(TRACE_CONFIG.get('retention_hours', 48)) * 3600
+        self._pending: Dict[str, List[int]] = {}
+        self._last_flush = time.time()
+
+    def _add(self, segment: str, ms: int):
+        counts = self._pending.get(segment)
+        if counts is None:
+            # [各桶次数..., count, sum_ms]
+            counts = self._pending[segment] = [0] * (len(BUCKET_LABELS) + 2)
+        ms = max(ms, 0)
+        counts[_bucket_index(ms)] += 1
+        counts[-2] += 1
+        counts[-1] += ms
+
+    def observe(self, event: dict, final: bool = False, start_hop: Optional[str] = None):
+        """
+        统计事件 _trace 中尚未统计的段，并把已统计段数写回事件
+
+        Args:
+            final: 链路终点（推送完成）时额外统计端到端耗时
+            start_hop: 只统计以该打点结尾及之后的段。同一 Stream 有多个消费组时，
+                       旁路消费者（如 router 与 pusher 同时消费 events:fused）用它避免重复统计上游段
+        """
+        value = event.get(TRACE_FIELD)
+        if not value:
+            return
+        try:
+            t0, recorded, hops = decode(value)
+        except (ValueError, TypeError):
+            return
+        start = max(recorded, 1)
+        if start_hop:
+            names = [name for name, _ in hops]
+            if start_hop in names:
+                start = max(start, len(names) - 1 - names[::-1].index(start_hop))
+        for i in range(start, len(hops)):
+            self._add(f'{hops[i - 1][0]}>{hops[i][0]}', hops[i][1] - hops[i - 1][1])
+        if final and len(hops) > 1:
+            self._add(TOTAL_SEGMENT, hops[-1][1] - hops[0][1])
+        event[TRACE_FIELD] = encode(t0, len(hops), hops)
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        if time.time() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """写入 Redis（失败时丢弃本批，不影响主流程）"""
+        self._last_flush = time.time()
+        if not self._pending or self.redis is None:
+            return
+        pending, self._pending = self._pending, {}
+        hour = datetime.now(timezone.utc).strftime('%Y%m%d%H')
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for segment, counts in pending.items():
+                key = f'{HIST_KEY_PREFIX}{hour}:{segment}'
+                for label, n in zip(BUCKET_LABELS, counts):
+                    if n:
+                        pipe.hincrby(key, label, n)
+                pipe.hincrby(key, 'count', counts[-2])
+                pipe.hincrby(key, 'sum_ms', counts[-1])
+                pipe.expire(key, self.retention)
+                pipe.sadd(SEGMENTS_KEY, segment)
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"写入延迟直方图失败: {e}")
+
+
+def _percentile(buckets: List[int], total: int, pct: float) -> Optional[int]:
+    """按桶估算分位数（返回所在桶上界，落在 +inf 桶时返回 None）"""
+    if not total:
+        return None
+    target = total * pct / 100
+    cumulative = 0
+    for bound, n in zip(BUCKETS_MS, buckets):
+        cumulative += n
+        if cumulative >= target:
+            return bound
+    return None
+
+
+def _segment_order(segment: str) -> float:
+    """按链路位置排序：以 xadd 结尾的段排在上游打点之后，未知段与 total 排最后"""
+    if segment == TOTAL_SEGMENT:
+        return len(HOP_ORDER) + 1
+    start, _, end = segment.partition('>')
+    if end == 'xadd' and start in HOP_ORDER:
+        return HOP_ORDER.index(start) + 0.5
+    return HOP_ORDER.index(end) if end in HOP_ORDER else len(HOP_ORDER)
+
+
+def get_latency_summary(redis_client, hours: int = 1) -> Dict[str, dict]:
+    """
+    汇总最近若干小时的每段延迟
+
+    Returns:
+        {段名: {count, mean_ms, p50_ms, p90_ms, p99_ms, buckets}}，按链路顺序排列
+    """
+    now = time.time()
+    hour_keys = [
+        datetime.fromtimestamp(now - h * 3600, timezone.utc).strftime('%Y%m%d%H')
+        for h in range(max(hours, 1))
+    ]
+    segments = sorted(redis_client.smembers(SEGMENTS_KEY) or [], key=lambda s: (_segment_order(s), s))
+    if not segments:
+        return {}
+
+    pipe = redis_client.pipeline(transaction=False)
+    for segment in segments:
+        for hour in hour_keys:
+            pipe.hgetall(f'{HIST_KEY_PREFIX}{hour}:{segment}')
+    rows = pipe.execute()
+
+    summary = {}
+    for i, segment in enumerate(segments):
+        buckets = [0] * len(BUCKET_LABELS)
+        count = sum_ms = 0
+        for data in rows[i * len(hour_keys):(i + 1) * len(hour_keys)]:
+            if not data:
+                continue
+            for j, label in enumerate(BUCKET_LABELS):
+                buckets[j] += int(data.get(label, 0))
+            count += int(data.get('count', 0))
+            sum_ms += int(data.get('sum_ms', 0))
+        if not count:
+            continue
+        summary[segment] = {
+            'count': count,
+            'mean_ms': round(sum_ms / count, 1),
+            'p50_ms': _percentile(buckets, count, 50),
+            'p90_ms': _percentile(buckets, count, 90),
+            'p99_ms': _percentile(buckets, count, 99),
+            'buckets': dict(zip(BUCKET_LABELS, buckets)),
+        }
+    return summary
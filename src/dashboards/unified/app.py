@@ -28,6 +28,48 @@ app = Flask(__name__)
 # 允许所有来源访问
 CORS(app, resources={r"/*": {"origins": "*", "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"]}})
 
+# Prometheus 指标（core.metrics 不可用时 /metrics 返回 503）
+try:
+    from src.core.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, histogram, render as render_metrics
+    HTTP_HANDLER_SECONDS = histogram(
+        'crypto_dashboard_request_seconds', '仪表盘接口处理耗时', ('endpoint', 'status'),
+    )
+    HAS_METRICS = True
+except ImportError:
+    HAS_METRICS = False
+
+# 事件流可能是二进制信封（core.codec），读取时统一解码为 legacy 字段
+try:
+    from src.core.codec import binary_client, decode_entries
+    HAS_CODEC = True
+except ImportError:
+    HAS_CODEC = False
+
+
+@app.before_request
+def _start_request_timer():
+    request.environ['metrics.start'] = time.perf_counter()
+
+
+@app.after_request
+def _observe_request(response):
+    start = request.environ.get('metrics.start')
+    if HAS_METRICS and start is not None and request.endpoint != 'metrics':
+        HTTP_HANDLER_SECONDS.observe(
+            time.perf_counter() - start,
+            endpoint=request.url_rule.rule if request.url_rule else 'unmatched',
+            status=f'{response.status_code // 100}xx',
+        )
+    return response
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus 抓取端点"""
+    if not HAS_METRICS:
+        return Response('core.metrics 不可用\n', status=503, mimetype='text/plain')
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
 # 北京时区 UTC+8
 BEIJING_TZ = timezone(timedelta(hours=8))
 
@@ -222,6 +264,8 @@ EXCHANGES = ['binance', 'okx', 'bybit', 'kucoin', 'gate', 'bitget', 'upbit', 'bi
 # 本地测试模式：当真实 Redis 不可用时使用 fakeredis
 USE_FAKE_REDIS = os.getenv("USE_FAKE_REDIS", "").lower() in ("1", "true", "yes")
 _fake_redis_instance = None
+# 二进制连接缓存（按 host/port/db；get_redis 每次请求都新建 Redis 对象，不能按对象缓存）
+_binary_clients: Dict[tuple, Any] = {}
 
 def get_redis():
     global _fake_redis_instance
@@ -247,6 +291,29 @@ def get_redis():
     except ImportError:
         return None
 
+def get_binary_redis(r):
+    """与 r 同一 Redis 的 decode_responses=False 连接，每个 Redis 只建一次连接池"""
+    kwargs = r.connection_pool.connection_kwargs
+    key = (kwargs.get('host'), kwargs.get('port'), kwargs.get('db'))
+    client = _binary_clients.get(key)
+    if client is None:
+        client = _binary_clients[key] = binary_client(r)
+    return client
+
+def read_stream_events(r, stream_key: str, count: Optional[int] = None,
+                       start: str = '-', end: str = '+', reverse: bool = True) -> list:
+    """XREVRANGE / XRANGE 事件流，返回 [(id, legacy 字段)]"""
+    if not HAS_CODEC:
+        if reverse:
+            return r.xrevrange(stream_key, max=end, min=start, count=count)
+        return r.xrange(stream_key, min=start, max=end, count=count)
+    client = get_binary_redis(r)
+    if reverse:
+        entries = client.xrevrange(stream_key, max=end, min=start, count=count)
+    else:
+        entries = client.xrange(stream_key, min=start, max=end, count=count)
+    return decode_entries(entries, legacy=True)
+
 def _init_test_data(r):
     """初始化测试数据"""
     import time
@@ -474,7 +541,7 @@ def get_events():
 
     try:
         stream_key = 'events:fused' if stream == 'fused' else 'events:raw'
-        for mid, data in r.xrevrange(stream_key, count=limit):
+        for mid, data in read_stream_events(r, stream_key, count=limit):
             symbols = data.get('symbols', data.get('symbol', ''))
             if symbols.startswith('['):
                 try:
@@ -606,7 +673,7 @@ def get_super_events():
 
     events = []
     try:
-        for mid, data in r.xrevrange('events:fused', count=200):
+        for mid, data in read_stream_events(r, 'events:fused', count=200):
             sc = int(data.get('source_count', '1'))
             score = float(data.get('score', 0))
             if sc >= 2 or score > 50:
@@ -642,7 +709,7 @@ def get_alpha_ranking():
     rankings = []
     seen = set()
     try:
-        for mid, data in r.xrevrange('events:fused', count=100):
+        for mid, data in read_stream_events(r, 'events:fused', count=100):
             sym = data.get('symbols', '')
             if sym.startswith('['):
                 try:
@@ -684,17 +751,78 @@ def get_metrics():
         for ex in EXCHANGES:
             total_pairs += r.scard(f'known_pairs:{ex}') or 0
         
+        # 端到端平均延迟（链路追踪直方图，近 1 小时）
+        avg_latency = None
+        try:
+            from src.core.trace import get_latency_summary, TOTAL_SEGMENT
+            total = get_latency_summary(r, hours=1).get(TOTAL_SEGMENT)
+            if total:
+                avg_latency = total['mean_ms']
+        except Exception as e:
+            logger.debug(f"读取链路延迟失败: {e}")
+        
         return {
             'total_events': events_raw + events_fused,
             'events_per_sec': round(events_fused / max(1, 3600) * 100, 1),
             'active_pairs': total_pairs,
-            'avg_latency': 142,
+            'avg_latency': avg_latency,
             'smart_money_flow': 4.2,
         }
     except:
         return {}
 
 
+@app.route('/api/trace/latency')
+def get_trace_latency():
+    """链路各段延迟直方图（collector -> fusion -> router -> pusher）"""
+    r = get_redis()
+    if not r:
+        return jsonify({'success': False, 'error': 'Redis 不可用'})
+    
+    hours = max(1, min(request.args.get('hours', 1, type=int), 48))
+    try:
+        from src.core.trace import get_latency_summary
+        return jsonify({
+            'success': True,
+            'hours': hours,
+            'segments': [
+                {'segment': name, **stats}
+                for name, stats in get_latency_summary(r, hours=hours).items()
+            ],
+        })
+    except Exception as e:
+        logger.error(f"读取链路延迟失败: {e}")
+        return jsonify({'success': False, 'error': str(e)})
+
+
+GAS_CHAINS = ['ethereum', 'bsc', 'base', 'arbitrum']
+
+
+@app.route('/api/gas')
+def get_gas():
+    """Gas 预言机最新建议（由 core.blockchain.gas_oracle 按区块写入 gas:oracle:{chain}）"""
+    r = get_redis()
+    if not r:
+        return jsonify({'success': False, 'data': {}})
+
+    result = {}
+    try:
+        pipe = r.pipeline()
+        for chain in GAS_CHAINS:
+            pipe.hgetall(f'gas:oracle:{chain}')
+        for chain, data in zip(GAS_CHAINS, pipe.execute()):
+            if not data:
+                continue
+            result[chain] = {
+                k: (int(v) if k in ('block_number', 'updated_at') else float(v))
+                for k, v in data.items()
+            }
+    except Exception as e:
+        logger.error(f"获取 Gas 数据失败: {e}")
+
+    return jsonify({'success': True, 'data': result})
+
+
 # ==================== 巨鲸监控 API ====================
 
 @app.route('/api/whales')
@@ -1024,6 +1152,23 @@ def get_whale_analytics():
     
     global _whale_analytics_cache, _analytics_cache_time
     
+    # 优先读取 WhaleMonitor 维护的增量聚合（覆盖全部历史，实时更新）
+    r = get_redis()
+    if r:
+        try:
+            from src.analytics import whale_aggregates
+            if whale_aggregates.has_aggregates(r):
+                limit = request.args.get('limit', type=int)
+                return jsonify({
+                    'success': True,
+                    'data': whale_aggregates.get_ranked(r, limit=limit),
+                    'cached': False,
+                    'source': 'aggregates',
+                    'updated_at': datetime.now().isoformat(),
+                })
+        except Exception as e:
+            logger.warning(f"读取巨鲸聚合失败，回退到 Stream 计算: {e}")
+    
     # 检查缓存（10分钟有效）
     if _analytics_cache_time and datetime.now() - _analytics_cache_time < timedelta(minutes=10):
         if _whale_analytics_cache:
@@ -1041,7 +1186,7 @@ def get_whale_analytics():
     
     try:
         # 从 whales:dynamics 流计算每个地址的统计
-        whale_events = r.xrange('whales:dynamics', count=1000)
+        whale_events = r.xrevrange('whales:dynamics', count=1000)
         
         # 按地址分组统计
         address_stats: Dict[str, Dict] = {}
@@ -1342,6 +1487,9 @@ def get_wallet_analytics(address: str):
                 'worst_trades': sorted([p for p in positions if p['pnl'] < 0], key=lambda x: x['pnl'])[:5],
                 
                 'recent_trades': trades[:20],
+                
+                # analyze_all_whales 写回的链上 PnL 快照（按交易时间历史价格估值）
+                'pnl_snapshot': json.loads(r.hget('whale:pnl:summary', address_lower) or 'null'),
             }
         })
         
@@ -1356,6 +1504,20 @@ def get_wallet_analytics(address: str):
 def get_whale_leaderboard():
     """获取聪明钱排行榜"""
     
+    # 优先读取增量聚合的排行（ZREVRANGE，无需全量排序）
+    r = get_redis()
+    if r:
+        try:
+            from src.analytics import whale_aggregates
+            if whale_aggregates.has_aggregates(r):
+                return jsonify({
+                    'success': True,
+                    'data': whale_aggregates.get_leaderboard(r, limit=10),
+                    'source': 'aggregates',
+                })
+        except Exception as e:
+            logger.warning(f"读取巨鲸排行失败，回退到 Stream 计算: {e}")
+    
     # 确保有数据
     if not _whale_analytics_cache:
         # 触发加载（忽略返回值，只是为了填充缓存）
@@ -2046,7 +2208,7 @@ def search():
 
     results = []
     try:
-        for mid, data in r.xrevrange('events:fused', count=200):
+        for mid, data in read_stream_events(r, 'events:fused', count=200):
             text = f"{data.get('symbols', '')} {data.get('exchange', '')} {data.get('raw_text', '')}".upper()
             if q in text:
                 results.append({
@@ -2071,7 +2233,7 @@ def get_insight():
         return jsonify({'summary': 'Redis disconnected'})
 
     try:
-        items = list(r.xrevrange('events:fused', count=30))
+        items = read_stream_events(r, 'events:fused', count=30)
         if not items:
             return jsonify({'summary': 'Waiting for market signals. System is operational and monitoring all data sources.'})
 
@@ -2188,7 +2350,7 @@ def export_events():
 
     events = []
     try:
-        for mid, data in r.xrevrange('events:fused', count=500):
+        for mid, data in read_stream_events(r, 'events:fused', count=500):
             events.append({
                 'id': mid,
                 'symbol': data.get('symbols', ''),
@@ -2483,7 +2645,7 @@ def get_event_detail(event_id):
 
     try:
         # 从 fused 流中查找
-        for mid, data in r.xrange('events:fused', event_id, event_id):
+        for mid, data in read_stream_events(r, 'events:fused', start=event_id, end=event_id, reverse=False):
             # 解析 score_detail JSON（如果存在）
             score_detail = {}
             try:
@@ -2867,6 +3029,33 @@ HTML = '''<!DOCTYPE html>
         <!-- Nodes Panel (Hidden by default) -->
         <div id="panelNodes" class="hidden">
             <div class="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4" id="nodesGrid"></div>
+            
+            <!-- 链路延迟 -->
+            <div class="card mt-6 overflow-hidden">
+                <div class="px-5 py-4 border-b border-slate-100 flex items-center justify-between">
+                    <h3 class="font-semibold text-slate-700 flex items-center gap-2">
+                        <i data-lucide="timer" class="w-4 h-4 text-sky-500"></i> 链路延迟
+                    </h3>
+                    <select id="traceHours" onchange="loadTraceLatency()" class="text-xs border border-slate-200 rounded-lg px-2 py-1 text-slate-600">
+                        <option value="1">近 1 小时</option>
+                        <option value="6">近 6 小时</option>
+                        <option value="24">近 24 小时</option>
+                    </select>
+                </div>
+                <table class="w-full text-sm">
+                    <thead class="bg-slate-50 text-xs text-slate-500">
+                        <tr>
+                            <th class="px-5 py-2 text-left font-medium">环节</th>
+                            <th class="px-5 py-2 text-right font-medium">次数</th>
+                            <th class="px-5 py-2 text-right font-medium">平均</th>
+                            <th class="px-5 py-2 text-right font-medium">P50</th>
+                            <th class="px-5 py-2 text-right font-medium">P90</th>
+                            <th class="px-5 py-2 text-right font-medium">P99</th>
+                        </tr>
+                    </thead>
+                    <tbody id="traceLatencyBody" class="divide-y divide-slate-100 font-mono text-slate-600"></tbody>
+                </table>
+            </div>
         </div>
         
         <!-- 流动性监控面板 -->
@@ -3715,7 +3904,7 @@ HTML = '''<!DOCTYPE html>
             });
             
             if (tab === 'trades') loadTrades();
-            if (tab === 'nodes') renderNodes();
+            if (tab === 'nodes') { renderNodes(); loadTraceLatency(); }
             if (tab === 'whales') loadWhaleEvents();
             if (tab === 'liquidity') loadLiquidityData();
             lucide.createIcons();
@@ -3980,6 +4169,32 @@ HTML = '''<!DOCTYPE html>
             lucide.createIcons();
         }
 
+        async function loadTraceLatency() {
+            const body = document.getElementById('traceLatencyBody');
+            const hours = document.getElementById('traceHours').value;
+            const fmt = v => v === null || v === undefined ? '>60s' : (v >= 1000 ? (v / 1000).toFixed(1) + 's' : v + 'ms');
+            try {
+                const res = await fetch(`/api/trace/latency?hours=${hours}`);
+                const data = await res.json();
+                const rows = data.segments || [];
+                if (!rows.length) {
+                    body.innerHTML = '<tr><td colspan="6" class="px-5 py-6 text-center text-slate-400 font-sans">暂无追踪数据</td></tr>';
+                    return;
+                }
+                body.innerHTML = rows.map(r => `
+                    <tr class="${r.segment === 'total' ? 'bg-sky-50/50 font-semibold' : ''}">
+                        <td class="px-5 py-2">${r.segment === 'total' ? '端到端' : r.segment.replace('>', ' → ')}</td>
+                        <td class="px-5 py-2 text-right">${r.count.toLocaleString()}</td>
+                        <td class="px-5 py-2 text-right">${fmt(r.mean_ms)}</td>
+                        <td class="px-5 py-2 text-right">≤${fmt(r.p50_ms)}</td>
+                        <td class="px-5 py-2 text-right">≤${fmt(r.p90_ms)}</td>
+                        <td class="px-5 py-2 text-right">≤${fmt(r.p99_ms)}</td>
+                    </tr>`).join('');
+            } catch (e) {
+                console.error(e);
+            }
+        }
+
         // 存储当前事件列表用于详情弹窗
         let currentEvents = [];
         
@@ -29,6 +29,7 @@ import aiohttp
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from core.logging import get_logger
 from core.redis_client import RedisClient
+from core.http_client import create_session
 
 logger = get_logger('contract_finder')
 
@@ -93,7 +94,7 @@ class ContractFinder:
     async def _ensure_session(self):
         """确保 aiohttp session 存在"""
         if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession(
+            self.session = create_session(
                 timeout=aiohttp.ClientTimeout(total=10)
             )
     
@@ -36,6 +36,15 @@ try:
 except ImportError:
     HAS_AIOHTTP = False
 
+# Gas 预言机（可选）
+try:
+    import sys
+    from pathlib import Path
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from core.blockchain.gas_oracle import get_gas_oracle
+except ImportError:
+    get_gas_oracle = None
+
 
 # ============================================================
 # ABI 定义
@@ -407,7 +416,8 @@ class DEXRouter:
             
             # 获取 nonce 和 gas
             nonce = self.w3.eth.get_transaction_count(self.account.address)
-            gas_price = self.w3.eth.gas_price
+            gas_fields = self._gas_fields()
+            gas_price = gas_fields.get('maxFeePerGas', gas_fields.get('gasPrice', 0))
             
             # 构建交易
             if is_eth_in:
@@ -422,8 +432,8 @@ class DEXRouter:
                     'from': self.account.address,
                     'value': amount,
                     'gas': 300000,
-                    'gasPrice': gas_price,
                     'nonce': nonce,
+                    **gas_fields,
                 })
             elif is_eth_out:
                 # Token -> ETH
@@ -441,8 +451,8 @@ class DEXRouter:
                 ).build_transaction({
                     'from': self.account.address,
                     'gas': 300000,
-                    'gasPrice': gas_price,
                     'nonce': nonce,
+                    **gas_fields,
                 })
             else:
                 # Token -> Token
@@ -460,8 +470,8 @@ class DEXRouter:
                 ).build_transaction({
                     'from': self.account.address,
                     'gas': 300000,
-                    'gasPrice': gas_price,
                     'nonce': nonce,
+                    **gas_fields,
                 })
             
             # 签名
@@ -496,6 +506,14 @@ class DEXRouter:
             logger.error(f"[DEX] 交易异常: {e}", exc_info=True)
             return SwapResult(success=False, error=str(e))
     
+    def _gas_fields(self, speed: str = 'fast') -> Dict[str, int]:
+        """Gas 字段：优先 Gas 预言机的 EIP-1559 建议，未启动/过期时回退 RPC gasPrice"""
+        oracle = get_gas_oracle(self.chain) if get_gas_oracle else None
+        suggestion = oracle.suggest(speed) if oracle else None
+        if suggestion and suggestion.base_fee > 0:
+            return suggestion.tx_fields()
+        return {'gasPrice': self.w3.eth.gas_price}
+    
     async def _ensure_allowance(self, token: str, spender: str, amount: int):
         """确保授权额度"""
         token_contract = self.w3.eth.contract(
@@ -518,7 +536,6 @@ class DEXRouter:
         max_uint = 2**256 - 1
         
         nonce = self.w3.eth.get_transaction_count(self.account.address)
-        gas_price = self.w3.eth.gas_price
         
         tx = token_contract.functions.approve(
             Web3.to_checksum_address(spender),
@@ -526,8 +543,8 @@ class DEXRouter:
         ).build_transaction({
             'from': self.account.address,
             'gas': 100000,
-            'gasPrice': gas_price,
             'nonce': nonce,
+            **self._gas_fields(),
         })
         
         signed_tx = self.account.sign_transaction(tx)
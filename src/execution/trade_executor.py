@@ -29,8 +29,11 @@ import aiohttp
 
 # 添加 core 层路径
 sys.path.insert(0, str(Path(__file__).parent.parent))
+from core.codec import field_json
 from core.logging import get_logger
 from core.redis_client import RedisClient
+from core.http_client import create_session
+from core.blockchain.gas_oracle import get_gas_oracle, start_gas_oracles
 
 logger = get_logger('trade_executor')
 
@@ -141,7 +144,7 @@ class TradeExecutor:
             headers = {}
             if self.api_key:
                 headers['Authorization'] = f'Bearer {self.api_key}'
-            self.session = aiohttp.ClientSession(
+            self.session = create_session(
                 headers=headers,
                 timeout=aiohttp.ClientTimeout(total=30)
             )
@@ -235,6 +238,11 @@ class TradeExecutor:
     
     # ==================== Gas 估算 ====================
     
+    def _gas_suggestion(self, speed: str = 'fast'):
+        """从 Gas 预言机读取建议（未启动或过期返回 None）"""
+        oracle = get_gas_oracle(self.chain)
+        return oracle.suggest(speed) if oracle else None
+    
     async def estimate_gas(self, to_address: str, data: str = '0x') -> Dict:
         """
         估算 Gas 费用
@@ -259,8 +267,13 @@ class TradeExecutor:
         }
         
         try:
-            # 获取当前 Gas 价格
-            gas_price = self.w3.eth.gas_price
+            # 获取当前 Gas 价格（优先读 Gas 预言机内存，过期再走 RPC）
+            suggestion = self._gas_suggestion()
+            if suggestion:
+                gas_price = suggestion.gas_price
+                result['max_fee_gwei'] = float(self.w3.from_wei(suggestion.max_fee, 'gwei'))
+            else:
+                gas_price = self.w3.eth.gas_price
             result['gas_price_gwei'] = float(self.w3.from_wei(gas_price, 'gwei'))
             
             # 估算 Gas Limit
@@ -464,13 +477,19 @@ class TradeExecutor:
                 return result
             
             # 3. 构建交易
+            if 'gasPrice' in tx_data:
+                gas_price = int(tx_data['gasPrice'])
+            else:
+                suggestion = self._gas_suggestion()
+                gas_price = suggestion.gas_price if suggestion else self.w3.eth.gas_price
+            
             tx = {
                 'from': self.wallet_address,
                 'to': self.w3.to_checksum_address(tx_data.get('to')),
                 'data': tx_data.get('data'),
                 'value': int(tx_data.get('value', 0)),
                 'gas': int(tx_data.get('gas', 300000)),
-                'gasPrice': int(tx_data.get('gasPrice', self.w3.eth.gas_price)),
+                'gasPrice': gas_price,
                 'nonce': self.w3.eth.get_transaction_count(self.wallet_address),
                 'chainId': self.chain_id,
             }
@@ -674,7 +693,7 @@ class DEXExecutor:
     async def _handle_event(self, event: Dict):
         """处理单个事件"""
         try:
-            route_info = json.loads(event.get('route_info', '{}'))
+            route_info = field_json(event.get('route_info'), {})
             symbol = route_info.get('symbol', 'UNKNOWN')
             contract = route_info.get('contract')
             chain = route_info.get('chain', 'ethereum')
@@ -732,6 +751,9 @@ class DEXExecutor:
         logger.info("DEX Executor 启动")
         logger.info("=" * 60)
         
+        # 启动 Gas 预言机（新区块订阅，交易路径不再逐笔查询 RPC）
+        await start_gas_oracles(list(self.default_amount), redis_client=self.redis)
+        
         await self.process_events()
     
     async def close(self):
@@ -20,6 +20,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from core.logging import get_logger
 from core.redis_client import RedisClient
+from core.http_client import create_session
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -411,7 +412,7 @@ class TradeNotifier:
                 }
             }
             
-            async with aiohttp.ClientSession() as session:
+            async with create_session() as session:
                 async with session.post(webhook_url, json=payload, timeout=10) as resp:
                     if resp.status == 200:
                         data = await resp.json()
@@ -568,7 +569,7 @@ class TradeNotifier:
                 "disable_web_page_preview": True,
             }
             
-            async with aiohttp.ClientSession() as session:
+            async with create_session() as session:
                 async with session.post(url, json=payload, timeout=10) as resp:
                     if resp.status == 200:
                         self.stats['telegram_success'] += 1
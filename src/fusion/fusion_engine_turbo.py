@@ -15,22 +15,22 @@ Fusion Engine Turbo - 极速版融合引擎
 
 import asyncio
 import threading
-import json
 import signal
 import sys
 import os
 import time
 import hashlib
-from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional, Set
-from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Set
 
 # 添加 core 层路径
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from core.logging import get_logger
 from core.redis_client import RedisClient
 from core.utils import extract_contract_address
+from core.trace import TRACE_FIELD, LatencyRecorder, extend, stamp
+from core.dedup import Deduplicator
+from core.metrics import EVENTS, QUEUE_DEPTH, SCORING_SECONDS, register_stats, start_metrics_server
 
 # YAML 为可选依赖
 try:
@@ -64,28 +64,6 @@ AGGREGATION_WINDOW = 2  # 从 5秒 减少到 2秒
 BATCH_SIZE = 50
 
 
-class LRUCache:
-    """LRU 缓存实现，用于去重"""
-    
-    def __init__(self, capacity: int = 5000):
-        self.capacity = capacity
-        self.cache: OrderedDict = OrderedDict()
-    
-    def contains(self, key: str) -> bool:
-        if key in self.cache:
-            self.cache.move_to_end(key)
-            return True
-        return False
-    
-    def add(self, key: str):
-        if key in self.cache:
-            self.cache.move_to_end(key)
-        else:
-            self.cache[key] = True
-            if len(self.cache) > self.capacity:
-                self.cache.popitem(last=False)
-
-
 class PriorityQueue:
     """优先级队列 - Tier-1 事件优先处理"""
     
@@ -231,16 +209,25 @@ class TurboAggregator:
 class FusionEngineTurbo:
     """极速版融合引擎"""
     
-    def __init__(self, config_path: str = 'config.yaml'):
+    def __init__(self, config_path: str = 'config.yaml', redis_client=None,
+                 clock: Optional[Callable[[], float]] = None):
+        """
+        Args:
+            config_path: YAML 配置文件
+            redis_client: 输出用的 Redis 客户端（回放时注入捕获器），默认从环境变量连接
+            clock: 返回 Unix 时间戳（秒）的时钟，默认墙钟
+        """
         self.config = {}
         if HAS_YAML and Path(config_path).exists():
             with open(config_path) as f:
                 self.config = yaml.safe_load(f) or {}
         
-        self.redis = RedisClient.from_env()
-        self.scorer = InstitutionalScorer()
+        self.redis = redis_client or RedisClient.from_env()
+        self.clock = clock or time.time
+        self.scorer = InstitutionalScorer(clock=self.clock)
+        self.tracer = LatencyRecorder(self.redis)
         self.aggregator = TurboAggregator(window_seconds=AGGREGATION_WINDOW)
-        self.dedup_cache = LRUCache(capacity=5000)
+        self.dedup = Deduplicator('fusion_turbo', redis_client=self.redis, clock=self.clock)
         self.priority_queue = PriorityQueue()
         
         self.running = True
@@ -267,6 +254,13 @@ class FusionEngineTurbo:
         key = f"{event.get('exchange', '')}:{event.get('symbol', '')}:{event.get('raw_text', '')[:100]}"
         return hashlib.md5(key.encode()).hexdigest()[:16]
     
+    def is_duplicate(self, event: dict) -> bool:
+        """Bloom 去重（未见过的事件记入过滤器，多个消费进程共享）"""
+        if self.dedup.seen(self.get_event_hash(event)):
+            self.stats['duplicates'] += 1
+            return True
+        return False
+    
     def format_fused_event(self, event: dict, score_info: dict) -> dict:
         """格式化融合事件"""
         raw_text = event.get('raw_text', '') or event.get('text', '') or event.get('title', '')
@@ -279,7 +273,7 @@ class FusionEngineTurbo:
             contract_address = contract_info.get('contract_address', '')
             chain = contract_info.get('chain', '')
         
-        return {
+        fused = {
             'source': score_info['classified_source'],
             'original_source': event.get('source', 'unknown'),
             'event_type': 'new_listing',
@@ -296,36 +290,43 @@ class FusionEngineTurbo:
             'base_score': str(score_info['base_score']),
             'exchange_multiplier': str(score_info['exchange_multiplier']),
             'freshness_multiplier': str(score_info['freshness_multiplier']),
-            'multi_source_bonus': str(score_info['multi_source_bonus']),
+            'multi_source_bonus': str(score_info['multi_bonus']),
             'source_count': str(score_info['source_count']),
             'exchange_count': str(score_info['exchange_count']),
             'should_trigger': '1' if score_info['should_trigger'] else '0',
             'trigger_reason': score_info['trigger_reason'],
             'is_first': '1' if score_info['is_first'] else '0',
             'is_tier1': '1' if self.is_tier1(event) else '0',
-            'ts': str(int(datetime.now(timezone.utc).timestamp() * 1000)),
+            'ts': str(int(self.clock() * 1000)),
             'processing_mode': 'instant' if self.is_tier1(event) else 'aggregated',
-            'symbol_hint': json.dumps(score_info['symbols']),
-            'score_detail': json.dumps({
+            'symbol_hint': score_info['symbols'],
+            'score_detail': {
                 'base': score_info['base_score'],
                 'exchange_mult': score_info['exchange_multiplier'],
                 'fresh_mult': score_info['freshness_multiplier'],
-                'multi_bonus': score_info['multi_source_bonus'],
-            }),
-            '_fusion': json.dumps({
+                'multi_bonus': score_info['multi_bonus'],
+            },
+            '_fusion': {
                 'source_confidence': score_info['total_score'] / 100,
                 'source_count': score_info['source_count'],
                 'exchange_count': score_info['exchange_count'],
                 'trigger_reason': score_info['trigger_reason'],
                 'turbo_mode': True,
-            }),
+            },
         }
+        trace = extend(event, 'fusion_emit')
+        if trace:
+            fused[TRACE_FIELD] = trace
+        return fused
     
     def format_super_event(self, super_event: dict) -> dict:
         """格式化超级事件"""
         best_event = super_event['best_event']
         score_info = super_event['best_score_info']
         raw_text = best_event.get('raw_text', '') or best_event.get('text', '')
+        # 集合转列表的顺序随哈希种子变化，排序后输出可复现（回放对比依赖这一点）
+        sources = sorted(super_event['sources'])
+        exchanges = sorted(super_event['exchanges'])
         
         should_trigger = super_event['exchange_count'] >= 2 or super_event['final_score'] >= TRIGGER_THRESHOLD
         
@@ -344,10 +345,10 @@ class FusionEngineTurbo:
             contract_address = contract_info.get('contract_address', '')
             chain = contract_info.get('chain', '')
         
-        return {
-            'source': ','.join(super_event['sources']),
+        fused = {
+            'source': ','.join(sources),
             'event_type': 'new_listing_confirmed' if super_event['is_super_event'] else 'new_listing',
-            'exchange': ','.join(super_event['exchanges']),
+            'exchange': ','.join(exchanges),
             'symbols': super_event['symbol'],
             'raw_text': raw_text,
             'url': best_event.get('url', ''),
@@ -363,17 +364,21 @@ class FusionEngineTurbo:
             'should_trigger': '1' if should_trigger else '0',
             'trigger_reason': trigger_reason,
             'is_first': '1' if score_info['is_first'] else '0',
-            'ts': str(int(datetime.now(timezone.utc).timestamp() * 1000)),
+            'ts': str(int(self.clock() * 1000)),
             'processing_mode': 'aggregated',
-            'symbol_hint': json.dumps([super_event['symbol']]),
-            '_fusion': json.dumps({
+            'symbol_hint': [super_event['symbol']],
+            '_fusion': {
                 'source_confidence': super_event['final_score'] / 100,
                 'source_count': super_event['source_count'],
                 'exchange_count': super_event['exchange_count'],
                 'is_super_event': super_event['is_super_event'],
                 'turbo_mode': True,
-            }),
+            },
         }
+        trace = extend(best_event, 'fusion_emit')
+        if trace:
+            fused[TRACE_FIELD] = trace
+        return fused
     
     async def consume_events(self):
         """消费事件流"""
@@ -402,13 +407,11 @@ class FusionEngineTurbo:
                     for stream, messages in events:
                         for message_id, event_data in messages:
                             # 去重
-                            event_hash = self.get_event_hash(event_data)
-                            if self.dedup_cache.contains(event_hash):
-                                self.stats['duplicates'] += 1
+                            if self.is_duplicate(event_data):
                                 self.redis.ack_message(stream_name, consumer_group, message_id)
                                 continue
                             
-                            self.dedup_cache.add(event_hash)
+                            stamp(event_data, 'fusion_in')
                             
                             # 判断优先级
                             priority = 1 if self.is_tier1(event_data) else 0
@@ -420,6 +423,86 @@ class FusionEngineTurbo:
                 logger.error(f"消费错误: {e}")
                 await asyncio.sleep(0.1)
     
+    def flush_aggregates(self, output_stream: str, current_time: float):
+        """刷新聚合窗口已过期的事件"""
+        expired = self.aggregator.flush_expired(current_time)
+        
+        for exp_evt in expired:
+            fused = self.format_super_event(exp_evt)
+            if fused['should_trigger'] == '1':
+                self.redis.push_event(output_stream, fused)
+                self.stats['aggregated'] += 1
+                self.stats['triggered'] += 1
+                
+                if exp_evt['is_super_event']:
+                    logger.info(
+                        f"🔥 超级事件: {exp_evt['symbol']} | "
+                        f"{exp_evt['exchange_count']}所 | "
+                        f"分数{exp_evt['final_score']:.0f}"
+                    )
+            else:
+                self.stats['filtered'] += 1
+    
+    def process_event(self, event_data: dict, output_stream: str, current_time: float):
+        """评分、聚合并输出单条事件"""
+        self.stats['processed'] += 1
+        EVENTS.inc(service='fusion_turbo', source=event_data.get('source', 'unknown'))
+        
+        # 计算评分
+        with SCORING_SECONDS.time(engine='turbo'):
+            score_info = self.scorer.calculate_score(event_data)
+        stamp(event_data, 'fusion_score')
+        self.tracer.observe(event_data)
+        symbols = score_info.get('symbols', [])
+        primary_symbol = symbols[0] if symbols else ''
+        
+        # Tier-1 即时处理
+        if self.is_tier1(event_data) and score_info['should_trigger']:
+            fused = self.format_fused_event(event_data, score_info)
+            self.redis.push_event(output_stream, fused)
+            self.stats['tier1_instant'] += 1
+            self.stats['triggered'] += 1
+            
+            logger.info(
+                f"⚡ Tier-1即时: {score_info['trigger_reason']} | "
+                f"{event_data.get('exchange', 'N/A')} | "
+                f"{primary_symbol} | "
+                f"分数{score_info['total_score']:.0f}"
+            )
+            return
+        
+        # 其他事件进入聚合
+        super_event = self.aggregator.add_event(
+            primary_symbol, event_data, score_info, current_time
+        )
+        
+        if super_event:
+            fused = self.format_super_event(super_event)
+            if fused['should_trigger'] == '1':
+                self.redis.push_event(output_stream, fused)
+                self.stats['aggregated'] += 1
+                self.stats['triggered'] += 1
+                
+                logger.info(
+                    f"🔥 多所确认: {super_event['symbol']} | "
+                    f"{super_event['exchanges']} | "
+                    f"分数{super_event['final_score']:.0f}"
+                )
+            else:
+                self.stats['filtered'] += 1
+        elif score_info['should_trigger']:
+            # 单源高分
+            fused = self.format_fused_event(event_data, score_info)
+            self.redis.push_event(output_stream, fused)
+            self.stats['triggered'] += 1
+            
+            logger.info(
+                f"✅ {score_info['trigger_reason']} | "
+                f"{primary_symbol} | 分数{score_info['total_score']:.0f}"
+            )
+        else:
+            self.stats['filtered'] += 1
+    
     async def process_events(self):
         """处理事件队列"""
         stream_cfg = self.config.get('stream', {})
@@ -432,84 +515,14 @@ class FusionEngineTurbo:
                 
                 if not batch:
                     # 刷新过期的聚合事件
-                    current_time = time.time()
-                    expired = self.aggregator.flush_expired(current_time)
-                    
-                    for exp_evt in expired:
-                        fused = self.format_super_event(exp_evt)
-                        if fused['should_trigger'] == '1':
-                            self.redis.push_event(output_stream, fused)
-                            self.stats['aggregated'] += 1
-                            self.stats['triggered'] += 1
-                            
-                            if exp_evt['is_super_event']:
-                                logger.info(
-                                    f"🔥 超级事件: {exp_evt['symbol']} | "
-                                    f"{exp_evt['exchange_count']}所 | "
-                                    f"分数{exp_evt['final_score']:.0f}"
-                                )
-                        else:
-                            self.stats['filtered'] += 1
-                    
+                    self.flush_aggregates(output_stream, self.clock())
                     await asyncio.sleep(0.05)  # 50ms 循环
                     continue
                 
-                current_time = time.time()
+                current_time = self.clock()
                 
                 for message_id, event_data in batch:
-                    self.stats['processed'] += 1
-                    
-                    # 计算评分
-                    score_info = self.scorer.calculate_score(event_data)
-                    symbols = score_info.get('symbols', [])
-                    primary_symbol = symbols[0] if symbols else ''
-                    
-                    # Tier-1 即时处理
-                    if self.is_tier1(event_data) and score_info['should_trigger']:
-                        fused = self.format_fused_event(event_data, score_info)
-                        self.redis.push_event(output_stream, fused)
-                        self.stats['tier1_instant'] += 1
-                        self.stats['triggered'] += 1
-                        
-                        logger.info(
-                            f"⚡ Tier-1即时: {score_info['trigger_reason']} | "
-                            f"{event_data.get('exchange', 'N/A')} | "
-                            f"{primary_symbol} | "
-                            f"分数{score_info['total_score']:.0f}"
-                        )
-                        continue
-                    
-                    # 其他事件进入聚合
-                    super_event = self.aggregator.add_event(
-                        primary_symbol, event_data, score_info, current_time
-                    )
-                    
-                    if super_event:
-                        fused = self.format_super_event(super_event)
-                        if fused['should_trigger'] == '1':
-                            self.redis.push_event(output_stream, fused)
-                            self.stats['aggregated'] += 1
-                            self.stats['triggered'] += 1
-                            
-                            logger.info(
-                                f"🔥 多所确认: {super_event['symbol']} | "
-                                f"{super_event['exchanges']} | "
-                                f"分数{super_event['final_score']:.0f}"
-                            )
-                        else:
-                            self.stats['filtered'] += 1
-                    elif score_info['should_trigger']:
-                        # 单源高分
-                        fused = self.format_fused_event(event_data, score_info)
-                        self.redis.push_event(output_stream, fused)
-                        self.stats['triggered'] += 1
-                        
-                        logger.info(
-                            f"✅ {score_info['trigger_reason']} | "
-                            f"{primary_symbol} | 分数{score_info['total_score']:.0f}"
-                        )
-                    else:
-                        self.stats['filtered'] += 1
+                    self.process_event(event_data, output_stream, current_time)
                 
             except Exception as e:
                 logger.error(f"处理错误: {e}")
@@ -554,6 +567,9 @@ class FusionEngineTurbo:
     async def run(self):
         """运行引擎"""
         self.start_heartbeat_thread()
+        register_stats('crypto_fusion', self.stats, engine='turbo')
+        QUEUE_DEPTH.set_function(self.priority_queue.size, service='fusion_turbo', queue='priority')
+        start_metrics_server('fusion_turbo')
         
         logger.info("=" * 60)
         logger.info("Fusion Engine Turbo 启动")
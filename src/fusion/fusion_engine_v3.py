@@ -18,19 +18,22 @@ Fusion Engine v3 - 顶级量化机构评分体系
 
 import asyncio
 import threading
-import json
 import signal
 import sys
 import os
-from datetime import datetime, timezone
+import time
 from pathlib import Path
+from typing import Callable, Optional
 
 # 添加 core 层路径
 sys.path.insert(0, str(Path(__file__).parent.parent))
+from core.codec import field_json
 from core.logging import get_logger
 from core.redis_client import RedisClient
 from core.config import get_config, get_redis_config
 from core.utils import extract_contract_address
+from core.trace import TRACE_FIELD, LatencyRecorder, extend, stamp
+from core.metrics import EVENTS, SCORING_SECONDS, register_stats, start_metrics_server
 
 # YAML 为可选依赖
 try:
@@ -42,6 +45,8 @@ except ImportError:
 # 导入机构级评分器
 from .scoring_engine import InstitutionalScorer, TIER_S_SOURCES, TRIGGER_THRESHOLD
 
+logger = get_logger('fusion_engine')
+
 # 导入代币分类器
 try:
     from analysis.token_classifier import TokenClassifier, get_classifier
@@ -50,8 +55,6 @@ except ImportError:
     HAS_CLASSIFIER = False
     logger.warning("TokenClassifier 未导入，代币分类功能禁用")
 
-logger = get_logger('fusion_engine')
-
 
 class SuperEventAggregator:
     """
@@ -153,7 +156,14 @@ class SuperEventAggregator:
 class FusionEngineV3:
     """Fusion Engine v3 - 机构级评分"""
     
-    def __init__(self, config_path: str = 'config.yaml'):
+    def __init__(self, config_path: str = 'config.yaml', redis_client=None,
+                 clock: Optional[Callable[[], float]] = None):
+        """
+        Args:
+            config_path: YAML 配置文件
+            redis_client: 输出用的 Redis 客户端（回放时注入捕获器），默认从环境变量连接
+            clock: 返回 Unix 时间戳（秒）的时钟，默认墙钟
+        """
         # 尝试加载 YAML 配置文件
         self.config = {}
         if HAS_YAML and Path(config_path).exists():
@@ -161,10 +171,12 @@ class FusionEngineV3:
                 self.config = yaml.safe_load(f) or {}
         
         # 连接 Redis（从环境变量读取配置）
-        self.redis = RedisClient.from_env()
+        self.redis = redis_client or RedisClient.from_env()
+        self.clock = clock or time.time
         
         # 使用机构级评分器
-        self.scorer = InstitutionalScorer()
+        self.scorer = InstitutionalScorer(clock=self.clock)
+        self.tracer = LatencyRecorder(self.redis)
         self.aggregator = SuperEventAggregator(window_seconds=5)
         self.running = True
         
@@ -207,7 +219,7 @@ class FusionEngineV3:
             token_type = self.token_classifier.classify_token_type(symbol).value
             is_tradeable = self.token_classifier.is_tradeable_token(symbol)
         
-        return {
+        fused = {
             # 基础信息
             'source': score_info['classified_source'],
             'original_source': event.get('source', 'unknown'),
@@ -242,7 +254,7 @@ class FusionEngineV3:
             'base_score': str(score_info['base_score']),
             'exchange_multiplier': str(score_info['exchange_multiplier']),
             'freshness_multiplier': str(score_info['freshness_multiplier']),
-            'multi_source_bonus': str(score_info['multi_source_bonus']),
+            'multi_source_bonus': str(score_info['multi_bonus']),
             'source_count': str(score_info['source_count']),
             'exchange_count': str(score_info['exchange_count']),
             
@@ -252,30 +264,37 @@ class FusionEngineV3:
             'is_first': '1' if score_info['is_first'] else '0',
             
             # 时间戳
-            'ts': str(int(datetime.now(timezone.utc).timestamp() * 1000)),
+            'ts': str(int(self.clock() * 1000)),
             
             # 兼容字段
-            'symbol_hint': json.dumps(score_info['symbols']),
-            'score_detail': json.dumps({
+            'symbol_hint': score_info['symbols'],
+            'score_detail': {
                 'base': score_info['base_score'],
                 'exchange_mult': score_info['exchange_multiplier'],
                 'fresh_mult': score_info['freshness_multiplier'],
-                'multi_bonus': score_info['multi_source_bonus'],
+                'multi_bonus': score_info['multi_bonus'],
                 'classified_source': score_info['classified_source'],
-            }),
-            '_fusion': json.dumps({
+            },
+            '_fusion': {
                 'source_confidence': score_info['total_score'] / 100,
                 'source_count': score_info['source_count'],
                 'exchange_count': score_info['exchange_count'],
                 'trigger_reason': score_info['trigger_reason'],
-            }),
+            },
         }
+        trace = extend(event, 'fusion_emit')
+        if trace:
+            fused[TRACE_FIELD] = trace
+        return fused
     
     def format_super_event(self, super_event: dict) -> dict:
         """格式化超级事件（多源合并）"""
         best_event = super_event['best_event']
         score_info = super_event['best_score_info']
         raw_text = best_event.get('raw_text', '') or best_event.get('text', '')
+        # 集合转列表的顺序随哈希种子变化，排序后输出可复现（回放对比依赖这一点）
+        sources = sorted(super_event['sources'])
+        exchanges = sorted(super_event['exchanges'])
         
         # 判断是否触发
         should_trigger = super_event['exchange_count'] >= 2 or super_event['final_score'] >= TRIGGER_THRESHOLD
@@ -303,16 +322,16 @@ class FusionEngineV3:
         
         if self.token_classifier and symbol:
             # 使用第一个源进行分类
-            first_source = list(super_event['sources'])[0] if super_event['sources'] else ''
+            first_source = sources[0] if sources else ''
             source_type = self.token_classifier.classify_source(first_source, raw_text).value
             token_type = self.token_classifier.classify_token_type(symbol).value
             is_tradeable = self.token_classifier.is_tradeable_token(symbol)
         
-        return {
+        fused = {
             # 基础信息
-            'source': ','.join(super_event['sources']),
+            'source': ','.join(sources),
             'event_type': 'new_listing_confirmed' if super_event['is_super_event'] else 'new_listing',
-            'exchange': ','.join(super_event['exchanges']),
+            'exchange': ','.join(exchanges),
             'symbols': super_event['symbol'],
             
             # 原始内容
@@ -345,23 +364,121 @@ class FusionEngineV3:
             'is_first': '1' if score_info['is_first'] else '0',
             
             # 时间戳
-            'ts': str(int(datetime.now(timezone.utc).timestamp() * 1000)),
+            'ts': str(int(self.clock() * 1000)),
             
             # 兼容字段
-            'symbol_hint': json.dumps([super_event['symbol']]),
-            'score_detail': json.dumps({
-                'sources': super_event['sources'],
-                'exchanges': super_event['exchanges'],
+            'symbol_hint': [super_event['symbol']],
+            'score_detail': {
+                'sources': sources,
+                'exchanges': exchanges,
                 'multi_bonus': super_event['multi_bonus'],
-            }),
-            '_fusion': json.dumps({
+            },
+            '_fusion': {
                 'source_confidence': super_event['final_score'] / 100,
                 'source_count': super_event['source_count'],
                 'exchange_count': super_event['exchange_count'],
                 'is_super_event': super_event['is_super_event'],
                 'trigger_reason': trigger_reason,
-            }),
+            },
         }
+        trace = extend(best_event, 'fusion_emit')
+        if trace:
+            fused[TRACE_FIELD] = trace
+        return fused
+    
+    def flush_aggregates(self, output_stream: str, current_time: float):
+        """刷新聚合窗口已过期的事件"""
+        expired_events = self.aggregator.flush_expired(current_time)
+        for exp_evt in expired_events:
+            exp_fused = self.format_super_event(exp_evt)
+            
+            # 只输出触发的事件
+            if exp_fused['should_trigger'] == '1':
+                self.redis.push_event(output_stream, exp_fused)
+                self.stats['fused'] += 1
+                self.stats['triggered'] += 1
+                
+                if exp_evt['is_super_event']:
+                    logger.info(
+                        f"🔥 超级事件: {exp_evt['symbol']} | "
+                        f"{exp_evt['exchange_count']}所确认 | "
+                        f"分数{exp_evt['final_score']:.0f}"
+                    )
+            else:
+                self.stats['filtered'] += 1
+    
+    def process_message(self, raw_msg: dict, output_stream: str, current_time: float):
+        """评分、聚合并输出单条原始事件（不含 ACK）"""
+        self.stats['processed'] += 1
+        
+        # 解析 event_data（legacy 为 JSON 字符串，信封中为原生 dict）
+        if 'event_data' in raw_msg:
+            event_data = field_json(raw_msg['event_data'])
+            if not isinstance(event_data, dict):
+                logger.warning(f"event_data 解析失败: {str(raw_msg['event_data'])[:100]}")
+                return
+            if raw_msg.get(TRACE_FIELD):
+                event_data[TRACE_FIELD] = raw_msg[TRACE_FIELD]
+        else:
+            event_data = raw_msg  # 兼容旧格式
+        
+        stamp(event_data, 'fusion_in')
+        
+        # 去重
+        if self.scorer.is_duplicate(event_data):
+            self.stats['duplicates'] += 1
+            return
+        
+        # 计算评分
+        EVENTS.inc(service='fusion_v3', source=event_data.get('source', 'unknown'))
+        with SCORING_SECONDS.time(engine='v3'):
+            score_info = self.scorer.calculate_score(event_data)
+        stamp(event_data, 'fusion_score')
+        self.tracer.observe(event_data)
+        
+        # 提取 symbol 用于聚合
+        symbols = score_info.get('symbols', [])
+        primary_symbol = symbols[0] if symbols else ''
+        
+        # 尝试聚合
+        super_event = self.aggregator.add_event(
+            primary_symbol, event_data, score_info, current_time
+        )
+        
+        if super_event:
+            # 多源确认，立即输出
+            fused_event = self.format_super_event(super_event)
+            
+            if fused_event['should_trigger'] == '1':
+                self.redis.push_event(output_stream, fused_event)
+                self.stats['fused'] += 1
+                self.stats['triggered'] += 1
+                
+                logger.info(
+                    f"🔥 多所确认: {super_event['symbol']} | "
+                    f"{super_event['exchanges']} | "
+                    f"分数{super_event['final_score']:.0f}"
+                )
+            else:
+                self.stats['filtered'] += 1
+        
+        elif score_info['should_trigger']:
+            # 单源但满足触发条件（Tier-S源或高分）
+            fused_event = self.format_fused_event(event_data, score_info)
+            self.redis.push_event(output_stream, fused_event)
+            self.stats['fused'] += 1
+            self.stats['triggered'] += 1
+            
+            symbol_str = symbols[0] if symbols else 'N/A'
+            logger.info(
+                f"✅ {score_info['trigger_reason']} | "
+                f"{score_info['classified_source']} | "
+                f"{symbol_str} | "
+                f"分数{score_info['total_score']:.0f}"
+            )
+        else:
+            # 不满足触发条件，等待聚合或过滤
+            self.stats['filtered'] += 1
     
     async def process_events(self):
         """处理事件流"""
@@ -392,96 +509,14 @@ class FusionEngineV3:
                 if not events:
                     continue
                 
-                import time
-                current_time = time.time()
+                current_time = self.clock()
                 
                 # 先刷新过期事件
-                expired_events = self.aggregator.flush_expired(current_time)
-                for exp_evt in expired_events:
-                    exp_fused = self.format_super_event(exp_evt)
-                    
-                    # 只输出触发的事件
-                    if exp_fused['should_trigger'] == '1':
-                        self.redis.push_event(output_stream, exp_fused)
-                        self.stats['fused'] += 1
-                        self.stats['triggered'] += 1
-                        
-                        if exp_evt['is_super_event']:
-                            logger.info(
-                                f"🔥 超级事件: {exp_evt['symbol']} | "
-                                f"{exp_evt['exchange_count']}所确认 | "
-                                f"分数{exp_evt['final_score']:.0f}"
-                            )
-                    else:
-                        self.stats['filtered'] += 1
+                self.flush_aggregates(output_stream, current_time)
                 
                 for stream, messages in events:
                     for message_id, raw_msg in messages:
-                        self.stats['processed'] += 1
-                        
-                        # 解析 JSON（event_data 字段是 JSON 字符串）
-                        try:
-                            if 'event_data' in raw_msg:
-                                event_data = json.loads(raw_msg['event_data'])
-                            else:
-                                event_data = raw_msg  # 兼容旧格式
-                        except (json.JSONDecodeError, TypeError) as e:
-                            logger.warning(f"JSON 解析失败: {e}")
-                            self.redis.ack_message(stream_name, consumer_group, message_id)
-                            continue
-                        
-                        # 去重
-                        if self.scorer.is_duplicate(event_data):
-                            self.stats['duplicates'] += 1
-                            self.redis.ack_message(stream_name, consumer_group, message_id)
-                            continue
-                        
-                        # 计算评分
-                        score_info = self.scorer.calculate_score(event_data)
-                        
-                        # 提取 symbol 用于聚合
-                        symbols = score_info.get('symbols', [])
-                        primary_symbol = symbols[0] if symbols else ''
-                        
-                        # 尝试聚合
-                        super_event = self.aggregator.add_event(
-                            primary_symbol, event_data, score_info, current_time
-                        )
-                        
-                        if super_event:
-                            # 多源确认，立即输出
-                            fused_event = self.format_super_event(super_event)
-                            
-                            if fused_event['should_trigger'] == '1':
-                                self.redis.push_event(output_stream, fused_event)
-                                self.stats['fused'] += 1
-                                self.stats['triggered'] += 1
-                                
-                                logger.info(
-                                    f"🔥 多所确认: {super_event['symbol']} | "
-                                    f"{super_event['exchanges']} | "
-                                    f"分数{super_event['final_score']:.0f}"
-                                )
-                            else:
-                                self.stats['filtered'] += 1
-                        
-                        elif score_info['should_trigger']:
-                            # 单源但满足触发条件（Tier-S源或高分）
-                            fused_event = self.format_fused_event(event_data, score_info)
-                            self.redis.push_event(output_stream, fused_event)
-                            self.stats['fused'] += 1
-                            self.stats['triggered'] += 1
-                            
-                            symbol_str = symbols[0] if symbols else 'N/A'
-                            logger.info(
-                                f"✅ {score_info['trigger_reason']} | "
-                                f"{score_info['classified_source']} | "
-                                f"{symbol_str} | "
-                                f"分数{score_info['total_score']:.0f}"
-                            )
-                        else:
-                            # 不满足触发条件，等待聚合或过滤
-                            self.stats['filtered'] += 1
+                        self.process_message(raw_msg, output_stream, current_time)
                         
                         # ACK
                         self.redis.ack_message(stream_name, consumer_group, message_id)
@@ -528,6 +563,8 @@ class FusionEngineV3:
     async def run(self):
         """运行引擎"""
         self.start_heartbeat_thread()
+        register_stats('crypto_fusion', self.stats, engine='v3')
+        start_metrics_server('fusion_v3')
         logger.info("=" * 60)
         logger.info("Fusion Engine v3 (机构级评分) 启动")
         logger.info(f"触发阈值: {TRIGGER_THRESHOLD} | Tier-S源: {len(TIER_S_SOURCES)}个")
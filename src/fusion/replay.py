@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Fusion Replay - 融合引擎确定性回放
+==================================
+
+把录制的 events:raw（Redis Stream / Parquet 归档 / JSONL）按原始顺序送入融合引擎：
+1. 注入回放时钟 - 评分时效、聚合窗口、输出 ts 都使用事件时间（Stream ID 毫秒）
+2. 回放速度 - N 倍实时速度，或不等待（尽可能快）
+3. 捕获输出 - 本应写入 events:fused 的事件写入 JSONL 文件，不碰线上 Stream
+4. 吞吐统计 + 触发结果对比，部署新评分版本前可以 diff 两次回放
+
+与线上消费的差异：事件逐条处理（不做批内 Tier-1 优先），每条事件前刷新一次过期聚合，
+结束时把时钟推过聚合窗口输出剩余事件。同一输入、同一代码的两次回放结果完全一致。
+
+用法:
+    python -m src.fusion.replay run --source redis --start - --end + --output data/replay/fused.jsonl
+    python -m src.fusion.replay run --source archive --start 2024-06-01 --end 2024-06-02 --speed 10
+    python -m src.fusion.replay run --source jsonl --path events.jsonl --engine turbo
+    python -m src.fusion.replay diff data/replay/old.jsonl data/replay/new.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 添加 core 层路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from core.codec import binary_client, decode_entries
+from core.logging import get_logger
+from core.trace import TRACE_FIELD
+
+from .fusion_engine_turbo import FusionEngineTurbo, AGGREGATION_WINDOW
+from .fusion_engine_v3 import FusionEngineV3
+
+logger = get_logger('fusion_replay')
+
+RAW_STREAM = 'events:raw'
+FUSED_STREAM = 'events:fused'
+
+# XRANGE 分页大小
+REDIS_PAGE_SIZE = 1000
+
+# 聚合窗口到期输出的事件，source_id 为 flush:<推进时钟的原始事件 ID>（结束时为 flush:end）
+FLUSH_PREFIX = 'flush:'
+
+# v3 的聚合窗口（SuperEventAggregator 默认 5 秒）
+V3_AGGREGATION_WINDOW = 5
+
+ENGINES = ('v3', 'turbo')
+
+RawEntry = Tuple[str, Dict[str, str]]  # (stream_id, 字段)，与 XRANGE 返回格式一致
+
+
+def stream_id_ts(stream_id: str) -> float:
+    """Stream ID 中的毫秒时间戳 -> Unix 秒"""
+    return int(str(stream_id).split('-', 1)[0]) / 1000
+
+
+class ReplayClock:
+    """回放时钟：返回当前回放到的事件时间，只向前走"""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance_to(self, ts: float):
+        if ts > self.now:
+            self.now = ts
+
+
+class FusedCapture:
+    """
+    输出捕获器
+
+    作为引擎的 redis_client 注入，只实现引擎处理路径用到的 push_event，
+    每条输出记录触发它的原始事件 ID 和回放时间
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.records: List[dict] = []
+        self.source_id = ''
+        self._clock: Optional[ReplayClock] = None
+        self._seq = 0
+        self._file = None
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(path, 'w', encoding='utf-8')
+
+    def bind(self, clock: ReplayClock):
+        self._clock = clock
+
+    def push_event(self, stream_key: str, event_data: dict, maxlen: int = 10000) -> str:
+        ts_ms = int((self._clock() if self._clock else time.time()) * 1000)
+        self._seq += 1
+        record = {
+            'id': f'{ts_ms}-{self._seq}',
+            'stream': stream_key,
+            'source_id': self.source_id,
+            'event': event_data,
+        }
+        self.records.append(record)
+        if self._file:
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return record['id']
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+# ==================== 数据源 ====================
+
+def iter_redis(redis_client, stream: str = RAW_STREAM, start: str = '-', end: str = '+',
+               page_size: int = REDIS_PAGE_SIZE) -> Iterator[RawEntry]:
+    """分页 XRANGE 读取 Stream（解码方式与线上消费一致）"""
+    client = binary_client(redis_client)
+    cursor = start
+    while True:
+        entries = decode_entries(client.xrange(stream, min=cursor, max=end, count=page_size))
+        if not entries:
+            return
+        yield from entries
+        if len(entries) < page_size:
+            return
+        cursor = f'({entries[-1][0]}'
+
+
+def iter_archive(base_dir: Optional[str], stream: str, start, end=None,
+                 symbols: Optional[Iterable[str]] = None) -> Iterator[RawEntry]:
+    """读取 services.event_tiering 写出的 Parquet 归档"""
+    try:
+        from src.services.event_tiering import EventArchiveReader
+    except ImportError:
+        from services.event_tiering import EventArchiveReader
+
+    yield from EventArchiveReader(base_dir).events(stream, start, end, symbols)
+
+
+def iter_jsonl(path: str) -> Iterator[RawEntry]:
+    """读取 JSONL，每行 {"id": "<stream_id>", "data": {...}}"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            yield record['id'], record['data']
+
+
+# ==================== 回放 ====================
+
+class FusionReplayer:
+    """融合引擎回放器"""
+
+    def __init__(self, engine: str = 'v3', output_path: Optional[str] = None,
+                 config_path: str = 'config.yaml'):
+        if engine not in ENGINES:
+            raise ValueError(f"未知引擎: {engine}（可选 {', '.join(ENGINES)}）")
+        self.engine_name = engine
+        self.clock = ReplayClock()
+        self.capture = FusedCapture(output_path)
+        self.capture.bind(self.clock)
+
+        if engine == 'turbo':
+            self.engine = FusionEngineTurbo(config_path, redis_client=self.capture, clock=self.clock)
+            self.window = AGGREGATION_WINDOW
+        else:
+            self.engine = FusionEngineV3(config_path, redis_client=self.capture, clock=self.clock)
+            self.window = V3_AGGREGATION_WINDOW
+        self.engine.running = False
+
+        stream_cfg = self.engine.config.get('stream', {})
+        self.output_stream = stream_cfg.get('fused_events', FUSED_STREAM)
+
+    def step(self, stream_id: str, fields: Dict[str, str]):
+        """处理一条原始事件"""
+        now = stream_id_ts(stream_id)
+        self.clock.advance_to(now)
+        # 录制事件的链路打点是历史墙钟时间，回放中不再统计
+        fields.pop(TRACE_FIELD, None)
+
+        # 窗口到期输出的聚合事件与本条事件无关，单独标记
+        self.capture.source_id = f'{FLUSH_PREFIX}{stream_id}'
+        self.engine.flush_aggregates(self.output_stream, self.clock())
+        self.capture.source_id = stream_id
+        if self.engine_name == 'turbo':
+            if self.engine.is_duplicate(fields):
+                return
+            self.engine.process_event(fields, self.output_stream, self.clock())
+        else:
+            self.engine.process_message(fields, self.output_stream, self.clock())
+
+    def finish(self):
+        """时钟推过聚合窗口，输出剩余的聚合事件"""
+        self.capture.source_id = f'{FLUSH_PREFIX}end'
+        self.clock.advance_to(self.clock() + self.window)
+        self.engine.flush_aggregates(self.output_stream, self.clock())
+
+    async def run(self, entries: Iterable[RawEntry], speed: Optional[float] = None) -> dict:
+        """
+        回放事件
+
+        Args:
+            entries: (stream_id, 字段) 序列，按 ID 递增
+            speed: 回放倍速（事件间隔 / speed）；None 或 0 表示不等待
+        """
+        count = 0
+        first_ts = last_ts = None
+        wall_start = time.perf_counter()
+
+        for stream_id, fields in entries:
+            ts = stream_id_ts(stream_id)
+            if speed and last_ts is not None and ts > last_ts:
+                await asyncio.sleep((ts - last_ts) / speed)
+            if first_ts is None:
+                first_ts = ts
+            last_ts = max(ts, last_ts or ts)
+
+            try:
+                self.step(stream_id, dict(fields))
+            except Exception as e:
+                logger.error(f"回放事件 {stream_id} 失败: {e}")
+            count += 1
+            if count % 10000 == 0:
+                logger.info(f"已回放 {count} 条")
+
+        self.finish()
+        elapsed = time.perf_counter() - wall_start
+        self.capture.close()
+
+        report = {
+            'engine': self.engine_name,
+            'events': count,
+            'emitted': len(self.capture.records),
+            'triggered': sum(
+                1 for r in self.capture.records if r['event'].get('should_trigger') == '1'
+            ),
+            'elapsed_seconds': round(elapsed, 3),
+            'events_per_second': round(count / elapsed, 1) if elapsed > 0 else 0,
+            'recorded_span_seconds': round(last_ts - first_ts, 3) if count else 0,
+            'speed': speed or 'max',
+            'output': self.capture.path,
+            'engine_stats': dict(self.engine.stats),
+        }
+        return report
+
+
+# ==================== 结果对比 ====================
+
+def _load_capture(path: str) -> Dict[tuple, List[dict]]:
+    """按 (触发事件 ID, symbols) 索引回放输出，同一键的多条输出按出现顺序保留"""
+    records: Dict[tuple, List[dict]] = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            event = record['event']
+            records.setdefault((record.get('source_id', ''), event.get('symbols', '')), []).append(event)
+    return records
+
+
+def diff_captures(path_a: str, path_b: str) -> dict:
+    """
+    对比两次回放的触发结果
+
+    同一键（触发事件 ID + symbols）的多条输出按出现顺序一一对应，多出的计入 only_a / only_b
+
+    Returns:
+        only_a / only_b: 只在一侧输出的事件
+        changed: 两侧都输出但触发结论、原因或分数不同的事件
+        collisions: 每侧有多条输出的键数
+    """
+    a = _load_capture(path_a)
+    b = _load_capture(path_b)
+    fields = ('should_trigger', 'trigger_reason', 'score', 'event_type')
+
+    def brief(key, index, event):
+        return {
+            'source_id': key[0],
+            'symbols': key[1],
+            'index': index,
+            **{f: event.get(f, '') for f in fields},
+        }
+
+    only_a, only_b, changed = [], [], []
+    for key in sorted(a.keys() | b.keys()):
+        events_a, events_b = a.get(key, []), b.get(key, [])
+        for index, (ea, eb) in enumerate(zip(events_a, events_b)):
+            diffs = {f: (ea.get(f, ''), eb.get(f, '')) for f in fields if ea.get(f, '') != eb.get(f, '')}
+            if diffs:
+                changed.append({'source_id': key[0], 'symbols': key[1], 'index': index, 'diff': diffs})
+        common = min(len(events_a), len(events_b))
+        only_a.extend(brief(key, i, e) for i, e in enumerate(events_a[common:], common))
+        only_b.extend(brief(key, i, e) for i, e in enumerate(events_b[common:], common))
+
+    return {
+        'total_a': sum(len(v) for v in a.values()),
+        'total_b': sum(len(v) for v in b.values()),
+        'collisions': {
+            'a': sum(1 for v in a.values() if len(v) > 1),
+            'b': sum(1 for v in b.values() if len(v) > 1),
+        },
+        'only_a': only_a,
+        'only_b': only_b,
+        'changed': changed,
+    }
+
+
+# ==================== 入口 ====================
+
+_STREAM_ID_RE = re.compile(r'(\d+)-(\d+)')
+
+
+def parse_time_arg(value: str) -> int:
+    """
+    --start / --end -> 毫秒时间戳
+
+    支持: ISO 日期或时间（无时区按 UTC）、毫秒/秒时间戳、Stream ID（取毫秒部分）
+    """
+    value = value.strip()
+    match = _STREAM_ID_RE.fullmatch(value)
+    if match:
+        return int(match.group(1))
+    if value.isdigit():
+        ts = int(value)
+        return ts if ts > 1e12 else ts * 1000
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"无法解析时间: {value}（支持 ISO 时间、秒/毫秒时间戳、Stream ID）")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def _redis_bound(value: Optional[str], default: str, end: bool = False) -> str:
+    """XRANGE 边界：-/+ 和 Stream ID 原样使用，时间转为毫秒（结束时间不含）"""
+    if not value or value in ('-', '+') or _STREAM_ID_RE.fullmatch(value.strip()):
+        return value or default
+    ms = parse_time_arg(value)
+    return str(ms - 1) if end else str(ms)
+
+
+def _archive_bound(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    return datetime.fromtimestamp(parse_time_arg(value) / 1000, tz=timezone.utc)
+
+
+def _build_entries(args) -> Iterable[RawEntry]:
+    if args.source == 'redis':
+        try:
+            from src.core.redis_client import RedisClient
+        except ImportError:
+            from core.redis_client import RedisClient
+        return iter_redis(
+            RedisClient.from_env(), args.stream,
+            _redis_bound(args.start, '-'), _redis_bound(args.end, '+', end=True),
+        )
+    if args.source == 'archive':
+        if not args.start:
+            raise SystemExit('--source archive 需要 --start')
+        return iter_archive(args.path, args.stream, _archive_bound(args.start), _archive_bound(args.end))
+    if not args.path:
+        raise SystemExit('--source jsonl 需要 --path')
+    return iter_jsonl(args.path)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='融合引擎确定性回放')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run_p = sub.add_parser('run', help='回放录制的原始事件')
+    run_p.add_argument('--source', choices=('redis', 'archive', 'jsonl'), default='redis')
+    run_p.add_argument('--path', help='归档目录（archive）或 JSONL 文件（jsonl）')
+    run_p.add_argument('--stream', default=RAW_STREAM)
+    run_p.add_argument('--start', help='起始 Stream ID、ISO 时间或秒/毫秒时间戳')
+    run_p.add_argument('--end', help='结束 Stream ID、ISO 时间或秒/毫秒时间戳（时间不含）')
+    run_p.add_argument('--engine', choices=ENGINES, default='v3')
+    run_p.add_argument('--config', default='config.yaml')
+    run_p.add_argument('--speed', type=float, default=0, help='回放倍速，0 表示尽可能快')
+    run_p.add_argument('--output', default='data/replay/fused.jsonl')
+
+    diff_p = sub.add_parser('diff', help='对比两次回放的输出')
+    diff_p.add_argument('a')
+    diff_p.add_argument('b')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'diff':
+        print(json.dumps(diff_captures(args.a, args.b), ensure_ascii=False, indent=2))
+        return
+
+    replayer = FusionReplayer(args.engine, args.output, args.config)
+    report = asyncio.run(replayer.run(_build_entries(args), speed=args.speed or None))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
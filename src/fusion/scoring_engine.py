@@ -23,21 +23,31 @@ Scoring Engine v4 - 新币信号评分体系（市场真实情况版）
 
 评分公式：
 final_score = (base_score + event_score) × exchange_mult × freshness_mult + multi_exchange_bonus
+
+回测/历史重算用 InstitutionalScorer.score_batch（列式输入，向量化，需要 numpy）
 """
 
 import json
 import re
 import hashlib
 import sys
+import time
 from pathlib import Path
-from datetime import datetime, timezone
 from collections import defaultdict
-from typing import Dict, List, Set, Tuple, Optional
+from typing import Callable, Dict, List, Set, Tuple, Optional
 
 # 添加 core 层路径
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from core.symbols import extract_symbols as core_extract_symbols
 from core.utils import generate_event_hash
+from core.dedup import Deduplicator
+
+# NumPy（可选，仅批量评分 score_batch 使用）
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
 
 
 # ============================================================
@@ -223,20 +233,24 @@ MULTI_SOURCE_CONFIG = {
 # 时效性乘数
 # ============================================================
 
+# (距首次出现秒数上限, 乘数)，按上限升序；批量评分共用同一张表
+FRESHNESS_STEPS = (
+    (30, 1.3),      # 首发30秒内，加成30%
+    (120, 1.1),     # 2分钟内
+    (300, 1.0),     # 5分钟内
+    (600, 0.8),     # 10分钟内
+)
+FRESHNESS_FLOOR = 0.5   # 超过10分钟，大幅降权
+
+
 def get_freshness_multiplier(seconds_ago: float) -> float:
     """
     越早发现，分数越高
     """
-    if seconds_ago < 30:
-        return 1.3      # 首发30秒内，加成30%
-    elif seconds_ago < 120:
-        return 1.1      # 2分钟内
-    elif seconds_ago < 300:
-        return 1.0      # 5分钟内
-    elif seconds_ago < 600:
-        return 0.8      # 10分钟内
-    else:
-        return 0.5      # 超过10分钟，大幅降权
+    for limit, mult in FRESHNESS_STEPS:
+        if seconds_ago < limit:
+            return mult
+    return FRESHNESS_FLOOR
 
 
 # ============================================================
@@ -336,6 +350,10 @@ VALID_SPOT_EVENTS = {
 
 # 韩国交易所
 KOREAN_EXCHANGES = {'upbit', 'bithumb', 'coinone', 'korbit', 'gopax'}
+KOREAN_ARB_BONUS = 20   # 韩国套利加分
+
+# 官方来源触发所需的头部交易所
+TIER1_TRIGGER_EXCHANGES = ('binance', 'coinbase', 'upbit', 'okx')
 
 TRIGGER_THRESHOLD = 60  # 最低触发分数（v4 提高阈值）
 
@@ -396,6 +414,57 @@ def detect_event_type(event: dict) -> str:
     return 'unknown'
 
 
+# ============================================================
+# 批量评分辅助（NumPy）
+# ============================================================
+
+# score_batch 输入列
+BATCH_COLUMNS = ('source', 'exchange', 'event_type', 'timestamp', 'symbol')
+
+
+def _batch_column(batch, name: str):
+    """取一列为 NumPy 数组（dict / DataFrame / pyarrow.Table 均可）"""
+    if hasattr(batch, 'column_names'):
+        return batch.column(name).to_numpy(zero_copy_only=False)
+    return np.asarray(batch[name])
+
+
+def _encode_strings(values, lower: bool = False):
+    """字符串列字典编码，返回 (唯一值, 每行编码)；None 视为空串"""
+    values = np.asarray(values, dtype=object)
+    values = np.where(values == None, '', values).astype(str)  # noqa: E711
+    if lower:
+        values = np.char.lower(values)
+    uniques, codes = np.unique(values, return_inverse=True)
+    return uniques.tolist(), codes.reshape(-1)
+
+
+def _lookup(uniques: list, codes, table: dict, default):
+    """按唯一值查表，再展开到每行"""
+    return np.array([table.get(u, default) for u in uniques])[codes]
+
+
+def _member(uniques: list, codes, members) -> 'np.ndarray':
+    return np.array([u in members for u in uniques], dtype=bool)[codes]
+
+
+def _session_cumsum(flags, session, session_start):
+    """按会话分段的累计和（各数组已按会话排序）"""
+    cum = np.cumsum(flags)
+    return cum - (cum - flags)[session_start][session]
+
+
+def _session_distinct(keys, session, session_start, mask=None):
+    """每行：所在会话内截至本行出现过的不同 key 数（mask 为 False 的行不计）"""
+    pair = session * (int(keys.max()) + 1 if len(keys) else 1) + keys
+    _, first = np.unique(pair, return_index=True)
+    flags = np.zeros(len(keys), dtype=np.int64)
+    flags[first] = 1
+    if mask is not None:
+        flags[~mask] = 0
+    return _session_cumsum(flags, session, session_start)
+
+
 # ============================================================
 # 评分器
 # ============================================================
@@ -403,9 +472,14 @@ def detect_event_type(event: dict) -> str:
 class InstitutionalScorer:
     """机构级评分器 v4"""
     
-    def __init__(self):
+    def __init__(self, clock: Optional[Callable[[], float]] = None):
+        """
+        Args:
+            clock: 返回 Unix 时间戳（秒）的时钟，默认墙钟；回放时注入事件时间
+        """
+        self.clock = clock or time.time
         self.recent_events: Dict[str, List[dict]] = defaultdict(list)
-        self.event_hashes: Set[str] = set()
+        self.dedup = Deduplicator('scorer_events', clock=self.clock)
         self.symbol_first_seen: Dict[str, float] = {}
         self.symbol_sources: Dict[str, Set[str]] = defaultdict(set)
         self.symbol_exchanges: Dict[str, Set[str]] = defaultdict(set)
@@ -621,7 +695,7 @@ class InstitutionalScorer:
                 'available_exchanges': other_exchanges,
                 'reason': 'Korean pump arbitrage',
                 'expected_pump': '30-100%',
-                'score_bonus': 20,
+                'score_bonus': KOREAN_ARB_BONUS,
             }
         return None
     
@@ -641,7 +715,7 @@ class InstitutionalScorer:
         
         # 条件2：官方确认 + 头部交易所
         if classified_source in OFFICIAL_SOURCES:
-            if exchange in ('binance', 'coinbase', 'upbit', 'okx'):
+            if exchange in TIER1_TRIGGER_EXCHANGES:
                 if final_score >= 60:
                     return True, f"官方+Tier1所({exchange})"
         
@@ -672,7 +746,7 @@ class InstitutionalScorer:
         - redis_client: Redis 连接（用于检查 known_pairs）
         - logger: 日志记录器（用于记录评分明细）
         """
-        current_time = datetime.now(timezone.utc).timestamp()
+        current_time = self.clock()
         symbols = self.extract_symbols(event)
         primary_symbol = symbols[0] if symbols else ''
         exchange = (event.get('exchange', '') or '').lower()
@@ -780,10 +854,153 @@ class InstitutionalScorer:
     
     def is_duplicate(self, event: dict) -> bool:
         """检查事件是否重复"""
-        h = self.get_event_hash(event)
-        if h in self.event_hashes:
-            return True
-        self.event_hashes.add(h)
-        if len(self.event_hashes) > 10000:
-            self.event_hashes = set(list(self.event_hashes)[-5000:])
-        return False
+        return self.dedup.seen(self.get_event_hash(event))
+    
+    # ==================== 批量评分 ====================
+    
+    def batch_columns(self, events: List[dict], timestamps) -> Dict[str, 'np.ndarray']:
+        """
+        原始事件 → score_batch 输入列
+        
+        来源分类、事件类型检测、符号提取是逐条的字符串处理，只做一次；
+        之后可对同一批列反复换评分表重算
+        
+        参数：
+        - events: 原始事件（字段同 events:raw），按处理顺序排列
+        - timestamps: 每条事件的处理时间（Unix 秒），如 Stream ID 时间
+        """
+        if not HAS_NUMPY:
+            raise ImportError("请安装 numpy: pip install numpy")
+        symbols = [self.extract_symbols(event) for event in events]
+        return {
+            'source': np.array([self.classify_source(event) for event in events], dtype=object),
+            'exchange': np.array([(event.get('exchange', '') or '').lower() for event in events], dtype=object),
+            'event_type': np.array([detect_event_type(event) for event in events], dtype=object),
+            'timestamp': np.asarray(timestamps, dtype=np.float64),
+            'symbol': np.array([s[0] if s else '' for s in symbols], dtype=object),
+        }
+    
+    def score_batch(self, batch, source_scores: Optional[dict] = None,
+                    event_type_scores: Optional[dict] = None,
+                    exchange_multipliers: Optional[dict] = None) -> Dict[str, 'np.ndarray']:
+        """
+        批量评分（向量化），用于回测和历史事件重算
+        
+        结果与新建评分器按行序逐条 calculate_score(event)（时钟为 timestamp 列、
+        不传 redis_client）一致：时效性按符号首次出现计算，多源/多交易所加分按
+        10 分钟会话累计，韩国套利只看会话内已出现的交易所。不读写本评分器的状态。
+        
+        参数：
+        - batch: 列式事件，dict / DataFrame / pyarrow.Table，列见 BATCH_COLUMNS：
+            source      classify_source() 结果
+            exchange    交易所
+            event_type  detect_event_type() 结果
+            timestamp   处理时间（Unix 秒）
+            symbol      主符号（'' 表示无），或整数符号 ID（负数表示无）
+          可由 batch_columns() 从原始事件生成
+        - source_scores / event_type_scores / exchange_multipliers: 替换对应评分表（试验新参数）
+        
+        返回：{列名: NumPy 数组}，分数未取整（逐条结果为 round(x, 1)），可直接 pyarrow.table(result)
+        """
+        if not HAS_NUMPY:
+            raise ImportError("请安装 numpy: pip install numpy")
+        source_scores = SOURCE_SCORES if source_scores is None else source_scores
+        event_type_scores = EVENT_TYPE_SCORES if event_type_scores is None else event_type_scores
+        exchange_multipliers = EXCHANGE_MULTIPLIERS if exchange_multipliers is None else exchange_multipliers
+        
+        ts = _batch_column(batch, 'timestamp').astype(np.float64)
+        n = len(ts)
+        sources, source_codes = _encode_strings(_batch_column(batch, 'source'))
+        exchanges, exchange_codes = _encode_strings(_batch_column(batch, 'exchange'), lower=True)
+        event_types, event_type_codes = _encode_strings(_batch_column(batch, 'event_type'))
+        
+        symbol_col = _batch_column(batch, 'symbol')
+        if symbol_col.dtype.kind in 'iu':
+            has_symbol = symbol_col >= 0
+            _, symbol_codes = np.unique(np.where(has_symbol, symbol_col, -1), return_inverse=True)
+            symbol_codes = symbol_codes.reshape(-1)
+        else:
+            symbols, symbol_codes = _encode_strings(symbol_col)
+            has_symbol = np.array([s != '' for s in symbols], dtype=bool)[symbol_codes]
+        
+        # 1-3. 基础分、类型分、交易所乘数
+        base_score = _lookup(sources, source_codes, source_scores, 0)
+        event_score = _lookup(event_types, event_type_codes, event_type_scores, 10)
+        default_mult = exchange_multipliers.get('default', EXCHANGE_MULTIPLIERS['default'])
+        exchange_mult = _lookup(exchanges, exchange_codes, exchange_multipliers, default_mult)
+        
+        # 4. 时效性：距该符号首次出现的秒数（无符号的事件共用一个空符号）
+        _, first_row = np.unique(symbol_codes, return_index=True)
+        first_row = first_row[symbol_codes]
+        seconds_ago = ts - ts[first_row]
+        is_first = first_row == np.arange(n)
+        freshness_mult = np.select(
+            [seconds_ago < limit for limit, _ in FRESHNESS_STEPS],
+            [mult for _, mult in FRESHNESS_STEPS],
+            FRESHNESS_FLOOR,
+        )
+        
+        # 5. 多源/多交易所：按符号稳定排序，同符号相邻事件间隔超过窗口即开始新会话
+        window = MULTI_SOURCE_CONFIG['window_seconds']
+        order = np.argsort(symbol_codes, kind='stable')
+        sorted_symbols, sorted_ts = symbol_codes[order], ts[order]
+        new_session = np.ones(n, dtype=bool)
+        new_session[1:] = (sorted_symbols[1:] != sorted_symbols[:-1]) | (sorted_ts[1:] - sorted_ts[:-1] > window)
+        session = np.cumsum(new_session) - 1
+        session_start = np.flatnonzero(new_session)
+        
+        has_exchange = np.array([e != '' for e in exchanges], dtype=bool)[exchange_codes]
+        source_count = np.empty(n, dtype=np.int64)
+        exchange_count = np.empty(n, dtype=np.int64)
+        source_count[order] = _session_distinct(source_codes[order], session, session_start)
+        exchange_count[order] = _session_distinct(
+            exchange_codes[order], session, session_start, has_exchange[order]
+        )
+        source_count[~has_symbol] = 1
+        exchange_count[~has_symbol] = 1
+        
+        exchange_bonus = np.array([0, 0] + [MULTI_EXCHANGE_BONUS[i] for i in (2, 3, 4)])
+        source_bonus = np.array([0, 0] + [MULTI_SOURCE_BONUS[i] for i in (2, 3, 4)])
+        multi_bonus = np.maximum(
+            exchange_bonus[np.minimum(exchange_count, 4)],
+            source_bonus[np.minimum(source_count, 4)],
+        )
+        multi_bonus[~has_symbol] = 0
+        
+        # 6. 韩国套利：韩国所事件 + 会话内已有非韩国所
+        is_korean = _member(exchanges, exchange_codes, KOREAN_EXCHANGES)
+        other_exchange = (has_exchange & ~is_korean).astype(np.int64)
+        has_other = np.empty(n, dtype=bool)
+        has_other[order] = _session_cumsum(other_exchange[order], session, session_start) > 0
+        korean_arb = is_korean & has_symbol & has_other
+        korean_bonus = np.where(korean_arb, KOREAN_ARB_BONUS, 0)
+        
+        # 7. 总分（运算顺序与 calculate_score 一致，浮点结果逐位相同）
+        post_mult = (base_score + event_score) * exchange_mult * freshness_mult
+        total_score = post_mult + multi_bonus + korean_bonus
+        
+        # 8. 触发条件（同 should_trigger）
+        should_trigger = _member(event_types, event_type_codes, VALID_SPOT_EVENTS) & (
+            (_member(sources, source_codes, TIER_S_SOURCES) & (total_score >= 50))
+            | (_member(sources, source_codes, OFFICIAL_SOURCES)
+               & _member(exchanges, exchange_codes, TIER1_TRIGGER_EXCHANGES)
+               & (total_score >= 60))
+            | ((exchange_count >= 2) & (total_score >= 50))
+            | korean_arb
+            | (total_score >= TRIGGER_THRESHOLD)
+        )
+        
+        return {
+            'total_score': total_score,
+            'base_score': base_score,
+            'event_score': event_score,
+            'exchange_multiplier': exchange_mult,
+            'freshness_multiplier': freshness_mult,
+            'multi_bonus': multi_bonus,
+            'korean_bonus': korean_bonus,
+            'source_count': source_count,
+            'exchange_count': exchange_count,
+            'is_first': is_first,
+            'seconds_ago': seconds_ago,
+            'should_trigger': should_trigger,
+        }
@@ -22,6 +22,7 @@ import aiohttp
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from core.logging import get_logger
 from core.redis_client import RedisClient
+from core.trace import LatencyRecorder, stamp
 import yaml
 
 logger = get_logger('signal_router')
@@ -50,7 +51,7 @@ class SignalRouter:
         
         self.config = {}
         if Path(config_path).exists():
-        with open(config_path) as f:
+            with open(config_path) as f:
                 self.config = yaml.safe_load(f) or {}
         
         # 设置默认 stream 配置
@@ -66,6 +67,7 @@ class SignalRouter:
         
         # 连接 Redis（从环境变量读取配置）
         self.redis = RedisClient.from_env()
+        self.tracer = LatencyRecorder(self.redis)
         
         self.running = True
         self.cex_symbols: Dict[str, set] = {}
@@ -357,6 +359,7 @@ class SignalRouter:
                 for stream, messages in events:
                     for message_id, event_data in messages:
                         self.stats['processed'] += 1
+                        stamp(event_data, 'router_in')
                         
                         # 确定路由
                         route_type, route_info = self.determine_route(event_data)
@@ -385,9 +388,11 @@ class SignalRouter:
                             **event_data,
                             'route_id': route_id,
                             'route_type': route_type,
-                            'route_info': json.dumps(route_info),
+                            'route_info': route_info,
                             'routed_at': str(int(datetime.now(timezone.utc).timestamp() * 1000)),
                         }
+                        stamp(routed_event, 'router_emit')
+                        self.tracer.observe(routed_event, start_hop='router_in')
                         
                         # 推送到对应队列
                         if route_type == 'cex_spot':
@@ -30,6 +30,8 @@ from enum import Enum
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from core.logging import get_logger
 from core.redis_client import RedisClient
+from core.trace import LatencyRecorder, stamp
+from core.metrics import EVENTS, PUSH_SECONDS, QUEUE_DEPTH, register_stats, start_metrics_server
 
 logger = get_logger('turbo_pusher')
 
@@ -54,6 +56,7 @@ class TurboPusher:
     
     def __init__(self):
         self.redis: Optional[RedisClient] = None
+        self.tracer: Optional[LatencyRecorder] = None
         self.session: Optional[aiohttp.ClientSession] = None
         self.running = True
         
@@ -87,6 +90,7 @@ class TurboPusher:
     async def init(self):
         """初始化"""
         self.redis = RedisClient.from_env()
+        self.tracer = LatencyRecorder(self.redis)
         logger.info("✅ Redis 连接成功")
         
         connector = aiohttp.TCPConnector(
@@ -220,11 +224,10 @@ class TurboPusher:
             logger.warning("未配置 WECHAT_WEBHOOK")
             return False
         
+        start = time.time()
         try:
             # 尝试 Markdown 格式
             payload = self.format_wechat_message(event)
-            
-            start = time.time()
             async with self.session.post(self.wechat_webhook, json=payload) as resp:
                 latency = (time.time() - start) * 1000
                 
@@ -238,16 +241,19 @@ class TurboPusher:
                 
                 if data.get('errcode') == 0:
                     self.stats['sent'] += 1
+                    PUSH_SECONDS.observe(latency / 1000, channel='wechat', result='ok')
                     logger.info(f"✅ 通知发送成功 ({latency:.0f}ms)")
                     return True
                 else:
                     logger.warning(f"通知返回错误: {data}")
                     self.stats['failed'] += 1
+                    PUSH_SECONDS.observe(latency / 1000, channel='wechat', result='rejected')
                     return False
         
         except Exception as e:
             logger.error(f"发送失败: {e}")
             self.stats['failed'] += 1
+            PUSH_SECONDS.observe(time.time() - start, channel='wechat', result='error')
             return False
     
     async def consumer(self):
@@ -276,12 +282,15 @@ class TurboPusher:
                 for stream, messages in events:
                     for message_id, event_data in messages:
                         self.stats['received'] += 1
+                        EVENTS.inc(service='turbo_pusher', source=event_data.get('source', 'unknown'))
                         
                         # 只处理触发的事件
                         if event_data.get('should_trigger') != '1':
                             self.redis.ack_message(stream_name, consumer_group, message_id)
                             continue
                         
+                        stamp(event_data, 'pusher_in')
+                        
                         # 入队
                         priority = self.get_priority(event_data)
                         task = NotificationTask(
@@ -318,6 +327,9 @@ class TurboPusher:
             
             # 发送通知
             success = await self.send_wechat(task.event)
+            if success:
+                stamp(task.event, 'pusher_sent')
+                self.tracer.observe(task.event, final=True)
             
             if not success and task.retry_count < 3:
                 # 重试
@@ -360,9 +372,17 @@ class TurboPusher:
                 f"平均延迟:{self.stats['avg_latency_ms']:.0f}ms"
             )
     
+    def register_metrics(self):
+        """注册 Prometheus 指标（统计字典 + 各优先级队列深度）"""
+        register_stats('crypto_pusher', self.stats, service='turbo_pusher')
+        for priority, queue in self.queues.items():
+            QUEUE_DEPTH.set_function(queue.qsize, service='turbo_pusher', queue=priority.name.lower())
+    
     async def run(self):
         """运行"""
         await self.init()
+        self.register_metrics()
+        start_metrics_server('turbo_pusher')
         
         logger.info("=" * 60)
         logger.info("Turbo Pusher 启动")
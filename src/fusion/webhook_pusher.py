@@ -17,8 +17,10 @@ from pathlib import Path
 
 # 添加 core 层路径
 sys.path.insert(0, str(Path(__file__).parent.parent))
+from core.codec import field_json
 from core.logging import get_logger
 from core.redis_client import RedisClient
+from core.trace import LatencyRecorder, stamp
 
 # 配置
 import os
@@ -29,6 +31,7 @@ logger = get_logger('webhook_pusher')
 
 # 全局变量
 redis_client = None
+tracer = None
 config = None
 running = True
 stats = {
@@ -70,7 +73,7 @@ def format_for_n8n(fused_event):
     n8n_payload = {
         'source': fused_event.get('source', 'fusion_engine'),
         'raw_text': fused_event.get('raw_text', ''),
-        'symbol_hint': fused_event.get('symbol_hint', []),
+        'symbol_hint': field_json(fused_event.get('symbol_hint'), []),
         'exchange': fused_event.get('exchange', ''),
         'url': fused_event.get('url', ''),
         'ts': fused_event.get('ts', int(datetime.now(timezone.utc).timestamp() * 1000))
@@ -79,7 +82,7 @@ def format_for_n8n(fused_event):
     # 可选：添加融合元数据
     # Strategy Generator可以根据source_confidence调整仓位
     if '_fusion' in fused_event:
-        n8n_payload['_fusion'] = fused_event['_fusion']
+        n8n_payload['_fusion'] = field_json(fused_event['_fusion'], {})
     
     return n8n_payload
 
@@ -176,6 +179,7 @@ async def process_fused_events():
                     for message_id, event_data in messages:
                         try:
                             stats['events_processed'] += 1
+                            stamp(event_data, 'pusher_in')
                             
                             # 格式化为n8n格式
                             payload = format_for_n8n(event_data)
@@ -183,6 +187,8 @@ async def process_fused_events():
                             # 发送webhook
                             success = await send_webhook(session, payload)
                             await send_wechat(session, event_data)
+                            stamp(event_data, 'pusher_sent')
+                            tracer.observe(event_data, final=True)
                             
                             # ACK消息
                             redis_client.ack_message(stream_name, consumer_group, message_id)
@@ -221,7 +227,7 @@ async def heartbeat_loop():
 
 async def main():
     """主函数"""
-    global redis_client, running
+    global redis_client, tracer, running
     
     logger.info("=" * 60)
     logger.info("Webhook Pusher 启动")
@@ -232,6 +238,7 @@ async def main():
     
     # 连接 Redis（从环境变量读取配置）
     redis_client = RedisClient.from_env()
+    tracer = LatencyRecorder(redis_client)
     logger.info("✅ Redis连接成功")
     
     # 显示webhook URL
@@ -7,14 +7,24 @@ Whale Analytics Data Models
 - TokenPosition: 单个代币持仓数据
 - WalletAnalytics: 钱包分析数据
 - TradeResult: 交易结果枚举
+
+to_state / from_state 保存原始累计字段，用于增量分析的快照持久化
 """
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from typing import Dict, List, Optional
 from datetime import datetime
 from enum import Enum
 
 
+def _dt_to_state(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _dt_from_state(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
 class TradeResult(Enum):
     """交易结果"""
     WIN = "win"       # 盈利
@@ -145,6 +155,22 @@ class TokenPosition:
             'first_buy_time': self.first_buy_time.isoformat() if self.first_buy_time else None,
             'last_trade_time': self.last_trade_time.isoformat() if self.last_trade_time else None,
         }
+    
+    def to_state(self) -> dict:
+        """导出原始字段（快照持久化）"""
+        state = {f.name: getattr(self, f.name) for f in fields(self)}
+        state['first_buy_time'] = _dt_to_state(self.first_buy_time)
+        state['last_trade_time'] = _dt_to_state(self.last_trade_time)
+        return state
+    
+    @classmethod
+    def from_state(cls, state: dict) -> 'TokenPosition':
+        """从快照恢复"""
+        known = {f.name for f in fields(cls)}
+        position = cls(**{k: v for k, v in state.items() if k in known})
+        position.first_buy_time = _dt_from_state(state.get('first_buy_time'))
+        position.last_trade_time = _dt_from_state(state.get('last_trade_time'))
+        return position
 
 
 @dataclass
@@ -178,6 +204,10 @@ class WalletAnalytics:
     eth_balance: float = 0
     total_portfolio_value: float = 0
     
+    # 增量分析游标（已处理的最大区块）
+    last_eth_block: int = 0
+    last_token_block: int = 0
+    
     @property
     def win_rate(self) -> float:
         """胜率 % (基于已清仓交易)"""
@@ -364,6 +394,46 @@ class WalletAnalytics:
             'analysis_time': self.analysis_time.isoformat() if self.analysis_time else None,
         }
     
+    def to_state(self) -> dict:
+        """导出累计状态（持仓原始字段 + 游标），用于增量分析"""
+        return {
+            'address': self.address,
+            'label': self.label,
+            'category': self.category,
+            'chain': self.chain,
+            'positions': {s: p.to_state() for s, p in self.positions.items()},
+            'total_trades': self.total_trades,
+            'first_trade_time': _dt_to_state(self.first_trade_time),
+            'last_trade_time': _dt_to_state(self.last_trade_time),
+            'analysis_time': _dt_to_state(self.analysis_time),
+            'eth_balance': self.eth_balance,
+            'last_eth_block': self.last_eth_block,
+            'last_token_block': self.last_token_block,
+        }
+    
+    @classmethod
+    def from_state(cls, state: dict) -> 'WalletAnalytics':
+        """从快照恢复（统计字段由 calculate_stats 重新计算）"""
+        analytics = cls(
+            address=state.get('address', ''),
+            label=state.get('label', ''),
+            category=state.get('category', ''),
+            chain=state.get('chain', 'ethereum'),
+            positions={
+                s: TokenPosition.from_state(p)
+                for s, p in (state.get('positions') or {}).items()
+            },
+            total_trades=state.get('total_trades', 0),
+            first_trade_time=_dt_from_state(state.get('first_trade_time')),
+            last_trade_time=_dt_from_state(state.get('last_trade_time')),
+            analysis_time=_dt_from_state(state.get('analysis_time')),
+            eth_balance=state.get('eth_balance', 0),
+            last_eth_block=state.get('last_eth_block', 0),
+            last_token_block=state.get('last_token_block', 0),
+        )
+        analytics.calculate_stats()
+        return analytics
+    
     def to_summary_dict(self) -> dict:
         """转换为摘要字典（用于列表显示）"""
         return {
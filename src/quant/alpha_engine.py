@@ -6,8 +6,8 @@ Alpha Engine V11 - 顶级量化信号引擎
 核心能力:
 1. 多因子评分模型 (Source + Exchange + Timing + Volume + Sentiment)
 2. 机器学习增强 (历史胜率学习)
-3. 实时市场数据融合
-4. 毫秒级响应
+3. 实时市场数据融合 (按 symbol 的 TTL 缓存 + 同一 symbol 并发请求合并)
+4. 毫秒级响应 (Tier-S 候选不等待市场数据，先出信号再异步补全)
 """
 
 import asyncio
@@ -18,7 +18,7 @@ import numpy as np
 from datetime import datetime, timezone
 from collections import defaultdict
 from dataclasses import dataclass, field
-from typing import Dict, List, Set, Optional, Tuple
+from typing import Awaitable, Callable, Dict, List, Set, Optional, Tuple
 from enum import Enum
 import aiohttp
 
@@ -28,6 +28,8 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from core.logging import get_logger
 from core.redis_client import RedisClient
+from core.http_client import create_session
+from core.dedup import Deduplicator
 
 logger = get_logger('alpha_engine')
 
@@ -94,6 +96,31 @@ class AlphaSignal:
     trigger_reason: str = ""
     confidence: float = 0.0
     
+    # 延迟补全 (Tier-S 快速路径): 结果为市场数据字典的 Future
+    enrichment: Optional[asyncio.Future] = field(default=None, repr=False, compare=False)
+    enriched: bool = False
+    
+    def apply_market_data(self, market_data: dict):
+        """补全市场数据，并按新的成交量得分修正总分 (等级不变)"""
+        if self.enriched or not market_data:
+            return
+        self.market_cap = market_data.get('market_cap')
+        self.volume_24h = market_data.get('volume_24h')
+        self.price_change_1h = market_data.get('price_change_1h')
+        volume_score = AlphaEngine.volume_score(market_data)
+        self.total_score = round(self.total_score + (volume_score - self.volume_score) * 0.15, 1)
+        self.volume_score = round(volume_score, 1)
+        self.confidence = round(min(100, self.total_score) / 100.0, 3)
+        self.enriched = True
+    
+    async def wait_enriched(self, timeout: float = 2.0):
+        """等待延迟补全完成 (超时不取消补全任务)"""
+        if self.enrichment is None or self.enriched:
+            return
+        await asyncio.wait({self.enrichment}, timeout=timeout)
+        if self.enrichment.done() and not self.enrichment.cancelled() and not self.enrichment.exception():
+            self.apply_market_data(self.enrichment.result())
+    
     def to_dict(self) -> dict:
         return {
             'id': self.id,
@@ -125,9 +152,91 @@ class AlphaSignal:
             'price_change_1h': self.price_change_1h,
             'trigger_reason': self.trigger_reason,
             'confidence': self.confidence,
+            'enriched': self.enriched,
         }
 
 
+class MarketDataCache:
+    """
+    市场数据缓存
+
+    - 按 symbol 缓存，有数据的结果 ttl 秒，空结果 negative_ttl 秒 (避免反复查无结果的新币)
+    - 同一 symbol 的并发请求共用一个请求任务 (single-flight)
+    - 等待方超时只放弃等待，不取消共享任务，结果仍会写入缓存
+    """
+    
+    def __init__(self, ttl: float = 60, negative_ttl: float = 15, max_entries: int = 2000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[float, dict]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'shared': 0}
+    
+    def peek(self, symbol: str) -> Optional[dict]:
+        """只读缓存，不发请求；未命中或过期返回 None"""
+        entry = self._entries.get(symbol)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if time.time() >= expires_at:
+            del self._entries[symbol]
+            return None
+        return data
+    
+    def _store(self, symbol: str, data: dict):
+        if len(self._entries) >= self.max_entries:
+            now = time.time()
+            expired = [k for k, (exp, _) in self._entries.items() if exp <= now]
+            for k in expired:
+                del self._entries[k]
+            if len(self._entries) >= self.max_entries:
+                # 仍然满了: 丢弃最早写入的 1/4
+                for k in list(self._entries)[:self.max_entries // 4]:
+                    del self._entries[k]
+        self._entries[symbol] = (time.time() + (self.ttl if data else self.negative_ttl), data)
+    
+    def fetch(self, symbol: str, fetcher: Callable[[str], Awaitable[dict]]) -> asyncio.Future:
+        """
+        返回该 symbol 市场数据的 Future: 缓存命中时为已完成的 Future，
+        否则为 (可能与其他调用方共享的) 请求任务
+        """
+        cached = self.peek(symbol)
+        if cached is not None:
+            self.stats['hits'] += 1
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(cached)
+            return future
+        
+        task = self._inflight.get(symbol)
+        if task is not None:
+            self.stats['shared'] += 1
+            return task
+        
+        self.stats['misses'] += 1
+        
+        async def run():
+            try:
+                data = await fetcher(symbol)
+                self._store(symbol, data or {})
+                return data or {}
+            finally:
+                self._inflight.pop(symbol, None)
+        
+        task = asyncio.create_task(run())
+        self._inflight[symbol] = task
+        return task
+    
+    async def get(self, symbol: str, fetcher: Callable[[str], Awaitable[dict]],
+                  timeout: Optional[float] = None) -> dict:
+        """取市场数据，最多等待 timeout 秒 (超时返回空字典)"""
+        future = self.fetch(symbol, fetcher)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            return {}
+
+
 class AlphaEngine:
     """
     顶级量化 Alpha 引擎
@@ -224,7 +333,7 @@ class AlphaEngine:
         self.symbol_sources: Dict[str, Set[str]] = defaultdict(set)
         self.symbol_exchanges: Dict[str, Set[str]] = defaultdict(set)
         self.symbol_timestamps: Dict[str, float] = {}
-        self.event_hashes: Set[str] = set()
+        self.dedup = Deduplicator('alpha_events')
         
         # 历史胜率 (用于ML增强)
         self.source_win_rates: Dict[str, float] = defaultdict(lambda: 0.5)
@@ -237,6 +346,8 @@ class AlphaEngine:
             'tier_a_count': 0,
             'tier_b_count': 0,
             'avg_latency_ms': 0,
+            'fast_path_count': 0,
+            'deferred_enrichments': 0,
         }
         
         # 配置
@@ -248,15 +359,25 @@ class AlphaEngine:
             'tier_s_threshold': 85,
             'tier_a_threshold': 65,
             'tier_b_threshold': 45,
+            'market_data_timeout': 2.0,      # 非快速路径等待市场数据的上限 (秒)
+            'market_data_ttl': 60,           # 市场数据缓存 (秒)
+            'market_data_negative_ttl': 15,  # 空结果缓存 (秒)
+            'tier_s_fast_path': True,        # Tier-S 候选不等待市场数据
         }
         
+        # 市场数据缓存 + 延迟补全任务
+        self.market_cache = MarketDataCache(
+            ttl=self.config['market_data_ttl'],
+            negative_ttl=self.config['market_data_negative_ttl'],
+        )
+        self._background: Set[asyncio.Task] = set()
+        
         logger.info("🧠 Alpha Engine V11 初始化完成")
     
     async def _ensure_session(self):
         if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession(
+            self.session = create_session(
                 timeout=aiohttp.ClientTimeout(total=5),
-                connector=aiohttp.TCPConnector(limit=50)
             )
     
     def _generate_signal_id(self, event: dict) -> str:
@@ -267,13 +388,7 @@ class AlphaEngine:
     def _is_duplicate(self, event: dict) -> bool:
         """去重检测"""
         key = f"{event.get('source', '')}|{event.get('exchange', '')}|{event.get('raw_text', '')[:100]}"
-        h = hashlib.md5(key.encode()).hexdigest()[:16]
-        if h in self.event_hashes:
-            return True
-        self.event_hashes.add(h)
-        if len(self.event_hashes) > 20000:
-            self.event_hashes = set(list(self.event_hashes)[-10000:])
-        return False
+        return self.dedup.seen(key)
     
     def _classify_source(self, event: dict) -> str:
         """智能来源分类"""
@@ -435,7 +550,12 @@ class AlphaEngine:
     
     def _calculate_volume_score(self, market_data: dict) -> float:
         """计算成交量得分"""
-        volume_24h = market_data.get('volume_24h', 0)
+        return self.volume_score(market_data)
+    
+    @staticmethod
+    def volume_score(market_data: dict) -> float:
+        """成交量得分 (无数据时 20 分)"""
+        volume_24h = market_data.get('volume_24h') or 0
         if volume_24h > 10_000_000:
             return 100.0
         elif volume_24h > 1_000_000:
@@ -527,15 +647,21 @@ class AlphaEngine:
             primary_symbol, classified_source, exchange, current_time
         )
         
-        # 市场数据 (异步获取，不阻塞)
-        market_data = {}
-        try:
-            market_data = await asyncio.wait_for(
-                self._fetch_market_data(primary_symbol),
-                timeout=2.0
+        # 市场数据: Tier-S 候选 (等级不依赖成交量) 只用缓存，缺失时出信号后异步补全；
+        # 其他事件最多等待 market_data_timeout 秒，同一 symbol 的并发请求合并
+        enrichment = None
+        is_tier_s_candidate = classified_source in self.TIER_S_SOURCES or exchange_count >= 3
+        if is_tier_s_candidate and self.config['tier_s_fast_path']:
+            self.stats['fast_path_count'] += 1
+            market_data = self.market_cache.peek(primary_symbol)
+            if market_data is None:
+                market_data = {}
+                enrichment = self.market_cache.fetch(primary_symbol, self._fetch_market_data)
+        else:
+            market_data = await self.market_cache.get(
+                primary_symbol, self._fetch_market_data,
+                timeout=self.config['market_data_timeout'],
             )
-        except asyncio.TimeoutError:
-            pass
         
         volume_score = self._calculate_volume_score(market_data)
         sentiment_score = self._calculate_sentiment_score(event)
@@ -602,8 +728,13 @@ class AlphaEngine:
             price_change_1h=market_data.get('price_change_1h'),
             trigger_reason=trigger_reason,
             confidence=round(confidence, 3),
+            enrichment=enrichment,
+            enriched=bool(market_data),
         )
         
+        if enrichment is not None:
+            self._schedule_enrichment(signal)
+        
         # 12. 更新统计
         self.stats['signals_processed'] += 1
         if tier == SignalTier.TIER_S:
@@ -621,7 +752,25 @@ class AlphaEngine:
         
         return signal
     
+    def _schedule_enrichment(self, signal: AlphaSignal):
+        """请求完成后把市场数据补到信号上"""
+        
+        async def enrich():
+            try:
+                data = await asyncio.shield(signal.enrichment)
+            except Exception as e:
+                logger.debug(f"延迟补全 {signal.symbol} 失败: {e}")
+                return
+            signal.apply_market_data(data)
+            self.stats['deferred_enrichments'] += 1
+        
+        task = asyncio.create_task(enrich())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+    
     async def close(self):
+        for task in list(self._background):
+            task.cancel()
         if self.session and not self.session.closed:
             await self.session.close()
         logger.info("🧠 Alpha Engine 已关闭")
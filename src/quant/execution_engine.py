@@ -29,6 +29,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from core.logging import get_logger
 from core.redis_client import RedisClient
+from core.http_client import create_session
 
 logger = get_logger('execution_engine')
 
@@ -211,9 +212,8 @@ class ExecutionEngine:
     
     async def _ensure_session(self):
         if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession(
+            self.session = create_session(
                 timeout=aiohttp.ClientTimeout(total=30),
-                connector=aiohttp.TCPConnector(limit=20)
             )
     
     async def get_1inch_quote(
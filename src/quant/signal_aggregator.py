@@ -197,6 +197,8 @@ class SignalAggregator:
             price_change_1h=best.price_change_1h,
             trigger_reason=trigger_reason,
             confidence=min(1.0, best.confidence + 0.1 * (len(signals) - 1)),
+            enrichment=best.enrichment,
+            enriched=best.enriched,
         )
         
         self.stats['signals_merged'] += 1
@@ -10,15 +10,28 @@ Quant Runner V11 - 顶级量化系统主运行器
 4. 风控管理 (仓位/止损)
 5. 执行引擎 (DEX/CEX)
 6. 通知推送 (企业微信)
+
+消费 events:raw 使用消费组 quant_runner_group：重启后从上次确认的位置继续，
+不会重读整个 Stream。确认按批（每 ACK_BATCH 条或 ACK_INTERVAL 秒）提交，
+进程异常退出时最多重新处理最后一批未确认的事件。
+
+事件处理在独立任务中并发进行（最多 MAX_INFLIGHT 条），非 Tier-S 事件等待市场数据
+（最多 market_data_timeout 秒）不会阻塞读取；处理完成的事件才记入待 ACK。
+
+用法:
+    python src/quant_runner.py
+    python src/quant_runner.py --replay-from 2024-06-01T08:00:00   # 有意重新处理（UTC）
+    python src/quant_runner.py --replay-from 1717228800000-0
 """
 
+import argparse
 import asyncio
-import json
+import re
 import time
 import os
 import signal
 from datetime import datetime, timezone
-from typing import Optional
+from typing import List, Optional, Set
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -27,6 +40,7 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
+from core.codec import field_json
 from core.logging import get_logger
 from core.redis_client import RedisClient
 from quant.alpha_engine import AlphaEngine, SignalTier, ActionType
@@ -36,6 +50,52 @@ from quant.execution_engine import ExecutionEngine
 
 logger = get_logger('quant_runner')
 
+RAW_STREAM = 'events:raw'
+CONSUMER_GROUP = 'quant_runner_group'
+
+# 每次读取条数 / 检查点（批量 ACK）条件
+READ_COUNT = 50
+ACK_BATCH = 50
+ACK_INTERVAL = 1.0
+
+# 同时处理中的事件上限（达到上限时读取等待，形成背压）
+MAX_INFLIGHT = 64
+
+MAX_SEQ = 2 ** 64 - 1
+
+
+def _id_before(ms: int, seq: int = 0) -> str:
+    """紧挨在 ms-seq 之前的 Stream ID（XGROUP SETID 之后从 ms-seq 开始投递）"""
+    if seq > 0:
+        return f'{ms}-{seq - 1}'
+    if ms > 0:
+        return f'{ms - 1}-{MAX_SEQ}'
+    return '0'
+
+
+def parse_replay_from(value: str) -> str:
+    """
+    把 --replay-from 转换为消费组的起始 ID（XGROUP SETID 的参数，不含该 ID 本身）
+
+    支持: 0（从头）、Stream ID（1717228800000-0）、毫秒/秒时间戳、ISO 时间（无时区按 UTC）
+    """
+    value = value.strip()
+    if value in ('0', '-'):
+        return '0'
+    match = re.fullmatch(r'(\d+)-(\d+)', value)
+    if match:
+        return _id_before(int(match.group(1)), int(match.group(2)))
+    if value.isdigit():
+        ts = int(value)
+        return _id_before(ts if ts > 1e12 else ts * 1000)
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"无法解析 --replay-from: {value}")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return _id_before(int(dt.timestamp() * 1000))
+
 
 class QuantRunner:
     """
@@ -45,8 +105,24 @@ class QuantRunner:
     events:raw -> Alpha Engine -> Signal Aggregator -> Risk Manager -> Execution Engine -> Notification
     """
     
-    def __init__(self):
+    def __init__(self, replay_from: Optional[str] = None, consumer_name: Optional[str] = None):
+        """
+        Args:
+            replay_from: 有意重新处理的起点（见 parse_replay_from），None 表示从检查点继续
+            consumer_name: 消费组内的消费者名，默认环境变量 QUANT_CONSUMER 或 quant_runner_1
+        """
         self.redis = RedisClient.from_env()
+        self.replay_from = replay_from
+        self.consumer_name = consumer_name or os.getenv('QUANT_CONSUMER', 'quant_runner_1')
+        
+        # 已处理、待 ACK 的消息 ID
+        self._unacked: List[str] = []
+        self._last_checkpoint = time.monotonic()
+        # 处理中的事件任务
+        self._inflight: Set[asyncio.Task] = set()
+        self._slots = asyncio.Semaphore(MAX_INFLIGHT)
+        # 等待市场数据补全后发送的通知（持有引用，避免任务被回收）
+        self._notifications: Set[asyncio.Task] = set()
         
         # 核心模块
         self.aggregator = SignalAggregator(redis=self.redis)
@@ -164,10 +240,11 @@ class QuantRunner:
             trade_amount = risk_result.allowed_amount
             logger.info(f"📉 仓位调整: {signal.symbol} | {risk_result.original_amount} -> {trade_amount}")
         
-        # 2. 发送通知
+        # 2. 发送通知 (独立任务：市场数据可能仍在补全，通知最多等 2 秒，交易不等)
         if signal.tier in (SignalTier.TIER_S, SignalTier.TIER_A):
-            message = self.format_signal_message(signal)
-            await self.send_notification(message)
+            task = asyncio.create_task(self._notify_signal(signal))
+            self._notifications.add(task)
+            task.add_done_callback(self._notifications.discard)
         
         # 3. 执行交易 (如果有合约地址)
         if signal.tier == SignalTier.TIER_S and signal.contract_address and signal.chain:
@@ -210,54 +287,142 @@ class QuantRunner:
                 else:
                     logger.error(f"❌ 交易失败: {signal.symbol} | {result.error_message}")
     
+    async def _notify_signal(self, signal, timeout: float = 2.0):
+        """等待市场数据补全（最多 timeout 秒）后发送信号通知"""
+        try:
+            await signal.wait_enriched(timeout=timeout)
+            await self.send_notification(self.format_signal_message(signal))
+        except Exception as e:
+            logger.error(f"信号通知失败 {signal.symbol}: {e}")
+    
+    def prepare_consumer_group(self):
+        """创建消费组（首次从最新事件开始），需要时把组位置移到 --replay-from"""
+        if self.redis.create_consumer_group(RAW_STREAM, CONSUMER_GROUP, start_id='$'):
+            logger.info(f"📌 创建消费组 {CONSUMER_GROUP}，从最新事件开始")
+        
+        if self.replay_from is not None:
+            start_id = parse_replay_from(self.replay_from)
+            self.redis.xgroup_setid(RAW_STREAM, CONSUMER_GROUP, start_id)
+            logger.warning(f"⏪ 重新处理 {RAW_STREAM}: 消费组位置移到 {start_id} 之后")
+    
+    def checkpoint(self):
+        """批量 ACK 已处理的消息"""
+        self._last_checkpoint = time.monotonic()
+        if not self._unacked:
+            return
+        ids, self._unacked = self._unacked, []
+        try:
+            self.redis.xack(RAW_STREAM, CONSUMER_GROUP, *ids)
+        except Exception as e:
+            logger.warning(f"ACK 失败，下次重试: {e}")
+            self._unacked = ids + self._unacked
+    
+    def _maybe_checkpoint(self):
+        if len(self._unacked) >= ACK_BATCH or time.monotonic() - self._last_checkpoint >= ACK_INTERVAL:
+            self.checkpoint()
+    
+    async def handle_message(self, msg_id: str, msg_data: dict):
+        """处理一条原始事件"""
+        self.stats['events_processed'] += 1
+        
+        # 解析事件（旧格式把事件放在 event_data 字段）
+        event = msg_data
+        if 'event_data' in msg_data:
+            event = field_json(msg_data['event_data'], msg_data)
+        
+        # 信号处理
+        signal = await self.aggregator.process_event(event)
+        
+        if signal and signal.tier != SignalTier.NOISE:
+            self.stats['signals_generated'] += 1
+            
+            # 只处理高优先级信号
+            if signal.tier in (SignalTier.TIER_S, SignalTier.TIER_A):
+                logger.info(
+                    f"⚡ [{signal.tier.value}] {signal.symbol} | "
+                    f"分数:{signal.total_score:.0f} | "
+                    f"来源:{signal.source_count} | "
+                    f"交易所:{signal.exchange_count}"
+                )
+                
+                # 异步处理信号
+                asyncio.create_task(self.process_signal(signal))
+    
+    async def _handle_and_track(self, msg_id: str, msg_data: dict):
+        """在独立任务中处理一条事件，成功后记入待 ACK（失败的留在未确认列表，重启后重放）"""
+        try:
+            await self.handle_message(msg_id, msg_data)
+            self._unacked.append(msg_id)
+        except Exception as e:
+            logger.error(f"处理事件失败 {msg_id}: {e}")
+        finally:
+            self._slots.release()
+    
+    async def _dispatch(self, msg_id: str, msg_data: dict):
+        """
+        启动事件处理任务
+        
+        评分中依赖事件顺序的状态（去重、首发、多源计数）在 process_event 第一个 await 之前
+        同步更新，按读取顺序创建任务即保持顺序；只有市场数据等待并发进行
+        """
+        await self._slots.acquire()
+        task = asyncio.create_task(self._handle_and_track(msg_id, msg_data))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+    
+    async def _drain(self, timeout: float = 5.0):
+        """等待处理中的事件完成（退出前，保证已完成的事件能被 ACK），顺带等待未发出的通知"""
+        pending = self._inflight | self._notifications
+        if pending:
+            await asyncio.wait(pending, timeout=timeout)
+    
     async def run_main_loop(self):
         """主循环"""
-        logger.info("📡 开始消费 events:raw")
+        self.prepare_consumer_group()
+        logger.info(f"📡 开始消费 {RAW_STREAM} (消费组 {CONSUMER_GROUP} / {self.consumer_name})")
         
-        last_id = '0'
+        # 先处理本消费者已投递但未确认的消息（上次退出前的最后一批），再读新消息
+        read_id = '0'
         
-        while self.running:
-            try:
-                # 读取原始事件
-                messages = self.redis.read_stream('events:raw', last_id=last_id, count=10, block=1000)
-                
-                if not messages:
-                    await asyncio.sleep(0.1)
-                    continue
-                
-                for msg_id, msg_data in messages:
-                    last_id = msg_id
-                    self.stats['events_processed'] += 1
+        try:
+            while self.running:
+                try:
+                    response = await asyncio.to_thread(
+                        self.redis.read_group,
+                        CONSUMER_GROUP,
+                        self.consumer_name,
+                        {RAW_STREAM: read_id},
+                        count=READ_COUNT,
+                        block=None if read_id != '>' else 1000,
+                    )
+                    messages = [m for _, entries in response or [] for m in entries]
                     
-                    # 解析事件
-                    try:
-                        event = json.loads(msg_data.get('event_data', '{}'))
-                    except:
-                        event = msg_data
+                    if not messages:
+                        if read_id != '>':
+                            read_id = '>'
+                            logger.info("✅ 未确认消息处理完毕，开始读取新事件")
+                        self._maybe_checkpoint()
+                        continue
                     
-                    # 信号处理
-                    signal = await self.aggregator.process_event(event)
+                    for msg_id, msg_data in messages:
+                        if read_id != '>':
+                            read_id = msg_id
+                        # 未确认期间已被 MAXLEN 裁剪的条目字段为空，只需 ACK
+                        if msg_data:
+                            await self._dispatch(msg_id, msg_data)
+                        else:
+                            self._unacked.append(msg_id)
                     
-                    if signal and signal.tier != SignalTier.NOISE:
-                        self.stats['signals_generated'] += 1
-                        
-                        # 只处理高优先级信号
-                        if signal.tier in (SignalTier.TIER_S, SignalTier.TIER_A):
-                            logger.info(
-                                f"⚡ [{signal.tier.value}] {signal.symbol} | "
-                                f"分数:{signal.total_score:.0f} | "
-                                f"来源:{signal.source_count} | "
-                                f"交易所:{signal.exchange_count}"
-                            )
-                            
-                            # 异步处理信号
-                            asyncio.create_task(self.process_signal(signal))
-                
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                logger.error(f"主循环错误: {e}")
-                await asyncio.sleep(1)
+                    self._maybe_checkpoint()
+                    
+                except asyncio.CancelledError:
+                    break
+                except Exception as e:
+                    logger.error(f"主循环错误: {e}")
+                    await asyncio.sleep(1)
+        finally:
+            await self._drain()
+            self.checkpoint()
     
     async def run_heartbeat(self):
         """心跳循环"""
@@ -404,7 +569,18 @@ class QuantRunner:
 
 
 async def main():
-    runner = QuantRunner()
+    parser = argparse.ArgumentParser(description='Quant Runner V11')
+    parser.add_argument(
+        '--replay-from',
+        help='从指定位置重新处理 events:raw: 0 / Stream ID / 毫秒或秒时间戳 / ISO 时间（无时区按 UTC）',
+    )
+    parser.add_argument('--consumer', help='消费者名（默认 QUANT_CONSUMER 或 quant_runner_1）')
+    args = parser.parse_args()
+    
+    if args.replay_from is not None:
+        parse_replay_from(args.replay_from)  # 启动前校验格式
+    
+    runner = QuantRunner(replay_from=args.replay_from, consumer_name=args.consumer)
     
     # 信号处理
     loop = asyncio.get_event_loop()
@@ -0,0 +1,563 @@
+"""
+合约地址解析服务
+
+把 known_pairs:{exchange} 里的交易对解析为代币合约地址，写入 contracts:{symbol}（Hash）：
+
+- Redis 读写批量走 pipeline，每 PIPELINE_CHUNK 个键一次往返
+- 先查 DexScreener，未找到时回退 GeckoTerminal；每个数据源一个并发上限，
+  请求经 core.http_client 的共享会话，按主机令牌桶限流（HTTP_RATE_LIMITS），429 自动退避
+- 增量模式：RedisClient.add_known_pair 新增交易对时记入 known_pairs:added（ZSet，
+  分数为毫秒时间戳），游标 contract_sync:cursor 记录已处理到的时间，只解析之后新增的交易对；
+  一轮处理完才推进游标，中途退出下次重做；查询失败（非 200，含重试后仍 429）的符号计入 errors，
+  游标停在它们最早的新增记录之前，下一轮重查
+- 全量模式：扫描所有已知交易对，补查仍缺合约的符号（DexScreener 后来才收录的代币）
+
+用法:
+    >>> resolver = ContractResolver(redis_client)
+    >>> summary = await resolver.sync(incremental=True)
+    >>> await resolver.run()        # 定时：增量 + 周期性全量
+
+命令行入口见 scripts/sync_contracts.py，unified_runner 的 contract_sync 模块定时运行
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import aiohttp
+
+try:
+    from src.core.http_client import create_session, fetch_json
+    from src.core.logging import get_logger
+    from src.core.redis_client import KNOWN_PAIRS_ADDED_KEY
+except ImportError:
+    from core.http_client import create_session, fetch_json
+    from core.logging import get_logger
+    from core.redis_client import KNOWN_PAIRS_ADDED_KEY
+
+logger = get_logger(__name__)
+
+# 读取同步配置
+try:
+    sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'config'))
+    from optimization_config import CONTRACT_SYNC_CONFIG
+except ImportError:
+    CONTRACT_SYNC_CONFIG = {}
+
+CURSOR_KEY = 'contract_sync:cursor'
+PIPELINE_CHUNK = 500
+
+DEXSCREENER_SEARCH = 'https://api.dexscreener.com/latest/dex/search'
+GECKOTERMINAL_SEARCH = 'https://api.geckoterminal.com/api/v2/search/pools'
+REQUEST_TIMEOUT = 15
+
+# GeckoTerminal 网络 ID -> DexScreener 链 ID（两者写入同一 chain 字段）
+GECKOTERMINAL_NETWORKS = {
+    'eth': 'ethereum',
+    'polygon_pos': 'polygon',
+    'arbitrum': 'arbitrum',
+    'bsc': 'bsc',
+    'base': 'base',
+    'solana': 'solana',
+    'avax': 'avalanche',
+}
+
+# 排除的稳定币和包装代币
+EXCLUDED_SYMBOLS = {
+    'USDT', 'USDC', 'BUSD', 'DAI', 'TUSD', 'USDP', 'GUSD', 'FRAX',
+    'LUSD', 'USDD', 'PYUSD', 'FDUSD', 'EURC', 'EURT', 'UST', 'MIM',
+    'WETH', 'WBTC', 'WBNB', 'WSOL', 'WMATIC',
+    'BTC', 'ETH', 'BNB', 'SOL', 'MATIC',  # 主流币可选排除
+    'USD', 'EUR', 'KRW', 'JPY', 'GBP', 'CNY',  # 法币
+}
+
+# 交易所列表
+EXCHANGES = [
+    'binance', 'okx', 'bybit', 'kucoin', 'gate', 'bitget',
+    'htx', 'mexc', 'coinbase', 'kraken',
+    'upbit', 'bithumb', 'coinone', 'korbit', 'gopax'
+]
+
+# 报价币：韩国所交易对报价币在前（KRW-DOGE / BTC-PEPE）
+QUOTE_SYMBOLS = {'KRW', 'USDT', 'USDC', 'BTC', 'ETH', 'USD', 'EUR'}
+
+# known_pairs 里混入的非交易对成员（如 Upbit 公告 ID）
+NON_PAIR_PREFIXES = ('notice_',)
+
+
+def extract_base_symbol(pair: str) -> Optional[str]:
+    """
+    从交易对中提取基础代币符号
+
+    Examples:
+        BTC_USDT -> BTC
+        ETH/USDT -> ETH
+        DOGE-USD -> DOGE
+        KRW-DOGE -> DOGE（韩国所报价币在前）
+        BTCUSDT -> BTC (如果以 USDT/USD/BTC/ETH 结尾)
+    """
+    pair = pair.upper().strip()
+
+    # 处理分隔符
+    for sep in ['_', '/', '-']:
+        if sep in pair:
+            parts = pair.split(sep)
+            if len(parts) >= 2:
+                if parts[0] in QUOTE_SYMBOLS and parts[1] and parts[1] not in QUOTE_SYMBOLS:
+                    return parts[1]
+                return parts[0]
+
+    # 无分隔符，尝试识别常见后缀
+    suffixes = ['USDT', 'USDC', 'BUSD', 'USD', 'BTC', 'ETH', 'BNB', 'KRW', 'EUR', 'JPY']
+    for suffix in suffixes:
+        if pair.endswith(suffix) and len(pair) > len(suffix):
+            return pair[:-len(suffix)]
+
+    return pair
+
+
+def symbols_from_pairs(pairs: Iterable[str]) -> Set[str]:
+    """交易对 -> 需要查合约的代币符号"""
+    symbols = set()
+    for pair in pairs:
+        if pair.lower().startswith(NON_PAIR_PREFIXES):
+            continue
+        symbol = extract_base_symbol(pair)
+        if symbol and symbol not in EXCLUDED_SYMBOLS and len(symbol) >= 2:
+            symbols.add(symbol)
+    return symbols
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def parse_dexscreener(symbol: str, data: Optional[dict]) -> Optional[dict]:
+    """DexScreener 搜索结果中符号精确匹配、流动性最高的交易对"""
+    best, best_liquidity = None, 0
+    for pair in ((data or {}).get('pairs') or [])[:30]:
+        base_token = pair.get('baseToken') or {}
+        if (base_token.get('symbol') or '').upper() != symbol:
+            continue
+        liquidity = (pair.get('liquidity') or {}).get('usd') or 0
+        if liquidity > best_liquidity:
+            best_liquidity = liquidity
+            best = {
+                'symbol': symbol,
+                'name': base_token.get('name', ''),
+                'contract_address': base_token.get('address', ''),
+                'chain': pair.get('chainId', ''),
+                'liquidity_usd': liquidity,
+                'volume_24h': (pair.get('volume') or {}).get('h24', 0) or 0,
+                'price_usd': pair.get('priceUsd', ''),
+                'dex': pair.get('dexId', ''),
+                'pair_address': pair.get('pairAddress', ''),
+                'source': 'dexscreener',
+                'updated_at': _now_iso(),
+            }
+    return best
+
+
+def parse_geckoterminal(symbol: str, data: Optional[dict]) -> Optional[dict]:
+    """GeckoTerminal 池子搜索结果中基础代币匹配、储备最高的池子"""
+    best, best_liquidity = None, 0.0
+    for pool in (data or {}).get('data') or []:
+        attrs = pool.get('attributes') or {}
+        # 池子名称形如 "PEPE / WETH" 或 "PEPE / WETH 0.3%"
+        if attrs.get('name', '').split(' / ')[0].strip().upper() != symbol:
+            continue
+        relationships = pool.get('relationships') or {}
+        token_id = ((relationships.get('base_token') or {}).get('data') or {}).get('id', '')
+        network, _, address = token_id.rpartition('_')
+        try:
+            liquidity = float(attrs.get('reserve_in_usd') or 0)
+        except (TypeError, ValueError):
+            liquidity = 0.0
+        if not address or liquidity <= best_liquidity:
+            continue
+        best_liquidity = liquidity
+        best = {
+            'symbol': symbol,
+            'name': '',
+            'contract_address': address,
+            'chain': GECKOTERMINAL_NETWORKS.get(network, network),
+            'liquidity_usd': liquidity,
+            'volume_24h': (attrs.get('volume_usd') or {}).get('h24', 0) or 0,
+            'price_usd': attrs.get('base_token_price_usd', '') or '',
+            'dex': ((relationships.get('dex') or {}).get('data') or {}).get('id', ''),
+            'pair_address': attrs.get('address', ''),
+            'source': 'geckoterminal',
+            'updated_at': _now_iso(),
+        }
+    return best
+
+
+def to_hash(record: dict) -> Dict[str, str]:
+    """解析结果 -> contracts:{symbol} 字段"""
+    return {
+        'symbol': record['symbol'],
+        'contract_address': record['contract_address'],
+        'chain': record.get('chain', ''),
+        'name': record.get('name', ''),
+        'liquidity_usd': str(record.get('liquidity_usd', 0)),
+        'volume_24h': str(record.get('volume_24h', 0)),
+        'price_usd': str(record.get('price_usd', '')),
+        'dex': record.get('dex', ''),
+        'source': record.get('source', ''),
+        'updated_at': record.get('updated_at', ''),
+    }
+
+
+class SearchError(Exception):
+    """数据源返回非 200（限流重试用尽、5xx 等），与"未找到"区分"""
+
+
+def _chunks(items: List, size: int = PIPELINE_CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class ContractResolver:
+    """代币符号 -> 合约地址解析（批量 Redis 读写 + 限流并发查询）"""
+
+    def __init__(
+        self,
+        redis_client,
+        concurrency: Optional[int] = None,
+        min_liquidity: Optional[float] = None,
+        geckoterminal: Optional[bool] = None,
+        dry_run: bool = False,
+    ):
+        """
+        Args:
+            redis_client: RedisClient（或 decode_responses=True 的 redis.Redis）
+            concurrency: DexScreener 并发上限，默认取 CONTRACT_SYNC_CONFIG
+            min_liquidity: 最低流动性（USD），低于此值不写入
+            geckoterminal: DexScreener 未找到时是否回退 GeckoTerminal
+            dry_run: 只查询不写入（也不推进游标）
+        """
+        cfg = CONTRACT_SYNC_CONFIG
+        self.redis = redis_client
+        self.concurrency = concurrency or cfg.get('concurrency', 8)
+        self.gt_concurrency = cfg.get('geckoterminal_concurrency', 2)
+        self.min_liquidity = min_liquidity if min_liquidity is not None else cfg.get('min_liquidity', 1000)
+        self.use_geckoterminal = cfg.get('geckoterminal_fallback', True) if geckoterminal is None else geckoterminal
+        self.write_batch = cfg.get('write_batch', 100)
+        self.incremental_interval = cfg.get('incremental_interval', 300)
+        self.full_interval = cfg.get('full_interval', 86400)
+        self.log_retention_ms = int(cfg.get('log_retention_days', 7) * 86400 * 1000)
+        self.dry_run = dry_run
+
+        self.running = False
+        self._pending: List[dict] = []
+        self.stats = {
+            'runs': 0,
+            'symbols_checked': 0,
+            'existing': 0,
+            'found': 0,
+            'low_liquidity': 0,
+            'not_found': 0,
+            'errors': 0,
+            'written': 0,
+            'by_source': {'dexscreener': 0, 'geckoterminal': 0},
+            'last_run': None,
+        }
+
+    # ==================== Redis 批量读写 ====================
+
+    def scan_symbols(self, exchanges: Optional[List[str]] = None) -> Set[str]:
+        """所有已知交易对的代币符号（一次 pipeline 读取全部交易所）"""
+        exchanges = exchanges or EXCHANGES
+        pipe = self.redis.pipeline(transaction=False)
+        for exchange in exchanges:
+            pipe.smembers(f'known_pairs:{exchange}')
+        pairs: Set[str] = set()
+        for members in pipe.execute():
+            pairs.update(members or ())
+        return symbols_from_pairs(pairs)
+
+    def added_since(self, cursor: int) -> Tuple[Set[str], int]:
+        """
+        游标之后新增交易对的代币符号
+
+        Returns:
+            (符号集合, 读到的最大时间戳；无新增时为原游标)
+        """
+        entries = self.redis.zrangebyscore(KNOWN_PAIRS_ADDED_KEY, f'({cursor}', '+inf', withscores=True)
+        pairs = [member.split(':', 1)[-1] for member, _ in entries]
+        latest = int(max((score for _, score in entries), default=cursor))
+        return symbols_from_pairs(pairs), latest
+
+    def hold_cursor(self, failed: Set[str], cursor: Optional[int], new_cursor: int) -> int:
+        """
+        有查询失败的符号时，游标停在它们在 (cursor, new_cursor] 内最早的新增记录之前
+
+        早于日志保留期的记录不再阻挡游标，避免一直失败的符号卡住增量同步
+        """
+        if not failed:
+            return new_cursor
+        low = '-inf' if cursor is None else f'({cursor}'
+        oldest = new_cursor - self.log_retention_ms
+        for member, score in self.redis.zrangebyscore(KNOWN_PAIRS_ADDED_KEY, low, new_cursor, withscores=True):
+            if score > oldest and symbols_from_pairs([member.split(':', 1)[-1]]) & failed:
+                return int(score) - 1
+        return new_cursor
+
+    def latest_added(self) -> int:
+        """新增记录中最新的时间戳（没有记录时为 0）"""
+        entries = self.redis.zrevrange(KNOWN_PAIRS_ADDED_KEY, 0, 0, withscores=True)
+        return int(entries[0][1]) if entries else 0
+
+    def load_contracts(self, symbols: Iterable[str]) -> Dict[str, Dict[str, str]]:
+        """批量读取 contracts:{symbol}，只返回存在的"""
+        symbols = list(symbols)
+        contracts = {}
+        for chunk in _chunks(symbols):
+            pipe = self.redis.pipeline(transaction=False)
+            for symbol in chunk:
+                pipe.hgetall(f'contracts:{symbol}')
+            for symbol, data in zip(chunk, pipe.execute()):
+                if data:
+                    contracts[symbol] = data
+        return contracts
+
+    def missing_symbols(self, symbols: Iterable[str]) -> List[str]:
+        """还没有合约地址的符号（排序，结果可复现）"""
+        symbols = sorted(symbols)
+        existing = self.load_contracts(symbols)
+        self.stats['existing'] += sum(1 for s in symbols if existing.get(s, {}).get('contract_address'))
+        return [s for s in symbols if not existing.get(s, {}).get('contract_address')]
+
+    def save_contracts(self, records: List[dict]) -> int:
+        """批量写入 contracts:{symbol}"""
+        if self.dry_run or not records:
+            return 0
+        for chunk in _chunks(records):
+            pipe = self.redis.pipeline(transaction=False)
+            for record in chunk:
+                pipe.hset(f"contracts:{record['symbol']}", mapping=to_hash(record))
+            pipe.execute()
+        self.stats['written'] += len(records)
+        return len(records)
+
+    async def _flush(self, force: bool = False):
+        if self._pending and (force or len(self._pending) >= self.write_batch):
+            records, self._pending = self._pending, []
+            await asyncio.to_thread(self.save_contracts, records)
+
+    # ==================== 查询 ====================
+
+    async def _search(self, session: aiohttp.ClientSession, url: str, params: dict) -> Optional[dict]:
+        status, data = await fetch_json(session, url, params=params)
+        if status != 200:
+            raise SearchError(f'HTTP {status}')
+        return data
+
+    async def lookup(self, session: aiohttp.ClientSession, symbol: str,
+                     ds_limit: asyncio.Semaphore, gt_limit: Optional[asyncio.Semaphore]) -> Optional[dict]:
+        """
+        单个符号：DexScreener，未找到（或请求失败）再 GeckoTerminal
+
+        两个数据源都没有结果且其中有请求失败时抛出 SearchError，不当作未找到
+        """
+        error = None
+        try:
+            async with ds_limit:
+                record = parse_dexscreener(symbol, await self._search(session, DEXSCREENER_SEARCH, {'q': symbol}))
+        except SearchError as e:
+            record, error = None, e
+        if record is None and gt_limit is not None:
+            try:
+                async with gt_limit:
+                    record = parse_geckoterminal(
+                        symbol, await self._search(session, GECKOTERMINAL_SEARCH, {'query': symbol})
+                    )
+            except SearchError as e:
+                error = error or e
+        if record is None and error is not None:
+            raise error
+        return record
+
+    async def _resolve_one(self, session, symbol, ds_limit, gt_limit, found: Dict[str, dict],
+                           failed: Set[str]):
+        try:
+            record = await self.lookup(session, symbol, ds_limit, gt_limit)
+        except (SearchError, aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            self.stats['errors'] += 1
+            failed.add(symbol)
+            logger.debug(f"查询合约失败 {symbol}: {e}")
+            return
+
+        if not record or not record.get('contract_address'):
+            self.stats['not_found'] += 1
+            return
+        if record['liquidity_usd'] < self.min_liquidity:
+            self.stats['low_liquidity'] += 1
+            return
+
+        self.stats['found'] += 1
+        self.stats['by_source'][record['source']] += 1
+        found[symbol] = record
+        self._pending.append(record)
+        await self._flush()
+
+    async def resolve(self, symbols: List[str], failed: Optional[Set[str]] = None) -> Dict[str, dict]:
+        """
+        并发解析一批符号，找到的合约分批写入 Redis
+
+        Args:
+            failed: 传入时收集查询失败的符号（与未找到区分，调用方据此决定是否推进游标）
+        """
+        found: Dict[str, dict] = {}
+        failed = failed if failed is not None else set()
+        if not symbols:
+            return found
+        ds_limit = asyncio.Semaphore(self.concurrency)
+        gt_limit = asyncio.Semaphore(self.gt_concurrency) if self.use_geckoterminal else None
+        session = create_session(timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT))
+        try:
+            await asyncio.gather(*(
+                self._resolve_one(session, symbol, ds_limit, gt_limit, found, failed) for symbol in symbols
+            ))
+        finally:
+            await self._flush(force=True)
+            await session.close()
+        return found
+
+    # ==================== 同步 ====================
+
+    async def sync(self, incremental: bool = False, limit: int = 0) -> dict:
+        """
+        同步一轮
+
+        Args:
+            incremental: 只处理游标之后新增的交易对；没有游标时按全量处理并建立游标
+            limit: 本轮最多查询的符号数（0 不限）；截断时不推进游标
+
+        Returns:
+            本轮统计
+        """
+        started = time.monotonic()
+        before = {k: v for k, v in self.stats.items() if isinstance(v, int)}
+
+        cursor = self.redis.get(CURSOR_KEY)
+        if incremental and cursor is not None:
+            mode = 'incremental'
+            cursor = int(cursor)
+            symbols, new_cursor = self.added_since(cursor)
+        else:
+            mode = 'full'
+            cursor = None
+            # 先取新增记录的最新时间再扫描，本轮运行中新增的交易对留给下一轮增量
+            new_cursor = self.latest_added()
+            symbols = self.scan_symbols()
+
+        missing = self.missing_symbols(symbols)
+        truncated = 0 < limit < len(missing)
+        if truncated:
+            missing = missing[:limit]
+        self.stats['symbols_checked'] += len(symbols)
+
+        failed: Set[str] = set()
+        found = await self.resolve(missing, failed)
+        new_cursor = self.hold_cursor(failed, cursor, new_cursor)
+
+        if not self.dry_run and not truncated:
+            self.redis.set(CURSOR_KEY, str(new_cursor))
+            if new_cursor > self.log_retention_ms:
+                self.redis.zremrangebyscore(KNOWN_PAIRS_ADDED_KEY, '-inf', new_cursor - self.log_retention_ms)
+
+        self.stats['runs'] += 1
+        self.stats['last_run'] = _now_iso()
+        summary = {k: self.stats[k] - v for k, v in before.items()}
+        summary.update({
+            'mode': mode,
+            'symbols': len(symbols),
+            'queried': len(missing),
+            'truncated': truncated,
+            'cursor': new_cursor,
+            'seconds': round(time.monotonic() - started, 1),
+            'found_symbols': sorted(found),
+            'failed_symbols': sorted(failed),
+        })
+        logger.info(
+            f"🔗 合约同步({mode}): 符号 {len(symbols)} | 查询 {len(missing)} | "
+            f"找到 {summary['found']} | 流动性低 {summary['low_liquidity']} | "
+            f"未找到 {summary['not_found']} | 失败 {summary['errors']} | {summary['seconds']}s"
+        )
+        return summary
+
+    async def run(self):
+        """定时同步：启动时和每隔 full_interval 全量，其余每隔 incremental_interval 增量"""
+        self.running = True
+        last_full = None
+        logger.info(
+            f"🔗 合约同步启动: 增量 {self.incremental_interval}s / 全量 {self.full_interval}s，"
+            f"并发 {self.concurrency}"
+        )
+        while self.running:
+            full = last_full is None or time.monotonic() - last_full >= self.full_interval
+            try:
+                await self.sync(incremental=not full)
+                if full:
+                    last_full = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"合约同步失败: {e}")
+            await asyncio.sleep(self.incremental_interval)
+
+    def stop(self):
+        self.running = False
+
+    def get_stats(self) -> dict:
+        return {**self.stats, 'by_source': dict(self.stats['by_source'])}
+
+
+async def main(argv: Optional[List[str]] = None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='同步合约地址到 Redis')
+    parser.add_argument('--dry-run', action='store_true', help='预览模式，不写入数据')
+    parser.add_argument('--limit', type=int, default=0, help='限制处理数量')
+    parser.add_argument('--min-liquidity', type=float, default=None, help='最低流动性 (USD)')
+    parser.add_argument('--incremental', action='store_true', help='只处理上次同步之后新增的交易对')
+    parser.add_argument('--concurrency', type=int, default=None, help='DexScreener 并发上限')
+    parser.add_argument('--no-geckoterminal', action='store_true', help='不回退 GeckoTerminal')
+    args = parser.parse_args(argv)
+
+    try:
+        from src.core.redis_client import RedisClient
+    except ImportError:
+        from core.redis_client import RedisClient
+
+    resolver = ContractResolver(
+        RedisClient.from_env(),
+        concurrency=args.concurrency,
+        min_liquidity=args.min_liquidity,
+        geckoterminal=False if args.no_geckoterminal else None,
+        dry_run=args.dry_run,
+    )
+    summary = await resolver.sync(incremental=args.incremental, limit=args.limit)
+
+    print("=" * 60)
+    print(f"合约地址同步完成 ({summary['mode']}{'，预览模式' if args.dry_run else ''})")
+    print("=" * 60)
+    print(f"代币符号: {summary['symbols']}  已有合约: {summary['existing']}  本次查询: {summary['queried']}")
+    print(f"✅ 找到合约: {summary['found']}")
+    print(f"⚠ 流动性过低: {summary['low_liquidity']}")
+    print(f"❌ 未找到: {summary['not_found']}  请求失败: {summary['errors']}")
+    print(f"💾 写入 Redis: {summary['written']} 条")
+    print(f"⏱ 耗时: {summary['seconds']}s")
+    if summary['truncated']:
+        print("ℹ️ 本次受 --limit 截断，游标未推进")
+    elif summary['failed_symbols'] and not args.dry_run:
+        print(f"ℹ️ 查询失败的符号下一轮重试: {', '.join(summary['failed_symbols'][:20])}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,470 @@
+"""
+事件分层存储 - 热数据 Redis Stream，温数据本地列式分段
+
+Redis 中的 events:raw / events:fused 被 push_event 裁剪到约 10000 条，
+回测评分器或追查漏掉的上币信号时只有几个小时的数据。分层服务持续跟随这些流，
+把事件写入按小时分区、zstd 压缩的 Parquet 分段：
+
+    data/events/<stream>/date=YYYY-MM-DD/hour=HH/part-<首条ID>.parquet
+
+- 写入：XREAD 游标保存在 Redis（tier:cursor），分段落盘后才推进，重启不丢不漏
+- 压实：已结束的小时合并为单个 data.parquet，按 stream_id 去重，按 symbol + ts 排序，
+  行组统计信息让 symbol / 时间过滤可以跳过无关行组
+- 读取：EventArchiveReader.scan(stream, start, end, symbols=...)，
+  分区裁剪 + 谓词下推，只读需要的列；结果按 stream_id 的 (毫秒, 序号) 排序，与 XRANGE 一致
+
+依赖 pyarrow（可选）
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:
+    from src.core.codec import binary_client, decode_response
+except ImportError:
+    from core.codec import binary_client, decode_response
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+    logger.warning("pyarrow 未安装: pip install pyarrow")
+
+
+DEFAULT_BASE_DIR = os.getenv(
+    'EVENT_ARCHIVE_DIR',
+    str(Path(__file__).parent.parent.parent / 'data' / 'events'),
+)
+DEFAULT_STREAMS = ['events:raw', 'events:fused']
+CURSOR_KEY = 'tier:cursor'
+COMPACTED_FILE = 'data.parquet'
+
+# 固定列（用于过滤），其余字段保存在 data（JSON）中
+COLUMNS = ['stream_id', 'ts', 'source', 'exchange', 'symbol', 'event_type', 'score', 'data']
+
+if HAS_PYARROW:
+    SCHEMA = pa.schema([
+        ('stream_id', pa.string()),
+        ('ts', pa.timestamp('ms', tz='UTC')),
+        ('source', pa.string()),
+        ('exchange', pa.string()),
+        ('symbol', pa.string()),
+        ('event_type', pa.string()),
+        ('score', pa.float64()),
+        ('data', pa.string()),
+    ])
+
+TimeLike = Union[datetime, int, float]
+
+
+def _stream_dir(stream: str) -> str:
+    return stream.replace(':', '_')
+
+
+def _to_datetime(value: TimeLike) -> datetime:
+    """datetime 或 Unix 时间戳（秒 / 毫秒）"""
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    value = float(value)
+    if value > 1e12:
+        value /= 1000
+    return datetime.fromtimestamp(value, tz=timezone.utc)
+
+
+def _first_symbol(data: Dict[str, str]) -> str:
+    """symbols 可能是 JSON 列表或逗号分隔字符串"""
+    raw = data.get('symbols') or data.get('symbol') or ''
+    if raw.startswith('['):
+        try:
+            symbols = json.loads(raw)
+            return str(symbols[0]).upper() if symbols else ''
+        except (ValueError, IndexError):
+            pass
+    return raw.split(',')[0].strip().upper()
+
+
+def _score(data: Dict[str, str]) -> Optional[float]:
+    try:
+        return float(data['score'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def to_row(stream_id: str, data: Dict[str, str]) -> Dict[str, Any]:
+    """Stream 消息 -> 分段行"""
+    return {
+        'stream_id': stream_id,
+        'ts': int(stream_id.split('-', 1)[0]),
+        'source': data.get('source', ''),
+        'exchange': data.get('exchange', ''),
+        'symbol': _first_symbol(data),
+        'event_type': data.get('event_type', ''),
+        'score': _score(data),
+        'data': json.dumps(data, ensure_ascii=False),
+    }
+
+
+class EventTierWriter:
+    """把 Redis Stream 写入按小时分区的 Parquet 分段"""
+
+    def __init__(
+        self,
+        redis_client,
+        base_dir: Optional[str] = None,
+        streams: Optional[List[str]] = None,
+        segment_rows: int = 50000,
+        segment_seconds: float = 300,
+        compact_interval: float = 600,
+        retention_days: Optional[int] = None,
+    ):
+        """
+        Args:
+            redis_client: RedisClient（或 redis.Redis）
+            base_dir: 分段根目录
+            streams: 分层的流
+            segment_rows: 缓冲达到该行数时落盘
+            segment_seconds: 缓冲最长保留时间（秒），也是重启时最多重放的范围
+            compact_interval: 压实已结束小时的间隔（秒）
+            retention_days: 保留天数，None 表示不清理
+        """
+        if not HAS_PYARROW:
+            raise ImportError("请安装 pyarrow: pip install pyarrow")
+
+        self.redis = redis_client
+        # 流里可能有二进制信封，读取走 bytes 连接，解码为 legacy 字段后写入分段
+        self._binary = binary_client(redis_client)
+        self.base_dir = Path(base_dir or DEFAULT_BASE_DIR)
+        self.streams = streams or list(DEFAULT_STREAMS)
+        self.segment_rows = segment_rows
+        self.segment_seconds = segment_seconds
+        self.compact_interval = compact_interval
+        self.retention_days = retention_days
+
+        self.running = False
+        self._buffers: Dict[str, List[Dict[str, Any]]] = {s: [] for s in self.streams}
+        self._cursors: Dict[str, str] = {}
+        self._gap_checked: set = set()
+        self._last_flush = time.monotonic()
+        self.stats = {
+            'rows_written': 0,
+            'segments_written': 0,
+            'hours_compacted': 0,
+            'gaps': 0,
+        }
+
+    # ==================== 写入 ====================
+
+    def _load_cursors(self):
+        stored = self.redis.hgetall(CURSOR_KEY) or {}
+        for stream in self.streams:
+            cursor = stored.get(stream)
+            if isinstance(cursor, bytes):
+                cursor = cursor.decode()
+            self._cursors[stream] = cursor or '0'
+
+    def _check_gap(self, stream: str, first_id: str):
+        """
+        重启后首次读取时检查缺口：游标之后读到的第一条就是流中最早的一条，
+        且它晚于游标，说明两者之间的消息可能已被裁剪
+        """
+        cursor = self._cursors[stream]
+        if cursor == '0':
+            return
+        try:
+            first = (self._binary.xinfo_stream(stream) or {}).get('first-entry')
+        except Exception:
+            return
+        first_entry_id = first[0] if first else None
+        if isinstance(first_entry_id, bytes):
+            first_entry_id = first_entry_id.decode()
+        if first_entry_id == first_id and self._id_key(first_id) > self._id_key(cursor):
+            self.stats['gaps'] += 1
+            logger.warning(f"⚠️ {stream} 游标 {cursor} 之后的消息可能已被裁剪，分段存在缺口")
+
+    @staticmethod
+    def _id_key(stream_id: str) -> Tuple[int, int]:
+        ms, _, seq = stream_id.partition('-')
+        return int(ms), int(seq or 0)
+
+    async def run(self):
+        """持续分层写入"""
+        self._load_cursors()
+        self.running = True
+        last_compact = time.monotonic()
+        logger.info(f"🗄️ 事件分层启动: {', '.join(self.streams)} -> {self.base_dir}")
+
+        while self.running:
+            try:
+                response = await asyncio.to_thread(
+                    self._binary.xread,
+                    {s: self._cursors[s] for s in self.streams},
+                    count=5000,
+                    block=1000,
+                )
+            except Exception as e:
+                logger.error(f"读取 Stream 失败: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            for stream, messages in decode_response(response, legacy=True):
+                if not messages:
+                    continue
+                if stream not in self._gap_checked:
+                    self._gap_checked.add(stream)
+                    self._check_gap(stream, messages[0][0])
+                for mid, data in messages:
+                    self._buffers[stream].append(to_row(mid, data))
+                    self._cursors[stream] = mid
+
+            buffered = sum(len(b) for b in self._buffers.values())
+            if buffered >= self.segment_rows or time.monotonic() - self._last_flush >= self.segment_seconds:
+                await asyncio.to_thread(self.flush)
+
+            if time.monotonic() - last_compact >= self.compact_interval:
+                await asyncio.to_thread(self.compact)
+                last_compact = time.monotonic()
+
+        await asyncio.to_thread(self.flush)
+
+    def stop(self):
+        self.running = False
+
+    def flush(self):
+        """缓冲落盘（每个小时分区一个分段），然后推进游标"""
+        self._last_flush = time.monotonic()
+        for stream, rows in self._buffers.items():
+            if not rows:
+                continue
+            by_hour: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+            for row in rows:
+                t = datetime.fromtimestamp(row['ts'] / 1000, tz=timezone.utc)
+                by_hour.setdefault((t.strftime('%Y-%m-%d'), t.strftime('%H')), []).append(row)
+
+            for (date, hour), hour_rows in by_hour.items():
+                part_dir = self.base_dir / _stream_dir(stream) / f'date={date}' / f'hour={hour}'
+                part_dir.mkdir(parents=True, exist_ok=True)
+                table = pa.Table.from_pylist(hour_rows, schema=SCHEMA)
+                path = part_dir / f"part-{hour_rows[0]['stream_id']}.parquet"
+                _write_atomic(table, path)
+                self.stats['segments_written'] += 1
+
+            self.stats['rows_written'] += len(rows)
+            self._buffers[stream] = []
+            self.redis.hset(CURSOR_KEY, stream, self._cursors[stream])
+
+    # ==================== 压实 / 清理 ====================
+
+    def compact(self):
+        """合并已结束小时的分段为单个文件，并清理过期分区"""
+        current = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        for stream in self.streams:
+            root = self.base_dir / _stream_dir(stream)
+            if not root.exists():
+                continue
+            for date_dir in sorted(root.glob('date=*')):
+                date = date_dir.name.split('=', 1)[1]
+                if self.retention_days is not None:
+                    cutoff = (current - timedelta(days=self.retention_days)).strftime('%Y-%m-%d')
+                    if date < cutoff:
+                        shutil.rmtree(date_dir, ignore_errors=True)
+                        continue
+                for hour_dir in sorted(date_dir.glob('hour=*')):
+                    hour_start = datetime.strptime(
+                        f"{date} {hour_dir.name.split('=', 1)[1]}", '%Y-%m-%d %H'
+                    ).replace(tzinfo=timezone.utc)
+                    # 当前小时仍在写入
+                    if hour_start >= current:
+                        continue
+                    parts = sorted(hour_dir.glob('part-*.parquet'))
+                    if parts:
+                        self._compact_hour(hour_dir, parts)
+
+    def _compact_hour(self, hour_dir: Path, parts: List[Path]):
+        files = parts + ([hour_dir / COMPACTED_FILE] if (hour_dir / COMPACTED_FILE).exists() else [])
+        table = pa.concat_tables([pq.read_table(f, schema=SCHEMA) for f in files])
+
+        # 游标推进前崩溃会导致重复写入，按 stream_id 去重
+        if len(pc.unique(table['stream_id'])) != table.num_rows:
+            seen = set()
+            keep = []
+            for i, sid in enumerate(table['stream_id'].to_pylist()):
+                if sid not in seen:
+                    seen.add(sid)
+                    keep.append(i)
+            table = table.take(keep)
+
+        table = table.sort_by([('symbol', 'ascending'), ('ts', 'ascending')])
+        _write_atomic(table, hour_dir / COMPACTED_FILE)
+        for part in parts:
+            part.unlink()
+        self.stats['hours_compacted'] += 1
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            'buffered': {s: len(b) for s, b in self._buffers.items()},
+            'cursors': dict(self._cursors),
+            'base_dir': str(self.base_dir),
+        }
+
+
+def _sort_stream_order(table: 'pa.Table') -> 'pa.Table':
+    """
+    按 stream_id 的 (毫秒, 序号) 排序，与 XRANGE 顺序一致
+
+    ts 只有毫秒精度，压实后同一毫秒的条目按 symbol 排列，只按 ts 排序会打乱流内顺序
+    """
+    parts = pc.split_pattern(table['stream_id'], '-')
+    keys = pa.table({
+        'ms': pc.cast(pc.list_element(parts, 0), pa.int64()),
+        'seq': pc.cast(pc.list_element(parts, 1), pa.int64()),
+    })
+    return table.take(pc.sort_indices(keys, sort_keys=[('ms', 'ascending'), ('seq', 'ascending')]))
+
+
+def _write_atomic(table: 'pa.Table', path: Path):
+    """先写临时文件再改名，读取方不会看到写了一半的分段"""
+    tmp = path.with_name(f'.{path.name}.{uuid.uuid4().hex[:8]}.tmp')
+    pq.write_table(
+        table, tmp,
+        compression='zstd',
+        compression_level=6,
+        row_group_size=64 * 1024,
+        use_dictionary=['source', 'exchange', 'symbol', 'event_type'],
+    )
+    os.replace(tmp, path)
+
+
+class EventArchiveReader:
+    """读取分层存储的事件（分区裁剪 + 谓词下推）"""
+
+    def __init__(self, base_dir: Optional[str] = None):
+        if not HAS_PYARROW:
+            raise ImportError("请安装 pyarrow: pip install pyarrow")
+        self.base_dir = Path(base_dir or DEFAULT_BASE_DIR)
+
+    def _dataset(self, stream: str, start: datetime, end: datetime) -> Optional['ds.Dataset']:
+        root = self.base_dir / _stream_dir(stream)
+        if not root.exists():
+            return None
+        # 按日期目录预先裁剪，避免遍历全部历史分区的文件列表
+        files = []
+        day = start.date()
+        while day <= end.date():
+            date_dir = root / f'date={day.isoformat()}'
+            if date_dir.exists():
+                files.extend(str(p) for p in date_dir.glob('hour=*/*.parquet'))
+            day += timedelta(days=1)
+        if not files:
+            return None
+        return ds.dataset(
+            files, schema=SCHEMA, format='parquet',
+            partitioning=ds.partitioning(flavor='hive'), partition_base_dir=str(root),
+        )
+
+    def _filter(self, start: datetime, end: datetime, symbols: Optional[Iterable[str]],
+                extra: Optional['ds.Expression']) -> 'ds.Expression':
+        expr = (ds.field('ts') >= pa.scalar(start, pa.timestamp('ms', tz='UTC'))) & \
+               (ds.field('ts') < pa.scalar(end, pa.timestamp('ms', tz='UTC')))
+        if symbols:
+            expr = expr & ds.field('symbol').isin([s.upper() for s in symbols])
+        if extra is not None:
+            expr = expr & extra
+        return expr
+
+    def scan(
+        self,
+        stream: str,
+        start: TimeLike,
+        end: Optional[TimeLike] = None,
+        symbols: Optional[Iterable[str]] = None,
+        columns: Optional[List[str]] = None,
+        filter: Optional['ds.Expression'] = None,
+    ) -> 'pa.Table':
+        """
+        按时间范围扫描事件
+
+        Args:
+            stream: 流名称（events:raw / events:fused）
+            start / end: 时间范围 [start, end)，datetime 或 Unix 时间戳
+            symbols: 只要这些币种
+            columns: 只读这些列（默认全部固定列）
+            filter: 额外的 pyarrow.dataset 过滤表达式，如 ds.field('score') >= 60
+
+        Returns:
+            按流内顺序（stream_id 的毫秒 + 序号）排序的 pyarrow.Table
+        """
+        columns = columns or COLUMNS
+        start_dt = _to_datetime(start)
+        end_dt = _to_datetime(end) if end is not None else datetime.now(timezone.utc)
+        dataset = self._dataset(stream, start_dt, end_dt)
+        if dataset is None:
+            return SCHEMA.empty_table().select(columns)
+        # 排序需要 stream_id，未请求时读出后再去掉
+        read_columns = columns if 'stream_id' in columns else [*columns, 'stream_id']
+        table = dataset.to_table(
+            columns=read_columns,
+            filter=self._filter(start_dt, end_dt, symbols, filter),
+        )
+        return _sort_stream_order(table).select(columns)
+
+    def iter_batches(
+        self,
+        stream: str,
+        start: TimeLike,
+        end: Optional[TimeLike] = None,
+        symbols: Optional[Iterable[str]] = None,
+        columns: Optional[List[str]] = None,
+        filter: Optional['ds.Expression'] = None,
+        batch_size: int = 64 * 1024,
+    ) -> Iterator['pa.RecordBatch']:
+        """流式扫描（不排序），适合超过内存的时间范围"""
+        start_dt = _to_datetime(start)
+        end_dt = _to_datetime(end) if end is not None else datetime.now(timezone.utc)
+        dataset = self._dataset(stream, start_dt, end_dt)
+        if dataset is None:
+            return
+        yield from dataset.to_batches(
+            columns=columns or COLUMNS,
+            filter=self._filter(start_dt, end_dt, symbols, filter),
+            batch_size=batch_size,
+        )
+
+    def events(self, stream: str, start: TimeLike, end: Optional[TimeLike] = None,
+               symbols: Optional[Iterable[str]] = None) -> List[Tuple[str, Dict[str, str]]]:
+        """还原为 (stream_id, 字段) 列表，格式和顺序与 XRANGE 一致，便于回放"""
+        table = self.scan(stream, start, end, symbols, columns=['stream_id', 'data'])
+        return [
+            (sid, json.loads(data))
+            for sid, data in zip(table['stream_id'].to_pylist(), table['data'].to_pylist())
+        ]
+
+
+async def main():
+    """独立运行入口"""
+    try:
+        from src.core.redis_client import RedisClient
+    except ImportError:
+        from core.redis_client import RedisClient
+
+    logging.basicConfig(level=logging.INFO)
+    writer = EventTierWriter(RedisClient.from_env())
+    await writer.run()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
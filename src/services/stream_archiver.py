@@ -0,0 +1,436 @@
+"""
+Stream 归档服务 - Redis Stream -> PostgreSQL
+
+Redis 中的事件流都有长度上限（push_event maxlen=10000），突发时几小时内就会被裁剪。
+归档服务用独立的消费组跟随各个流，按微批次 COPY 到 PostgreSQL：
+
+- 所有消息写入 stream_archive（完整字段 JSONB，主键 stream + stream_id）
+- events:fused    -> listing_events   （event_id = 'fused:<stream_id>'）
+- whales:dynamics -> whale_activities （stream_id 唯一索引）
+- trades:executed -> trades           （trade_id）
+
+每批先 COPY 到临时表，再 INSERT ... SELECT ... ON CONFLICT DO NOTHING，
+提交成功后才 XACK；进程崩溃后重启会先重放本消费者的未确认消息，重复写入被主键忽略。
+某条消息的数据让整批失败（超长数值、非法字符等）时，二分批次定位到具体消息，
+单条仍失败的写入死信流 archive:dead_letter 后 ACK，不会卡住后续归档。
+
+表结构: scripts/init_postgres.sql + scripts/init_archive_tables.sql
+"""
+
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from src.core.config import get_postgres_dsn
+    from src.core.codec import binary_client, decode_response
+except ImportError:
+    from core.config import get_postgres_dsn
+    from core.codec import binary_client, decode_response
+
+logger = logging.getLogger(__name__)
+
+try:
+    import asyncpg
+    HAS_ASYNCPG = True
+    # 由行数据本身引起的错误（22xxx / 23xxx），拆批重试有意义；连接、表结构等错误整批重试
+    ROW_ERRORS: Tuple[type, ...] = (
+        asyncpg.exceptions.DataError,
+        asyncpg.exceptions.IntegrityConstraintViolationError,
+    )
+except ImportError:
+    HAS_ASYNCPG = False
+    ROW_ERRORS = ()
+    logger.warning("asyncpg 未安装: pip install asyncpg")
+
+
+DEFAULT_STREAMS = ['events:raw', 'events:fused', 'whales:dynamics', 'trades:executed']
+CONSUMER_GROUP = 'archiver_group'
+DEAD_LETTER_STREAM = 'archive:dead_letter'
+DEAD_LETTER_MAXLEN = 10000
+
+Message = Tuple[str, Dict[str, str]]
+Item = Tuple[str, str, Dict[str, str]]   # (stream, stream_id, 字段)
+
+
+def _stream_ts(stream_id: str) -> datetime:
+    """Stream ID 的毫秒时间戳"""
+    return datetime.fromtimestamp(int(stream_id.split('-', 1)[0]) / 1000, tz=timezone.utc)
+
+
+def _decimal(value: Any) -> Optional[Decimal]:
+    """解析数值（兼容 "$1,234" 格式），无法解析时返回 None"""
+    if value in (None, ''):
+        return None
+    try:
+        result = Decimal(str(value).replace('$', '').replace(',', '').strip())
+    except InvalidOperation:
+        return None
+    return result if result.is_finite() else None
+
+
+def _json_field(value: Any) -> Optional[str]:
+    """已是 JSON 字符串的字段原样保留，否则返回 None"""
+    if not value:
+        return None
+    try:
+        json.loads(value)
+        return value
+    except (TypeError, ValueError):
+        return None
+
+
+def _first_symbol(data: Dict[str, str]) -> str:
+    symbols = data.get('symbols') or data.get('symbol') or ''
+    return (symbols.split(',')[0].strip() or 'UNKNOWN')[:50]
+
+
+# ==================== 行映射 ====================
+# (目标表, 冲突键, 列, 行构造函数)
+
+def _listing_row(stream_id: str, data: Dict[str, str]) -> tuple:
+    return (
+        f'fused:{stream_id}',
+        (data.get('event_type') or 'new_listing')[:50],
+        _first_symbol(data),
+        (data.get('exchange') or '')[:50] or None,
+        (data.get('source') or '')[:100] or None,
+        data.get('raw_text') or None,
+        _decimal(data.get('score')),
+        _json_field(data.get('score_detail')),
+        (data.get('contract_address') or '')[:100] or None,
+        (data.get('chain') or '')[:50] or None,
+        _stream_ts(stream_id),
+        data.get('should_trigger') == '1',
+        json.dumps(data, ensure_ascii=False),
+    )
+
+
+def _whale_row(stream_id: str, data: Dict[str, str]) -> tuple:
+    try:
+        detected_at = datetime.fromtimestamp(int(data['timestamp']) / 1000, tz=timezone.utc)
+    except (KeyError, TypeError, ValueError):
+        detected_at = _stream_ts(stream_id)
+    try:
+        priority = int(data.get('priority') or 3)
+    except ValueError:
+        priority = 3
+    return (
+        stream_id,
+        (data.get('address') or '')[:100],
+        (data.get('category') or '')[:100] or None,
+        (data.get('address_label') or '')[:200] or None,
+        (data.get('action') or 'transfer')[:50],
+        (data.get('token') or '')[:50] or None,
+        _decimal(data.get('amount')),
+        _decimal(data.get('value_usd_raw')) or _decimal(data.get('value_usd')),
+        (data.get('from_address') or '')[:100] or None,
+        (data.get('to_address') or '')[:100] or None,
+        (data.get('exchange') or '')[:50] or None,
+        (data.get('tx_hash') or '')[:100] or None,
+        (data.get('chain') or 'ethereum')[:50],
+        priority,
+        detected_at,
+        (data.get('source') or 'etherscan')[:50],
+        json.dumps(data, ensure_ascii=False),
+    )
+
+
+def _trade_row(stream_id: str, data: Dict[str, str]) -> tuple:
+    return (
+        (data.get('trade_id') or f'trade:{stream_id}')[:100],
+        (data.get('token_symbol') or 'UNKNOWN')[:50],
+        (data.get('dex') or data.get('exchange') or 'unknown')[:50],
+        (data.get('chain') or '')[:50] or None,
+        (data.get('action') or data.get('direction') or 'buy')[:10],
+        _decimal(data.get('amount_in')),
+        _decimal(data.get('amount_out')),
+        _decimal(data.get('price_usd')),
+        (data.get('tx_hash') or '')[:100] or None,
+        (data.get('status') or 'pending')[:20],
+        _stream_ts(stream_id),
+        _decimal(data.get('pnl_percent')),
+        json.dumps(data, ensure_ascii=False),
+    )
+
+
+TABLE_MAPPINGS = {
+    'events:fused': (
+        'listing_events', 'event_id',
+        ['event_id', 'event_type', 'token_symbol', 'exchange', 'source', 'raw_text', 'score',
+         'score_breakdown', 'contract_address', 'chain', 'detected_at', 'is_triggered', 'metadata'],
+        _listing_row,
+    ),
+    'whales:dynamics': (
+        'whale_activities', 'stream_id',
+        ['stream_id', 'address', 'address_label', 'address_name', 'action', 'token_symbol',
+         'amount_token', 'amount_usd', 'from_address', 'to_address', 'exchange_or_dex', 'tx_hash',
+         'chain', 'priority', 'detected_at', 'source', 'metadata'],
+        _whale_row,
+    ),
+    'trades:executed': (
+        'trades', 'trade_id',
+        ['trade_id', 'token_symbol', 'exchange', 'chain', 'direction', 'amount_in', 'amount_out',
+         'price_usd', 'tx_hash', 'status', 'executed_at', 'pnl_percent', 'metadata'],
+        _trade_row,
+    ),
+}
+
+ARCHIVE_COLUMNS = ['stream', 'stream_id', 'ts', 'data']
+
+
+class StreamArchiver:
+    """Redis Stream 归档器"""
+
+    def __init__(
+        self,
+        redis_client,
+        dsn: Optional[str] = None,
+        streams: Optional[List[str]] = None,
+        consumer_name: str = 'archiver_1',
+        batch_size: int = 1000,
+        flush_interval: float = 2.0,
+    ):
+        """
+        Args:
+            redis_client: RedisClient（或 redis.Redis）
+            dsn: PostgreSQL 连接串，默认 get_postgres_dsn()
+            streams: 归档的流
+            batch_size: 每批最多写入的消息数
+            flush_interval: 未满一批时的最长等待（秒）
+        """
+        if not HAS_ASYNCPG:
+            raise ImportError("请安装 asyncpg: pip install asyncpg")
+
+        self.redis = redis_client
+        # 流里可能有二进制信封，读取走 bytes 连接，解码为 legacy 字段后归档
+        self._binary = binary_client(redis_client)
+        self.dsn = dsn or get_postgres_dsn()
+        self.streams = streams or list(DEFAULT_STREAMS)
+        self.consumer_name = consumer_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.pool = None
+        self.running = False
+        self.stats = {
+            'batches': 0,
+            'messages': 0,
+            'inserted': 0,
+            'errors': 0,
+            'dead_letters': 0,
+            'last_flush_ms': 0.0,
+        }
+
+    async def start(self):
+        """连接数据库、创建消费组并开始归档"""
+        self.pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=2)
+        for stream in self.streams:
+            try:
+                # 从头开始，已在流中的历史也会归档
+                self.redis.xgroup_create(stream, CONSUMER_GROUP, id='0', mkstream=True)
+            except Exception as e:
+                if 'BUSYGROUP' not in str(e):
+                    raise
+
+        self.running = True
+        logger.info(f"📦 Stream 归档启动: {', '.join(self.streams)}")
+        try:
+            while self.running:
+                # 先重放本消费者未确认的消息（重启或写入失败后），再读新消息；
+                # 新消息写入失败时 _run 返回，回到重放
+                await self._run(replay=True)
+                await self._run(replay=False)
+        finally:
+            await self.pool.close()
+
+    def stop(self):
+        self.running = False
+
+    async def _read(self, ids: Dict[str, str], count: int, block: Optional[int]) -> Dict[str, List[Message]]:
+        response = await asyncio.to_thread(
+            self._binary.xreadgroup,
+            groupname=CONSUMER_GROUP,
+            consumername=self.consumer_name,
+            streams=ids,
+            count=count,
+            block=block,
+        )
+        return {stream: messages for stream, messages in decode_response(response, legacy=True) if messages}
+
+    async def _run(self, replay: bool):
+        """
+        读取并按批写入
+
+        replay=True 时从 0 开始遍历本消费者的未确认消息（逐流推进 ID），遍历完返回；
+        否则阻塞读取新消息，直到停止或写入失败
+        """
+        ids = {s: '0' if replay else '>' for s in self.streams}
+        pending: Dict[str, List[Message]] = {}
+        size = 0
+        deadline = time.monotonic() + self.flush_interval
+
+        while self.running:
+            block = None if replay else max(int((deadline - time.monotonic()) * 1000), 1)
+            try:
+                batch = await self._read(ids, self.batch_size - size, block)
+            except Exception as e:
+                logger.error(f"读取 Stream 失败: {e}")
+                self.stats['errors'] += 1
+                await asyncio.sleep(1)
+                continue
+
+            for stream, messages in batch.items():
+                pending.setdefault(stream, []).extend(messages)
+                size += len(messages)
+                if replay:
+                    ids[stream] = messages[-1][0]
+
+            replay_done = replay and not batch
+            if size >= self.batch_size or time.monotonic() >= deadline or replay_done:
+                if size and not await self._flush(pending):
+                    # 不 ACK，稍后从未确认消息重试
+                    await asyncio.sleep(5)
+                    return
+                pending, size = {}, 0
+                deadline = time.monotonic() + self.flush_interval
+            if replay_done:
+                return
+
+    async def _flush(self, batch: Dict[str, List[Message]]) -> bool:
+        """写入一批消息，成功后 ACK；行数据错误时拆批定位并把坏消息送入死信"""
+        started = time.perf_counter()
+        items: List[Item] = [(stream, mid, data) for stream, messages in batch.items() for mid, data in messages]
+
+        try:
+            try:
+                inserted = await self._write(items)
+            except ROW_ERRORS as e:
+                logger.warning(f"归档批次含无法写入的数据，拆批重试: {e}")
+                inserted = await self._bisect(items)
+        except Exception as e:
+            logger.error(f"归档写入失败: {e}")
+            self.stats['errors'] += 1
+            return False
+
+        for stream, messages in batch.items():
+            await asyncio.to_thread(self.redis.xack, stream, CONSUMER_GROUP, *[mid for mid, _ in messages])
+
+        self.stats['batches'] += 1
+        self.stats['messages'] += sum(1 for _, _, data in items if data)
+        self.stats['inserted'] += inserted
+        self.stats['last_flush_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return True
+
+    async def _bisect(self, items: List[Item]) -> int:
+        """二分写入，单条仍因数据错误失败时写入死信；其他错误向上抛出（整批不 ACK）"""
+        if len(items) == 1:
+            try:
+                return await self._write(items)
+            except ROW_ERRORS as e:
+                await self._dead_letter(items[0], e)
+                return 0
+
+        half = len(items) // 2
+        inserted = 0
+        for part in (items[:half], items[half:]):
+            try:
+                inserted += await self._write(part)
+            except ROW_ERRORS:
+                inserted += await self._bisect(part)
+        return inserted
+
+    async def _dead_letter(self, item: Item, error: Exception):
+        stream, mid, data = item
+        logger.error(f"消息无法归档，写入死信 {stream} {mid}: {error}")
+        await asyncio.to_thread(
+            self.redis.xadd,
+            DEAD_LETTER_STREAM,
+            {
+                'stream': stream,
+                'stream_id': mid,
+                'error': str(error)[:500],
+                'data': json.dumps(data, ensure_ascii=False),
+            },
+            maxlen=DEAD_LETTER_MAXLEN,
+            approximate=True,
+        )
+        self.stats['dead_letters'] += 1
+
+    async def _write(self, items: List[Item]) -> int:
+        """在一个事务内写入消息（归档表 + 业务表），返回新插入的行数"""
+        # 重放未确认消息时，已被裁剪的条目字段为空，只需 ACK
+        archive_rows = [
+            (stream, mid, _stream_ts(mid), json.dumps(data, ensure_ascii=False))
+            for stream, mid, data in items
+            if data
+        ]
+        if not archive_rows:
+            return 0
+
+        mapped: Dict[str, List[tuple]] = {}
+        for stream, mid, data in items:
+            mapping = TABLE_MAPPINGS.get(stream)
+            if not mapping or not data:
+                continue
+            try:
+                mapped.setdefault(stream, []).append(mapping[3](mid, data))
+            except Exception as e:
+                logger.debug(f"跳过无法映射的消息 {stream} {mid}: {e}")
+
+        inserted = 0
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                inserted += await self._copy_upsert(
+                    conn, 'stream_archive', '(stream, stream_id)', ARCHIVE_COLUMNS, archive_rows
+                )
+                for stream, rows in mapped.items():
+                    table, key, columns, _ = TABLE_MAPPINGS[stream]
+                    inserted += await self._copy_upsert(conn, table, f'({key})', columns, rows)
+        return inserted
+
+    @staticmethod
+    async def _copy_upsert(conn, table: str, conflict: str, columns: List[str], rows: List[tuple]) -> int:
+        """COPY 到临时表，再幂等插入目标表，返回新插入的行数"""
+        if not rows:
+            return 0
+        stage = f'_stage_{table}'
+        cols = ', '.join(columns)
+        await conn.execute(
+            f'CREATE TEMP TABLE IF NOT EXISTS {stage} '
+            f'(LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS'
+        )
+        await conn.copy_records_to_table(stage, records=rows, columns=columns)
+        status = await conn.execute(
+            f'INSERT INTO {table} ({cols}) SELECT {cols} FROM {stage} '
+            f'ON CONFLICT {conflict} DO NOTHING'
+        )
+        # 'INSERT 0 <n>'
+        return int(status.rsplit(' ', 1)[-1])
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            'streams': self.streams,
+            'running': self.running,
+        }
+
+
+async def main():
+    """独立运行入口"""
+    try:
+        from src.core.redis_client import RedisClient
+    except ImportError:
+        from core.redis_client import RedisClient
+
+    logging.basicConfig(level=logging.INFO)
+    archiver = StreamArchiver(RedisClient.from_env())
+    await archiver.start()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
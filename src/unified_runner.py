@@ -12,6 +12,9 @@
 - news: 新闻 RSS 监控
 - fusion: 融合引擎
 - pusher: 推送服务
+- archiver: Redis Stream 归档到 PostgreSQL
+- tiering: 事件流分层到本地 Parquet 分段
+- contract_sync: 已知交易对 -> 合约地址定时同步
 """
 
 import os
@@ -30,6 +33,7 @@ load_dotenv()
 
 from core.logging import get_logger
 from core.redis_client import RedisClient
+from core.metrics import register_stats, start_metrics_server
 
 logger = get_logger('unified_runner')
 
@@ -52,6 +56,9 @@ ENABLED_MODULES = {
     'signal_router': False,     # 信号路由（按需）
     'pusher': True,             # 推送服务
     'whale': True,              # 巨鲸/聪明钱监控
+    'archiver': False,          # Stream 归档（需要 PostgreSQL + asyncpg）
+    'tiering': False,           # 事件分层存储（需要 pyarrow）
+    'contract_sync': False,     # 合约地址同步（DexScreener/GeckoTerminal，按需）
 }
 
 
@@ -266,6 +273,62 @@ class UnifiedRunner:
             logger.error(f"Webhook Pusher 错误: {e}")
             self.stats['errors'] += 1
     
+    # ============================================================
+    # Stream 归档
+    # ============================================================
+    
+    async def run_archiver(self):
+        """Redis Stream -> PostgreSQL 归档"""
+        if not ENABLED_MODULES.get('archiver'):
+            return
+        
+        try:
+            from services.stream_archiver import StreamArchiver
+            logger.info("[START] 📦 Stream Archiver")
+            archiver = StreamArchiver(self.redis)
+            await archiver.start()
+        except ImportError as e:
+            logger.warning(f"Stream Archiver 导入失败: {e}")
+        except Exception as e:
+            logger.error(f"Stream Archiver 错误: {e}")
+            self.stats['errors'] += 1
+    
+    async def run_tiering(self):
+        """events:raw / events:fused -> 本地 Parquet 分段"""
+        if not ENABLED_MODULES.get('tiering'):
+            return
+        
+        try:
+            from services.event_tiering import EventTierWriter
+            logger.info("[START] 🗄️ Event Tiering")
+            writer = EventTierWriter(self.redis)
+            await writer.run()
+        except ImportError as e:
+            logger.warning(f"Event Tiering 导入失败: {e}")
+        except Exception as e:
+            logger.error(f"Event Tiering 错误: {e}")
+            self.stats['errors'] += 1
+    
+    # ============================================================
+    # 合约同步
+    # ============================================================
+    
+    async def run_contract_sync(self):
+        """known_pairs -> contracts:{symbol} 合约地址同步（增量 + 周期性全量）"""
+        if not ENABLED_MODULES.get('contract_sync'):
+            return
+        
+        try:
+            from services.contract_resolver import ContractResolver
+            logger.info("[START] 🔗 Contract Sync")
+            resolver = ContractResolver(self.redis)
+            await resolver.run()
+        except ImportError as e:
+            logger.warning(f"Contract Sync 导入失败: {e}")
+        except Exception as e:
+            logger.error(f"Contract Sync 错误: {e}")
+            self.stats['errors'] += 1
+    
     # ============================================================
     # 系统监控
     # ============================================================
@@ -305,6 +368,9 @@ class UnifiedRunner:
             'whale': 'whale',
             'fusion': 'fusion',
             'pusher': 'pusher',
+            'archiver': 'archiver',
+            'tiering': 'tiering',
+            'contract_sync': 'contract_sync',
         }
         
         await asyncio.sleep(2)
@@ -337,6 +403,10 @@ class UnifiedRunner:
         """主运行方法"""
         await self.initialize()
         
+        # 单进程只启动一个 /metrics，各模块内部的 start_metrics_server 调用直接复用
+        register_stats('crypto_runner', self.stats, service='unified_runner')
+        start_metrics_server('unified_runner')
+        
         self.tasks = {
             'exchange_intl': asyncio.create_task(self.run_exchange_intl()),
             'exchange_kr': asyncio.create_task(self.run_exchange_kr()),
@@ -347,6 +417,9 @@ class UnifiedRunner:
             'whale': asyncio.create_task(self.run_whale()),  # 巨鲸监控
             'fusion': asyncio.create_task(self.run_fusion()),
             'pusher': asyncio.create_task(self.run_pusher()),
+            'archiver': asyncio.create_task(self.run_archiver()),
+            'tiering': asyncio.create_task(self.run_tiering()),
+            'contract_sync': asyncio.create_task(self.run_contract_sync()),
             'memory': asyncio.create_task(self.memory_monitor()),
             'heartbeat': asyncio.create_task(self.heartbeat()),
         }
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+融合管线吞吐/延迟基准
+=====================
+
+进程内运行（不依赖线上 Redis / 企业微信），逐阶段测量：
+1. symbols   - core.symbols.extract_symbols
+2. contract  - core.utils.extract_contract_address
+3. scorer    - InstitutionalScorer.calculate_score
+4. v3        - FusionEngineV3 单条处理（含聚合、写 fakeredis events:fused）
+5. turbo     - FusionEngineTurbo 单条处理（含去重、聚合、写 fakeredis）
+
+每个场景（见 generators.py）报告 events/sec、p50/p99/max 单条延迟（µs），
+以及单独一轮 tracemalloc 统计的峰值内存和每条事件滞留字节数。
+引擎使用回放时钟（事件时间），聚合窗口行为与真实流量一致。
+
+用法:
+    python -m tests.benchmarks.fusion_benchmark
+    python -m tests.benchmarks.fusion_benchmark --count 20000 --scenario telegram_spam_storm
+    python -m tests.benchmarks.fusion_benchmark --compare data/benchmarks/fusion_20240601_120000.json
+"""
+
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+import fakeredis
+
+from core.dedup import Deduplicator
+from core.redis_client import RedisClient
+from core.symbols import extract_symbols
+from core.utils import extract_contract_address
+from fusion.fusion_engine_turbo import FusionEngineTurbo
+from fusion.fusion_engine_v3 import FusionEngineV3
+from fusion.replay import ReplayClock
+from fusion.scoring_engine import InstitutionalScorer
+
+try:
+    from .generators import GENERATORS, SyntheticEvent
+except ImportError:
+    from generators import GENERATORS, SyntheticEvent
+
+STAGES = ('symbols', 'contract', 'scorer', 'v3', 'turbo')
+OUTPUT_STREAM = 'events:fused'
+DEFAULT_OUTPUT_DIR = ROOT / 'data' / 'benchmarks'
+
+# 分配统计轮次最多取的事件数（tracemalloc 会显著拖慢执行）
+ALLOC_SAMPLE = 2000
+
+# 引擎每次触发都会打 INFO 日志，基准中只保留告警
+QUIET_LOGGERS = ('fusion_engine', 'fusion_turbo', 'core.redis_client')
+
+
+# ==================== 阶段 ====================
+
+def _make_stage(stage: str) -> Callable[[float, Dict[str, str]], None]:
+    """构造阶段处理函数 fn(ts, event)；有状态的阶段每次新建，互不影响"""
+    if stage == 'symbols':
+        return lambda ts, event: extract_symbols(event.get('raw_text', ''))
+    if stage == 'contract':
+        return lambda ts, event: extract_contract_address(event.get('raw_text', ''))
+
+    clock = ReplayClock()
+    if stage == 'scorer':
+        scorer = InstitutionalScorer(clock=clock)
+
+        def run_scorer(ts, event):
+            clock.advance_to(ts)
+            scorer.calculate_score(event)
+        return run_scorer
+
+    redis = RedisClient.from_client(fakeredis.FakeRedis(decode_responses=True))
+    if stage == 'v3':
+        engine = FusionEngineV3(redis_client=redis, clock=clock)
+
+        def run_v3(ts, event):
+            clock.advance_to(ts)
+            engine.flush_aggregates(OUTPUT_STREAM, ts)
+            engine.process_message(event, OUTPUT_STREAM, ts)
+        return run_v3
+
+    engine = FusionEngineTurbo(redis_client=redis, clock=clock)
+    # 只测进程内去重；共享模式每条新事件多一次 Redis 往返，fakeredis 下会掩盖引擎本身的开销
+    engine.dedup = Deduplicator('fusion_turbo', clock=clock, shared=False)
+
+    def run_turbo(ts, event):
+        clock.advance_to(ts)
+        engine.flush_aggregates(OUTPUT_STREAM, ts)
+        if not engine.is_duplicate(event):
+            engine.process_event(event, OUTPUT_STREAM, ts)
+    return run_turbo
+
+
+def _percentile(sorted_values: List[int], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def measure_stage(stage: str, events: List[SyntheticEvent]) -> dict:
+    """计时一轮 + tracemalloc 一轮（各自使用新的阶段实例）"""
+    # 事件会被评分器/引擎修改（_timestamp 等），每轮使用副本
+    fn = _make_stage(stage)
+    copies = [(ts, dict(event)) for ts, event in events]
+    latencies = []
+    perf = time.perf_counter_ns
+    wall_start = perf()
+    for ts, event in copies:
+        t0 = perf()
+        fn(ts, event)
+        latencies.append(perf() - t0)
+    wall_ns = perf() - wall_start
+    latencies.sort()
+
+    sample = [(ts, dict(event)) for ts, event in events[:ALLOC_SAMPLE]]
+    fn = _make_stage(stage)
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for ts, event in sample:
+        fn(ts, event)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'events': len(copies),
+        'events_per_second': round(len(copies) / (wall_ns / 1e9), 1) if wall_ns else 0,
+        'p50_us': round(_percentile(latencies, 50) / 1000, 2),
+        'p99_us': round(_percentile(latencies, 99) / 1000, 2),
+        'max_us': round(latencies[-1] / 1000, 2) if latencies else 0,
+        'mean_us': round(sum(latencies) / len(latencies) / 1000, 2) if latencies else 0,
+        'alloc_peak_kb': round((peak - base) / 1024, 1),
+        'retained_bytes_per_event': round((current - base) / len(sample), 1) if sample else 0,
+    }
+
+
+def run_benchmark(count: int, scenarios: List[str], stages: List[str]) -> dict:
+    results: Dict[str, Dict[str, dict]] = {}
+    for name in scenarios:
+        events = GENERATORS[name](count)
+        results[name] = {}
+        for stage in stages:
+            results[name][stage] = measure_stage(stage, events)
+            r = results[name][stage]
+            print(
+                f"  {name:<24} {stage:<9} {r['events_per_second']:>11,.0f} ev/s | "
+                f"p50 {r['p50_us']:>8.1f}µs | p99 {r['p99_us']:>8.1f}µs | "
+                f"peak {r['alloc_peak_kb']:>8.1f}KB"
+            )
+    return results
+
+
+# ==================== 结果 ====================
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip()
+    except Exception:
+        return ''
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """对比吞吐和 p99，返回超过阈值的退化项"""
+    regressions = []
+    for scenario, stages in current['results'].items():
+        for stage, r in stages.items():
+            b = baseline.get('results', {}).get(scenario, {}).get(stage)
+            if not b:
+                continue
+            eps_change = (r['events_per_second'] - b['events_per_second']) / b['events_per_second'] if b['events_per_second'] else 0
+            p99_change = (r['p99_us'] - b['p99_us']) / b['p99_us'] if b['p99_us'] else 0
+            line = (
+                f"  {scenario:<24} {stage:<9} ev/s {eps_change:+7.1%} | p99 {p99_change:+7.1%}"
+            )
+            if eps_change < -threshold or p99_change > threshold:
+                line += '  ⚠️'
+                regressions.append(f'{scenario}/{stage}')
+            print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='融合管线吞吐/延迟基准')
+    parser.add_argument('--count', type=int, default=5000, help='每个场景的事件数')
+    parser.add_argument('--scenario', action='append', choices=sorted(GENERATORS), help='只跑指定场景（可重复）')
+    parser.add_argument('--stage', action='append', choices=STAGES, help='只跑指定阶段（可重复）')
+    parser.add_argument('--output', help='结果 JSON 路径，默认 data/benchmarks/fusion_<时间>.json')
+    parser.add_argument('--compare', help='与之前的结果 JSON 对比')
+    parser.add_argument('--threshold', type=float, default=0.10, help='退化阈值（默认 10%%）')
+    parser.add_argument('--fail-on-regression', action='store_true', help='有退化时以非零状态退出')
+    args = parser.parse_args()
+
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    scenarios = args.scenario or list(GENERATORS)
+    stages = args.stage or list(STAGES)
+
+    print(f"🏁 融合基准: {args.count} 条/场景 | 场景: {', '.join(scenarios)}")
+    results = run_benchmark(args.count, scenarios, stages)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'count': args.count,
+        },
+        'results': results,
+    }
+
+    output = Path(args.output) if args.output else (
+        DEFAULT_OUTPUT_DIR / f"fusion_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"💾 结果已保存: {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\n📊 对比 {args.compare} (commit {baseline.get('meta', {}).get('commit', '?')})")
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"⚠️ 退化: {', '.join(regressions)}")
+            if args.fail_on_regression:
+                sys.exit(1)
+        else:
+            print("✅ 无明显退化")
+
+
+if __name__ == '__main__':
+    main()
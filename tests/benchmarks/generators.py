@@ -0,0 +1,195 @@
+"""
+合成事件生成器
+===============
+
+生成与采集器写入 events:raw 字段一致的合成流量，固定随机种子，结果可复现：
+- binance_listing_fanout: Binance 上币公告后数秒内多渠道、多交易所跟进
+- telegram_spam_storm: 低质量 TG 频道短时间内大量喊单/转发（含合约地址、近似重复）
+- ticker_noise: 稳态行情噪音（新交易对检测、价格播报），分数低、均匀到达
+
+每个生成器返回按时间排序的 [(ts, event)]，ts 为 Unix 秒
+"""
+
+import json
+import random
+import string
+import zlib
+from typing import Callable, Dict, List, Tuple
+
+SyntheticEvent = Tuple[float, Dict[str, str]]
+
+DEFAULT_START_TS = 1_700_000_000.0
+
+FOLLOW_EXCHANGES = ['okx', 'bybit', 'gate', 'kucoin', 'bitget', 'mexc', 'upbit', 'coinbase']
+TICKER_EXCHANGES = ['binance', 'okx', 'bybit', 'gate', 'mexc', 'kucoin']
+MAJORS = ['BTC', 'ETH', 'SOL', 'BNB', 'XRP', 'DOGE', 'PEPE', 'ARB', 'OP', 'WIF']
+SPAM_CHANNELS = [f'pump_signals_{i}' for i in range(40)]
+ALPHA_CHANNELS = ['方程式新闻', 'BWE News', 'Wu Blockchain', 'PANews']
+
+
+def _symbol(rng: random.Random) -> str:
+    return ''.join(rng.choice(string.ascii_uppercase) for _ in range(rng.randint(3, 5)))
+
+
+def _address(rng: random.Random) -> str:
+    return '0x' + ''.join(rng.choice('0123456789abcdef') for _ in range(40))
+
+
+def _ms(ts: float) -> str:
+    return str(int(ts * 1000))
+
+
+def _announcement(exchange: str, symbol: str, ts: float, title: str, contract: str = '') -> Dict[str, str]:
+    return {
+        'source': f'{exchange}_announcement',
+        'source_type': 'announcement',
+        'exchange': exchange,
+        'symbol': symbol,
+        'symbols': json.dumps([symbol]),
+        'raw_text': title,
+        'url': f'https://www.{exchange}.com/support/announcement/{int(ts)}',
+        'contract_address': contract,
+        'chain': 'ethereum' if contract else '',
+        'ts': _ms(ts),
+        'detected_at': _ms(ts),
+    }
+
+
+def _telegram(channel: str, category: str, text: str, symbols: List[str], ts: float,
+              tier: int = 2) -> Dict[str, str]:
+    return {
+        'source': 'social_telegram',
+        'source_type': 'telegram',
+        'channel': channel,
+        'channel_id': str(zlib.crc32(channel.encode())),
+        'category': category,
+        'channel_tier': str(tier),
+        'text': text,
+        'raw_text': text,
+        'symbols': json.dumps(symbols),
+        'event_type': 'listing' if 'list' in text.lower() else 'social',
+        'timestamp': _ms(ts),
+        'msg_timestamp': _ms(ts - 0.4),
+    }
+
+
+def binance_listing_fanout(count: int, seed: int = 1, start_ts: float = DEFAULT_START_TS) -> List[SyntheticEvent]:
+    """
+    Binance 上币扇出
+
+    每个上币：情报频道抢跑 -> Binance 公告 -> 官方 TG/推特 -> 数十个频道转发
+    -> 其他交易所 1-30 秒内跟进 -> 新交易对检测
+    """
+    rng = random.Random(seed)
+    events: List[SyntheticEvent] = []
+    ts = start_ts
+    while len(events) < count:
+        symbol = _symbol(rng)
+        contract = _address(rng) if rng.random() < 0.5 else ''
+        title = f'Binance Will List {symbol} ({symbol}) with Seed Tag Applied'
+
+        events.append((ts - rng.uniform(5, 60), _telegram(
+            rng.choice(ALPHA_CHANNELS), 'alpha_intel',
+            f'🚨 Binance 即将上线 ${symbol}，合约 {contract or "待公布"}', [symbol], ts, tier=1,
+        )))
+        events.append((ts, _announcement('binance', symbol, ts, title, contract)))
+        events.append((ts + rng.uniform(0.2, 2), _telegram(
+            'Binance Announcements', 'exchange_official', title, [symbol], ts, tier=1,
+        )))
+        for _ in range(rng.randint(10, 40)):
+            t = ts + rng.uniform(1, 20)
+            events.append((t, _telegram(
+                rng.choice(SPAM_CHANNELS), 'kol',
+                f'{title} 🔥🔥 ${symbol} 冲！{rng.randint(1, 999)}', [symbol], t,
+            )))
+        for exchange in rng.sample(FOLLOW_EXCHANGES, rng.randint(2, 6)):
+            t = ts + rng.uniform(1, 30)
+            events.append((t, _announcement(
+                exchange, symbol, t, f'{exchange.upper()} will list {symbol} ({symbol}) spot trading', contract,
+            )))
+            events.append((t + rng.uniform(60, 600), {
+                'source': f'{exchange}_market',
+                'source_type': 'market',
+                'exchange': exchange,
+                'symbol': f'{symbol}USDT',
+                'symbols': json.dumps([symbol]),
+                'raw_text': f'New trading pair detected: {symbol}USDT on {exchange.upper()}',
+                'url': '',
+                'ts': _ms(t),
+            }))
+        ts += rng.uniform(120, 900)
+
+    events.sort(key=lambda e: e[0])
+    return events[:count]
+
+
+def telegram_spam_storm(count: int, seed: int = 2, start_ts: float = DEFAULT_START_TS) -> List[SyntheticEvent]:
+    """
+    Telegram 喊单风暴
+
+    少量代币被 40 个频道以每秒数百条的速度反复转发，文本只差表情/编号，
+    约三成带合约地址
+    """
+    rng = random.Random(seed)
+    symbols = [_symbol(rng) for _ in range(12)]
+    contracts = {s: _address(rng) for s in symbols}
+    templates = [
+        '🚀🚀 ${s} 即将上所！100x gem, CA: {ca}',
+        'JUST IN: ${s} listing rumor on Binance?? {n}',
+        '${s} pump incoming 📈📈 join now {n}',
+        '💎 ${s} presale live, contract {ca}',
+        '{s}/USDT breakout 🔥 target {n}x',
+    ]
+    events: List[SyntheticEvent] = []
+    ts = start_ts
+    for _ in range(count):
+        ts += rng.expovariate(300)
+        s = rng.choice(symbols)
+        text = rng.choice(templates).format(
+            s=s, ca=contracts[s] if rng.random() < 0.3 else '', n=rng.randint(1, 50),
+        )
+        events.append((ts, _telegram(rng.choice(SPAM_CHANNELS), 'kol', text, [s], ts, tier=3)))
+    return events
+
+
+def ticker_noise(count: int, seed: int = 3, start_ts: float = DEFAULT_START_TS) -> List[SyntheticEvent]:
+    """稳态行情噪音：主流币价格播报与新交易对检测，约每 50ms 一条"""
+    rng = random.Random(seed)
+    events: List[SyntheticEvent] = []
+    ts = start_ts
+    for _ in range(count):
+        ts += rng.uniform(0.02, 0.08)
+        exchange = rng.choice(TICKER_EXCHANGES)
+        base = rng.choice(MAJORS)
+        if rng.random() < 0.9:
+            event = {
+                'source': f'{exchange}_ticker',
+                'source_type': 'market',
+                'exchange': exchange,
+                'symbol': f'{base}USDT',
+                'symbols': json.dumps([base]),
+                'raw_text': f'{base}/USDT {rng.uniform(0.01, 70000):.4f} ({rng.uniform(-5, 5):+.2f}%) on {exchange}',
+                'url': '',
+                'ts': _ms(ts),
+            }
+        else:
+            quote = rng.choice(['USDC', 'FDUSD', 'TRY', 'EUR'])
+            event = {
+                'source': f'{exchange}_market',
+                'source_type': 'market',
+                'exchange': exchange,
+                'symbol': f'{base}{quote}',
+                'symbols': json.dumps([base]),
+                'raw_text': f'New trading pair detected: {base}{quote} on {exchange.upper()}',
+                'url': '',
+                'ts': _ms(ts),
+            }
+        events.append((ts, event))
+    return events
+
+
+GENERATORS: Dict[str, Callable[..., List[SyntheticEvent]]] = {
+    'binance_listing_fanout': binance_listing_fanout,
+    'telegram_spam_storm': telegram_spam_storm,
+    'ticker_noise': ticker_noise,
+}
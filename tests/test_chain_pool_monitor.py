@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+测试链上新池扫描：工厂事件解码、eth_getLogs 区间缩小/放大、区块游标续扫、events:raw 字段
+"""
+
+import asyncio
+import sys
+from collections import deque
+from pathlib import Path
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+# 添加 src 路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from collectors.blockchain import monitor
+from core.redis_client import RedisClient
+from fusion.scoring_engine import SOURCE_SCORES
+
+WETH = '0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2'
+USDC = '0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48'
+UNIV2 = '0x5C69bEe701ef814a2B6a3EDD4B1652CB9cc5aA6f'
+UNIV3 = '0x1F98431c8aD98523631AE4a59f267346ea31F984'
+AERODROME = '0x420DD381b31aEf6683db6B902084cB0FFECe40Da'
+
+# RPC 拒绝超过该区间的 getLogs（模拟 "query returned more than 10000 results"）
+RANGE_ERROR = {'code': -32005, 'message': 'query returned more than 10000 results'}
+
+
+def _topic(address):
+    return '0x' + address[2:].lower().rjust(64, '0')
+
+
+def _uint(value):
+    return format(value % (1 << 256), '064x')
+
+
+def _token(i):
+    return '0x' + format(0x1000 + i, '040x')
+
+
+def v2_log(block, token0, token1, pair, index=0):
+    """PairCreated(token0 indexed, token1 indexed, pair, uint)"""
+    return {
+        'address': UNIV2.lower(),
+        'topics': [monitor.TOPIC_V2_PAIR_CREATED, _topic(token0), _topic(token1)],
+        'data': '0x' + _topic(pair)[2:] + _uint(1),
+        'blockNumber': hex(block),
+        'transactionHash': f'0x{block:064x}',
+        'logIndex': hex(index),
+    }
+
+
+def v3_log(block, token0, token1, fee, tick_spacing, pool):
+    """PoolCreated(token0 indexed, token1 indexed, fee indexed, tickSpacing, pool)"""
+    return {
+        'address': UNIV3.lower(),
+        'topics': [monitor.TOPIC_V3_POOL_CREATED, _topic(token0), _topic(token1), '0x' + _uint(fee)],
+        'data': '0x' + _uint(tick_spacing) + _topic(pool)[2:],
+        'blockNumber': hex(block),
+        'transactionHash': f'0x{block:064x}',
+        'logIndex': '0x0',
+    }
+
+
+class FakeRpc:
+    """按区块号返回预设日志；区间超过 range_limit 时返回区间错误"""
+
+    def __init__(self, head, logs, range_limit=None):
+        self.head = head
+        self.logs = logs
+        self.range_limit = range_limit
+        self.requests = []
+
+    async def __call__(self, session, rpc_url, method, params):
+        if method == 'eth_blockNumber':
+            return hex(self.head), None
+        start, end = int(params[0]['fromBlock'], 16), int(params[0]['toBlock'], 16)
+        self.requests.append((start, end))
+        if self.range_limit and end - start + 1 > self.range_limit:
+            return None, RANGE_ERROR
+        return [log for log in self.logs if start <= int(log['blockNumber'], 16) <= end], None
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = RedisClient.from_client(fakeredis.FakeRedis(decode_responses=True))
+    monkeypatch.setattr(monitor, 'redis_client', client)
+    return client
+
+
+def _state(chain='ethereum', log_range=100):
+    """与 monitor_evm_chain 相同的扫描状态"""
+    factories = monitor.DEX_FACTORIES[chain]
+    return {
+        'cursor': monitor._load_cursor(chain),
+        'log_range': log_range,
+        'factories': [address for _, _, address in factories],
+        'topics': sorted({monitor.FACTORY_TOPICS[kind] for _, kind, _ in factories}),
+        'factory_index': {address.lower(): (dex, kind) for dex, kind, address in factories},
+        'seen': deque(maxlen=2000),
+    }
+
+
+def _scan(monkeypatch, rpc, state, chain='ethereum', **chain_config):
+    monkeypatch.setattr(monitor, 'rpc_call', rpc)
+    config = {'rpc_url': 'http://rpc', 'max_log_range': 2000, 'max_catchup_blocks': 7200, **chain_config}
+    asyncio.run(monitor.scan_pool_logs(None, chain, config, state))
+
+
+def _pushed(redis):
+    return [event for _, event in redis.range_events('events:raw')]
+
+
+def test_decode_v2_and_v3():
+    index = {UNIV2.lower(): ('uniswap_v2', 'v2'), UNIV3.lower(): ('uniswap_v3', 'v3')}
+
+    pool = monitor.decode_pool_log('ethereum', v2_log(100, _token(1), WETH, _token(2)), index)
+    assert pool['dex'] == 'uniswap_v2'
+    assert (pool['token0'], pool['token1'], pool['pool_address']) == (_token(1), WETH, _token(2))
+    assert (pool['fee'], pool['tick_spacing'], pool['block_number']) == (0, 0, 100)
+
+    pool = monitor.decode_pool_log('ethereum', v3_log(101, WETH, _token(3), 3000, -60, _token(4)), index)
+    assert pool['dex'] == 'uniswap_v3'
+    assert (pool['token0'], pool['token1'], pool['pool_address']) == (WETH, _token(3), _token(4))
+    assert (pool['fee'], pool['tick_spacing'], pool['block_number']) == (3000, -60, 101)
+
+
+def test_decode_solidly_stable_flag():
+    index = {AERODROME.lower(): ('aerodrome', 'solidly')}
+    log = {
+        'address': AERODROME,
+        'topics': [monitor.TOPIC_SOLIDLY_POOL_CREATED, _topic(_token(5)), _topic(_token(6)), '0x' + _uint(1)],
+        'data': '0x' + _topic(_token(7))[2:] + _uint(42),
+        'blockNumber': '0x10',
+    }
+    pool = monitor.decode_pool_log('base', log, index)
+    assert pool['stable'] is True
+    assert pool['pool_address'] == _token(7)
+
+
+def test_unknown_factory_raises():
+    with pytest.raises(KeyError):
+        monitor.decode_pool_log('ethereum', v2_log(1, _token(1), WETH, _token(2)), {})
+
+
+def test_pushed_event_fields(redis, monkeypatch):
+    state = _state()
+    state['cursor'] = 99
+    logs = [v2_log(100, _token(1), WETH, _token(2)), v2_log(100, WETH, USDC, _token(3), index=1)]
+    _scan(monkeypatch, FakeRpc(100, logs), state)
+
+    # 两边都是基础代币的池被过滤
+    (event,) = _pushed(redis)
+    assert event['source'] in SOURCE_SCORES
+    assert event['contract_address'] == _token(1)
+    assert event['exchange'] == 'uniswap_v2' and event['chain'] == 'ethereum'
+    # 毫秒整数字符串，不是 decode_pool_log 里的 ISO 时间
+    assert event['timestamp'].isdigit() and len(event['timestamp']) == 13
+    assert event['timestamp'] == event['detected_at']
+
+
+def test_range_shrinks_on_rpc_limit(redis, monkeypatch):
+    logs = [v2_log(b, _token(b), WETH, _token(b + 1000)) for b in (1001, 1030, 1099, 1100)]
+    rpc = FakeRpc(1100, logs, range_limit=30)
+    state = _state()
+    state['cursor'] = 1000
+    _scan(monkeypatch, rpc, state)
+
+    # 100 -> 50 -> 25，之后以 25 为上限不再放大
+    assert rpc.requests[:3] == [(1001, 1100), (1001, 1050), (1001, 1025)]
+    assert state['log_range'] == 25 and state['range_cap'] == 25
+    assert all(end - start + 1 <= 25 for start, end in rpc.requests[3:])
+    # 拒绝的区间不丢块：每个区块只被成功扫描一次
+    assert [event['block_number'] for event in _pushed(redis)] == ['1001', '1030', '1099', '1100']
+    assert state['cursor'] == 1100
+
+
+def test_range_grows_when_sparse(redis, monkeypatch):
+    rpc = FakeRpc(2000, [])
+    state = _state(log_range=100)
+    state['cursor'] = 1000
+    _scan(monkeypatch, rpc, state, max_log_range=400)
+
+    spans = [end - start + 1 for start, end in rpc.requests]
+    assert spans == [100, 200, 400, 300]
+    assert state['log_range'] == 400
+    assert state['cursor'] == 2000
+
+
+def test_cursor_persists_and_resumes(redis, monkeypatch):
+    logs = [v2_log(5003, _token(1), WETH, _token(2))]
+    state = _state()
+    assert state['cursor'] is None
+
+    # 首次启动从 head - 1 开始
+    _scan(monkeypatch, FakeRpc(5000, logs), state)
+    assert redis.hget(monitor.CURSOR_KEY, 'ethereum') == '5000'
+
+    # 重启后从 Redis 游标续扫停机期间的区块
+    rpc = FakeRpc(5005, logs)
+    state = _state()
+    assert state['cursor'] == 5000
+    _scan(monkeypatch, rpc, state)
+    assert rpc.requests[0][0] == 5001
+    assert [event['block_number'] for event in _pushed(redis)] == ['5003']
+    assert redis.hget(monitor.CURSOR_KEY, 'ethereum') == '5005'
+
+
+def test_catchup_capped(redis, monkeypatch):
+    redis.hset(monitor.CURSOR_KEY, 'ethereum', 100)
+    rpc = FakeRpc(10_000, [])
+    state = _state()
+    _scan(monkeypatch, rpc, state, max_catchup_blocks=500)
+    assert rpc.requests[0][0] == 10_000 - 500 + 1
+    assert state['cursor'] == 10_000
+
+
+def test_failed_range_keeps_cursor(redis, monkeypatch):
+    async def failing(session, rpc_url, method, params):
+        if method == 'eth_blockNumber':
+            return hex(300), None
+        return None, {'code': -32000, 'message': 'header not found'}
+
+    state = _state()
+    state['cursor'] = 200
+    _scan(monkeypatch, failing, state)
+    assert state['cursor'] == 200
+    assert redis.hget(monitor.CURSOR_KEY, 'ethereum') is None
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+测试 Stream 编解码（legacy 与 mp1 信封往返、新旧生产者/消费者混用、field_json）
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+# 添加 src 路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from core import codec
+from core.redis_client import RedisClient
+
+STREAM = 'events:fused'
+
+EVENT = {
+    'symbol': 'FOO',
+    'exchange': 'binance',
+    'raw_text': 'Binance will list FOO (FOO) 币安上线',
+    'score': 87.5,
+    'source_count': 3,
+    'is_first': True,
+    'contract_address': None,
+    'exchanges': ['binance', 'okx'],
+    'score_detail': {'base': 60, 'multi': [1, 2], 'note': '首发'},
+}
+
+# legacy 字段语义：标量转字符串，None 为空串
+SCALARS = {
+    'symbol': 'FOO',
+    'exchange': 'binance',
+    'raw_text': 'Binance will list FOO (FOO) 币安上线',
+    'score': '87.5',
+    'source_count': '3',
+    'is_first': 'True',
+    'contract_address': '',
+}
+
+
+@pytest.fixture
+def fmt():
+    """切换生产者格式，测试结束后恢复"""
+    original = codec._format
+
+    def switch(name):
+        if name == codec.FORMAT_MSGPACK and not codec.HAS_MSGPACK:
+            pytest.skip('需要 msgspec 或 msgpack')
+        codec.set_format(name)
+
+    yield switch
+    codec.set_format(original)
+
+
+@pytest.fixture
+def redis():
+    return RedisClient.from_client(fakeredis.FakeRedis(decode_responses=True))
+
+
+def _assert_event(event):
+    for key, value in SCALARS.items():
+        assert event[key] == value, key
+    assert codec.field_json(event['exchanges'], []) == EVENT['exchanges']
+    assert codec.field_json(event['score_detail'], {}) == EVENT['score_detail']
+
+
+def test_legacy_encoding(fmt):
+    fmt(codec.FORMAT_LEGACY)
+    fields = codec.encode_event(STREAM, EVENT)
+    assert codec.CODEC_FIELD not in fields
+    assert all(isinstance(v, str) for v in fields.values())
+    assert json.loads(fields['score_detail']) == EVENT['score_detail']
+    _assert_event(codec.decode_event(fields))
+
+
+def test_envelope_encoding(fmt):
+    fmt(codec.FORMAT_MSGPACK)
+    fields = codec.encode_event(STREAM, EVENT)
+    assert set(fields) == {codec.CODEC_FIELD, codec.BODY_FIELD}
+    assert fields[codec.CODEC_FIELD] == codec.CODEC_MSGPACK_V1
+
+    event = codec.decode_event(fields)
+    _assert_event(event)
+    # 嵌套字段为原生结构，不再是 JSON 字符串
+    assert event['score_detail'] == EVENT['score_detail']
+
+    # legacy=True 时与 legacy 生产者写出的字段完全相同
+    assert codec.decode_event(fields, legacy=True) == codec.legacy_fields(EVENT)
+
+
+def test_envelope_only_for_configured_streams(fmt):
+    fmt(codec.FORMAT_MSGPACK)
+    assert codec.envelope_enabled('events:raw')
+    assert codec.envelope_enabled('events:route:cex')
+    assert not codec.envelope_enabled('whale:alerts')
+    assert codec.encode_event('whale:alerts', EVENT) == codec.legacy_fields(EVENT)
+
+
+def test_mixed_producers_round_trip(fmt, redis):
+    """同一 Stream 里新旧格式交替写入，各种读取方式都得到一致的事件"""
+    for name in (codec.FORMAT_LEGACY, codec.FORMAT_MSGPACK, codec.FORMAT_LEGACY, codec.FORMAT_MSGPACK):
+        fmt(name)
+        assert redis.push_event(STREAM, {**EVENT, 'producer': name})
+
+    raw = redis.binary.xrange(STREAM)
+    assert sum(1 for _, fields in raw if b'_enc' in fields) == 2
+
+    entries = redis.range_events(STREAM)
+    assert [e['producer'] for _, e in entries] == ['legacy', 'msgpack', 'legacy', 'msgpack']
+    for _, event in entries:
+        _assert_event(event)
+
+    # 只认识 legacy 字段的下游：两种来源解码结果逐字段相同
+    legacy = [event for _, event in redis.range_events(STREAM, legacy=True)]
+    assert legacy[0] == {**legacy[1], 'producer': 'legacy'}
+    assert all(isinstance(v, str) for event in legacy for v in event.values())
+
+    messages = redis.read_stream(STREAM, last_id='0', count=10, block=None)
+    assert [(stream, len(items)) for stream, items in messages] == [(STREAM, 4)]
+    assert [e for _, e in messages[0][1]] == [e for _, e in entries]
+
+    redis.create_consumer_group(STREAM, 'fusion')
+    grouped = redis.read_group('fusion', 'worker-1', {STREAM: '>'}, count=10)
+    assert [e for _, e in grouped[0][1]] == [e for _, e in entries]
+
+
+def test_text_consumer_reads_legacy(fmt, redis):
+    """decode_responses=True 的旧消费者仍能读取 legacy 消息"""
+    fmt(codec.FORMAT_LEGACY)
+    redis.push_event(STREAM, EVENT)
+    ((msg_id, fields),) = redis.xrange(STREAM)
+    _assert_event(codec.decode_event(fields))
+
+
+def test_binary_client(redis):
+    binary = codec.binary_client(redis._client)
+    assert binary is not redis._client
+    redis.set('k', 'v')
+    assert binary.get('k') == b'v'
+    assert codec.binary_client(binary) is binary
+
+
+@pytest.mark.parametrize('fields', [
+    {b'_enc': b'mp9', b'_body': b'\x80'},
+    {b'_enc': b'mp1', b'_body': b'\xc1'},
+    {'_enc': 'mp1', '_body': 'not-bytes'},
+])
+def test_undecodable_envelope(fields):
+    if not codec.HAS_MSGPACK:
+        pytest.skip('需要 msgspec 或 msgpack')
+    assert codec.decode_event(fields) == {}
+
+
+@pytest.mark.parametrize('value, expected', [
+    ({'a': 1}, {'a': 1}),
+    ([1, 2], [1, 2]),
+    ('{"a": 1}', {'a': 1}),
+    ('[1, 2]', [1, 2]),
+    ('', 'default'),
+    (None, 'default'),
+    ('not json', 'default'),
+])
+def test_field_json(value, expected):
+    assert codec.field_json(value, 'default') == expected
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+测试合约解析：请求失败计入 errors 而非 not_found，增量游标不越过失败的符号
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+# 添加 src 路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from core.redis_client import KNOWN_PAIRS_ADDED_KEY, RedisClient
+from services import contract_resolver
+from services.contract_resolver import CURSOR_KEY, ContractResolver
+
+
+def _ds_pairs(symbol):
+    return {'pairs': [{
+        'baseToken': {'symbol': symbol, 'address': f'0x{symbol.lower()}', 'name': symbol},
+        'chainId': 'ethereum', 'liquidity': {'usd': 50_000}, 'dexId': 'uniswap',
+    }]}
+
+
+class FakeApi:
+    """按符号返回 (状态码, 数据)；responses[symbol] = (dexscreener, geckoterminal)"""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.queried = []
+
+    async def __call__(self, session, url, params=None, **kwargs):
+        symbol = (params or {}).get('q') or (params or {}).get('query')
+        self.queried.append(symbol)
+        ds, gt = self.responses.get(symbol, ((200, {'pairs': []}), (200, {'data': []})))
+        return ds if 'dexscreener' in url else gt
+
+
+@pytest.fixture
+def redis():
+    return RedisClient.from_client(fakeredis.FakeRedis(decode_responses=True))
+
+
+def _add(redis, exchange, pair, ts):
+    redis.sadd(f'known_pairs:{exchange}', pair)
+    redis.zadd(KNOWN_PAIRS_ADDED_KEY, {f'{exchange}:{pair}': ts})
+
+
+def _sync(resolver, api, monkeypatch, incremental=True):
+    monkeypatch.setattr(contract_resolver, 'fetch_json', api)
+    return asyncio.run(resolver.sync(incremental=incremental))
+
+
+def test_rate_limited_symbol_is_error_and_holds_cursor(redis, monkeypatch):
+    now = int(time.time() * 1000)
+    redis.set(CURSOR_KEY, str(now - 10_000))
+    _add(redis, 'binance', 'AAA_USDT', now - 5_000)
+    _add(redis, 'binance', 'FOO_USDT', now - 4_000)
+    _add(redis, 'okx', 'BBB-USDT', now - 3_000)
+
+    api = FakeApi({
+        'AAA': ((200, _ds_pairs('AAA')), None),
+        'FOO': ((429, None), (429, None)),
+    })
+    summary = _sync(ContractResolver(redis), api, monkeypatch)
+    assert summary['errors'] == 1
+    assert summary['not_found'] == 1          # BBB：两个数据源都 200 且无结果
+    assert summary['failed_symbols'] == ['FOO']
+    assert int(redis.get(CURSOR_KEY)) == now - 4_000 - 1
+
+    # 下一轮重查 FOO（以及仍未找到的 BBB），成功后游标推进到最新
+    api = FakeApi({'FOO': ((200, _ds_pairs('FOO')), None)})
+    summary = _sync(ContractResolver(redis), api, monkeypatch)
+    assert 'FOO' in api.queried and 'AAA' not in api.queried
+    assert summary['found_symbols'] == ['FOO']
+    assert int(redis.get(CURSOR_KEY)) == now - 3_000
+
+
+def test_fallback_result_wins_over_primary_error(redis, monkeypatch):
+    now = int(time.time() * 1000)
+    redis.set(CURSOR_KEY, str(now - 10_000))
+    _add(redis, 'gate', 'PEPE_USDT', now - 1_000)
+    gt = {'data': [{
+        'attributes': {'name': 'PEPE / WETH', 'reserve_in_usd': '90000'},
+        'relationships': {'base_token': {'data': {'id': 'eth_0xpepe'}}},
+    }]}
+    api = FakeApi({'PEPE': ((503, None), (200, gt))})
+    summary = _sync(ContractResolver(redis), api, monkeypatch)
+    assert summary['found_symbols'] == ['PEPE'] and summary['errors'] == 0
+    assert int(redis.get(CURSOR_KEY)) == now - 1_000
+
+
+def test_stale_failures_do_not_pin_cursor(redis, monkeypatch):
+    now = int(time.time() * 1000)
+    resolver = ContractResolver(redis)
+    resolver.log_retention_ms = 60_000
+    redis.set(CURSOR_KEY, str(now - 120_000))
+    _add(redis, 'binance', 'OLD_USDT', now - 90_000)
+    _add(redis, 'binance', 'NEW_USDT', now - 1_000)
+
+    api = FakeApi({'OLD': ((500, None), (500, None))})
+    _sync(resolver, api, monkeypatch)
+    assert int(redis.get(CURSOR_KEY)) == now - 1_000
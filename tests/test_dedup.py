@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+测试 Bloom 去重（跨实例共享、桶轮转过期、容量内误判率）
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+# 添加 src 路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from core.dedup import REDIS_KEY_PREFIX, Deduplicator, TimeBucketedBloom, bloom_size
+from core.redis_client import RedisClient
+
+WINDOW = 400        # 4 个桶，每桶 100 秒
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def _client(server):
+    """同一个 FakeServer 上的独立连接，模拟不同进程"""
+    return RedisClient.from_client(fakeredis.FakeRedis(server=server, decode_responses=True))
+
+
+def _dedup(server, clock, name='fusion_turbo', **kwargs):
+    params = {'window_seconds': WINDOW, 'capacity': 1000, 'fp_rate': 0.001, 'shared': True, **kwargs}
+    return Deduplicator(name, redis_client=_client(server), clock=clock, **params)
+
+
+def test_shared_across_instances(server):
+    clock = FakeClock(1000.0)
+    a = _dedup(server, clock)
+    b = _dedup(server, clock)
+    assert a.shared is not None and b.shared is not None
+
+    assert not a.seen('evt:1')
+    assert b.seen('evt:1')
+    assert b.stats['shared_hits'] == 1
+
+    assert 'evt:2' not in b
+    a.add('evt:2')
+    assert 'evt:2' in b
+    # 共享命中后写入本地，再查不访问 Redis
+    assert b.stats['shared_hits'] == 2
+    assert b.local.contains('evt:2')
+
+    # 不同名字互不影响
+    other = _dedup(server, clock, name='whale_monitor')
+    assert not other.seen('evt:1')
+
+
+def test_local_only_does_not_share(server):
+    clock = FakeClock(1000.0)
+    a = _dedup(server, clock, shared=False)
+    b = _dedup(server, clock, shared=False)
+    assert a.shared is None
+    assert not a.seen('evt:1')
+    assert not b.seen('evt:1')
+    assert not _client(server).keys(f'{REDIS_KEY_PREFIX}*')
+
+
+def test_redis_keys_rotate_with_ttl(server):
+    clock = FakeClock(1000.0)
+    dedup = _dedup(server, clock)
+    dedup.seen('evt:1')
+    clock.now = 1150.0
+    dedup.seen('evt:2')
+
+    redis = _client(server)
+    keys = sorted(redis.keys(f'{REDIS_KEY_PREFIX}fusion_turbo:*'))
+    assert keys == [f'{REDIS_KEY_PREFIX}fusion_turbo:10', f'{REDIS_KEY_PREFIX}fusion_turbo:11']
+    # 窗口 + 一个桶
+    assert all(400 < redis.ttl(key) <= 500 for key in keys)
+
+
+@pytest.mark.parametrize('added_at', [1000.0, 1050.0, 1099.9])
+def test_expiry_between_three_and_four_buckets(server, added_at):
+    """键在 window × (buckets - 1) / buckets 到 window 之间过期（本地与共享一致）"""
+    clock = FakeClock(added_at)
+    writer = _dedup(server, clock)
+    assert not writer.seen('evt:1')
+
+    for t in (added_at + 1, added_at + 300, 1399.9):
+        clock.now = t
+        assert writer.local.contains('evt:1')
+        # 新实例本地为空，只能从 Redis 判断
+        assert 'evt:1' in _dedup(server, clock)
+
+    clock.now = 1400.0
+    assert not writer.local.contains('evt:1')
+    assert 'evt:1' not in _dedup(server, clock)
+    assert not writer.seen('evt:1')
+
+
+def test_clock_jump_clears_all_buckets():
+    clock = FakeClock(0.0)
+    bloom = TimeBucketedBloom(WINDOW, 1000, 0.001, clock=clock)
+    for t in range(0, 400, 50):
+        clock.now = t
+        bloom.add(f'evt:{t}')
+    clock.now = 10_000.0
+    assert not any(bloom.contains(f'evt:{t}') for t in range(0, 400, 50))
+    assert all(f.count == 0 for f in bloom._filters)
+
+
+def _false_positive_rate(contains, probes):
+    return sum(1 for i in range(probes) if contains(f'probe:{i}')) / probes
+
+
+def _fill(add, clock, per_bucket):
+    for bucket in range(4):
+        clock.now = bucket * 100.0
+        for i in range(per_bucket):
+            add(f'key:{bucket}:{i}')
+
+
+def test_local_false_positive_rate_at_capacity():
+    """一个窗口内装入 capacity 个键（均匀分布在各桶），误判率不超过 fp_rate"""
+    capacity, fp_rate = 8000, 0.01
+    clock = FakeClock(0.0)
+    bloom = TimeBucketedBloom(WINDOW, capacity, fp_rate, clock=clock)
+    _fill(bloom.add, clock, capacity // 4)
+    assert sum(f.count for f in bloom._filters) == capacity
+
+    assert _false_positive_rate(bloom.contains, 20000) <= fp_rate
+    # 已加入的键不会漏判
+    assert all(bloom.contains(f'key:{b}:{i}') for b in range(4) for i in range(0, capacity // 4, 97))
+
+
+def test_local_false_positive_rate_every_bucket_full():
+    """最坏情况：每个桶都装满 capacity 个键，每桶 fp_rate / buckets，整环约为 fp_rate"""
+    capacity, fp_rate = 2000, 0.01
+    clock = FakeClock(0.0)
+    bloom = TimeBucketedBloom(WINDOW, capacity, fp_rate, clock=clock)
+    _fill(bloom.add, clock, capacity)
+    assert all(f.count == capacity for f in bloom._filters)
+
+    # 20000 次探测的抽样误差约 ±7%
+    rate = _false_positive_rate(bloom.contains, 20000)
+    assert fp_rate / 2 < rate <= fp_rate * 1.2
+
+
+def test_shared_false_positive_rate_at_capacity(server):
+    capacity, fp_rate = 1600, 0.02
+    clock = FakeClock(0.0)
+    writer = _dedup(server, clock, capacity=capacity, fp_rate=fp_rate)
+    _fill(writer.add, clock, capacity // 4)
+
+    reader = _dedup(server, clock, capacity=capacity, fp_rate=fp_rate)
+    assert (reader.shared.m, reader.shared.k) == bloom_size(capacity, fp_rate / 4)
+    # 新实例本地为空，全部由 Redis 位图判断
+    assert _false_positive_rate(reader.shared.contains, 2000) <= fp_rate
+    assert all(reader.shared.contains(f'key:{b}:{i}') for b in range(4) for i in range(0, capacity // 4, 37))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+测试 Etherscan 增量拉取：升序分页、失败/页数上限时游标不越过未拉到的交易
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加 src 路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from collectors import etherscan_fetcher
+from collectors.etherscan_fetcher import EtherscanFetcher, INCREMENTAL_PAGE_SIZE
+
+ADDRESS = '0xabc'
+
+
+class FakeChain:
+    """按 Etherscan 语义分页返回交易；fail_pages 中的页返回 None（请求失败）"""
+
+    def __init__(self, blocks, fail_pages=()):
+        self.txs = [{'hash': f'0x{i}', 'blockNumber': str(b)} for i, b in enumerate(blocks)]
+        self.fail_pages = set(fail_pages)
+        self.requests = []
+
+    async def __call__(self, params):
+        self.requests.append(dict(params))
+        if params['page'] in self.fail_pages:
+            return None
+        txs = [tx for tx in self.txs if int(tx['blockNumber']) >= params.get('startblock', 0)]
+        txs.sort(key=lambda tx: int(tx['blockNumber']), reverse=params['sort'] == 'desc')
+        start = (params['page'] - 1) * params['offset']
+        return txs[start:start + params['offset']]
+
+
+def _fetcher(chain, cursor=None):
+    fetcher = EtherscanFetcher(api_key='test')
+    fetcher._make_request = chain
+    if cursor is not None:
+        fetcher.cursors['txlist'] = {ADDRESS: cursor}
+    return fetcher
+
+
+def _fetch(fetcher):
+    return asyncio.run(fetcher.get_new_transactions(ADDRESS, offset=5))
+
+
+def test_bootstrap_takes_latest():
+    chain = FakeChain(range(100, 130))
+    fetcher = _fetcher(chain)
+    txs = _fetch(fetcher)
+    assert len(txs) == 5
+    assert fetcher.cursors['txlist'][ADDRESS] == 129
+
+
+def test_burst_is_paged_ascending_without_gaps():
+    # 游标之后有 250 笔（超过一页），旧实现 desc + offset=5 只取最新 5 笔
+    chain = FakeChain(range(1000, 1250))
+    fetcher = _fetcher(chain, cursor=1000)
+    txs = _fetch(fetcher)
+    assert [int(tx['blockNumber']) for tx in txs] == list(range(1000, 1250))
+    assert all(r['sort'] == 'asc' for r in chain.requests)
+    assert fetcher.cursors['txlist'][ADDRESS] == 1249
+
+
+def test_failed_page_keeps_cursor_at_contiguous_prefix():
+    chain = FakeChain(range(1000, 1250), fail_pages={2})
+    fetcher = _fetcher(chain, cursor=1000)
+    txs = _fetch(fetcher)
+    assert len(txs) == INCREMENTAL_PAGE_SIZE
+    assert fetcher.cursors['txlist'][ADDRESS] == 1000 + INCREMENTAL_PAGE_SIZE - 1
+
+    # 下一轮从游标继续，拿到剩余交易
+    chain.fail_pages.clear()
+    rest = _fetch(fetcher)
+    assert int(rest[-1]['blockNumber']) == 1249
+    seen = {tx['hash'] for tx in txs + rest}
+    assert len(seen) == 250
+
+
+def test_page_cap_resumes_next_round(monkeypatch):
+    monkeypatch.setattr(etherscan_fetcher, 'INCREMENTAL_MAX_PAGES', 2)
+    chain = FakeChain(range(1000, 1500))
+    fetcher = _fetcher(chain, cursor=1000)
+    first = _fetch(fetcher)
+    assert len(first) == 2 * INCREMENTAL_PAGE_SIZE
+    assert fetcher.cursors['txlist'][ADDRESS] == int(first[-1]['blockNumber'])
+
+    hashes = {tx['hash'] for tx in first}
+    for _ in range(3):
+        hashes.update(tx['hash'] for tx in _fetch(fetcher))
+    assert len(hashes) == 500
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+测试事件分层存储：写入分段 → 压实去重 → 按流内顺序读取、symbol 过滤
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+# 添加 src 路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+tiering = pytest.importorskip('services.event_tiering')
+if not tiering.HAS_PYARROW:
+    pytest.skip('需要 pyarrow', allow_module_level=True)
+
+from core.redis_client import RedisClient
+
+STREAM = 'events:raw'
+HOUR_MS = 1717203600000         # 2024-06-01 01:00 UTC
+
+
+def _entries():
+    """同一毫秒内多条（symbol 与流内顺序相反），外加下一小时的事件"""
+    entries = []
+    for ms, symbols in ((HOUR_MS + 5, ['ZZZ', 'AAA', 'MMM']),
+                        (HOUR_MS + 9, ['AAA']),
+                        (HOUR_MS + 10, ['MMM', 'AAA']),
+                        (HOUR_MS + 3600000 + 1, ['ZZZ', 'AAA'])):
+        for seq, symbol in enumerate(symbols):
+            entries.append((f'{ms}-{seq}', {
+                'source': 'rest_api', 'exchange': 'binance', 'symbols': f'["{symbol}"]',
+                'event_type': 'listing', 'score': '50', 'raw_text': f'list {symbol} #{seq}',
+            }))
+    return entries
+
+
+@pytest.fixture
+def redis():
+    client = RedisClient.from_client(fakeredis.FakeRedis(decode_responses=True))
+    for sid, fields in _entries():
+        client.xadd(STREAM, fields, id=sid)
+    return client
+
+
+def _drain(writer, last_id):
+    """跑写入循环直到读到 last_id，停止时落盘"""
+    async def drive():
+        task = asyncio.create_task(writer.run())
+        while writer._cursors.get(STREAM) != last_id:
+            await asyncio.sleep(0.01)
+        writer.stop()
+        await task
+    asyncio.run(asyncio.wait_for(drive(), timeout=10))
+
+
+def _writer(redis, tmp_path):
+    return tiering.EventTierWriter(redis, base_dir=str(tmp_path), streams=[STREAM], segment_seconds=3600)
+
+
+def _hour_dir(tmp_path, hour):
+    return tmp_path / 'events_raw' / 'date=2024-06-01' / f'hour={hour}'
+
+
+def _xrange_order(symbols=None):
+    entries = _entries()
+    if symbols:
+        entries = [(sid, f) for sid, f in entries if f['symbols'].strip('[]"') in symbols]
+    return [sid for sid, _ in entries]
+
+
+def test_write_advances_cursor(redis, tmp_path):
+    entries = _entries()
+    writer = _writer(redis, tmp_path)
+    _drain(writer, entries[-1][0])
+
+    assert redis.hget(tiering.CURSOR_KEY, STREAM) == entries[-1][0]
+    assert writer.stats['rows_written'] == len(entries)
+    assert len(list(_hour_dir(tmp_path, '01').glob('part-*.parquet'))) == 1
+    assert len(list(_hour_dir(tmp_path, '02').glob('part-*.parquet'))) == 1
+
+
+def test_compact_dedups_and_reader_keeps_stream_order(redis, tmp_path):
+    entries = _entries()
+    writer = _writer(redis, tmp_path)
+    _drain(writer, entries[-1][0])
+    # 模拟游标推进前崩溃：重启后从较早的游标重放，产生与已有分段重叠的新分段
+    redis.hset(tiering.CURSOR_KEY, STREAM, entries[1][0])
+    writer = _writer(redis, tmp_path)
+    _drain(writer, entries[-1][0])
+    assert len(list(_hour_dir(tmp_path, '01').glob('part-*.parquet'))) == 2
+
+    reader = tiering.EventArchiveReader(str(tmp_path))
+    start, end = HOUR_MS, HOUR_MS + 2 * 3600000
+    before = reader.scan(STREAM, start, end)
+    first_hour = [sid for sid, _ in entries if int(sid.split('-')[0]) < HOUR_MS + 3600000]
+    assert before.num_rows == len(entries) + len(first_hour) - 2
+
+    writer.compact()
+    assert writer.stats['hours_compacted'] == 2
+    assert not list(_hour_dir(tmp_path, '01').glob('part-*.parquet'))
+    assert (_hour_dir(tmp_path, '01') / tiering.COMPACTED_FILE).exists()
+
+    # 压实后文件内按 symbol 排序，读取仍按 (毫秒, 序号) 还原 XRANGE 顺序
+    events = reader.events(STREAM, start, end)
+    assert [sid for sid, _ in events] == _xrange_order()
+    assert events == [(sid, fields) for sid, fields in _entries()]
+
+
+def test_symbol_filter_and_time_range(redis, tmp_path):
+    entries = _entries()
+    writer = _writer(redis, tmp_path)
+    _drain(writer, entries[-1][0])
+    writer.compact()
+    reader = tiering.EventArchiveReader(str(tmp_path))
+
+    events = reader.events(STREAM, HOUR_MS, HOUR_MS + 2 * 3600000, symbols=['aaa'])
+    assert [sid for sid, _ in events] == _xrange_order({'AAA'})
+
+    # [start, end)：不含下一小时
+    table = reader.scan(STREAM, HOUR_MS, HOUR_MS + 3600000, symbols=['AAA', 'ZZZ'], columns=['symbol'])
+    assert table.column_names == ['symbol']
+    assert table['symbol'].to_pylist() == ['ZZZ', 'AAA', 'AAA', 'AAA']
+
+
+def test_scan_empty_range(tmp_path):
+    reader = tiering.EventArchiveReader(str(tmp_path))
+    table = reader.scan(STREAM, HOUR_MS, HOUR_MS + 3600000, columns=['stream_id', 'ts'])
+    assert table.num_rows == 0 and table.column_names == ['stream_id', 'ts']
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+测试 Gas 预言机启动与重连（启动时节点不可用、重连后重放订阅并回填 feeHistory）
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('websockets')
+
+# 添加 src 路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from core.blockchain import gas_oracle
+from core.blockchain.websocket_client import WebSocketPool
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(json.loads(message))
+
+
+def _methods(socket):
+    return [(m['method'], m['params'][0]) for m in socket.sent]
+
+
+@pytest.fixture(autouse=True)
+def reset_oracles(monkeypatch):
+    monkeypatch.setenv('ETHEREUM_WS_URL', 'wss://rpc.invalid/ws')
+    monkeypatch.setattr(gas_oracle, '_oracles', {})
+    monkeypatch.setattr(gas_oracle, '_pool', None)
+
+
+def _start(pool, connected):
+    """启动预言机；connect 按 connected 返回，不启动监听任务"""
+    async def connect(self=None):
+        return connected
+
+    original_add = pool.add_client
+
+    def add_client(config):
+        client = original_add(config)
+        client.config.reconnect_interval = 0
+        client.connect = connect
+        return client
+
+    pool.add_client = add_client
+    pool.listen_client = lambda name: None
+    oracles = asyncio.run(gas_oracle.start_gas_oracles(['ethereum'], pool=pool, block_window=5))
+    return oracles['ethereum']
+
+
+def test_subscription_recorded_when_rpc_down_at_startup():
+    oracle = _start(WebSocketPool(), connected=False)
+    client = oracle.client
+    assert [s['method'] for s in client._subscriptions] == ['eth_subscribe']
+
+    # listen() 中的重连成功：重放订阅，并回填 feeHistory
+    socket = FakeSocket()
+
+    async def reconnect_ok():
+        client.ws = socket
+        client.is_connected = True
+        return True
+
+    client.connect = reconnect_ok
+    assert asyncio.run(client.reconnect())
+    assert _methods(socket) == [('eth_subscribe', 'newHeads'), ('eth_feeHistory', hex(5))]
+
+
+def test_backfill_repeated_after_every_reconnect():
+    pool = WebSocketPool()
+    oracle = _start(pool, connected=False)
+    client = oracle.client
+    socket = FakeSocket()
+
+    async def reconnect_ok():
+        client.ws = socket
+        client.is_connected = True
+        return True
+
+    client.connect = reconnect_ok
+    for _ in range(3):
+        client.is_connected = False
+        assert asyncio.run(client.reconnect())
+    assert _methods(socket).count(('eth_feeHistory', hex(5))) == 3
+    assert _methods(socket).count(('eth_subscribe', 'newHeads')) == 3
+
+    # 回填响应写入环形缓冲
+    request = [m for m in socket.sent if m['method'] == 'eth_feeHistory'][-1]
+    asyncio.run(oracle._handle_response({
+        'id': request['id'],
+        'result': {
+            'oldestBlock': hex(100),
+            'baseFeePerGas': [hex(10 * 10 ** 9)] * 6,
+            'reward': [[hex(1), hex(2 * 10 ** 9), hex(3)]] * 5,
+        },
+    }))
+    assert oracle.suggest('standard').max_priority_fee == 2 * 10 ** 9
+    assert oracle.status['head'] == 104
+
+
+def test_connected_at_startup_backfills_once():
+    pool = WebSocketPool()
+    socket = FakeSocket()
+
+    original_add = pool.add_client
+
+    def add_client(config):
+        client = original_add(config)
+        client.ws = socket
+        client.is_connected = True
+        return client
+
+    pool.add_client = add_client
+    oracle = _start(pool, connected=True)
+    assert oracle.client.is_connected
+    assert _methods(socket) == [('eth_subscribe', 'newHeads'), ('eth_feeHistory', hex(5))]
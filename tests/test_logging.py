@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+测试日志限流级别与丢弃计数导出
+"""
+
+import logging
+import queue
+import sys
+from pathlib import Path
+
+# 添加 src 路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from core import logging as core_logging
+from core.logging import CallSiteRateLimiter, NonBlockingQueueHandler, discard_counts
+
+
+def _record(level, created, lineno=10):
+    record = logging.LogRecord('t', level, 'x.py', lineno, 'msg %s', ('a',), None)
+    record.created = created
+    return record
+
+
+def test_warnings_not_sampled_by_default():
+    limiter = CallSiteRateLimiter(rate=2, interval=10)
+    assert all(limiter.filter(_record(logging.WARNING, 0.1 * i)) for i in range(10))
+    passed = [limiter.filter(_record(logging.INFO, 0.1 * i, lineno=20)) for i in range(10)]
+    assert passed.count(True) == 2 and limiter.suppressed == 8
+
+
+def test_warning_sampling_is_opt_in():
+    limiter = CallSiteRateLimiter(rate=2, interval=10, max_level=logging.WARNING)
+    assert [limiter.filter(_record(logging.WARNING, 0.1 * i)) for i in range(4)].count(True) == 2
+    # ERROR 始终放行
+    limiter = CallSiteRateLimiter(rate=1, interval=10, max_level=logging.CRITICAL)
+    assert all(limiter.filter(_record(logging.ERROR, 0.1 * i)) for i in range(5))
+
+
+def test_discard_counts_exported(monkeypatch):
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    limiter = CallSiteRateLimiter(rate=1, interval=10)
+    monkeypatch.setattr(core_logging, '_queue_handlers', [handler])
+    monkeypatch.setattr(core_logging, '_rate_limiters', [limiter])
+    for i in range(3):
+        handler.enqueue(_record(logging.INFO, i))
+        limiter.filter(_record(logging.INFO, 0.1 * i))
+    assert discard_counts() == {'queue_full': 2, 'rate_limited': 2}
+
+    from core.metrics import render
+    text = render()
+    assert 'crypto_log_discarded{reason="queue_full"} 2' in text
+    assert 'crypto_log_discarded{reason="rate_limited"} 2' in text
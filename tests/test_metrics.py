@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+测试指标导出格式：stats 桥接同名指标只输出一个 TYPE 行
+"""
+
+import sys
+from pathlib import Path
+
+# 添加 src 路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from core.metrics import MetricsRegistry
+
+
+def _families(text):
+    """指标名 -> 样本行下标列表；同时检查 TYPE 行不重复"""
+    types, rows = [], {}
+    for i, line in enumerate(text.splitlines()):
+        if line.startswith('# TYPE '):
+            types.append(line.split()[2])
+        elif line and not line.startswith('#'):
+            rows.setdefault(line.split('{', 1)[0].split(' ', 1)[0], []).append(i)
+    return types, rows
+
+
+def test_shared_prefix_has_single_type_and_contiguous_samples():
+    registry = MetricsRegistry()
+    registry.register_stats('crypto_exchange_monitor', {'scans': 3, 'errors': 1, 'running': True},
+                            service='exchange_intl')
+    registry.register_stats('crypto_exchange_monitor', {'scans': 7, 'errors': 0, 'last': 'x'},
+                            service='exchange_kr')
+    registry.counter('crypto_events_total', 'events', ('service',)).inc(service='a')
+
+    text = registry.render()
+    types, rows = _families(text)
+    assert len(types) == len(set(types))
+    assert types.count('crypto_exchange_monitor_scans') == 1
+    assert 'crypto_exchange_monitor_running' not in rows and 'crypto_exchange_monitor_last' not in rows
+    for name, idx in rows.items():
+        assert idx == list(range(idx[0], idx[0] + len(idx))), name
+    assert 'crypto_exchange_monitor_scans{service="exchange_intl"} 3' in text
+    assert 'crypto_exchange_monitor_scans{service="exchange_kr"} 7' in text
+
+
+def test_reregister_replaces_stats():
+    registry = MetricsRegistry()
+    registry.register_stats('crypto_fusion', {'processed': 1}, engine='v3')
+    registry.register_stats('crypto_fusion', {'processed': 5}, engine='v3')
+    text = registry.render()
+    assert 'crypto_fusion_processed{engine="v3"} 5' in text
+    assert text.count('crypto_fusion_processed{') == 1
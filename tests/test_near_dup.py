@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+测试近似重复检测：转发合并，含义相反的公告（上币 / 下架）、不同交易所的上币不合并
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加 src 路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from core.near_dup import NearDuplicateDetector, event_class, exchange_names, make_anchor
+
+# (上币, 下架 / 暂停)：文本只差一两个词，SimHash 距离在默认阈值内
+OPPOSITE_PAIRS = [
+    ('[거래] 노트코인(NOT) 원화 마켓 거래 지원 안내', '[거래] 노트코인(NOT) 원화 마켓 거래 지원 종료 안내'),
+    ('거래 지원 안내 (NOT)', '거래 지원 종료 안내 (NOT)'),
+    ('Binance Will List Notcoin (NOT) with Seed Tag Applied',
+     'Binance Will Delist Notcoin (NOT) with Seed Tag Applied'),
+    ('Bybit will list NOT/USDT spot trading pair today', 'Bybit will suspend NOT/USDT spot trading pair today'),
+    ('币安将上线 NOT 现货交易 开放充值', '币安将下架 NOT 现货交易 开放充值'),
+]
+
+# 同一代币在不同交易所上币：文本几乎相同，但属于多所确认 / 韩国套利信号
+CROSS_EXCHANGE = [
+    ('Binance will list FOO (FOO) in the Innovation Zone, trading opens 10:00 UTC',
+     'OKX will list FOO (FOO) in the Innovation Zone, trading opens 10:00 UTC'),
+    ('Upbit 원화 마켓 디지털 자산 추가 FOO', 'Bithumb 원화 마켓 디지털 자산 추가 FOO'),
+    ('업비트 원화 마켓 디지털 자산 추가 (FOO)', '빗썸 원화 마켓 디지털 자산 추가 (FOO)'),
+]
+
+REPOSTS = [
+    ('Binance Will List Notcoin (NOT) with Seed Tag Applied',
+     '🚨 Binance Will List Notcoin (NOT) with Seed Tag Applied!!'),
+    ('[거래] 노트코인(NOT) 원화 마켓 거래 지원 종료 안내', '[공지] 노트코인(NOT) 원화 마켓 거래 지원 종료 안내'),
+]
+
+
+def _check_pair(a, b, symbol='NOT'):
+    detector = NearDuplicateDetector()
+    assert detector.check(a, 'src', make_anchor([symbol], text=a), ts=0) is None
+    return detector.check(b, 'src', make_anchor([symbol], text=b), ts=1)
+
+
+@pytest.mark.parametrize('listing, delisting', OPPOSITE_PAIRS)
+def test_opposite_notices_are_not_merged(listing, delisting):
+    assert _check_pair(listing, delisting) is None
+    assert _check_pair(delisting, listing) is None
+
+
+@pytest.mark.parametrize('first, second', CROSS_EXCHANGE)
+def test_listings_on_different_exchanges_both_pass(first, second):
+    """同一来源分类（交易所官方频道）先后发出两家交易所的上币，都要推送"""
+    assert _check_pair(first, second, 'FOO') is None
+    assert _check_pair(second, first, 'FOO') is None
+
+
+def test_same_exchange_repost_still_merges():
+    first, _ = CROSS_EXCHANGE[0]
+    match = _check_pair(first, '🔥 ' + first + ' 🔥', 'FOO')
+    assert match is not None and not match.new_source
+
+
+@pytest.mark.parametrize('first, repost', REPOSTS)
+def test_reposts_still_merge(first, repost):
+    match = _check_pair(first, repost)
+    assert match is not None and not match.new_source
+
+
+def test_event_class():
+    assert event_class('Binance Will List Notcoin (NOT)') == ''
+    assert event_class('거래 지원 종료 안내 (NOT)') == 'delist'
+    assert event_class('Notice on Removal of Spot Trading Pairs') == 'delist'
+    assert event_class('NOT 입출금 일시 중단 안내') == 'suspend'
+    assert event_class('투자 유의 종목 지정 안내 (NOT)') == 'caution'
+
+
+def test_exchange_names():
+    assert exchange_names('Binance will list FOO') == ['binance']
+    assert exchange_names('OKX上线 FOO，欧易现货') == ['okx']
+    assert exchange_names('업비트·빗썸 동시 상장') == ['upbit', 'bithumb']
+    assert exchange_names('looks okay, no exchange here') == []
+    assert make_anchor(['FOO'], text='OKX and Binance will list FOO') == 'FOO@binance+okx'
+    assert make_anchor(['FOO'], text='Binance will delist FOO') == 'FOO@binance#delist'
+
+
+def test_anchor_without_text_unchanged():
+    assert make_anchor(['not', 'ABC'], '0xAbC') == 'ABC,NOT,0xabc'
+    assert make_anchor(['NOT'], text='거래 지원 종료 안내') == 'NOT#delist'
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+测试 PnL 增量拉取：升序分页，失败/页数上限时只返回完整区块的连续前缀
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加 src 路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from analytics import pnl_calculator
+from analytics.pnl_calculator import PnLCalculator
+
+PAGE = 10
+
+
+class FakeTxList:
+    """按 Etherscan 语义分页；fail_pages 中的页返回空列表（与 fetcher 失败时一致）"""
+
+    def __init__(self, blocks, fail_pages=()):
+        self.txs = [{'hash': f'0x{i}', 'blockNumber': str(b)} for i, b in enumerate(blocks)]
+        self.fail_pages = set(fail_pages)
+
+    async def __call__(self, address, start_block=0, page=1, offset=100, sort='desc'):
+        if page in self.fail_pages:
+            return []
+        txs = sorted((tx for tx in self.txs if int(tx['blockNumber']) >= start_block),
+                     key=lambda tx: int(tx['blockNumber']), reverse=sort == 'desc')
+        return txs[(page - 1) * offset:page * offset]
+
+
+def _drain(fetch, last_block, rounds=10):
+    """模拟多轮刷新：每轮按返回结果推进游标，返回所有处理过的交易"""
+    calc = PnLCalculator()
+    seen = []
+    for _ in range(rounds):
+        txs = asyncio.run(calc._fetch_since(fetch, '0xabc', last_block, 5))
+        seen.extend(txs)
+        if txs:
+            last_block = max(last_block, max(int(tx['blockNumber']) for tx in txs))
+    return seen, last_block
+
+
+def _blocks(count, per_block=3, start=101):
+    return [start + i // per_block for i in range(count)]
+
+
+def test_failed_page_does_not_skip(monkeypatch):
+    monkeypatch.setattr(pnl_calculator, 'INCREMENTAL_PAGE_SIZE', PAGE)
+    fetch = FakeTxList(_blocks(45), fail_pages={2})
+    calc = PnLCalculator()
+    first = asyncio.run(calc._fetch_since(fetch, '0xabc', 100, 5))
+    # 第 1 页末尾区块不完整，被丢弃
+    assert [tx['hash'] for tx in first] == [f'0x{i}' for i in range(9)]
+
+    fetch.fail_pages.clear()
+    seen, last = _drain(fetch, 100)
+    assert sorted(tx['hash'] for tx in seen) == sorted(tx['hash'] for tx in fetch.txs)
+    assert len(seen) == 45
+    assert last == int(fetch.txs[-1]['blockNumber'])
+
+
+def test_page_cap_resumes_without_gaps_or_duplicates(monkeypatch):
+    monkeypatch.setattr(pnl_calculator, 'INCREMENTAL_PAGE_SIZE', PAGE)
+    monkeypatch.setattr(pnl_calculator, 'INCREMENTAL_MAX_PAGES', 2)
+    fetch = FakeTxList(_blocks(95, per_block=4))
+    seen, last = _drain(fetch, 100)
+    hashes = [tx['hash'] for tx in seen]
+    assert len(hashes) == len(set(hashes)) == 95
+    assert last == int(fetch.txs[-1]['blockNumber'])
+
+
+def test_short_page_is_complete(monkeypatch):
+    monkeypatch.setattr(pnl_calculator, 'INCREMENTAL_PAGE_SIZE', PAGE)
+    fetch = FakeTxList(_blocks(14))
+    txs = asyncio.run(PnLCalculator()._fetch_since(fetch, '0xabc', 100, 5))
+    assert len(txs) == 14
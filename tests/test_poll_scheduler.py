@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+测试 REST 轮询调度器（时间轮重排、加速、空闲退避），使用注入时钟
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加 src 路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from core.poll_scheduler import PollScheduler
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class ScriptedBudget:
+    """按顺序返回预设等待秒数；可在 reserve 时执行回调（模拟触发过程中的重排）"""
+
+    def __init__(self, waits=(), on_reserve=None):
+        self.waits = list(waits)
+        self.on_reserve = on_reserve
+
+    def reserve(self, weight=1.0):
+        if self.on_reserve is not None:
+            self.on_reserve()
+        return self.waits.pop(0) if self.waits else 0.0
+
+
+def _scheduler(clock, **config):
+    scheduler = PollScheduler({'global_rps': 1000, 'burst': 1000, **config}, clock=clock)
+    # 由测试手动推进时间轮，不启动后台任务
+    scheduler._ensure_running = lambda: None
+    scheduler._tick_no = int(clock() / scheduler.tick)
+    return scheduler
+
+
+def _advance_to(scheduler, clock, t):
+    clock.now = t
+    scheduler._advance(t)
+
+
+def _take(job):
+    """消费一次释放（wait 在已到期时直接返回）"""
+    assert job._ready
+    asyncio.run(job.wait())
+    assert job.in_flight
+
+
+def test_deferred_entry_reinserted_into_current_slot():
+    """预算顺延正好一圈，条目插回正在推进的槽，不能丢也不能提前释放"""
+    clock = FakeClock(10.0)
+    scheduler = _scheduler(clock, tick=0.25, wheel_slots=8)     # 一圈 2 秒
+    scheduler.budget = ScriptedBudget([2.0])
+    job = scheduler.register('rest:binance', 'binance', interval=5)
+
+    scheduler._reschedule(job, 10.0)
+    slot = int(10.0 / 0.25) % 8
+    _advance_to(scheduler, clock, 10.0)
+    assert not job._ready
+    assert scheduler.stats['deferred'] == 1
+    assert [e[0] for e in scheduler.slots[slot]] == [48]
+
+    for t in (10.5, 11.0, 11.75):
+        _advance_to(scheduler, clock, t)
+        assert not job._ready
+
+    _advance_to(scheduler, clock, 12.0)
+    assert job._ready
+    assert scheduler.stats['released'] == 1
+    assert not scheduler.slots[slot]
+
+
+def test_reinsert_due_in_current_tick_fires_same_pass():
+    clock = FakeClock(10.0)
+    scheduler = _scheduler(clock, tick=0.25, wheel_slots=8)
+    first = scheduler.register('rest:binance', 'binance', interval=5)
+    second = scheduler.register('rest:okx', 'okx', interval=5)
+
+    # 触发 first 的过程中把 second 重排到当前刻度（落在同一个槽）
+    def reschedule_second():
+        if second.due <= 0:
+            scheduler._reschedule(second, clock())
+
+    scheduler.budget = ScriptedBudget(on_reserve=reschedule_second)
+    scheduler._reschedule(first, 10.0)
+    _advance_to(scheduler, clock, 10.0)
+
+    assert first._ready and second._ready
+    assert scheduler.stats['released'] == 2
+    assert not any(scheduler.slots)
+
+
+def test_fixed_cadence_and_boost():
+    clock = FakeClock()
+    scheduler = _scheduler(clock, boost_factor=3)
+    job = scheduler.register('rest:binance', 'binance', interval=9)
+    assert job.min_interval == 3
+
+    scheduler._reschedule(job, 1000.0)
+    _advance_to(scheduler, clock, 1000.0)
+    _take(job)
+    clock.now = 1000.2
+    job.done()
+    assert job.due == 1009.0                 # 请求耗时不叠加到周期上
+
+    clock.now = 1001.0
+    assert scheduler.boost('binance', duration=60, publish=False) == 1
+    assert job.boosted
+    assert job.due == 1003.0                 # 提前到上次释放 + 加速间隔
+
+    _advance_to(scheduler, clock, 1002.75)
+    assert not job._ready
+    _advance_to(scheduler, clock, 1003.0)
+    _take(job)
+    clock.now = 1003.1
+    job.done()
+    assert job.due == 1006.0
+
+    _advance_to(scheduler, clock, 1006.0)
+    _take(job)
+    job.done()
+    # 原先 1009 的旧条目已失效，同一时刻只释放一次
+    _advance_to(scheduler, clock, 1009.0)
+    _take(job)
+    assert scheduler.stats['released'] == 4
+
+    clock.now = 1061.5
+    assert not job.boosted
+    assert job.interval == 9
+
+
+def test_boost_other_venue_untouched():
+    clock = FakeClock()
+    scheduler = _scheduler(clock)
+    job = scheduler.register('rest:okx', 'okx', interval=9)
+    scheduler._reschedule(job, 1009.0)
+    assert scheduler.boost('binance', duration=60, publish=False) == 0
+    assert job.due == 1009.0 and not job.boosted
+
+
+def test_idle_backoff():
+    clock = FakeClock()
+    scheduler = _scheduler(clock, idle_after=100, max_backoff=8)
+    job = scheduler.register('rest:gate', 'gate', interval=10)
+
+    for idle, expected in ((0, 10), (99, 10), (100, 20), (250, 40), (299, 40), (300, 80), (10_000, 80)):
+        clock.now = 1000 + idle
+        assert job.interval == expected, idle
+
+    clock.now = 1000.0
+    scheduler._reschedule(job, 1000.0)
+    _advance_to(scheduler, clock, 1000.0)
+    _take(job)
+    clock.now = 1250.0
+    job.done(changed=False)
+    # 退避到 40 秒；错过的周期按固定节拍跳过（仍对齐 1000 + 40k）
+    assert job.due == 1280.0
+
+    _advance_to(scheduler, clock, 1279.75)
+    assert not job._ready
+    _advance_to(scheduler, clock, 1280.0)
+    _take(job)
+    clock.now = 1280.5
+    job.done(changed=True)
+    assert job.interval == 10
+    assert job.due == 1290.0
+
+
+@pytest.mark.parametrize('idle_after', [100, 3600])
+def test_boost_overrides_backoff(idle_after):
+    clock = FakeClock()
+    scheduler = _scheduler(clock, idle_after=idle_after)
+    job = scheduler.register('rest:mexc', 'mexc', interval=6)
+    clock.now = 1000 + idle_after * 3
+    assert job.interval > 6
+    scheduler.boost('mexc', duration=60, publish=False)
+    assert job.interval == job.min_interval
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+测试历史 K 线回补：按实际 K 线计算缺口（含中间空洞），已查过的空历史区间不重复请求，
+暂时性失败不停用代币、未拉完的区间下次重试
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# 添加 src 路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from analytics import price_history
+from analytics.price_history import BINANCE_KLINES_LIMIT, HistoricalPriceStore
+
+STEP = 3600
+
+
+@pytest.fixture
+def store():
+    store = HistoricalPriceStore(db_path=':memory:')
+    yield store
+    store._db.close()
+
+
+def _candles(times):
+    return [(t, 1.0, 1.0, 1.0, 1.0) for t in times]
+
+
+class FakeBinance:
+    """记录请求区间；halted 中的 K 线数据源本身没有"""
+
+    def __init__(self, halted=()):
+        self.requests = []
+        self.halted = set(halted)
+
+    async def __call__(self, symbol, interval, start, end):
+        self.requests.append((start, end))
+        return _candles(t for t in range(start, end + 1, STEP) if t not in self.halted)
+
+
+def _base():
+    return (int(time.time()) // STEP - 200) * STEP
+
+
+def test_interior_gap_is_backfilled(store, monkeypatch):
+    base = _base()
+    # 已有 [0, 10) 与 [20, 30) 两段，中间 10 根缺失
+    store.upsert_candles('FOO', '1h', _candles(base + i * STEP for i in list(range(10)) + list(range(20, 30))))
+    fetch = FakeBinance()
+    monkeypatch.setattr(store, '_fetch_binance', fetch)
+
+    asyncio.run(store.backfill('FOO', '1h', base, base + 29 * STEP))
+    assert fetch.requests == [(base + 10 * STEP, base + 19 * STEP)]
+    assert store.missing_spans('FOO', '1h', base, base + 29 * STEP) == []
+    assert store.lookup('FOO', base + 15 * STEP + 60, '1h') == 1.0
+
+
+def test_leading_and_trailing_gaps(store, monkeypatch):
+    base = _base()
+    store.upsert_candles('FOO', '1h', _candles(base + i * STEP for i in range(5, 10)))
+    assert store.missing_spans('FOO', '1h', base, base + 19 * STEP) == [
+        (base, base + 4 * STEP),
+        (base + 9 * STEP, base + 19 * STEP),     # 最后一根可能未收盘，从它开始
+    ]
+
+
+def test_empty_history_is_queried_once(store, monkeypatch):
+    base = _base()
+    halted = {base + i * STEP for i in range(3, 6)}
+    fetch = FakeBinance(halted=halted)
+    monkeypatch.setattr(store, '_fetch_binance', fetch)
+
+    asyncio.run(store.backfill('FOO', '1h', base, base + 9 * STEP))
+    asyncio.run(store.backfill('FOO', '1h', base, base + 9 * STEP))
+    assert fetch.requests == [(base, base + 9 * STEP)]
+    # 数据源确实没有的空洞仍然存在，但已记为查过
+    assert store.lookup('FOO', base + 4 * STEP, '1h') is None
+    assert store.missing_spans('FOO', '1h', base, base + 9 * STEP) == []
+
+
+class ScriptedKlines:
+    """按顺序返回 (状态码, 数据) 或抛出异常，替代 fetch_json；数据为 None 时按请求区间生成 K 线"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    async def __call__(self, session, url, params=None, **kwargs):
+        self.requests.append((url, dict(params or {})))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        status, data = response
+        if status == 200 and data is None:
+            start = params['startTime'] // 1000
+            end = params['endTime'] // 1000
+            times = list(range(start, end + 1, STEP))[:BINANCE_KLINES_LIMIT]
+            data = [[t * 1000, '1', '1', '1', '1'] for t in times]
+        return status, data
+
+
+@pytest.fixture
+def klines(store, monkeypatch):
+    async def no_session():
+        return None
+
+    monkeypatch.setattr(store, '_get_session', no_session)
+
+    def install(*responses):
+        fetch = ScriptedKlines(*responses)
+        monkeypatch.setattr(price_history, 'fetch_json', fetch)
+        return fetch
+    return install
+
+
+@pytest.mark.parametrize('failure', [
+    (429, {'code': -1003, 'msg': 'Too many requests'}),
+    (503, None),
+    asyncio.TimeoutError(),
+])
+def test_transient_error_does_not_disable_symbol(store, klines, failure):
+    base = _base()
+    klines(failure)
+    assert asyncio.run(store.backfill('FOO', '1h', base, base + 9 * STEP)) == 0
+    assert 'FOO' not in store._unavailable
+    assert store.stats['source_errors'] == 1
+
+    # 下次回补重新请求并补齐
+    fetch = klines((200, None))
+    assert asyncio.run(store.backfill('FOO', '1h', base, base + 9 * STEP)) == 10
+    assert len(fetch.requests) == 1
+    assert store.missing_spans('FOO', '1h', base, base + 9 * STEP) == []
+
+
+def test_invalid_symbol_disables_symbol(store, klines):
+    base = _base()
+    fetch = klines((400, {'code': -1121, 'msg': 'Invalid symbol.'}))
+    assert asyncio.run(store.backfill('NOPE', '1h', base, base + 9 * STEP)) == 0
+    assert 'NOPE' in store._unavailable
+    asyncio.run(store.backfill('NOPE', '1h', base, base + 9 * STEP))
+    assert len(fetch.requests) == 1
+
+
+def test_invalid_on_binance_falls_back_to_coingecko(store, klines):
+    base = _base()
+    store.coingecko_ids['FOO'] = 'foo-token'
+    prices = [[(base + i * STEP) * 1000, 2.0] for i in range(10)]
+    klines((400, {'code': -1121, 'msg': 'Invalid symbol.'}), (200, {'prices': prices}))
+    assert asyncio.run(store.backfill('FOO', '1h', base, base + 9 * STEP)) == 10
+    assert 'FOO' not in store._unavailable
+
+
+def test_partial_page_failure_refetches_remainder(store, klines):
+    """第一页成功、第二页限流：已拿到的写入，区间不记为查过，下次只补剩余部分"""
+    base = (int(time.time()) // STEP - 3 * BINANCE_KLINES_LIMIT) * STEP
+    end = base + (BINANCE_KLINES_LIMIT + 99) * STEP
+    klines((200, None), (429, None))
+    assert asyncio.run(store.backfill('FOO', '1h', base, end)) == BINANCE_KLINES_LIMIT
+    assert 'FOO' not in store._unavailable
+    assert not store._checked.get(('FOO', '1h'))
+    remainder = (base + (BINANCE_KLINES_LIMIT - 1) * STEP, end)
+    assert store.missing_spans('FOO', '1h', base, end) == [remainder]
+
+    fetch = klines((200, None))
+    # 剩余 100 根 + 重新拉取已有的最后一根（可能未收盘）
+    assert asyncio.run(store.backfill('FOO', '1h', base, end)) == 101
+    assert [p['startTime'] // 1000 for _, p in fetch.requests] == [remainder[0]]
+    assert store.missing_spans('FOO', '1h', base, end) == []
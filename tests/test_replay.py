@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+测试融合引擎回放（归档数据源、命令行时间参数）
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+# 添加 src 路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from fusion import replay
+
+try:
+    from .benchmarks.generators import GENERATORS
+except ImportError:
+    from benchmarks.generators import GENERATORS
+
+DAY_START = datetime(2024, 6, 1, tzinfo=timezone.utc).timestamp()
+
+
+def _entries(count=300, start_ts=DAY_START + 3600):
+    """合成事件 -> (stream_id, 字段)，ID 递增"""
+    entries = []
+    for i, (ts, event) in enumerate(GENERATORS['binance_listing_fanout'](count, start_ts=start_ts)):
+        entries.append((f'{int(ts * 1000)}-{i}', event))
+    return entries
+
+
+def _write_archive(base_dir, entries):
+    tiering = pytest.importorskip('services.event_tiering')
+    if not tiering.HAS_PYARROW:
+        pytest.skip('需要 pyarrow')
+    rows = [tiering.to_row(sid, data) for sid, data in entries]
+    part_dir = Path(base_dir) / 'events_raw' / 'date=2024-06-01' / 'hour=01'
+    part_dir.mkdir(parents=True)
+    table = tiering.pa.Table.from_pylist(rows, schema=tiering.SCHEMA)
+    tiering._write_atomic(table, part_dir / f'part-{entries[0][0]}.parquet')
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2024-06-01', 1717200000000),
+    ('2024-06-01T08:00:00+08:00', 1717200000000),
+    ('1717200000', 1717200000000),
+    ('1717200000000', 1717200000000),
+    ('1717200000000-5', 1717200000000),
+])
+def test_parse_time_arg(value, expected):
+    assert replay.parse_time_arg(value) == expected
+
+
+def test_parse_time_arg_rejects_garbage():
+    with pytest.raises(ValueError):
+        replay.parse_time_arg('yesterday')
+
+
+def test_redis_bounds():
+    assert replay._redis_bound(None, '-') == '-'
+    assert replay._redis_bound('1717200000000-3', '-') == '1717200000000-3'
+    assert replay._redis_bound('2024-06-01', '-') == '1717200000000'
+    assert replay._redis_bound('2024-06-02', '+', end=True) == '1717286399999'
+
+
+def test_archive_command_from_docstring(tmp_path, capsys):
+    """文档中的 --source archive --start 2024-06-01 --end 2024-06-02 用法"""
+    entries = _entries()
+    _write_archive(tmp_path / 'events', entries)
+    output = tmp_path / 'fused.jsonl'
+
+    replay.main([
+        'run', '--source', 'archive', '--path', str(tmp_path / 'events'),
+        '--start', '2024-06-01', '--end', '2024-06-02', '--output', str(output),
+    ])
+    report = json.loads(capsys.readouterr().out)
+    assert report['events'] == len(entries)
+    assert report['emitted'] > 0
+    assert output.exists()
+
+
+def test_archive_range_is_end_exclusive(tmp_path, capsys):
+    entries = _entries()
+    _write_archive(tmp_path / 'events', entries)
+    end_ms = replay.parse_time_arg('2024-06-01T01:00:01')
+    expected = sum(1 for sid, _ in entries if int(sid.split('-')[0]) < end_ms)
+    assert 0 < expected < len(entries)
+
+    replay.main([
+        'run', '--source', 'archive', '--path', str(tmp_path / 'events'),
+        '--start', '2024-06-01', '--end', '2024-06-01T01:00:01', '--output', str(tmp_path / 'out.jsonl'),
+    ])
+    assert json.loads(capsys.readouterr().out)['events'] == expected
+
+
+def _mixed_entries(count=2000):
+    """三个场景按时间合并，产生大量窗口到期的聚合输出"""
+    events = []
+    for name, gen in sorted(GENERATORS.items()):
+        events.extend(gen(count, start_ts=DAY_START))
+    events.sort(key=lambda e: e[0])
+    return [(f'{int(ts * 1000)}-{i}', event) for i, (ts, event) in enumerate(events)]
+
+
+def _replay(entries, path, engine='v3'):
+    replayer = replay.FusionReplayer(engine, str(path))
+    return asyncio.run(replayer.run(entries)), replayer.capture.records
+
+
+@pytest.mark.parametrize('engine', replay.ENGINES)
+def test_flushed_aggregates_are_tagged_and_diff_keeps_all(tmp_path, engine):
+    entries = _mixed_entries()
+    report, records = _replay(entries, tmp_path / 'a.jsonl', engine)
+
+    flushed = [r for r in records if r['source_id'].startswith(replay.FLUSH_PREFIX)]
+    assert flushed, '应有窗口到期输出的聚合事件'
+    # 窗口到期的输出不挂在推进时钟的那条原始事件名下
+    direct_ids = {r['source_id'] for r in records} - {r['source_id'] for r in flushed}
+    assert all(sid in dict(entries) for sid in direct_ids)
+
+    result = replay.diff_captures(str(tmp_path / 'a.jsonl'), str(tmp_path / 'a.jsonl'))
+    assert result['total_a'] == report['emitted']
+    assert not result['only_a'] and not result['only_b'] and not result['changed']
+
+
+def test_diff_reports_dropped_duplicate_key(tmp_path):
+    _, records = _replay(_mixed_entries(), tmp_path / 'a.jsonl')
+    counts = {}
+    for r in records:
+        key = (r['source_id'], r['event'].get('symbols', ''))
+        counts[key] = counts.get(key, 0) + 1
+    lines = (tmp_path / 'a.jsonl').read_text(encoding='utf-8').splitlines()
+    # 删掉最后一条输出，必须出现在 only_a 里
+    (tmp_path / 'b.jsonl').write_text('\n'.join(lines[:-1]) + '\n', encoding='utf-8')
+
+    result = replay.diff_captures(str(tmp_path / 'a.jsonl'), str(tmp_path / 'b.jsonl'))
+    assert result['total_a'] == len(lines)
+    assert result['total_b'] == len(lines) - 1
+    assert len(result['only_a']) == 1 and not result['only_b']
+    assert result['collisions']['a'] == sum(1 for c in counts.values() if c > 1)
+
+
+@pytest.mark.parametrize('engine', replay.ENGINES)
+def test_replay_output_independent_of_hash_seed(tmp_path, engine):
+    """模块文档承诺两次回放结果一致：不同 PYTHONHASHSEED 下输出逐字节相同"""
+    source = tmp_path / 'events.jsonl'
+    with open(source, 'w', encoding='utf-8') as f:
+        for sid, data in _mixed_entries(1000):
+            f.write(json.dumps({'id': sid, 'data': data}, ensure_ascii=False) + '\n')
+
+    root = Path(__file__).parent.parent
+    outputs = []
+    for seed in ('1', '2'):
+        output = tmp_path / f'fused_{seed}.jsonl'
+        subprocess.run(
+            [sys.executable, '-m', 'src.fusion.replay', 'run', '--source', 'jsonl', '--path', str(source),
+             '--engine', engine, '--output', str(output)],
+            cwd=root, env={**os.environ, 'PYTHONHASHSEED': seed}, check=True, capture_output=True,
+        )
+        outputs.append(output.read_bytes())
+    assert outputs[0]
+    assert outputs[0] == outputs[1]
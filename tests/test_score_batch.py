@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+测试批量评分 score_batch 与逐条 calculate_score 结果一致
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+# 添加 src 路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from fusion import scoring_engine
+from fusion.scoring_engine import InstitutionalScorer
+
+try:
+    from .benchmarks.generators import GENERATORS
+except ImportError:
+    from benchmarks.generators import GENERATORS
+
+START_TS = 1_700_000_000.0
+
+
+def _handmade_events():
+    """覆盖会话过期、无符号事件、韩国套利、空交易所"""
+    def ev(ts, source, exchange, text, symbol=''):
+        return ts, {'source': source, 'exchange': exchange, 'raw_text': text, 'symbol': symbol}
+
+    return [
+        ev(START_TS, 'rest_api', 'binance', 'Binance will list FOO', 'FOO'),
+        ev(START_TS + 5, 'rest_api', 'okx', 'OKX new listing FOO', 'FOO'),
+        ev(START_TS + 10, 'kr_market', 'upbit', 'Upbit 上币 FOO', 'FOO'),
+        ev(START_TS + 20, 'social_telegram', '', 'gm everyone'),
+        ev(START_TS + 40, 'news', '', 'market recap'),
+        ev(START_TS + 700, 'kr_market', 'bithumb', 'Bithumb lists FOO', 'FOO'),
+        ev(START_TS + 710, 'rest_api', 'gate', 'Gate new listing FOO', 'FOO'),
+        ev(START_TS + 715, 'kr_market', 'upbit', 'Upbit 上币 FOO', 'FOO'),
+        ev(START_TS + 2000, 'websocket', 'mexc', 'new pair BARUSDT', 'BAR'),
+        ev(START_TS + 2001, 'websocket', 'mexc', 'new pair BARUSDT', 'BAR'),
+    ]
+
+
+def _scenarios():
+    scenarios = {name: gen(300) for name, gen in GENERATORS.items()}
+    scenarios['handmade'] = _handmade_events()
+    return scenarios
+
+
+def _score_each(events):
+    """逐条评分（新评分器，时钟为事件时间）"""
+    now = [0.0]
+    scorer = InstitutionalScorer(clock=lambda: now[0])
+    results = []
+    for ts, event in events:
+        now[0] = ts
+        results.append(scorer.calculate_score(dict(event)))
+    return results
+
+
+def _assert_parity(results, batch):
+    for i, r in enumerate(results):
+        row = {key: values[i].item() for key, values in batch.items()}
+        assert round(row['total_score'], 1) == r['total_score'], (i, row, r)
+        assert row['base_score'] == r['base_score']
+        assert row['event_score'] == r['event_score']
+        assert round(row['exchange_multiplier'], 2) == r['exchange_multiplier']
+        assert round(row['freshness_multiplier'], 2) == r['freshness_multiplier']
+        assert row['multi_bonus'] == r['multi_bonus']
+        assert row['korean_bonus'] == r['korean_bonus']
+        assert row['source_count'] == r['source_count']
+        assert row['exchange_count'] == r['exchange_count']
+        assert row['is_first'] == r['is_first']
+        assert round(row['seconds_ago'], 1) == r['seconds_ago']
+        assert row['should_trigger'] == r['should_trigger'], (i, row, r)
+
+
+@pytest.mark.parametrize('name', sorted(_scenarios()))
+def test_parity_with_calculate_score(name):
+    events = _scenarios()[name]
+    scorer = InstitutionalScorer()
+    columns = scorer.batch_columns([e for _, e in events], [ts for ts, _ in events])
+    _assert_parity(_score_each(events), scorer.score_batch(columns))
+
+
+def test_handmade_covers_edge_cases():
+    scorer = InstitutionalScorer()
+    events = _handmade_events()
+    batch = scorer.score_batch(scorer.batch_columns([e for _, e in events], [ts for ts, _ in events]))
+    assert batch['korean_bonus'].any()
+    assert (batch['source_count'][5:8] <= 2).all()    # 间隔超过窗口后重新计数
+
+
+def test_custom_tables(monkeypatch):
+    """替换评分表后与逐条评分（修改全局表）一致"""
+    events = _scenarios()['binance_listing_fanout']
+    source_scores = {**scoring_engine.SOURCE_SCORES, 'tg_alpha_intel': 10, 'rest_api_binance': 80}
+    multipliers = {**scoring_engine.EXCHANGE_MULTIPLIERS, 'binance': 0.9, 'default': 1.2}
+
+    scorer = InstitutionalScorer()
+    columns = scorer.batch_columns([e for _, e in events], [ts for ts, _ in events])
+    batch = scorer.score_batch(columns, source_scores=source_scores, exchange_multipliers=multipliers)
+
+    monkeypatch.setattr(scoring_engine, 'SOURCE_SCORES', source_scores)
+    monkeypatch.setattr(scoring_engine, 'EXCHANGE_MULTIPLIERS', multipliers)
+    _assert_parity(_score_each(events), batch)
+
+
+def test_arrow_and_integer_symbols():
+    pa = pytest.importorskip('pyarrow')
+    events = _scenarios()['telegram_spam_storm']
+    scorer = InstitutionalScorer()
+    columns = scorer.batch_columns([e for _, e in events], [ts for ts, _ in events])
+    expected = scorer.score_batch(columns)
+
+    from_arrow = scorer.score_batch(pa.table(columns))
+    symbols, codes = np.unique(columns['symbol'].astype(str), return_inverse=True)
+    ids = np.where(symbols[codes] == '', -1, codes)
+    from_ids = scorer.score_batch({**columns, 'symbol': ids})
+    for key, values in expected.items():
+        np.testing.assert_array_equal(from_arrow[key], values)
+        np.testing.assert_array_equal(from_ids[key], values)
+
+
+def test_empty_batch():
+    scorer = InstitutionalScorer()
+    batch = scorer.score_batch(scorer.batch_columns([], []))
+    assert all(len(values) == 0 for values in batch.values())
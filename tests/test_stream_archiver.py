@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+测试 Stream 归档：坏消息拆批定位、写入死信并 ACK
+"""
+
+import asyncio
+import json
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import pytest
+
+asyncpg = pytest.importorskip('asyncpg')
+fakeredis = pytest.importorskip('fakeredis')
+
+# 添加 src 路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from core.redis_client import RedisClient
+from services import stream_archiver
+from services.stream_archiver import CONSUMER_GROUP, DEAD_LETTER_STREAM, StreamArchiver
+
+
+class FakeConn:
+    """只实现归档用到的接口：临时表 COPY + INSERT ... SELECT，事务失败时丢弃"""
+
+    def __init__(self, db):
+        self.db = db
+        self.staged = {}
+
+    @asynccontextmanager
+    async def transaction(self):
+        self.staged = {}
+        yield
+        for table, rows in self.staged.items():
+            self.db.setdefault(table, []).extend(rows)
+
+    async def execute(self, sql):
+        if sql.startswith('INSERT INTO'):
+            table = sql.split()[2]
+            return f"INSERT 0 {len(self.staged.get(table, []))}"
+        return 'CREATE TABLE'
+
+    async def copy_records_to_table(self, stage, records, columns):
+        for row in records:
+            # text 列不接受 NUL，JSONB 不接受 \u0000（22P05）
+            if any(isinstance(v, str) and ('\x00' in v or '\\u0000' in v) for v in row):
+                raise asyncpg.exceptions.UntranslatableCharacterError('unsupported Unicode escape sequence')
+        self.staged.setdefault(stage[len('_stage_'):], []).extend(records)
+
+
+class FakePool:
+    def __init__(self, fail=None):
+        self.db = {}
+        self.fail = fail
+        self.writes = 0
+
+    @asynccontextmanager
+    async def acquire(self):
+        self.writes += 1
+        if self.fail:
+            raise self.fail
+        yield FakeConn(self.db)
+
+
+def _archiver(count, poison=()):
+    redis = RedisClient.from_client(fakeredis.FakeRedis(decode_responses=True))
+    for i in range(count):
+        text = 'bad\x00text' if i in poison else f'event {i}'
+        redis.xadd('events:raw', {'raw_text': text, 'symbol': f'T{i}'})
+    redis.xgroup_create('events:raw', CONSUMER_GROUP, id='0')
+    archiver = StreamArchiver(redis, dsn='postgresql://test', streams=['events:raw'])
+    batch = asyncio.run(archiver._read({'events:raw': '>'}, count, None))
+    return archiver, redis, batch
+
+
+def test_poison_rows_are_dead_lettered_and_acked():
+    archiver, redis, batch = _archiver(64, poison={5, 40})
+    archiver.pool = FakePool()
+
+    assert asyncio.run(archiver._flush(batch)) is True
+    assert len(archiver.pool.db['stream_archive']) == 62
+    assert archiver.stats['dead_letters'] == 2
+    assert archiver.stats['inserted'] == 62
+    assert redis.xpending('events:raw', CONSUMER_GROUP)['pending'] == 0
+
+    letters = redis.xrange(DEAD_LETTER_STREAM)
+    assert [json.loads(f['data'])['symbol'] for _, f in letters] == ['T5', 'T40']
+    assert all(f['stream'] == 'events:raw' and f['error'] for _, f in letters)
+
+
+def test_clean_batch_is_one_write():
+    archiver, redis, batch = _archiver(32)
+    archiver.pool = FakePool()
+
+    assert asyncio.run(archiver._flush(batch)) is True
+    assert archiver.pool.writes == 1
+    assert archiver.stats['dead_letters'] == 0
+
+
+def test_connection_errors_keep_messages_pending():
+    archiver, redis, batch = _archiver(8)
+    archiver.pool = FakePool(fail=ConnectionRefusedError('db down'))
+
+    assert asyncio.run(archiver._flush(batch)) is False
+    assert archiver.pool.writes == 1                       # 非数据错误不拆批
+    assert redis.xpending('events:raw', CONSUMER_GROUP)['pending'] == 8
+    assert not redis.xrange(DEAD_LETTER_STREAM)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+测试巨鲸增量聚合：按日分桶的去重集合（带过期）、标记与计数原子提交
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+# 添加 src 路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from analytics import whale_aggregates as agg
+
+
+def _event(tx_hash='0xaa', ts=None, action='receive', usd='1000'):
+    return {
+        'address': '0xWhale',
+        'tx_hash': tx_hash,
+        'timestamp': str(ts or int(time.time() * 1000)),
+        'action': action,
+        'token': 'ETH',
+        'value_usd_raw': usd,
+    }
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def test_duplicate_tx_counted_once(redis):
+    event = _event()
+    assert agg.record_event(redis, event) is True
+    assert agg.record_event(redis, dict(event)) is False
+    assert agg.get_wallet(redis, '0xwhale')['total_trades'] == 1
+
+
+def test_seen_bucket_expires(redis):
+    ts = int(time.time() * 1000)
+    agg.record_event(redis, _event(ts=ts))
+    key = agg.seen_key(ts)
+    assert redis.sismember(key, '0xwhale:0xaa')
+    ttl = redis.ttl(key)
+    assert 0 < ttl <= (agg.SEEN_RETENTION_DAYS + 1) * 86_400
+    assert not redis.exists('whale:agg:seen')
+
+
+def test_events_beyond_retention_are_skipped(redis):
+    old = int((time.time() - (agg.SEEN_RETENTION_DAYS + 1) * 86_400) * 1000)
+    assert agg.record_event(redis, _event(ts=old)) is False
+    assert agg.get_wallet(redis, '0xwhale') is None
+
+
+def test_failed_update_does_not_mark_seen(redis, monkeypatch):
+    """EXEC 失败时去重标记与计数都不生效，重试能计入（旧实现先 SADD，事件永久丢失）"""
+    event = _event()
+    pipeline_cls = type(redis.pipeline())
+    real_execute = pipeline_cls.execute
+
+    def failing_execute(self, *args, **kwargs):
+        if self.transaction:
+            self.reset()
+            raise ConnectionError('connection lost')
+        return real_execute(self, *args, **kwargs)
+
+    monkeypatch.setattr(pipeline_cls, 'execute', failing_execute)
+    with pytest.raises(ConnectionError):
+        agg.record_event(redis, event)
+    monkeypatch.undo()
+
+    assert not redis.exists(agg.seen_key(int(event['timestamp'])))
+    assert agg.record_event(redis, event) is True
+    assert agg.get_wallet(redis, '0xwhale')['total_trades'] == 1
+
+
+def test_rebuild_is_idempotent(redis):
+    for i in range(5):
+        redis.xadd('whales:dynamics', _event(tx_hash=f'0x{i}', action='send' if i % 2 else 'receive'))
+    assert agg.rebuild_from_stream(redis) == 5
+    assert agg.rebuild_from_stream(redis) == 0
+    wallet = agg.get_wallet(redis, '0xwhale')
+    assert wallet['total_trades'] == 5
+    assert wallet['total_buy_usd'] == 3000 and wallet['total_sell_usd'] == 2000